@@ -0,0 +1,317 @@
+"""
+Headless asset compiler for the emotion animations.
+
+    python emotions.py compile test/ -o build/ -e rle
+    python emotions.py compile happy.json sad.json -o build/ -e delta -j 4
+    python emotions.py pack test/ -o faces.bpk -e rle --align 512
+    python emotions.py inspect faces.bpk
+    python emotions.py import art/*.gif -o test/ --colors 8 --dither floyd-steinberg
+    python emotions.py tiles moods/ -o build/emotion_tiles.h --tile 8
+
+Reads project files written by the editors' SAVE PROJECT (any version, see
+bubu_assets.project) and writes one <name>.h per project in any
+bubu_assets.encoders encoding, plus bubu_frames.h for the packed ones.
+
+Rebuilds are incremental: <out>/.emotions-cache.json records a content hash of
+every input (file bytes + encoding + the bubu_assets sources), and a project whose
+hash and output are unchanged is skipped. Changed projects are compiled in a
+process pool, one file per task.
+
+`pack` puts every project into a single binary asset pack (bubu_assets.pack)
+that the firmware streams from SD with bubu_pack.h. `inspect` lists a pack's
+contents and checks it, exiting non-zero if it is damaged. `import` turns
+PNG/GIF files into project files on the editor grid (bubu_assets.images), one
+frame per GIF frame, so artwork can be batch-converted without opening an editor.
+`tiles` compiles a whole emotion set into one header around a shared bank of
+deduplicated tiles (bubu_assets.tiles) and reports the flash it saves.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+import bubu_assets
+from bubu_assets import encoders, images, pack, project, tiles
+
+MANIFEST = ".emotions-cache.json"
+IMAGE_EXTENSIONS = (".png", ".gif")
+GRID = (34, 60)     # rows, cols of the animation editor at SCALE=4
+ASSETS_DIR = os.path.dirname(os.path.abspath(bubu_assets.__file__))
+
+
+def codec_fingerprint():
+    """Changes whenever the asset library or the C decoders change, forcing a rebuild."""
+    h = hashlib.sha256()
+    for name in sorted(os.listdir(ASSETS_DIR)):
+        if name.endswith((".py", ".h")) and name != "tests.py":
+            h.update(name.encode())
+            with open(os.path.join(ASSETS_DIR, name), "rb") as f:
+                h.update(f.read())
+    return h.hexdigest()
+
+
+def content_hash(path, encoding, fingerprint):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        h.update(f.read())
+    h.update(encoding.encode())
+    h.update(fingerprint.encode())
+    return h.hexdigest()
+
+
+def symbol_name(path):
+    return os.path.splitext(os.path.basename(path))[0].replace(" ", "_").replace("-", "_")
+
+
+def compile_one(src, out_path, encoding):
+    """Worker: compile one project. Returns (src, packed bytes, raw bytes)."""
+    proj = project.load(src)
+    tmp = out_path + ".tmp"
+    with open(tmp, "w") as f:
+        encoders.write_header(f, symbol_name(src), proj.store, proj.speed, encoding)
+    os.replace(tmp, out_path)   # never leave a half-written header behind
+    frames565 = encoders.frames_to_565(proj.store)
+    return (src, encoders.encoded_size(frames565, encoding),
+            encoders.encoded_size(frames565, "raw"))
+
+
+def collect_inputs(paths, extensions=(".json",)):
+    found = []
+    for p in paths:
+        if os.path.isdir(p):
+            found += sorted(os.path.join(p, n) for n in os.listdir(p) if n.lower().endswith(extensions))
+        else:
+            found.append(p)
+    return found
+
+
+def compile_all(inputs, out_dir, encoding="raw", jobs=None, force=False, log=print):
+    """Compile every changed project; returns {"compiled", "skipped", "failed"} lists."""
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    try:
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+
+    fingerprint = codec_fingerprint()
+    todo, result = [], {"compiled": [], "skipped": [], "failed": []}
+    for src in inputs:
+        out_path = os.path.join(out_dir, symbol_name(src) + ".h")
+        digest = content_hash(src, encoding, fingerprint)
+        entry = manifest.get(os.path.abspath(src))
+        if not force and entry and entry["hash"] == digest and os.path.exists(out_path):
+            result["skipped"].append(src)
+            continue
+        todo.append((src, out_path, digest))
+
+    def finish(task, run):
+        src, out_path, digest = task
+        try:
+            _, packed, raw = run()
+        except (OSError, ValueError) as e:
+            result["failed"].append(src)
+            log(f"  {os.path.basename(src):<24} FAILED: {e}")
+            return
+        manifest[os.path.abspath(src)] = {"hash": digest, "encoding": encoding,
+                                          "output": os.path.basename(out_path)}
+        result["compiled"].append(src)
+        log(f"  {os.path.basename(src):<24} {encoding:<6} {packed:>7} B  (raw {raw} B)")
+
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(todo) <= 1:
+        for task in todo:
+            finish(task, lambda t=task: compile_one(t[0], t[1], encoding))
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(todo))) as pool:
+            futures = [(task, pool.submit(compile_one, task[0], task[1], encoding)) for task in todo]
+            for task, fut in futures:
+                finish(task, fut.result)
+
+    if encoding != "raw" and (result["compiled"] or result["skipped"]):
+        shutil.copyfile(encoders.DECODER_HEADER, os.path.join(out_dir, "bubu_frames.h"))
+    tmp = manifest_path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, manifest_path)
+    return result
+
+
+def build_pack_file(inputs, out_path, encoding="rle", align=pack.DEFAULT_ALIGN):
+    """Compile every project into one .bpk at out_path; returns its size in bytes."""
+    animations = []
+    for src in inputs:
+        proj = project.load(src)
+        animations.append((symbol_name(src), proj.store, proj.speed))
+    data = pack.build_pack(animations, encoding, align)
+    tmp = out_path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, out_path)
+    return len(data)
+
+
+def inspect_pack(path, log=print):
+    """Print a pack's animation table and every problem validate() finds; returns the problems."""
+    with open(path, "rb") as f:
+        data = f.read()
+    problems = pack.validate(data)
+    try:
+        bpk = pack.Pack(data)
+    except pack.PackError:
+        bpk = None
+    if bpk is not None:
+        log(f"{path}: v{bpk.version}, {len(bpk.animations)} animations, {len(data)} B, "
+            f"align {bpk.align}, largest blob {bpk.max_blob} B")
+        for anim in bpk.animations.values():
+            size = sum(s for _, s, _ in anim.frames) + 2 * len(anim.palette) + len(anim.keyframe)
+            log(f"  {anim.name:<16} {anim.encoding:<6} {anim.width}x{anim.height} "
+                f"{len(anim.frames):>3} frames @ {anim.delay_ms} ms  {size:>7} B")
+    for problem in problems:
+        log(f"  PROBLEM: {problem}")
+    return problems
+
+
+def import_images(inputs, out_dir, rows, cols, log=print, **options):
+    """Convert every image into <out_dir>/<name>.json; options go to images.import_image."""
+    os.makedirs(out_dir, exist_ok=True)
+    failed = []
+    for src in inputs:
+        out_path = os.path.join(out_dir, symbol_name(src) + ".json")
+        try:
+            proj = images.import_image(src, rows, cols, **options)
+        except (OSError, ValueError) as e:
+            failed.append(src)
+            log(f"  {os.path.basename(src):<24} FAILED: {e}")
+            continue
+        project.save(out_path, proj)
+        log(f"  {os.path.basename(src):<24} {len(proj.store):>3} frames, {len(proj.palette):>3} colours "
+            f"→ {os.path.basename(out_path)}")
+    return failed
+
+
+def build_tiles_file(inputs, out_path, tile=tiles.TILE, log=print):
+    """Compile every project into one shared-tile header (+ bubu_tiles.h); returns the report."""
+    animations = []
+    for src in inputs:
+        proj = project.load(src)
+        animations.append((symbol_name(src), proj.store, proj.speed))
+    tileset = tiles.build_tileset(animations, tile)
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    tmp = out_path + ".tmp"
+    with open(tmp, "w") as f:
+        tiles.write_header(f, tileset, symbol_name(out_path))
+    os.replace(tmp, out_path)
+    shutil.copyfile(tiles.DECODER_HEADER, os.path.join(os.path.dirname(os.path.abspath(out_path)), "bubu_tiles.h"))
+
+    rep = tiles.report(tileset, animations)
+    for name, raw, best, enc in rep["per_anim"]:
+        log(f"  {name:<24} raw {raw:>7} B   best alone {best:>7} B ({enc})")
+    log(f"  {rep['unique_tiles']} unique {tile}x{tile} tiles of {rep['total_tiles']} "
+        f"({tileset.bank_layout()[0]} bank, {tileset.bpp} bpp, {tileset.map_bytes}-byte map entries)")
+    for label, size in (("raw", rep["raw"]), ("best per-animation", rep["best"])):
+        saved = size - rep["tiles"]
+        log(f"  tiles {rep['tiles']} B vs {label} {size} B: {saved:+} B saved "
+            f"({saved * 100 // max(size, 1)}%)")
+    missing = [m for m in tiles.MOODS if m not in {name for name, _, _ in animations}]
+    if missing:
+        log(f"  moods not in this set yet: {', '.join(missing)}")
+    return rep
+
+
+def grid_size(text):
+    """"60x34" → (rows, cols)."""
+    try:
+        cols, rows = (int(v) for v in text.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected COLSxROWS, got {text!r}")
+    return rows, cols
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="emotions", description=__doc__.split("\n\n")[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    comp = sub.add_parser("compile", help="convert project JSON files into C headers")
+    comp.add_argument("inputs", nargs="+", help="project .json files or directories of them")
+    comp.add_argument("-o", "--out", default=None, help="output directory (default: next to the input)")
+    comp.add_argument("-e", "--encoding", default="raw", choices=encoders.ENCODINGS)
+    comp.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: CPU count)")
+    comp.add_argument("-f", "--force", action="store_true", help="ignore the hash cache")
+    pk = sub.add_parser("pack", help="bundle project JSON files into one binary asset pack")
+    pk.add_argument("inputs", nargs="+", help="project .json files or directories of them")
+    pk.add_argument("-o", "--out", required=True, help="output .bpk file")
+    pk.add_argument("-e", "--encoding", default="rle", choices=list(pack.ENCODING_IDS))
+    pk.add_argument("--align", type=int, default=pack.DEFAULT_ALIGN,
+                    help="blob alignment in bytes (512 = one SD sector per read start)")
+    ins = sub.add_parser("inspect", help="list and validate a binary asset pack")
+    ins.add_argument("pack", help=".bpk file")
+    imp = sub.add_parser("import", help="convert PNG/GIF images into project JSON files")
+    imp.add_argument("inputs", nargs="+", help="image files or directories of them")
+    imp.add_argument("-o", "--out", default=None, help="output directory (default: next to the input)")
+    imp.add_argument("--size", type=grid_size, default=GRID, metavar="COLSxROWS",
+                     help="editor grid (default 60x34; the ESP32 editor is 48x64)")
+    imp.add_argument("--colors", type=int, default=16, help="palette size when no --palette is given")
+    imp.add_argument("--palette", nargs="+", default=None, metavar="#RRGGBB",
+                     help="map onto these colours instead of building a palette")
+    imp.add_argument("--method", default="median-cut", choices=images.METHODS)
+    imp.add_argument("--dither", default="none", choices=images.DITHERS)
+    imp.add_argument("--background", default="#000000", help="colour behind transparent pixels and margins")
+    til = sub.add_parser("tiles", help="compile an emotion set into one header with a shared tile bank")
+    til.add_argument("inputs", nargs="+", help="project .json files or directories of them")
+    til.add_argument("-o", "--out", required=True, help="output .h file")
+    til.add_argument("--tile", type=int, default=tiles.TILE, help="tile size in cells (default 8)")
+    args = parser.parse_args(argv)
+
+    if args.command == "import":
+        inputs = collect_inputs(args.inputs, IMAGE_EXTENSIONS)
+        if not inputs:
+            parser.error("no images found")
+        out_dir = args.out or os.path.dirname(os.path.abspath(inputs[0]))
+        rows, cols = args.size
+        try:
+            failed = import_images(inputs, out_dir, rows, cols, colors=args.palette, n_colors=args.colors,
+                                   method=args.method, dither=args.dither, background=args.background)
+        except ImportError as e:
+            print(e)
+            return 1
+        print(f"{len(inputs) - len(failed)} imported, {len(failed)} failed → {out_dir}")
+        return 1 if failed else 0
+
+    if args.command == "inspect":
+        return 1 if inspect_pack(args.pack) else 0
+
+    inputs = collect_inputs(args.inputs)
+    if not inputs:
+        parser.error("no project files found")
+    if args.command == "tiles":
+        try:
+            build_tiles_file(inputs, args.out, args.tile)
+        except (OSError, ValueError) as e:
+            print(f"tiles failed: {e}")
+            return 1
+        print(f"{len(inputs)} animations → {args.out}")
+        return 0
+    if args.command == "pack":
+        try:
+            size = build_pack_file(inputs, args.out, args.encoding, args.align)
+        except (OSError, ValueError) as e:
+            print(f"pack failed: {e}")
+            return 1
+        print(f"{len(inputs)} animations, {size} B → {args.out}")
+        return 0
+    out_dir = args.out or os.path.dirname(os.path.abspath(inputs[0]))
+    start = time.perf_counter()
+    result = compile_all(inputs, out_dir, args.encoding, args.jobs, args.force)
+    print(f"{len(result['compiled'])} compiled, {len(result['skipped'])} unchanged, "
+          f"{len(result['failed'])} failed in {time.perf_counter() - start:.2f}s → {out_dir}")
+    return 1 if result["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
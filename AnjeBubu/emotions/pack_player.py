@@ -0,0 +1,113 @@
+"""
+Desktop preview player for binary asset packs (.bpk, see bubu_assets.pack).
+
+    python pack_player.py faces.bpk            # every animation, pick from the list
+    python pack_player.py faces.bpk smile -z 6
+
+Frames are decoded with the same reference decoders the compiler verifies
+against, so what plays here is what bubu_pack.h draws on the device, RGB565
+rounding included. The pack is validated on open and any problems are printed;
+a pack that can't be parsed at all is reported and the player exits.
+"""
+import argparse
+import os
+import sys
+import tkinter as tk
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from bubu_assets import pack
+from bubu_assets.color import rgb565_to_hex
+from bubu_assets.render import PreviewImage
+
+BG_COLOR = "#1E1E1E"
+TEXT_COLOR = "#FFFFFF"
+
+
+def hex_frames(frames565):
+    """RGB565 grids → "#RRGGBB" object arrays; each distinct colour is converted once."""
+    values, inverse = np.unique(np.asarray(frames565, dtype=np.uint16), return_inverse=True)
+    table = np.array([rgb565_to_hex(int(v)) for v in values], dtype=object)
+    return table[inverse.reshape(np.shape(frames565))]
+
+
+class PackPlayer:
+    def __init__(self, root, bpk, zoom=4, start=None):
+        self.root = root
+        self.pack = bpk
+        self.zoom = zoom
+        self.frames = []
+        self.index = 0
+        self.job = None
+        root.title("Bubu Pack Player")
+        root.configure(bg=BG_COLOR)
+
+        names = list(bpk.animations)
+        self.listbox = tk.Listbox(root, bg=BG_COLOR, fg=TEXT_COLOR, width=18, exportselection=False)
+        for name in names:
+            self.listbox.insert(tk.END, name)
+        self.listbox.pack(side=tk.LEFT, fill=tk.Y, padx=5, pady=5)
+        self.listbox.bind("<<ListboxSelect>>", lambda _e: self.select(names[self.listbox.curselection()[0]]))
+
+        right = tk.Frame(root, bg=BG_COLOR)
+        right.pack(side=tk.LEFT, padx=5, pady=5)
+        self.canvas = tk.Canvas(right, bg="#000000", highlightthickness=0)
+        self.canvas.pack()
+        self.info = tk.Label(right, bg=BG_COLOR, fg=TEXT_COLOR, font=("Arial", 9))
+        self.info.pack(pady=(5, 0))
+
+        first = start if start in bpk.animations else names[0]
+        self.listbox.selection_set(names.index(first))
+        self.select(first)
+
+    def select(self, name):
+        if self.job is not None:
+            self.root.after_cancel(self.job)
+        anim = self.pack.animations[name]
+        self.anim = anim
+        self.frames = hex_frames(self.pack.decode(name))
+        self.canvas.delete("all")
+        self.canvas.config(width=anim.width * self.zoom, height=anim.height * self.zoom)
+        self.preview = PreviewImage(self.canvas, anim.width, anim.height, self.zoom)
+        self.preview.prerender(self.frames)
+        self.index = 0
+        self.tick()
+
+    def tick(self):
+        anim = self.anim
+        self.preview.show(self.index, self.frames[self.index])
+        self.info.config(text=f"{anim.name}  {anim.encoding}  {anim.width}x{anim.height}  "
+                              f"frame {self.index + 1}/{len(self.frames)}  {anim.delay_ms} ms")
+        self.index = (self.index + 1) % len(self.frames)
+        self.job = self.root.after(max(anim.delay_ms, 1), self.tick)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play the animations in a .bpk asset pack")
+    parser.add_argument("pack", help=".bpk file")
+    parser.add_argument("name", nargs="?", default=None, help="animation to start with")
+    parser.add_argument("-z", "--zoom", type=int, default=4, help="screen pixels per frame pixel")
+    args = parser.parse_args(argv)
+
+    with open(args.pack, "rb") as f:
+        data = f.read()
+    for problem in pack.validate(data):
+        print(f"[Pack] {problem}")
+    try:
+        bpk = pack.Pack(data)
+    except pack.PackError as e:
+        print(f"[Pack] cannot open {args.pack}: {e}")
+        return 1
+    if not bpk.animations:
+        print(f"[Pack] {args.pack} has no animations")
+        return 1
+
+    root = tk.Tk()
+    PackPlayer(root, bpk, args.zoom, args.name)
+    root.mainloop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
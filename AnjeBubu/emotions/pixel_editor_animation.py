@@ -1,7 +1,13 @@
 import tkinter as tk
 from tkinter import colorchooser, filedialog, messagebox
-import json
-import math
+import os
+import sys
+import numpy as np
+
+# Shared asset code lives in bubu_assets/ at the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from bubu_assets import FrameStore, Project, encoders, images, project, raster
+from bubu_assets.render import CellGrid, PreviewImage, batch
 
 # --- USER CONFIG ---
 # SCALE: how many real TFT pixels each editor pixel represents.
@@ -20,11 +26,15 @@ class AnimatedPixelArtCreator:
         self.root.title("TFT_eSPI Animation Designer")
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         
-        self.frames = [[["#000000" for _ in range(COLS)] for _ in range(ROWS)]]
+        self.MAX_HISTORY = 50
+        self.store = FrameStore(ROWS, COLS, max_history=self.MAX_HISTORY)   # store.data[f, r, c] → colour index
         self.current_frame_idx = 0
         self.palette_colors = ["#000000", "#FFFFFF", "#FF0000", "#00FF00", "#0000FF", "#FFFF00", "#FF00FF", "#00FFFF"]
         self.selected_color = "#FFFFFF"
         self.anim_speed = tk.IntVar(value=150)
+        self.export_encoding = tk.StringVar(value="raw")   # see bubu_assets.encoders.ENCODINGS
+        self.import_dither = tk.StringVar(value="floyd-steinberg")   # see bubu_assets.images.DITHERS
+        self.import_swatches = tk.BooleanVar(value=False)   # map imports onto the swatches as they are
         
         self.show_grid = tk.BooleanVar(value=True)
         self.show_numbers = tk.BooleanVar(value=True)
@@ -37,18 +47,14 @@ class AnimatedPixelArtCreator:
         self.sel_anchor = None   # (r, c) where drag started
         self.sel_box = None      # (r0, c0, r1, c1) normalized bounding box
         self.sel_highlight = []  # canvas item IDs for the yellow selection overlay
-        self.clipboard = None    # {(rel_r, rel_c): color} snapshot for copy/paste
-        self.clipboard_size = None
+        self.clipboard = None    # store.region() block for copy/paste
 
-        # --- Undo history (per frame index) ---
-        self.history = {}        # {frame_idx: [snapshot, ...]}
-        self.MAX_HISTORY = 50
+        # Undo history lives in the store as per-frame cell diffs (see bubu_assets/frames.py)
 
         # --- Shape / tool state ---
         self.current_tool = "draw"   # draw | bucket | circle | rect | tri
         self.shape_fill = tk.BooleanVar(value=True)
         self.shape_anchor = None     # (r, c) where shape drag started
-        self.shape_preview_items = []
         self.tool_btns = {}
 
         self.setup_ui()
@@ -63,6 +69,10 @@ class AnimatedPixelArtCreator:
         tk.Label(self.top_bar, text=" PROJECT MANAGEMENT", fg="white", bg="#1c2833", font=("Arial", 9, "bold")).pack(side=tk.LEFT, padx=10)
         tk.Button(self.top_bar, text="SAVE PROJECT", command=self.save_project, bg="#f39c12", fg="black", font=("Arial", 8, "bold"), width=15).pack(side=tk.RIGHT, padx=5, pady=5)
         tk.Button(self.top_bar, text="LOAD PROJECT", command=self.load_project, bg="#3498db", fg="black", font=("Arial", 8, "bold"), width=15).pack(side=tk.RIGHT, padx=5, pady=5)
+        tk.Button(self.top_bar, text="IMPORT IMAGE", command=self.import_image, bg="#9b59b6", fg="black", font=("Arial", 8, "bold"), width=15).pack(side=tk.RIGHT, padx=5, pady=5)
+        tk.OptionMenu(self.top_bar, self.import_dither, *images.DITHERS).pack(side=tk.RIGHT, pady=5)
+        tk.Checkbutton(self.top_bar, text="Swatches only", variable=self.import_swatches, fg="white", bg="#1c2833",
+                       selectcolor="#1c2833", font=("Arial", 8)).pack(side=tk.RIGHT, padx=5)
 
         self.main_frame = tk.Frame(self.root)
         self.main_frame.pack(padx=10, pady=10)
@@ -91,6 +101,7 @@ class AnimatedPixelArtCreator:
         tk.Label(self.sidebar, text="LIVE PREVIEW", font=("Arial", 9, "bold")).pack(pady=(0,5))
         self.preview_canvas = tk.Canvas(self.sidebar, width=COLS, height=ROWS, bg="black", highlightthickness=1, highlightbackground="white")
         self.preview_canvas.pack(pady=5)
+        self.preview = PreviewImage(self.preview_canvas, COLS, ROWS)
 
         # --- View Options ---
         tk.Label(self.sidebar, text="VIEW SETTINGS", font=("Arial", 9, "bold")).pack(pady=(10,2))
@@ -162,6 +173,10 @@ class AnimatedPixelArtCreator:
         self.sel_btn_frame = tk.Frame(bottom_bar, bg="#555555")
         self.sel_btn_frame.pack(fill=tk.X)
 
+        enc_row = tk.Frame(bottom_bar)
+        enc_row.pack(fill=tk.X, pady=(2, 0))
+        tk.Label(enc_row, text="ENCODING", font=("Arial", 8, "bold")).pack(side=tk.LEFT)
+        tk.OptionMenu(enc_row, self.export_encoding, *encoders.ENCODINGS).pack(side=tk.RIGHT, fill=tk.X, expand=True)
         tk.Button(bottom_bar, text="EXPORT .H FILE", command=self.export_to_file, bg="#2ecc71", fg="black", font=("Arial", 10, "bold"), height=2).pack(fill=tk.X, pady=(2, 0))
         self.select_btn = tk.Label(self.sel_btn_frame, text="SELECT MODE: OFF",
                                    bg="#555555", fg="white", font=("Arial", 8, "bold"),
@@ -183,21 +198,20 @@ class AnimatedPixelArtCreator:
 
     def start_live_preview(self):
         self.preview_frame_idx = 0
+        self.prerender_preview()
         self.animate_preview()
 
+    def prerender_preview(self):
+        self.preview.prerender([self.store.hex_grid(f) for f in range(len(self.store))])
+
     def animate_preview(self):
-        self.preview_canvas.delete("all")
-        if self.frames:
-            if self.preview_frame_idx >= len(self.frames):
+        if len(self.store):
+            if self.preview_frame_idx >= len(self.store):
                 self.preview_frame_idx = 0
             
-            f = self.frames[self.preview_frame_idx]
-            for r in range(ROWS):
-                for c in range(COLS):
-                    if f[r][c] != "#000000":
-                        self.preview_canvas.create_rectangle(c, r, c+1, r+1, fill=f[r][c], outline="")
+            self.preview.show(self.preview_frame_idx, self.store.hex_grid(self.preview_frame_idx))
             
-            self.preview_frame_idx = (self.preview_frame_idx + 1) % len(self.frames)
+            self.preview_frame_idx = (self.preview_frame_idx + 1) % len(self.store)
         
         self.root.after(self.anim_speed.get(), self.animate_preview)
 
@@ -215,7 +229,7 @@ class AnimatedPixelArtCreator:
                     t_col = self.canvas.create_text(x_pos, OFFSET - 12, text=str(c+1), fill="#888888", font=("Arial", 8))
                     self.texts.append(t_col)
                 x1, y1 = c * PIXEL_SIZE + OFFSET, r * PIXEL_SIZE + OFFSET
-                self.rects[r][c] = self.canvas.create_rectangle(x1, y1, x1+PIXEL_SIZE, y1+PIXEL_SIZE, fill="#000000", outline="#222222")
+                self.rects[r][c] = self.canvas.create_rectangle(x1, y1, x1+PIXEL_SIZE, y1+PIXEL_SIZE, fill="#000000", outline="#222222", tags="cell")
         
         mid_x = (COLS // 2) * PIXEL_SIZE + OFFSET
         mid_y = (ROWS // 2) * PIXEL_SIZE + OFFSET
@@ -223,13 +237,12 @@ class AnimatedPixelArtCreator:
             self.canvas.create_line(mid_x, 5, mid_x, ROWS*PIXEL_SIZE+OFFSET+5, fill="#e74c3c", dash=(4,4), width=1),
             self.canvas.create_line(5, mid_y, COLS*PIXEL_SIZE+OFFSET+5, mid_y, fill="#e74c3c", dash=(4,4), width=1)
         ]
+        self.cells = CellGrid(self.canvas, self.rects, "#000000")
         self.refresh_canvas_style()
 
     def refresh_canvas_style(self):
         outline_color = "#222222" if self.show_grid.get() else ""
-        for r in range(ROWS):
-            for c in range(COLS):
-                self.canvas.itemconfig(self.rects[r][c], outline=outline_color)
+        self.canvas.itemconfig("cell", outline=outline_color)   # one call for every cell rectangle
         text_state = "normal" if self.show_numbers.get() else "hidden"
         for t_id in self.texts: self.canvas.itemconfig(t_id, state=text_state)
         center_state = "normal" if self.show_center.get() else "hidden"
@@ -331,41 +344,29 @@ class AnimatedPixelArtCreator:
         if not self.select_mode or self.sel_box is None:
             return
         self.push_history()
-        r0, c0, r1, c1 = self.sel_box
-        frame = self.frames[self.current_frame_idx]
-        for r in range(r0, r1 + 1):
-            for c in range(c0, c1 + 1):
-                frame[r][c] = "#000000"
-                self.canvas.itemconfig(self.rects[r][c], fill="#000000")
+        self.repaint_cells(self.store.clear(self.current_frame_idx, self.sel_box))
         self.clear_selection()
 
     def push_history(self):
-        idx = self.current_frame_idx
-        frame = self.frames[idx]
-        stack = self.history.setdefault(idx, [])
-        stack.append([row[:] for row in frame])
-        if len(stack) > self.MAX_HISTORY:
-            stack.pop(0)
+        """Start a new undo step; it records whatever changes until the next one."""
+        self.store.begin_edit(self.current_frame_idx)
 
     def undo(self):
-        idx = self.current_frame_idx
-        stack = self.history.get(idx, [])
-        if not stack:
+        restored = self.store.undo(self.current_frame_idx)
+        if restored is None:
             return
-        self.frames[idx] = stack.pop()
         # Keep the selection overlay visible but re-draw it over the restored frame
-        self.update_frame_view()
+        self.repaint_cells(restored)
         self.draw_selection()
 
+    def repaint_cells(self, mask):
+        """Push the current frame's colours to the canvas for the cells in mask that changed."""
+        self.cells.show_frame(self.store, self.current_frame_idx, mask)
+
     def copy_selection(self):
         if not self.select_mode or self.sel_box is None:
             return
-        r0, c0, r1, c1 = self.sel_box
-        frame = self.frames[self.current_frame_idx]
-        self.clipboard = {(r - r0, c - c0): frame[r][c]
-                          for r in range(r0, r1 + 1)
-                          for c in range(c0, c1 + 1)}
-        self.clipboard_size = (r1 - r0 + 1, c1 - c0 + 1)
+        self.clipboard = self.store.region(self.current_frame_idx, self.sel_box)
 
     def paste_selection(self):
         if not self.select_mode or self.clipboard is None:
@@ -375,17 +376,12 @@ class AnimatedPixelArtCreator:
             pr0, pc0 = self.sel_box[0], self.sel_box[1]
         else:
             pr0, pc0 = 0, 0
-        h, w = self.clipboard_size
+        h, w = self.clipboard.shape
         # Clamp so paste stays in grid
         pr0 = min(pr0, ROWS - h)
         pc0 = min(pc0, COLS - w)
         self.push_history()
-        frame = self.frames[self.current_frame_idx]
-        for (dr, dc), color in self.clipboard.items():
-            nr, nc = pr0 + dr, pc0 + dc
-            if 0 <= nr < ROWS and 0 <= nc < COLS:
-                frame[nr][nc] = color
-                self.canvas.itemconfig(self.rects[nr][nc], fill=color)
+        self.repaint_cells(self.store.paste(self.current_frame_idx, self.clipboard, pr0, pc0))
         # Select the pasted region so it can be moved immediately
         self.sel_box = (pr0, pc0, pr0 + h - 1, pc0 + w - 1)
         self.sel_anchor = (pr0, pc0)
@@ -399,18 +395,7 @@ class AnimatedPixelArtCreator:
         if not (0 <= nr0 and nr1 < ROWS and 0 <= nc0 and nc1 < COLS):
             return
         self.push_history()
-        frame = self.frames[self.current_frame_idx]
-        # Snapshot colors inside the selection
-        snapshot = {(r, c): frame[r][c] for r in range(r0, r1 + 1) for c in range(c0, c1 + 1)}
-        # Clear old cells
-        for (r, c) in snapshot:
-            frame[r][c] = "#000000"
-            self.canvas.itemconfig(self.rects[r][c], fill="#000000")
-        # Paint at new positions
-        for (r, c), color in snapshot.items():
-            nr, nc = r + dr, c + dc
-            frame[nr][nc] = color
-            self.canvas.itemconfig(self.rects[nr][nc], fill=color)
+        self.repaint_cells(self.store.move(self.current_frame_idx, self.sel_box, dr, dc))
         self.sel_box = (nr0, nc0, nr1, nc1)
         if self.sel_anchor:
             ar, ac = self.sel_anchor
@@ -427,152 +412,70 @@ class AnimatedPixelArtCreator:
                 btn.config(relief="raised", bg="#bdc3c7", fg="black")
 
     def bucket_fill(self, r, c):
-        frame = self.frames[self.current_frame_idx]
-        target = frame[r][c]
-        fill = self.selected_color
-        if target == fill:
+        f = self.current_frame_idx
+        if self.store.data[f, r, c] == self.store.color_index(self.selected_color):
             return
         self.push_history()
-        stack = [(r, c)]
-        visited = set()
-        while stack:
-            cr, cc = stack.pop()
-            if (cr, cc) in visited:
-                continue
-            if not (0 <= cr < ROWS and 0 <= cc < COLS):
-                continue
-            if frame[cr][cc] != target:
-                continue
-            visited.add((cr, cc))
-            frame[cr][cc] = fill
-            self.canvas.itemconfig(self.rects[cr][cc], fill=fill)
-            stack += [(cr+1, cc), (cr-1, cc), (cr, cc+1), (cr, cc-1)]
+        self.repaint_cells(self.store.fill(f, self.store.flood_mask(f, r, c), self.selected_color))
 
     # ------------------------------------------------------------------ shape drawing
     def _clear_shape_preview(self):
-        for item in self.shape_preview_items:
-            self.canvas.delete(item)
-        self.shape_preview_items = []
+        self.canvas.delete("shape_preview")
 
     def _preview_shape(self, anchor, end_cell):
         self._clear_shape_preview()
         r0 = min(anchor[0], end_cell[0]); c0 = min(anchor[1], end_cell[1])
         r1 = max(anchor[0], end_cell[0]); c1 = max(anchor[1], end_cell[1])
-        for (r, c) in self._get_shape_cells(r0, c0, r1, c1):
-            if 0 <= r < ROWS and 0 <= c < COLS:
-                x1 = c * PIXEL_SIZE + OFFSET; y1 = r * PIXEL_SIZE + OFFSET
-                self.shape_preview_items.append(
-                    self.canvas.create_rectangle(x1, y1, x1+PIXEL_SIZE, y1+PIXEL_SIZE,
-                                                 fill=self.selected_color, outline="#FFFFFF", width=1)
-                )
+        color = self.store.colors[self.store.color_index(self.selected_color)]
+        batch(self.canvas, [
+            f"create rectangle {c * PIXEL_SIZE + OFFSET} {r * PIXEL_SIZE + OFFSET} "
+            f"{(c + 1) * PIXEL_SIZE + OFFSET} {(r + 1) * PIXEL_SIZE + OFFSET} "
+            f"-fill {color} -outline #FFFFFF -width 1 -tags shape_preview"
+            for r, c in np.argwhere(self._shape_mask(r0, c0, r1, c1)).tolist()
+        ])
 
     def _commit_shape(self, anchor, end_cell):
         self._clear_shape_preview()
         r0 = min(anchor[0], end_cell[0]); c0 = min(anchor[1], end_cell[1])
         r1 = max(anchor[0], end_cell[0]); c1 = max(anchor[1], end_cell[1])
         self.push_history()
-        frame = self.frames[self.current_frame_idx]
-        for (r, c) in self._get_shape_cells(r0, c0, r1, c1):
-            if 0 <= r < ROWS and 0 <= c < COLS:
-                frame[r][c] = self.selected_color
-                self.canvas.itemconfig(self.rects[r][c], fill=self.selected_color)
+        mask = self._shape_mask(r0, c0, r1, c1)
+        self.repaint_cells(self.store.fill(self.current_frame_idx, mask, self.selected_color))
 
-    def _get_shape_cells(self, r0, c0, r1, c1):
+    def _shape_mask(self, r0, c0, r1, c1):
         filled = self.shape_fill.get()
         if self.current_tool == "rect":
-            return self._cells_rect(r0, c0, r1, c1, filled)
+            return raster.rect_mask((ROWS, COLS), r0, c0, r1, c1, filled)
         if self.current_tool == "circle":
-            return self._cells_circle(r0, c0, r1, c1, filled)
+            return raster.ellipse_mask((ROWS, COLS), r0, c0, r1, c1, filled)
         if self.current_tool == "tri":
-            return self._cells_triangle(r0, c0, r1, c1, filled)
-        return set()
-
-    def _cells_rect(self, r0, c0, r1, c1, filled):
-        cells = set()
-        if filled:
-            for r in range(r0, r1+1):
-                for c in range(c0, c1+1):
-                    cells.add((r, c))
-        else:
-            for c in range(c0, c1+1):
-                cells.add((r0, c)); cells.add((r1, c))
-            for r in range(r0+1, r1):
-                cells.add((r, c0)); cells.add((r, c1))
-        return cells
-
-    def _cells_circle(self, r0, c0, r1, c1, filled):
-        cells = set()
-        cr = (r0 + r1) / 2.0; cc = (c0 + c1) / 2.0
-        rx = (c1 - c0) / 2.0; ry = (r1 - r0) / 2.0
-        if rx < 0.5 or ry < 0.5:
-            cells.add((r0, c0)); return cells
-        if filled:
-            for r in range(r0, r1+1):
-                for c in range(c0, c1+1):
-                    if ((c-cc)/rx)**2 + ((r-cr)/ry)**2 <= 1.0:
-                        cells.add((r, c))
-        else:
-            steps = max(int(2 * math.pi * max(rx, ry) * 2), 8)
-            for i in range(steps):
-                a = 2 * math.pi * i / steps
-                cells.add((int(round(cr + ry*math.sin(a))),
-                            int(round(cc + rx*math.cos(a)))))
-        return cells
-
-    def _line_cells(self, r0, c0, r1, c1):
-        cells = set()
-        dr = abs(r1-r0); dc = abs(c1-c0)
-        sr = 1 if r1>r0 else -1; sc = 1 if c1>c0 else -1
-        err = dr - dc; r, c = r0, c0
-        while True:
-            cells.add((r, c))
-            if r == r1 and c == c1: break
-            e2 = 2*err
-            if e2 > -dc: err -= dc; r += sr
-            if e2 <  dr: err += dr; c += sc
-        return cells
-
-    def _cells_triangle(self, r0, c0, r1, c1, filled):
-        apex = (r0, (c0+c1)//2)
-        bl = (r1, c0); br = (r1, c1)
-        outline = (self._line_cells(*apex, *bl) |
-                   self._line_cells(*apex, *br) |
-                   self._line_cells(*bl,   *br))
-        if not filled:
-            return outline
-        cells = set()
-        for r in range(r0, r1+1):
-            cols = [c for (rr, c) in outline if rr == r]
-            if cols:
-                for c in range(min(cols), max(cols)+1):
-                    cells.add((r, c))
-        return cells
+            return raster.triangle_mask((ROWS, COLS), r0, c0, r1, c1, filled)
+        return np.zeros((ROWS, COLS), dtype=bool)
 
     def paint(self, event):
         c, r = (event.x - OFFSET) // PIXEL_SIZE, (event.y - OFFSET) // PIXEL_SIZE
         if 0 <= r < ROWS and 0 <= c < COLS:
-            self.frames[self.current_frame_idx][r][c] = self.selected_color
-            self.canvas.itemconfig(self.rects[r][c], fill=self.selected_color)
+            idx = self.store.color_index(self.selected_color)
+            self.store.data[self.current_frame_idx, r, c] = idx
+            self.cells.set(r, c, self.store.colors[idx], idx)
 
     def erase(self, event):
         c, r = (event.x - OFFSET) // PIXEL_SIZE, (event.y - OFFSET) // PIXEL_SIZE
         if 0 <= r < ROWS and 0 <= c < COLS:
             self.push_history()
-            self.frames[self.current_frame_idx][r][c] = "#000000"
-            self.canvas.itemconfig(self.rects[r][c], fill="#000000")
+            self.store.data[self.current_frame_idx, r, c] = self.store.background
+            self.cells.set(r, c, self.store.colors[self.store.background], self.store.background)
 
     def update_frame_view(self):
-        self.frame_label.config(text=f"Frame: {self.current_frame_idx + 1} / {len(self.frames)}")
-        current_data = self.frames[self.current_frame_idx]
-        for r in range(ROWS):
-            for c in range(COLS):
-                self.canvas.itemconfig(self.rects[r][c], fill=current_data[r][c])
+        self.frame_label.config(text=f"Frame: {self.current_frame_idx + 1} / {len(self.store)}")
+        # Only cells that differ from what the canvas already shows are repainted
+        self.cells.show_frame(self.store, self.current_frame_idx)
 
     def next_frame(self):
-        if self.current_frame_idx < len(self.frames) - 1:
+        if self.current_frame_idx < len(self.store) - 1:
             self.current_frame_idx += 1
         else:
-            self.frames.append([["#000000" for _ in range(COLS)] for _ in range(ROWS)])
+            self.store.insert(len(self.store))
             self.current_frame_idx += 1
         self.update_frame_view()
 
@@ -584,17 +487,16 @@ class AnimatedPixelArtCreator:
     def clone_specific_frame(self):
         try:
             source_idx = int(self.clone_idx_var.get()) - 1
-            if 0 <= source_idx < len(self.frames):
-                new_frame = [row[:] for row in self.frames[source_idx]]
-                self.frames.insert(self.current_frame_idx + 1, new_frame)
+            if 0 <= source_idx < len(self.store):
+                self.store.insert(self.current_frame_idx + 1, source=source_idx)
                 self.current_frame_idx += 1
                 self.update_frame_view()
         except: pass
 
     def delete_frame(self):
-        if len(self.frames) > 1:
-            self.frames.pop(self.current_frame_idx)
-            self.current_frame_idx = min(self.current_frame_idx, len(self.frames)-1)
+        if len(self.store) > 1:
+            self.store.delete(self.current_frame_idx)
+            self.current_frame_idx = min(self.current_frame_idx, len(self.store)-1)
             self.update_frame_view()
 
     def on_closing(self):
@@ -605,41 +507,75 @@ class AnimatedPixelArtCreator:
     def save_project(self):
         path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("Project File", "*.json")])
         if path:
-            with open(path, "w") as f:
-                json.dump({"frames": self.frames, "palette": self.palette_colors, "speed": self.anim_speed.get()}, f)
+            project.save(path, Project(self.store, self.palette_colors, self.anim_speed.get()))
 
     def load_project(self):
         path = filedialog.askopenfilename(filetypes=[("Project File", "*.json")])
         if path:
-            with open(path, "r") as f:
-                data = json.load(f)
-                self.frames, self.palette_colors = data["frames"], data["palette"]
-                if "speed" in data: self.anim_speed.set(data["speed"])
-                # Update palette UI to match loaded project
-                for i, color in enumerate(self.palette_colors):
-                    self.palette_widgets[i].config(bg=color)
+            try:
+                loaded = project.load(path)
+            except (OSError, ValueError) as e:
+                messagebox.showerror("Load failed", str(e))
+                return
+            if (loaded.store.rows, loaded.store.cols) != (ROWS, COLS):
+                messagebox.showerror("Load failed", f"Project is {loaded.store.cols}x{loaded.store.rows}, "
+                                                    f"this editor is {COLS}x{ROWS} (SCALE={SCALE}).")
+                return
+            self.store = loaded.store
+            self.store.max_history = self.MAX_HISTORY
+            self.palette_colors = (loaded.palette + self.palette_colors[len(loaded.palette):])[:len(self.palette_widgets)]
+            self.anim_speed.set(loaded.speed)
+            # Update palette UI to match loaded project
+            for i, color in enumerate(self.palette_colors):
+                self.palette_widgets[i].config(bg=color)
             self.current_frame_idx = 0
             self.update_frame_view()
+            self.root.after_idle(self.prerender_preview)
+
+    def import_image(self):
+        """PNG/GIF → the current frame onwards (one frame per GIF frame, see bubu_assets/images.py)."""
+        path = filedialog.askopenfilename(filetypes=[("Image", "*.png *.gif"), ("All files", "*.*")])
+        if not path: return
+        swatches = self.import_swatches.get()
+        try:
+            imported = images.import_image(path, ROWS, COLS, colors=self.palette_colors if swatches else None,
+                                           n_colors=len(self.palette_widgets), dither=self.import_dither.get(),
+                                           background=self.store.colors[self.store.background])
+        except (ImportError, OSError, ValueError) as e:
+            messagebox.showerror("Import failed", str(e))
+            return
+        src = imported.store
+        self.push_history()     # the first frame overwrites the current one, so it can be undone
+        for i in range(len(src)):
+            f = self.current_frame_idx + i
+            if i:
+                self.store.insert(f)
+            self.store.put_frame(f, src.colors, src.data[i])
+        if not swatches:
+            self.palette_colors = (imported.palette + self.palette_colors[len(imported.palette):])[:len(self.palette_widgets)]
+            for i, color in enumerate(self.palette_colors):
+                self.palette_widgets[i].config(bg=color)
+        if len(src) > 1:
+            self.anim_speed.set(imported.speed)
+        self.update_frame_view()
+        self.root.after_idle(self.prerender_preview)
 
     def export_to_file(self):
         path = filedialog.asksaveasfilename(defaultextension=".h", filetypes=[("Arduino Header", "*.h")])
         if not path: return
-        name = path.split("/")[-1].replace(".h", "").replace(" ", "_")
-        with open(path, "w") as f:
-            f.write(f"#include <pgmspace.h>\nconst int {name}_delay = {self.anim_speed.get()};\n")
-            for i, fr in enumerate(self.frames):
-                f.write(f"const uint16_t {name}{i+1}[] PROGMEM = {{\n")
-                for r in range(ROWS):
-                    row = [f"0x{self.rgb_to_565(fr[r][c]):04X}" for c in range(COLS)]
-                    f.write("  " + ", ".join(row) + ",\n")
-                f.write("};\n\n")
-            f.write(f"const uint16_t* const {name}_anim[] PROGMEM = {{"+", ".join([f"{name}{i+1}" for i in range(len(self.frames))])+"};\n")
-            f.write(f"const int {name}_frame_count = {len(self.frames)};\n")
-
-    def rgb_to_565(self, hex_color):
-        h = hex_color.lstrip('#')
-        r, g, b = tuple(int(h[i:i+2], 16) for i in (0, 2, 4))
-        return ((r & 0xF8) << 8) | ((g & 0xFC) << 3) | (b >> 3)
+        encoding = self.export_encoding.get()
+        try:
+            encoders.export_header(path, self.store, self.anim_speed.get(), encoding)
+        except ValueError as e:
+            # e.g. more colours than the palette encoding can index
+            messagebox.showerror("Export failed", str(e))
+            return
+        if encoding != "raw":
+            frames565 = encoders.frames_to_565(self.store)
+            raw = encoders.encoded_size(frames565, "raw")
+            packed = encoders.encoded_size(frames565, encoding)
+            messagebox.showinfo("Exported", f"{encoding}: {packed} bytes ({raw} raw, {packed * 100 // raw}%)\n"
+                                            "bubu_frames.h was copied next to the header.")
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -1,7 +1,12 @@
 import tkinter as tk
 from tkinter import colorchooser, filedialog, messagebox
-import json
 import os
+import sys
+
+# Shared asset code lives in bubu_assets/ at the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from bubu_assets import FrameStore, Project, face, images, project
+from bubu_assets.render import CellGrid, PreviewImage
 
 # ===== Editor grid (coarse) =====
 # 48x64 grid corresponds to 240x320 if BLOCK=5
@@ -35,12 +40,13 @@ class AnimatedPixelArtCreator:
         self.root.title("TFT_eSPI Animation Designer")
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
 
-        self.frames = [[[CELL_EMPTY for _ in range(COLS)] for _ in range(ROWS)]]
+        self.store = FrameStore(ROWS, COLS, background=CELL_EMPTY)   # store.data[f, r, c] → colour index
         self.current_frame_idx = 0
 
         self.palette_colors = DEFAULT_PALETTE[:]
         self.selected_color = "#FFFFFF"
         self.anim_speed = tk.IntVar(value=150)
+        self.import_dither = tk.StringVar(value="floyd-steinberg")   # see bubu_assets.images.DITHERS
 
         self.show_grid = tk.BooleanVar(value=True)
         self.show_numbers = tk.BooleanVar(value=True)
@@ -85,6 +91,18 @@ class AnimatedPixelArtCreator:
             width=15
         ).pack(side=tk.RIGHT, padx=5, pady=5)
 
+        tk.Button(
+            self.top_bar,
+            text="IMPORT IMAGE",
+            command=self.import_image,
+            bg="#9b59b6",
+            fg="black",
+            font=("Arial", 8, "bold"),
+            width=15
+        ).pack(side=tk.RIGHT, padx=5, pady=5)
+
+        tk.OptionMenu(self.top_bar, self.import_dither, *images.DITHERS).pack(side=tk.RIGHT, pady=5)
+
         self.main_frame = tk.Frame(self.root)
         self.main_frame.pack(padx=10, pady=10)
 
@@ -115,6 +133,8 @@ class AnimatedPixelArtCreator:
         )
         self.preview_canvas.pack(pady=5)
 
+        self.preview = PreviewImage(self.preview_canvas, COLS, ROWS, zoom=2)
+
         # --- View Options ---
         tk.Label(self.sidebar, text="VIEW SETTINGS", font=("Arial", 9, "bold")).pack(pady=(10, 2))
         tk.Checkbutton(self.sidebar, text="Show Grid", variable=self.show_grid, command=self.refresh_canvas_style).pack(anchor="w")
@@ -187,24 +207,20 @@ class AnimatedPixelArtCreator:
 
     def start_live_preview(self):
         self.preview_frame_idx = 0
+        self.prerender_preview()
         self.animate_preview()
 
+    def prerender_preview(self):
+        self.preview.prerender([self.store.hex_grid(f) for f in range(len(self.store))])
+
     def animate_preview(self):
-        self.preview_canvas.delete("all")
-        if self.frames:
-            if self.preview_frame_idx >= len(self.frames):
+        if len(self.store):
+            if self.preview_frame_idx >= len(self.store):
                 self.preview_frame_idx = 0
 
-            f = self.frames[self.preview_frame_idx]
-            for r in range(ROWS):
-                for c in range(COLS):
-                    if f[r][c] != CELL_EMPTY:
-                        self.preview_canvas.create_rectangle(
-                            c * 2, r * 2, c * 2 + 2, r * 2 + 2,
-                            fill=f[r][c], outline=""
-                        )
+            self.preview.show(self.preview_frame_idx, self.store.hex_grid(self.preview_frame_idx))
 
-            self.preview_frame_idx = (self.preview_frame_idx + 1) % len(self.frames)
+            self.preview_frame_idx = (self.preview_frame_idx + 1) % len(self.store)
 
         self.root.after(self.anim_speed.get(), self.animate_preview)
 
@@ -227,7 +243,7 @@ class AnimatedPixelArtCreator:
                 x1, y1 = c * PIXEL_SIZE + OFFSET, r * PIXEL_SIZE + OFFSET
                 self.rects[r][c] = self.canvas.create_rectangle(
                     x1, y1, x1 + PIXEL_SIZE, y1 + PIXEL_SIZE,
-                    fill=CELL_EMPTY, outline="#222222"
+                    fill=CELL_EMPTY, outline="#222222", tags="cell"
                 )
 
         # --- Center lines (optional guides) ---
@@ -247,13 +263,12 @@ class AnimatedPixelArtCreator:
             fill="white", width=2
         )
 
+        self.cells = CellGrid(self.canvas, self.rects, CELL_EMPTY)
         self.refresh_canvas_style()
 
     def refresh_canvas_style(self):
         outline_color = "#222222" if self.show_grid.get() else ""
-        for r in range(ROWS):
-            for c in range(COLS):
-                self.canvas.itemconfig(self.rects[r][c], outline=outline_color)
+        self.canvas.itemconfig("cell", outline=outline_color)   # one call for every cell rectangle
 
         text_state = "normal" if self.show_numbers.get() else "hidden"
         for t_id in self.texts:
@@ -269,27 +284,26 @@ class AnimatedPixelArtCreator:
     def paint(self, event):
         c, r = (event.x - OFFSET) // PIXEL_SIZE, (event.y - OFFSET) // PIXEL_SIZE
         if 0 <= r < ROWS and 0 <= c < COLS:
-            self.frames[self.current_frame_idx][r][c] = self.selected_color
-            self.canvas.itemconfig(self.rects[r][c], fill=self.selected_color)
+            idx = self.store.color_index(self.selected_color)
+            self.store.data[self.current_frame_idx, r, c] = idx
+            self.cells.set(r, c, self.store.colors[idx], idx)
 
     def erase(self, event):
         c, r = (event.x - OFFSET) // PIXEL_SIZE, (event.y - OFFSET) // PIXEL_SIZE
         if 0 <= r < ROWS and 0 <= c < COLS:
-            self.frames[self.current_frame_idx][r][c] = CELL_EMPTY
-            self.canvas.itemconfig(self.rects[r][c], fill=CELL_EMPTY)
+            self.store.data[self.current_frame_idx, r, c] = self.store.background
+            self.cells.set(r, c, self.store.colors[self.store.background], self.store.background)
 
     def update_frame_view(self):
-        self.frame_label.config(text=f"Frame: {self.current_frame_idx + 1} / {len(self.frames)}")
-        current_data = self.frames[self.current_frame_idx]
-        for r in range(ROWS):
-            for c in range(COLS):
-                self.canvas.itemconfig(self.rects[r][c], fill=current_data[r][c])
+        self.frame_label.config(text=f"Frame: {self.current_frame_idx + 1} / {len(self.store)}")
+        # Only cells that differ from what the canvas already shows are repainted
+        self.cells.show_frame(self.store, self.current_frame_idx)
 
     def next_frame(self):
-        if self.current_frame_idx < len(self.frames) - 1:
+        if self.current_frame_idx < len(self.store) - 1:
             self.current_frame_idx += 1
         else:
-            self.frames.append([[CELL_EMPTY for _ in range(COLS)] for _ in range(ROWS)])
+            self.store.insert(len(self.store))
             self.current_frame_idx += 1
         self.update_frame_view()
 
@@ -301,18 +315,17 @@ class AnimatedPixelArtCreator:
     def clone_specific_frame(self):
         try:
             source_idx = int(self.clone_idx_var.get()) - 1
-            if 0 <= source_idx < len(self.frames):
-                new_frame = [row[:] for row in self.frames[source_idx]]
-                self.frames.insert(self.current_frame_idx + 1, new_frame)
+            if 0 <= source_idx < len(self.store):
+                self.store.insert(self.current_frame_idx + 1, source=source_idx)
                 self.current_frame_idx += 1
                 self.update_frame_view()
         except:
             pass
 
     def delete_frame(self):
-        if len(self.frames) > 1:
-            self.frames.pop(self.current_frame_idx)
-            self.current_frame_idx = min(self.current_frame_idx, len(self.frames) - 1)
+        if len(self.store) > 1:
+            self.store.delete(self.current_frame_idx)
+            self.current_frame_idx = min(self.current_frame_idx, len(self.store) - 1)
             self.update_frame_view()
 
     def on_closing(self):
@@ -323,34 +336,74 @@ class AnimatedPixelArtCreator:
     def save_project(self):
         path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("Project File", "*.json")])
         if path:
-            with open(path, "w") as f:
-                json.dump({"frames": self.frames, "palette": self.palette_colors, "speed": self.anim_speed.get()}, f)
+            project.save(path, Project(self.store, self.palette_colors, self.anim_speed.get()))
 
     def load_project(self):
         path = filedialog.askopenfilename(filetypes=[("Project File", "*.json")])
         if not path:
             return
 
-        with open(path, "r") as f:
-            data = json.load(f)
+        try:
+            loaded = project.load(path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Load failed", str(e))
+            return
+        if (loaded.store.rows, loaded.store.cols) != (ROWS, COLS):
+            messagebox.showerror("Load failed", f"Project is {loaded.store.cols}x{loaded.store.rows}, "
+                                                f"this editor is {COLS}x{ROWS}.")
+            return
 
-        self.frames = data.get("frames", self.frames)
+        self.store = loaded.store
 
-        loaded_palette = data.get("palette", self.palette_colors)
+        loaded_palette = loaded.palette or self.palette_colors
         if len(loaded_palette) < 8:
             loaded_palette = loaded_palette + DEFAULT_PALETTE[len(loaded_palette):]
         elif len(loaded_palette) > 8:
             loaded_palette = loaded_palette[:8]
         self.palette_colors = loaded_palette
 
-        if "speed" in data:
-            self.anim_speed.set(data["speed"])
+        self.anim_speed.set(loaded.speed)
 
         for i, color in enumerate(self.palette_colors):
             self.palette_widgets[i].config(bg=color)
 
         self.current_frame_idx = 0
         self.update_frame_view()
+        self.root.after_idle(self.prerender_preview)
+
+    # ===== Import: PNG/GIF into the face region, one frame per GIF frame =====
+    def import_image(self):
+        path = filedialog.askopenfilename(filetypes=[("Image", "*.png *.gif"), ("All files", "*.*")])
+        if not path:
+            return
+
+        try:
+            imported = images.import_image(
+                path, FACE_ROWS, FACE_COLS,
+                n_colors=len(self.palette_widgets),
+                dither=self.import_dither.get(),
+                background=CELL_EMPTY
+            )
+        except (ImportError, OSError, ValueError) as e:
+            messagebox.showerror("Import failed", str(e))
+            return
+
+        # The first frame goes into the current frame, any further GIF frames follow it
+        src = imported.store
+        for i in range(len(src)):
+            f = self.current_frame_idx + i
+            if i:
+                self.store.insert(f)
+            self.store.put_frame(f, src.colors, src.data[i])
+
+        self.palette_colors = (imported.palette + self.palette_colors[len(imported.palette):])[:8]
+        for i, color in enumerate(self.palette_colors):
+            self.palette_widgets[i].config(bg=color)
+        if len(src) > 1:
+            self.anim_speed.set(imported.speed)
+
+        self.update_frame_view()
+        self.root.after_idle(self.prerender_preview)
 
     # ===== Export: custom face header (240x135) contained above the white line =====
     def export_to_file(self):
@@ -362,53 +415,18 @@ class AnimatedPixelArtCreator:
         if not path:
             return
 
-        fr = self.frames[self.current_frame_idx]
-
-        # Expand ONLY the top FACE_ROWS rows into a 240x135 bitmap
-        pixels = []
-        for r in range(FACE_ROWS):  # <-- KEY FIX: only export rows above the boundary line
-            for _ in range(BLOCK):
-                for c in range(FACE_COLS):  # should be 48
-                    v = self.rgb_to_565(fr[r][c])
-                    pixels.extend([v] * BLOCK)
-
-        expected = FACE_W * FACE_H
-        if len(pixels) != expected:
-            messagebox.showerror("Export Error", f"Pixel count mismatch: got {len(pixels)}, expected {expected}.")
+        # Only the face region (above the boundary line) is exported, each cell as BLOCK x BLOCK pixels
+        try:
+            face.export_face(path, self.store, self.current_frame_idx, BLOCK, FACE_W, FACE_H)
+        except ValueError as e:
+            messagebox.showerror("Export Error", str(e))
             return
 
-        with open(path, "w") as f:
-            f.write("// Auto-generated custom face header\n")
-            f.write("#pragma once\n")
-            f.write("#include <Arduino.h>\n\n")
-            f.write(f"#define FACE_W {FACE_W}\n")
-            f.write(f"#define FACE_H {FACE_H}\n\n")
-
-            # Keep EXACT naming expected by the old Arduino custom-face program
-            f.write("static const uint16_t face_bitmap[FACE_W * FACE_H] PROGMEM = {\n")
-
-            per_line = 12
-            for i, val in enumerate(pixels):
-                if i % per_line == 0:
-                    f.write("  ")
-                f.write(f"0x{val:04X}, ")
-                if i % per_line == per_line - 1:
-                    f.write("\n")
-            if len(pixels) % per_line != 0:
-                f.write("\n")
-
-            f.write("};\n")
-
         messagebox.showinfo(
             "Export",
             f"Saved {path}\nExported Frame {self.current_frame_idx + 1}\n(face region: top {FACE_H}px)"
         )
 
-    def rgb_to_565(self, hex_color):
-        h = hex_color.lstrip('#')
-        r, g, b = tuple(int(h[i:i + 2], 16) for i in (0, 2, 4))
-        return ((r & 0xF8) << 8) | ((g & 0xFC) << 3) | (b >> 3)
-
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -0,0 +1,72 @@
+"""
+Admin routes — production diagnosis. Every route requires the X-Admin-Token
+header to match ADMIN_TOKEN; with no token configured the whole router 404s.
+
+POST   /api/admin/profile?seconds=N | ?requests=N  — start a sampling session
+GET    /api/admin/profile                          — session status
+DELETE /api/admin/profile                          — stop the session early
+GET    /api/admin/profile/collapsed                — flamegraph collapsed stacks
+"""
+import hmac
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from core.config import ADMIN_TOKEN, PROFILER_INTERVAL_MS
+from core.profiling import profiler
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+router = APIRouter(prefix="/api/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+
+@router.post("/profile")
+def start_profile(seconds: Optional[float] = None,
+                  requests: Optional[int] = None,
+                  interval_ms: float = Query(PROFILER_INTERVAL_MS, ge=1, le=1000),
+                  include_idle: bool = False):
+    """
+    Sample every thread's stack for `seconds`, or until the next `requests`
+    requests (admin and /metrics calls don't count) have completed.
+    """
+    try:
+        return profiler.start(seconds=seconds, requests=requests,
+                              interval_ms=interval_ms, include_idle=include_idle)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@router.get("/profile")
+def profile_status():
+    return profiler.status()
+
+
+@router.delete("/profile")
+def stop_profile():
+    profiler.stop()
+    return profiler.status()
+
+
+@router.get("/profile/collapsed", response_class=PlainTextResponse)
+def profile_collapsed():
+    """The finished session as `frame;frame;... count` lines (flamegraph.pl, speedscope)."""
+    status = profiler.status()
+    if status["state"] == "idle":
+        raise HTTPException(status_code=404, detail="No profile recorded yet")
+    if status["state"] == "running":
+        raise HTTPException(status_code=409, detail="Profiling session still running")
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    return PlainTextResponse(
+        profiler.collapsed(),
+        headers={"Content-Disposition": f'attachment; filename="profile-{stamp}.collapsed"'},
+    )
@@ -0,0 +1,166 @@
+"""
+Asset routes — mood animations for the device, compiled from the pixel editors' projects.
+
+GET /api/assets/emotions                 — every mood's current pack hash, size and URL
+GET /api/assets/emotions/{mood}          — the mood's pack (ETag = hash, revalidate every time)
+GET /api/assets/emotions/{mood}/{hash}   — the same bytes at a content-addressed URL, cached forever
+
+Each <mood>.json in EMOTION_PROJECT_DIR is compiled into a one-animation .bpk
+pack (bubu_assets.pack, EMOTION_PACK_ENCODING) the first time it is asked for,
+and again only when the project file changes. The phone checks the index (or
+the mood URL with If-None-Match) and downloads a pack only when its hash is new.
+Both pack routes honour Range, so a download can resume, and the app can
+fetch the pack in pieces to relay it to the device over BLE.
+"""
+import hashlib
+import os
+import re
+import sys
+import threading
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
+
+from core.config import EMOTION_PACK_ALIGN, EMOTION_PACK_ENCODING, EMOTION_PROJECT_DIR, REPO_DIR
+from core.models import MOOD_EMOJI
+
+router = APIRouter(prefix="/api/assets", tags=["assets"])
+
+PACK_MEDIA_TYPE = "application/octet-stream"
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+_RANGE = re.compile(r"bytes=(\d*)-(\d*)$")
+_packs: dict = {}     # mood → (source key, digest, pack bytes)
+_build_lock = threading.Lock()
+
+
+def _source_key(path: str) -> tuple:
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size, EMOTION_PACK_ENCODING, EMOTION_PACK_ALIGN)
+
+
+def _compile(mood: str, path: str) -> bytes:
+    if REPO_DIR not in sys.path:
+        sys.path.insert(0, REPO_DIR)
+    from bubu_assets import pack, project
+    proj = project.load(path)
+    return pack.build_pack([(mood, proj.store, proj.speed)], EMOTION_PACK_ENCODING, EMOTION_PACK_ALIGN)
+
+
+def get_pack(mood: str) -> Optional[Tuple[str, bytes]]:
+    """(digest, bytes) of the mood's pack, rebuilt if its project changed; None if it has no art."""
+    path = os.path.join(EMOTION_PROJECT_DIR, f"{mood}.json")
+    try:
+        key = _source_key(path)
+    except OSError:
+        _packs.pop(mood, None)
+        return None
+    cached = _packs.get(mood)
+    if cached and cached[0] == key:
+        return cached[1], cached[2]
+    with _build_lock:       # one compile per change, however many phones ask at once
+        cached = _packs.get(mood)
+        if cached and cached[0] == key:
+            return cached[1], cached[2]
+        data = _compile(mood, path)
+        digest = hashlib.sha256(data).hexdigest()
+        _packs[mood] = (key, digest, data)
+        print(f"[Assets] {mood}: {len(data)} B pack ({EMOTION_PACK_ENCODING}) → {digest[:12]}")
+        return digest, data
+
+
+def _check_mood(mood: str):
+    if mood not in MOOD_EMOJI:
+        raise HTTPException(status_code=400,
+                            detail=f"Unknown mood '{mood}'. Valid: {list(MOOD_EMOJI.keys())}")
+
+
+async def _load(mood: str) -> Tuple[str, bytes]:
+    _check_mood(mood)
+    try:
+        found = await run_in_threadpool(get_pack, mood)
+    except ValueError as e:      # malformed project file or frames the encoding can't hold
+        raise HTTPException(status_code=500, detail=f"Could not build the {mood} pack: {e}")
+    if found is None:
+        raise HTTPException(status_code=404, detail=f"No animation for mood '{mood}'")
+    return found
+
+
+def _byte_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Inclusive (start, end) for a single "bytes=" range. None means serve the
+    whole body (no range, several ranges or a malformed header, which RFC 9110
+    lets a server ignore). Raises 416 for ranges that miss the body.
+    """
+    m = _RANGE.match(header.replace(" ", ""))
+    if not m or m.groups() == ("", ""):
+        return None
+    first, last = m.groups()
+    if first == "":                               # suffix: the last N bytes
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end or size == 0:
+        raise HTTPException(status_code=416, detail="Range not satisfiable",
+                            headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+
+def _send(request: Request, digest: str, data: bytes, cache_control: str,
+          extra_headers: Optional[dict] = None) -> Response:
+    etag = f'"{digest}"'
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Accept-Ranges": "bytes", **(extra_headers or {})}
+    match = request.headers.get("if-none-match")
+    if match and (match.strip() == "*" or etag in [t.strip().removeprefix("W/") for t in match.split(",")]):
+        return Response(status_code=304, headers=headers)
+
+    body, status = data, 200
+    range_header = request.headers.get("range")
+    if range_header and request.headers.get("if-range", etag) == etag:
+        span = _byte_range(range_header, len(data))
+        if span is not None:
+            start, end = span
+            body, status = data[start:end + 1], 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+    if request.method == "HEAD":
+        headers["Content-Length"] = str(len(body))
+        return Response(status_code=status, headers=headers, media_type=PACK_MEDIA_TYPE)
+    return Response(body, status_code=status, headers=headers, media_type=PACK_MEDIA_TYPE)
+
+
+@router.get("/emotions")
+async def emotion_index():
+    """Current pack per mood; a mood with no project file is listed with pack = null."""
+    moods = {}
+    for mood, emoji in MOOD_EMOJI.items():
+        try:
+            found = await run_in_threadpool(get_pack, mood)
+        except ValueError as e:
+            print(f"[Assets] {mood}: {e}")
+            found = None
+        entry = None
+        if found is not None:
+            digest, data = found
+            entry = {"hash": digest, "size": len(data), "url": f"{router.prefix}/emotions/{mood}/{digest}"}
+        moods[mood] = {"emoji": emoji, "pack": entry}
+    return {"encoding": EMOTION_PACK_ENCODING, "align": EMOTION_PACK_ALIGN, "moods": moods}
+
+
+@router.api_route("/emotions/{mood}", methods=["GET", "HEAD"])
+async def emotion_pack(mood: str, request: Request):
+    """The mood's latest pack. Clients must revalidate; Content-Location names the immutable URL."""
+    digest, data = await _load(mood)
+    return _send(request, digest, data, REVALIDATE,
+                 {"Content-Location": f"{router.prefix}/emotions/{mood}/{digest}"})
+
+
+@router.api_route("/emotions/{mood}/{digest}", methods=["GET", "HEAD"])
+async def emotion_pack_by_hash(mood: str, digest: str, request: Request):
+    """The pack with this exact hash. Only the current build is kept; an old hash is a 404."""
+    current, data = await _load(mood)
+    if digest != current:
+        raise HTTPException(status_code=404, detail=f"Pack {digest[:12]} for '{mood}' is no longer current")
+    return _send(request, digest, data, IMMUTABLE)
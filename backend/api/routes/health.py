@@ -1,32 +1,89 @@
 """
 Health data routes.
 POST /api/health/snapshot  — receive a reading from the mobile app
-GET  /api/health/{user_id}/recent — last N snapshots for a user
+GET  /api/health/{user_id}/recent — last N snapshots for a user (or a streamed history)
+GET  /api/health/export     — every snapshot as streamed NDJSON / Arrow / Parquet
 """
-from fastapi import APIRouter, HTTPException
+import base64
+import itertools
+import json
+from datetime import datetime, timezone
+from typing import Iterator, Optional
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from core.config import EXPORT_CHUNK_ROWS
 from core.models import HealthSnapshot
-from db.store import save_snapshot, get_recent_snapshots, count_labeled, count_total
+from core.profiling import timing_phase
+from core.tracing import tracer
+from db.store import save_snapshot, iter_user_snapshots, iter_snapshots, count_labeled, count_total
 
 router = APIRouter(prefix="/api/health", tags=["health"])
 
 # Auto-retrain every time this many NEW labeled samples have been collected
 RETRAIN_EVERY_N = 10
+
+# Largest page for the JSON form of /recent; larger limits are clamped to it
+# (the NDJSON stream has no cap)
+MAX_RECENT_LIMIT = 500
 _labeled_at_last_train: int = 0
 
 
 async def _maybe_retrain(current_labeled: int):
-    """Trigger a background retrain if enough new labeled samples have accumulated."""
+    """
+    Schedule a background retrain if enough new labeled samples have accumulated.
+    Training runs on the model lifecycle thread — the request never waits for it.
+    """
+    with tracer.span("_maybe_retrain", {"labeled.total": current_labeled}) as span:
+        scheduled = _schedule_retrain(current_labeled)
+        span.set_attribute("retrain.scheduled", scheduled)
+
+
+def _schedule_retrain(current_labeled: int) -> bool:
     global _labeled_at_last_train
-    new_since_last = current_labeled - _labeled_at_last_train
-    if new_since_last >= RETRAIN_EVERY_N:
-        try:
-            from ml.models.training.train import train_model
-            result = await run_in_threadpool(train_model, 1)
-            _labeled_at_last_train = current_labeled
+    previous = _labeled_at_last_train
+    if current_labeled - previous < RETRAIN_EVERY_N:
+        return False
+
+    def on_done(result, error):
+        global _labeled_at_last_train
+        if error is not None:
+            _labeled_at_last_train = previous   # retry on the next labeled sample
+            print(f"[Auto-retrain] Failed: {error}")
+        else:
             print(f"[Auto-retrain] {result['total_samples']} samples | F1={result['cv_f1_weighted_mean']}")
-        except Exception as e:
-            print(f"[Auto-retrain] Failed: {e}")
+
+    from ml.warmup import schedule_retrain
+    # The retrain runs as its own trace, linked back to this ingest
+    if schedule_retrain(reason="auto", on_done=on_done, trace_link=tracer.current_context()):
+        _labeled_at_last_train = current_labeled
+        return True
+    return False
+
+
+def _online_features(record: dict):
+    """
+    Feature vector for the online head, or None when it's disabled. Taken
+    before save_snapshot pushes the reading == the features ingest sees.
+    Blocking: a user's first peek hydrates their window from the DB.
+    """
+    from ml.online import online_model
+    if not online_model.enabled:
+        return None
+    from ml.features import extract_features
+    from ml.temporal import temporal_state
+    with timing_phase("features"):
+        return extract_features(record, temporal_state.peek(record))
+
+
+def _learn_online(features, label: str):
+    """Constant-time partial_fit of the online head (every 10th call also saves it)."""
+    from ml.online import online_model
+    try:
+        with timing_phase("model"):
+            online_model.learn(features, label)
+    except Exception as e:
+        print(f"[Online] Update failed: {e}")
 
 
 @router.post("/snapshot")
@@ -35,23 +92,32 @@ async def post_snapshot(data: HealthSnapshot):
     Ingest a health snapshot from the mobile app.
     - Always saves to the database.
     - If `label` is included, the snapshot is flagged as training data.
+    - Labeled samples also update the online head (if enabled) once saved.
     - Auto-retrains the model every 10 new labeled samples.
     - The app should call this every 30-60 seconds during an active commute.
     """
-    record = data.model_dump()
-    doc_id = save_snapshot(record)
-    labeled_total = count_labeled()
+    with tracer.span("post_snapshot", {"snapshot.labeled": data.label is not None}):
+        record   = data.model_dump()
+        features = None
+        if data.label is not None:
+            features = await run_in_threadpool(_online_features, record)
+        # Off the event loop: a WAL append waits for its group commit's fsync
+        doc_id = await run_in_threadpool(save_snapshot, record)
+        if features is not None:     # only a stored reading may teach the head
+            await run_in_threadpool(_learn_online, features, record["label"])
+        labeled_total = count_labeled()
 
-    # Trigger background retrain if we have enough new labeled data
-    if data.label is not None:
-        await _maybe_retrain(labeled_total)
+        # Trigger background retrain if we have enough new labeled data
+        if data.label is not None:
+            await _maybe_retrain(labeled_total)
+        total = count_total()
 
     return {
         "status":                "saved",
         "doc_id":                doc_id,
         "is_training_sample":    data.label is not None,
         "total_labeled_samples": labeled_total,
-        "total_snapshots":       count_total(),
+        "total_snapshots":       total,
         "hint": (
             None if data.label
             else "Add 'label' to contribute training data"
@@ -59,20 +125,109 @@ async def post_snapshot(data: HealthSnapshot):
     }
 
 
+def _encode_cursor(doc) -> str:
+    return base64.urlsafe_b64encode(
+        json.dumps([doc.get("timestamp") or "", doc.doc_id]).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[str, int]:
+    try:
+        ts, doc_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(ts), int(doc_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=422, detail="Invalid cursor")
+
+
+def _ndjson_lines(first, rows: Iterator, limit: Optional[int]) -> Iterator[bytes]:
+    """One snapshot per line; a final {"next_cursor"} line if `limit` cut the stream short."""
+    sent, last = 0, None
+    for doc in itertools.chain([first], rows):
+        if limit is not None and sent == limit:
+            yield (json.dumps({"next_cursor": _encode_cursor(last)}) + "\n").encode()
+            return
+        yield (json.dumps({"doc_id": doc.doc_id, **doc}, default=str) + "\n").encode()
+        sent, last = sent + 1, doc
+
+
 @router.get("/{user_id}/recent")
-def get_recent(user_id: str, limit: int = 10):
+def get_recent(user_id: str, request: Request, response: Response,
+               limit: Optional[int] = Query(None, ge=1), cursor: Optional[str] = None):
     """
-    Retrieve the most recent health snapshots for a specific user.
+    Retrieve the most recent health snapshots for a specific user, newest first.
     Path param: user_id
-    Query param: limit (default 10, max recommended 50)
+    Query params:
+      limit  — default 10 for the JSON response, which clamps it to MAX_RECENT_LIMIT;
+               no default (the whole history) when streaming
+      cursor — `next_cursor` from a previous page, to continue with older rows
+    A JSON page with older rows left carries `next_cursor` and a
+    `Link: <...>; rel="next"` header, so a client that asked for more than
+    MAX_RECENT_LIMIT can follow it for the rest.
+    With `Accept: application/x-ndjson` the rows are streamed one per line as
+    they're read from the store (memory stays flat with STORE_PARTITION=day|week;
+    the default single table is read whole for the user first);
+    if `limit` stops the stream early the last line is {"next_cursor": ...}.
     """
-    snapshots = get_recent_snapshots(user_id, limit=limit)
-    if not snapshots:
+    before = _decode_cursor(cursor) if cursor else None
+    with timing_phase("store"):
+        rows  = iter_user_snapshots(user_id, before)
+        first = next(rows, None)
+    if first is None:
         raise HTTPException(
             status_code=404,
             detail=f"No snapshots found for user '{user_id}'"
         )
-    return {"user_id": user_id, "count": len(snapshots), "snapshots": snapshots}
+
+    if "application/x-ndjson" in request.headers.get("accept", ""):
+        return StreamingResponse(_ndjson_lines(first, rows, limit), media_type="application/x-ndjson")
+
+    requested = 10 if limit is None else limit
+    limit     = min(requested, MAX_RECENT_LIMIT)
+    with timing_phase("store"):
+        snapshots = [first, *itertools.islice(rows, limit - 1)]
+        more      = next(rows, None) is not None
+    next_cursor = _encode_cursor(snapshots[-1]) if more else None
+    if next_cursor is not None:
+        url = request.url.include_query_params(limit=requested, cursor=next_cursor)
+        response.headers["Link"] = f'<{url}>; rel="next"'
+    return {
+        "user_id":     user_id,
+        "count":       len(snapshots),
+        "snapshots":   snapshots,
+        "next_cursor": next_cursor,
+    }
+
+
+def _naive_utc(ts: Optional[datetime]) -> Optional[datetime]:
+    if ts is not None and ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+@router.get("/export")
+def export_snapshots(format: str = "ndjson", labeled: bool = False,
+                     since: Optional[datetime] = None, until: Optional[datetime] = None):
+    """
+    Bulk export, encoded and streamed chunk by chunk. Rows are read one
+    partition at a time (STORE_PARTITION=day|week); the default single table is
+    read whole before the first chunk is sent.
+    Query params:
+      format  — ndjson (default), arrow (IPC stream) or parquet; the last two need pyarrow
+      labeled — only snapshots with a label (training data)
+      since / until — ISO timestamps bounding the range (partitioned stores skip
+                      the files outside it)
+    """
+    from db.columnar import FORMATS, ColumnarUnavailable, export_stream
+    if format not in FORMATS:
+        raise HTTPException(status_code=422,
+                            detail=f"Unknown format '{format}' ({' | '.join(FORMATS)})")
+    chunks = iter_snapshots(_naive_utc(since), _naive_utc(until), labeled_only=labeled)
+    try:
+        body = export_stream(format, chunks, chunk_rows=EXPORT_CHUNK_ROWS)
+    except ColumnarUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    media_type, ext = FORMATS[format]
+    return StreamingResponse(body, media_type=media_type, headers={
+        "Content-Disposition": f'attachment; filename="snapshots.{ext}"'})
 
 
 @router.get("/")
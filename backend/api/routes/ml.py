@@ -2,6 +2,7 @@
 ML routes — mood prediction, training, and model info.
 """
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse
 from datetime import datetime
 from core.models import HealthSnapshot, MoodPrediction, TrainRequest, MOOD_EMOJI
 
@@ -61,39 +62,58 @@ MOOD_PLAYLIST_SEEDS = {
 
 
 @router.post("/predict", response_model=MoodPrediction)
-def predict(snapshot: HealthSnapshot):
+async def predict(snapshot: HealthSnapshot):
     """
     Predict mood from a health snapshot.
     Spotify audio features are optional — the model works on HR + steps alone,
     but confidence will be lower without them.
+    Concurrent requests are micro-batched into a single model call.
     """
-    from ml.inference import predict_mood
+    from ml.inference import predict_mood_async
+    from ml.warmup import ModelNotReady
     try:
-        return predict_mood(snapshot.model_dump())
+        return await predict_mood_async(snapshot.model_dump())
+    except ModelNotReady as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/train")
+@router.post("/train", status_code=202)
 def train(req: TrainRequest):
-    """Retrain the mood classifier."""
-    from ml.models.training.train import train_model
-    try:
-        return train_model(min_samples=req.min_samples)
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    """
+    Retrain the mood classifier in the background — single-flight with the
+    auto/warm-up retrains. Answers 202 with the lifecycle state; poll /ready
+    (or GET /api/ml/model/info) for the result. `scheduled` is false when a
+    retrain was already running and this request joined it.
+    """
+    from ml.warmup import schedule_retrain, readiness
+    scheduled = schedule_retrain(reason="manual", min_samples=req.min_samples)
+    return JSONResponse(status_code=202, content={"scheduled": scheduled, **readiness()})
 
 
 @router.get("/model/info")
 def model_info():
-    """Return metadata about the currently loaded model."""
+    """
+    Return metadata about the currently loaded model, plus the online head's
+    blend, prediction cache hit-rate and micro-batching stats.
+    """
     import os, json
     from core.config import MODEL_DIR
+    from ml.online import online_model
+    from ml.inference import prediction_cache, batcher
     meta_path = os.path.join(MODEL_DIR, "model_metadata.json")
     if not os.path.exists(meta_path):
         raise HTTPException(status_code=404, detail="No model trained yet")
     with open(meta_path) as f:
-        return json.load(f)
+        meta = json.load(f)
+    online = online_model.info()
+    meta["online"] = online
+    meta["blend"]  = {"batch": round(1.0 - online["blend_weight"], 4),
+                      "online": online["blend_weight"]}
+    meta["prediction_cache"] = prediction_cache.stats()
+    meta["micro_batching"]   = batcher.stats()
+    return meta
 
 
 @router.get("/playlist-seeds/{mood}")
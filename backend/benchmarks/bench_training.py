@@ -0,0 +1,249 @@
+"""
+Training / inference benchmark — how the ML pipeline scales with history size.
+
+For each dataset size (default 1k, 10k, 100k, 1M labeled snapshots) a fresh
+worker process:
+  1. generates realistic snapshot dicts (many users, 30 s cadence, Spotify)
+  2. times each stage:
+       featurize   — build_feature_matrix (incl. temporal window replay)
+       cv          — cross_val_score with the production pipeline + splitter
+       fit         — pipeline.fit
+       save / load — joblib.dump / joblib.load of the fitted artifact
+       predict_single — one-row predict_proba (median + p99 over repeats)
+       predict_batch  — predict_proba on BATCH_ROWS rows (rows/s)
+  3. records peak RSS after every stage (ru_maxrss of the worker)
+
+Each size runs in its own process so peak RSS is per size, not cumulative.
+CV / fit / save / load are skipped above --fit-limit rows (a 300-tree forest on
+1M rows takes a very long time); raise it to measure them anyway.
+
+Results go to JSON (default benchmarks/results/training-<UTC stamp>.json) so
+runs can be diffed release over release; --compare prints the ratio against an
+earlier results file. Runs fully offline; it never reads the app's snapshot DB
+or writes its model file.
+
+Usage (from backend/):
+    python -m benchmarks.bench_training
+    python -m benchmarks.bench_training --sizes 1000,10000 --compare benchmarks/results/old.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+
+DEFAULT_SIZES     = [1_000, 10_000, 100_000, 1_000_000]
+DEFAULT_FIT_LIMIT = 100_000
+BATCH_ROWS        = 1024
+SINGLE_REPEATS    = 200
+USERS             = 50
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far, in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def make_snapshots(n: int, seed: int = 0) -> list[dict]:
+    """
+    n labeled snapshots shaped like POST /api/health/snapshot records, drawn
+    from the synthetic mood specs and spread over USERS users at 30 s cadence.
+    """
+    from ml.synthetic import MOOD_SPECS
+    rng    = np.random.default_rng(seed)
+    moods  = list(MOOD_SPECS)
+    start  = datetime(2026, 3, 2, 6, 0)
+    picks  = rng.integers(0, len(moods), size=n)
+    snaps  = []
+    for i, m in enumerate(picks):
+        mood    = moods[int(m)]
+        variant = MOOD_SPECS[mood][i % len(MOOD_SPECS[mood])]
+        user    = i % USERS
+        ts      = start + timedelta(seconds=30 * (i // USERS))
+        snaps.append({
+            "user_id":           f"bench_user_{user:03d}",
+            "heart_rate":        int(rng.integers(*variant["heart_rate"])),
+            "steps_last_minute": int(rng.integers(*variant["steps_last_minute"])),
+            "location_variance": float(rng.uniform(*variant["location_variance"])),
+            "timestamp":         ts.isoformat(),
+            "spotify": {
+                "track_name": "Bench Track",
+                "energy":     float(rng.uniform(*variant["energy"])),
+                "valence":    float(rng.uniform(*variant["valence"])),
+                "tempo":      float(rng.uniform(*variant["tempo"])),
+            },
+            "label": mood,
+        })
+    return snaps
+
+
+class _Stages:
+    """Collects {stage: {seconds, peak_rss_mb, ...}} for one size."""
+
+    def __init__(self):
+        self.results: dict[str, dict] = {}
+
+    def run(self, name: str, fn, **extra):
+        start = time.perf_counter()
+        value = fn()
+        self.results[name] = {"seconds": round(time.perf_counter() - start, 6),
+                              "peak_rss_mb": peak_rss_mb(), **extra}
+        return value
+
+    def skip(self, name: str, reason: str):
+        self.results[name] = {"skipped": reason}
+
+
+def run_size(size: int, fit_limit: int = DEFAULT_FIT_LIMIT, seed: int = 0) -> dict:
+    """Benchmark every stage for one dataset size (in the current process)."""
+    import joblib
+    from sklearn.model_selection import cross_val_score
+    from ml.features import build_feature_matrix
+    from ml.models.training.train import build_pipeline, cv_splitter
+
+    stages = _Stages()
+    snaps  = stages.run("generate", lambda: make_snapshots(size, seed))
+    X, y   = stages.run("featurize", lambda: build_feature_matrix(snaps))
+    stages.results["featurize"]["rows_per_second"] = round(
+        size / max(stages.results["featurize"]["seconds"], 1e-9), 1)
+    del snaps
+
+    if size > fit_limit:
+        for name in ("cv", "fit", "save", "load", "predict_single", "predict_batch"):
+            stages.skip(name, f"size > fit_limit ({fit_limit})")
+        return {"size": size, "stages": stages.results}
+
+    stages.run("cv", lambda: cross_val_score(build_pipeline(), X, y, cv=cv_splitter(y),
+                                             scoring="f1_weighted"))
+    pipeline = build_pipeline()
+    stages.run("fit", lambda: pipeline.fit(X, y))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "model.pkl")
+        stages.run("save", lambda: joblib.dump(pipeline, path))
+        stages.results["save"]["artifact_mb"] = round(os.path.getsize(path) / 1e6, 3)
+        pipeline = stages.run("load", lambda: joblib.load(path))
+
+    row = X[:1]
+    pipeline.predict_proba(row)   # warm
+    timings = []
+    for _ in range(SINGLE_REPEATS):
+        t = time.perf_counter()
+        pipeline.predict_proba(row)
+        timings.append(time.perf_counter() - t)
+    stages.results["predict_single"] = {
+        "p50_ms": round(float(np.percentile(timings, 50)) * 1000, 3),
+        "p99_ms": round(float(np.percentile(timings, 99)) * 1000, 3),
+        "repeats": SINGLE_REPEATS, "peak_rss_mb": peak_rss_mb(),
+    }
+
+    batch = X[np.arange(BATCH_ROWS) % len(X)]
+    stages.run("predict_batch", lambda: pipeline.predict_proba(batch), rows=BATCH_ROWS)
+    stages.results["predict_batch"]["rows_per_second"] = round(
+        BATCH_ROWS / max(stages.results["predict_batch"]["seconds"], 1e-9), 1)
+
+    return {"size": size, "stages": stages.results}
+
+
+def _run_in_worker(size: int, fit_limit: int, seed: int) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_training", "--worker",
+         "--sizes", str(size), "--fit-limit", str(fit_limit), "--seed", str(seed)],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+    )
+    if out.returncode != 0:
+        return {"size": size, "error": out.stderr.strip().splitlines()[-1:] or ["worker failed"]}
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def environment() -> dict:
+    import sklearn
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "git_commit": commit,
+        "python":    platform.python_version(),
+        "numpy":     np.__version__,
+        "sklearn":   sklearn.__version__,
+        "platform":  platform.platform(),
+        "cpus":      os.cpu_count(),
+    }
+
+
+def compare(current: dict, previous: dict) -> list[str]:
+    """Human-readable `stage: old → new (×ratio)` lines for matching sizes."""
+    old = {r["size"]: r.get("stages", {}) for r in previous.get("results", [])}
+    lines = []
+    for result in current["results"]:
+        for stage, now in result.get("stages", {}).items():
+            before = old.get(result["size"], {}).get(stage, {})
+            for metric in ("seconds", "p50_ms"):
+                if metric in now and before.get(metric):
+                    ratio = now[metric] / before[metric]
+                    flag  = "  ← slower" if ratio > 1.2 else ""
+                    lines.append(f"{result['size']:>9,} {stage:<15} {before[metric]:.4f} → "
+                                 f"{now[metric]:.4f} {metric} (×{ratio:.2f}){flag}")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark training/inference scaling")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="comma-separated dataset sizes")
+    parser.add_argument("--fit-limit", type=int, default=DEFAULT_FIT_LIMIT,
+                        help="skip CV/fit/save/load/inference above this many rows")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="results JSON path")
+    parser.add_argument("--compare", help="earlier results JSON to diff against")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+
+    if args.worker:
+        print(json.dumps(run_size(sizes[0], args.fit_limit, args.seed)))
+        return
+
+    report = {"environment": environment(), "fit_limit": args.fit_limit, "results": []}
+    for size in sizes:
+        print(f"[bench] {size:,} snapshots...", flush=True)
+        result = _run_in_worker(size, args.fit_limit, args.seed)
+        report["results"].append(result)
+        for stage, r in result.get("stages", {}).items():
+            if "skipped" in r:
+                print(f"    {stage:<15} skipped — {r['skipped']}")
+                continue
+            shown = f"{r['seconds']:.4f} s" if "seconds" in r else f"p50 {r['p50_ms']} ms"
+            print(f"    {stage:<15} {shown:<14} peak RSS {r['peak_rss_mb']} MB")
+        if "error" in result:
+            print(f"    failed: {result['error']}")
+
+    out = args.out or os.path.join(
+        RESULTS_DIR, f"training-{datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"[bench] results → {out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            print("\n".join(compare(report, json.load(f))) or "[bench] nothing comparable")
+
+
+if __name__ == "__main__":
+    main()
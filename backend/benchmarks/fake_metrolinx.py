@@ -0,0 +1,149 @@
+"""
+Local stand-in for the Metrolinx Open Data API — for load tests only.
+
+Serves the one endpoint the backend calls:
+  GET /OpenDataAPI/api/V1/ServiceUpdate/UnionDepartures/All
+      → canned UnionDepartures JSON, departure times generated relative to now
+
+Every response can be delayed (`latency_ms` ± `jitter_ms`) and a fraction of
+requests (`failure_rate`) answer 503, so /api/transit/next can be measured
+against a slow or flaky upstream without touching the real API.
+
+Point the app at it with:
+    METROLINX_DEPARTURES_URL=http://127.0.0.1:<port>/OpenDataAPI/api/V1/ServiceUpdate/UnionDepartures/All
+    METROLINX_API_KEY=anything
+
+Run standalone:
+    python -m benchmarks.fake_metrolinx --port 8900 --latency-ms 120 --failure-rate 0.05
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEPARTURES_PATH = "/OpenDataAPI/api/V1/ServiceUpdate/UnionDepartures/All"
+
+LINES = [
+    ("Lakeshore West", ["Exhibition", "Mimico", "Port Credit", "Oakville", "Aldershot"]),
+    ("Lakeshore East", ["Danforth", "Scarborough", "Pickering", "Ajax", "Oshawa"]),
+    ("Barrie",         ["Downsview Park", "Rutherford", "Aurora", "Barrie South"]),
+    ("Kitchener",      ["Bloor", "Weston", "Malton", "Brampton", "Kitchener"]),
+    ("Stouffville",    ["Kennedy", "Agincourt", "Unionville", "Mount Joy"]),
+    ("Milton",         ["Kipling", "Dixie", "Meadowvale", "Milton"]),
+    ("Richmond Hill",  ["Oriole", "Old Cummer", "Langstaff", "Richmond Hill"]),
+]
+
+
+def departures_payload(n: int = 40, now: datetime | None = None) -> dict:
+    """UnionDepartures-shaped JSON with `n` trips over the next few hours."""
+    now = now or datetime.now()
+    trips = []
+    for i in range(n):
+        line, stops = LINES[i % len(LINES)]
+        trips.append({
+            "Service":  line,
+            "Time":     (now + timedelta(minutes=4 * i + 3)).strftime("%Y-%m-%d %H:%M:%S"),
+            "Platform": str(3 + i % 11),
+            "Info":     "Delayed" if i % 9 == 4 else "On Time",
+            "TripNumber": f"{1000 + i}",
+            "Stops":    [{"Name": name, "Code": name[:2].upper()} for name in stops],
+        })
+    # The real API nests trips in a dict of lists — exercise that path
+    return {"AllDepartures": {"Trip": trips}}
+
+
+class FakeMetrolinx:
+    """Threaded HTTP server with configurable latency and failure injection."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0.0,
+                 jitter_ms: float = 0.0, failure_rate: float = 0.0, trips: int = 40,
+                 seed: int | None = None):
+        self.latency_ms   = latency_ms
+        self.jitter_ms    = jitter_ms
+        self.failure_rate = failure_rate
+        self.trips        = trips
+        self.requests     = 0
+        self.failures     = 0
+        self._rng         = random.Random(seed)
+        self._lock        = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def departures_url(self) -> str:
+        return self.base_url + DEPARTURES_PATH
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):   # keep load-test output clean
+                pass
+
+            def _send(self, status: int, body: bytes, content_type: str):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                path = self.path.split("?", 1)[0]
+                with fake._lock:
+                    fake.requests += 1
+                    delay = max(0.0, fake.latency_ms + fake._rng.uniform(-1, 1) * fake.jitter_ms)
+                    fail  = fake._rng.random() < fake.failure_rate
+                    if fail:
+                        fake.failures += 1
+                time.sleep(delay / 1000.0)
+
+                if fail:
+                    self._send(503, b'{"error": "injected failure"}', "application/json")
+                elif path == DEPARTURES_PATH:
+                    body = json.dumps(departures_payload(fake.trips)).encode()
+                    self._send(200, body, "application/json")
+                else:
+                    self._send(404, b'{"error": "not found"}', "application/json")
+
+        return Handler
+
+    def start(self) -> "FakeMetrolinx":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Metrolinx API for load tests")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = FakeMetrolinx(port=args.port, latency_ms=args.latency_ms,
+                           jitter_ms=args.jitter_ms, failure_rate=args.failure_rate)
+    print(f"Fake Metrolinx on {server.departures_url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,240 @@
+"""
+End-to-end HTTP load test — the request mix the mobile app actually produces.
+
+Stands up (unless --target is given):
+  - a local fake Metrolinx server (benchmarks/fake_metrolinx.py) with the
+    configured upstream latency / failure rate
+  - the FastAPI app under uvicorn in a subprocess, pointed at the fake server,
+    with its DB and model dir in a temp directory (your real data is untouched)
+
+then drives it from --concurrency client threads for --duration seconds with a
+weighted mix of:
+  snapshot — POST /api/health/snapshot   (a fraction carry a mood label)
+  predict  — POST /api/ml/predict
+  transit  — GET  /api/transit/next
+
+and reports throughput and p50/p95/p99 latency per route (plus JSON via --out).
+
+Usage (from backend/):
+    python -m benchmarks.loadtest --duration 30 --concurrency 16
+    python -m benchmarks.loadtest --mix snapshot=6,predict=3,transit=1 \\
+        --upstream-latency-ms 150 --upstream-failure-rate 0.05
+    python -m benchmarks.loadtest --target http://localhost:8000   # existing server
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import requests
+
+from benchmarks.fake_metrolinx import FakeMetrolinx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MOODS       = ["happy", "neutral", "stressed", "angry", "sad", "sleepy"]
+ROUTES      = {
+    "snapshot": ("POST", "/api/health/snapshot"),
+    "predict":  ("POST", "/api/ml/predict"),
+    "transit":  ("GET",  "/api/transit/next"),
+}
+
+
+def parse_mix(spec: str) -> dict[str, float]:
+    """'snapshot=6,predict=3,transit=1' → normalized weights."""
+    weights = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ROUTES:
+            raise ValueError(f"Unknown route '{name}'. Valid: {list(ROUTES)}")
+        weights[name.strip()] = float(weight or 1)
+    total = sum(weights.values())
+    return {name: w / total for name, w in weights.items()}
+
+
+def make_snapshot(rng: random.Random, users: int, label_rate: float) -> dict:
+    """A reading like the app sends every 30–60 s; some carry a mood label."""
+    body = {
+        "user_id":           f"load_user_{rng.randrange(users):04d}",
+        "heart_rate":        rng.randint(55, 150),
+        "steps_last_minute": rng.choice([0, 0, 3, 12, 40, 90]),
+        "location_variance": rng.uniform(0.0, 0.001),
+        "timestamp":         datetime.utcnow().isoformat(),
+    }
+    if rng.random() < 0.7:
+        body["spotify"] = {"track_name": "Load Test", "artist_name": "Bench",
+                           "energy": rng.random(), "valence": rng.random(),
+                           "tempo": rng.uniform(60, 200)}
+    if rng.random() < label_rate:
+        body["label"] = rng.choice(MOODS)
+    return body
+
+
+def summarize(records: list[tuple[str, float, int]], elapsed: float) -> dict:
+    """records = [(route, latency_s, status)] → per-route throughput + percentiles."""
+    report = {}
+    by_route: dict[str, list] = {}
+    for route, latency, status in records:
+        by_route.setdefault(route, []).append((latency, status))
+    for route, rows in sorted(by_route.items()):
+        lat = np.array([r[0] for r in rows]) * 1000.0
+        statuses: dict[str, int] = {}
+        for _, status in rows:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        report[route] = {
+            "requests":   len(rows),
+            "errors":     sum(1 for _, s in rows if s == 0 or s >= 500),
+            "statuses":   statuses,
+            "throughput_rps": round(len(rows) / elapsed, 2) if elapsed > 0 else 0.0,
+            "mean_ms":    round(float(lat.mean()), 2),
+            "p50_ms":     round(float(np.percentile(lat, 50)), 2),
+            "p95_ms":     round(float(np.percentile(lat, 95)), 2),
+            "p99_ms":     round(float(np.percentile(lat, 99)), 2),
+            "max_ms":     round(float(lat.max()), 2),
+        }
+    total = len(records)
+    report["_all"] = {"requests": total,
+                      "throughput_rps": round(total / elapsed, 2) if elapsed > 0 else 0.0,
+                      "elapsed_s": round(elapsed, 2)}
+    return report
+
+
+def drive(base_url: str, duration: float, concurrency: int, mix: dict[str, float],
+          users: int = 200, label_rate: float = 0.05, seed: int = 0) -> dict:
+    """Run the load for `duration` seconds and return summarize()'s report."""
+    records: list[tuple[str, float, int]] = []
+    lock     = threading.Lock()
+    deadline = time.perf_counter() + duration
+    names, weights = list(mix), list(mix.values())
+
+    def worker(idx: int):
+        rng = random.Random(seed * 1000 + idx)
+        session = requests.Session()
+        local = []
+        while time.perf_counter() < deadline:
+            route = rng.choices(names, weights)[0]
+            method, path = ROUTES[route]
+            start = time.perf_counter()
+            try:
+                if method == "POST":
+                    resp = session.post(base_url + path, timeout=30,
+                                        json=make_snapshot(rng, users, label_rate))
+                else:
+                    resp = session.get(base_url + path, params={"limit": 10}, timeout=30)
+                status = resp.status_code
+            except requests.RequestException:
+                status = 0
+            local.append((route, time.perf_counter() - start, status))
+        with lock:
+            records.extend(local)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return summarize(records, time.perf_counter() - started)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(base_url: str, timeout: float = 180.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(base_url + "/ready", timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"App at {base_url} not ready after {timeout}s")
+
+
+def start_app(tmp_dir: str, departures_url: str, port: int, workers: int = 1) -> subprocess.Popen:
+    """Launch uvicorn with an isolated DB/model dir, pointed at the fake upstream."""
+    env = {
+        **os.environ,
+        "COMMUTE_DB_PATH":          os.path.join(tmp_dir, "commute_data.json"),
+        "COMMUTE_MODEL_DIR":        os.path.join(tmp_dir, "models"),
+        "METROLINX_API_KEY":        "loadtest",
+        "METROLINX_DEPARTURES_URL": departures_url,
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+
+
+def print_report(report: dict):
+    print(f"\n{'route':<10} {'reqs':>7} {'err':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}  (ms)")
+    for route, r in report.items():
+        if route.startswith("_"):
+            continue
+        print(f"{route:<10} {r['requests']:>7} {r['errors']:>5} {r['throughput_rps']:>8} "
+              f"{r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8}")
+    total = report["_all"]
+    print(f"{'all':<10} {total['requests']:>7} {'':>5} {total['throughput_rps']:>8}"
+          f"   over {total['elapsed_s']}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP load test for the Commute Buddy API")
+    parser.add_argument("--target", help="base URL of a running app (skip launching one)")
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mix", default="snapshot=6,predict=3,transit=1")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--label-rate", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--upstream-latency-ms", type=float, default=80.0)
+    parser.add_argument("--upstream-jitter-ms", type=float, default=40.0)
+    parser.add_argument("--upstream-failure-rate", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the JSON report here")
+    args = parser.parse_args(argv)
+    mix = parse_mix(args.mix)
+
+    config = {k: v for k, v in vars(args).items() if k != "out"}
+    if args.target:
+        report = drive(args.target.rstrip("/"), args.duration, args.concurrency, mix,
+                       args.users, args.label_rate, args.seed)
+    else:
+        with FakeMetrolinx(latency_ms=args.upstream_latency_ms, jitter_ms=args.upstream_jitter_ms,
+                           failure_rate=args.upstream_failure_rate, seed=args.seed) as upstream, \
+                tempfile.TemporaryDirectory() as tmp:
+            port = _free_port()
+            app  = start_app(tmp, upstream.departures_url, port, args.workers)
+            base = f"http://127.0.0.1:{port}"
+            try:
+                print(f"[load] waiting for {base}/ready ...", flush=True)
+                _wait_ready(base)
+                print(f"[load] {args.concurrency} clients × {args.duration}s, mix {mix}", flush=True)
+                report = drive(base, args.duration, args.concurrency, mix,
+                               args.users, args.label_rate, args.seed)
+            finally:
+                app.terminate()
+                app.wait(timeout=30)
+            report["_upstream"] = {"requests": upstream.requests, "failures": upstream.failures}
+
+    print_report(report)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"config": config, "report": report}, f, indent=2)
+        print(f"[load] report → {args.out}")
+
+
+if __name__ == "__main__":
+    main()
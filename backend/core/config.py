@@ -9,11 +9,88 @@ load_dotenv()
 # --- Transit ---
 METROLINX_API_KEY: str = os.getenv("METROLINX_API_KEY", "")
 
+# --- ML ---
+# Preload (or train) the model on a background thread at app startup
+WARMUP_ON_STARTUP: bool = os.getenv("WARMUP_ON_STARTUP", "1") == "1"
+
+# Sliding window (minutes) used for the per-user temporal features (HR/steps trend)
+TEMPORAL_WINDOW_MINUTES: float = float(os.getenv("TEMPORAL_WINDOW_MINUTES", "10"))
+
+# Synthetic rows mixed into every retrain (generated once, then cached on disk)
+SYNTHETIC_SAMPLES_PER_MOOD: int = int(os.getenv("SYNTHETIC_SAMPLES_PER_MOOD", "100"))
+SYNTHETIC_SEED: int             = int(os.getenv("SYNTHETIC_SEED", "42"))
+
+# Optional online (partial_fit) head blended with the batch forest
+ONLINE_MODEL_ENABLED: bool  = os.getenv("ONLINE_MODEL_ENABLED", "0") == "1"
+ONLINE_BLEND_WEIGHT: float  = float(os.getenv("ONLINE_BLEND_WEIGHT", "0.3"))
+ONLINE_WARMUP_SAMPLES: int  = int(os.getenv("ONLINE_WARMUP_SAMPLES", "20"))
+
+# Prediction cache (quantized feature vector + model version → mood); size 0 disables
+PREDICTION_CACHE_SIZE: int   = int(os.getenv("PREDICTION_CACHE_SIZE", "2048"))
+PREDICTION_CACHE_TTL: float  = float(os.getenv("PREDICTION_CACHE_TTL", "300"))
+
+# Micro-batching of /api/ml/predict — max wait for a batch to fill, and its size cap.
+# A window of 0 turns batching off.
+PREDICT_BATCH_WINDOW_MS: float = float(os.getenv("PREDICT_BATCH_WINDOW_MS", "5"))
+PREDICT_BATCH_MAX: int         = int(os.getenv("PREDICT_BATCH_MAX", "32"))
+
+# --- Storage ---
+# Write-ahead log ingest: appends go to NDJSON segments (group-committed fsync)
+# and a background compactor folds them into the TinyDB file
+STORE_WAL: bool                 = os.getenv("STORE_WAL", "0") == "1"
+WAL_GROUP_COMMIT_MS: float      = float(os.getenv("WAL_GROUP_COMMIT_MS", "5"))
+WAL_FSYNC: bool                 = os.getenv("WAL_FSYNC", "1") == "1"
+WAL_COMPACT_INTERVAL_S: float   = float(os.getenv("WAL_COMPACT_INTERVAL_S", "30"))
+WAL_COMPACT_MAX_PENDING: int    = int(os.getenv("WAL_COMPACT_MAX_PENDING", "5000"))
+
+# Time partitions: "none" (one table, default), "day" or "week" (one file per period)
+STORE_PARTITION: str = os.getenv("STORE_PARTITION", "none").lower()
+
+# Retention (partitioned store only) — unlabeled readings older than RAW_DAYS are
+# downsampled to per-minute aggregates, which are dropped after AGGREGATE_DAYS.
+# Labeled readings are kept. Interval 0 disables the background pass.
+RETENTION_RAW_DAYS: float       = float(os.getenv("RETENTION_RAW_DAYS", "14"))
+RETENTION_AGGREGATE_DAYS: float = float(os.getenv("RETENTION_AGGREGATE_DAYS", "90"))
+RETENTION_INTERVAL_HOURS: float = float(os.getenv("RETENTION_INTERVAL_HOURS", "6"))
+
+# How far back retrains read history (days); 0 = everything
+TRAIN_HISTORY_DAYS: float = float(os.getenv("TRAIN_HISTORY_DAYS", "0"))
+
+# Rows per chunk of /api/health/export (one Parquet row group / Arrow batch each)
+EXPORT_CHUNK_ROWS: int = int(os.getenv("EXPORT_CHUNK_ROWS", "5000"))
+
+# --- Assets ---
+# Encoding (bubu_assets.pack) and blob alignment of the packs served at /api/assets/emotions
+EMOTION_PACK_ENCODING: str = os.getenv("EMOTION_PACK_ENCODING", "rle")
+EMOTION_PACK_ALIGN: int    = int(os.getenv("EMOTION_PACK_ALIGN", "32"))
+
+# --- Diagnostics ---
+# Shared secret for /api/admin/* (X-Admin-Token header); empty disables the admin API
+ADMIN_TOKEN: str = os.getenv("ADMIN_TOKEN", "")
+
+# Per-request Server-Timing header (store / features / model / upstream)
+SERVER_TIMING_ENABLED: bool = os.getenv("SERVER_TIMING_ENABLED", "1") == "1"
+
+# Sampling profiler — default stack sampling interval and the longest allowed session
+PROFILER_INTERVAL_MS: float = float(os.getenv("PROFILER_INTERVAL_MS", "10"))
+PROFILER_MAX_SECONDS: float = float(os.getenv("PROFILER_MAX_SECONDS", "300"))
+
+# Tracing — "none" (default), "console", or "file" (OTLP/JSON lines at TRACE_FILE)
+TRACING_EXPORTER: str     = os.getenv("TRACING_EXPORTER", "none").lower()
+TRACE_SAMPLE_RATIO: float = float(os.getenv("TRACE_SAMPLE_RATIO", "1.0"))
+
 # --- Paths ---
+# MODEL_DIR / DB_PATH / TRACE_FILE / WAL_DIR / PARTITION_DIR / EMOTION_PROJECT_DIR can be redirected (e.g. to a temp dir for load tests)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-MODEL_DIR = os.path.join(BASE_DIR, "ml", "models")
-DB_PATH   = os.path.join(BASE_DIR, "db", "commute_data.json")
+MODEL_DIR  = os.getenv("COMMUTE_MODEL_DIR", os.path.join(BASE_DIR, "ml", "models"))
+DB_PATH    = os.getenv("COMMUTE_DB_PATH", os.path.join(BASE_DIR, "db", "commute_data.json"))
+TRACE_FILE = os.getenv("TRACE_FILE", os.path.join(BASE_DIR, "traces.ndjson"))
+WAL_DIR    = os.getenv("WAL_DIR", os.path.join(os.path.dirname(DB_PATH), "wal"))
+PARTITION_DIR = os.getenv("PARTITION_DIR", os.path.join(os.path.dirname(DB_PATH), "partitions"))
+REPO_DIR   = os.path.dirname(BASE_DIR)      # holds bubu_assets, the editors' asset library
+# Editor project files, one <mood>.json per mood
+EMOTION_PROJECT_DIR = os.getenv("EMOTION_PROJECT_DIR", os.path.join(REPO_DIR, "AnjeBubu", "emotions", "moods"))
 
 # Ensure dirs exist at import time
 os.makedirs(MODEL_DIR, exist_ok=True)
-os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
\ No newline at end of file
+os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
@@ -0,0 +1,264 @@
+"""
+Production diagnosis — a sampling profiler and per-request Server-Timing.
+
+SamplingProfiler
+  A daemon thread that snapshots every other thread's Python stack
+  (sys._current_frames) every `interval_ms` and counts identical stacks.
+  Nothing is hooked into the interpreter, so the cost is one stack walk per
+  thread per tick — only while a session is running. A session ends after
+  N seconds or after the next N requests, and the result is the collapsed
+  stack format flamegraph.pl / speedscope / inferno read directly:
+
+      MainThread;main (main.py:1);save_snapshot (db/store.py:42) 17
+
+  Admin-only: started/stopped/downloaded via /api/admin/profile.
+
+Server-Timing
+  `timing_phase("store")` (context manager or decorator) adds its wall time to
+  the current request's bucket. DiagnosticsMiddleware opens the bucket and
+  writes the header on the response:
+
+      Server-Timing: store;dur=12.4, features;dur=0.3, model;dur=5.1, total;dur=19.0
+
+  Outside a request (scripts, background retrains) a phase costs one
+  ContextVar lookup. Nested phases of the same name are counted once.
+"""
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter as _Counter
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Optional
+
+from core.config import BASE_DIR, PROFILER_INTERVAL_MS, PROFILER_MAX_SECONDS, SERVER_TIMING_ENABLED
+
+# Leaf frames that mean "this thread is parked", dropped unless include_idle
+IDLE_FRAMES = {
+    ("threading.py", "wait"), ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"), ("selectors.py", "select"), ("socket.py", "accept"),
+    ("socketserver.py", "serve_forever"), ("_thread.py", "_worker"),
+}
+
+# Paths excluded from request-count sessions and Server-Timing (diagnostics themselves)
+_UNTRACKED_PREFIXES = ("/api/admin", "/metrics")
+
+
+# ──────────────────────────────────────────────
+# Sampling profiler
+# ──────────────────────────────────────────────
+
+class SamplingProfiler:
+    """One profiling session at a time; results kept until the next start()."""
+
+    def __init__(self):
+        self._lock    = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop    = threading.Event()
+        self._stacks: _Counter = _Counter()
+        self._labels: dict = {}
+        self._info: dict = {"state": "idle"}
+        self._requests_left: Optional[int] = None
+
+    @property
+    def running(self) -> bool:
+        t = self._thread
+        return t is not None and t.is_alive()
+
+    def start(self, seconds: Optional[float] = None, requests: Optional[int] = None,
+              interval_ms: float = PROFILER_INTERVAL_MS, include_idle: bool = False) -> dict:
+        """Begin a session bounded by `seconds` or by the next `requests` requests."""
+        if (seconds is None) == (requests is None):
+            raise ValueError("Give exactly one of seconds or requests")
+        if seconds is not None and not 0 < seconds <= PROFILER_MAX_SECONDS:
+            raise ValueError(f"seconds must be in (0, {PROFILER_MAX_SECONDS}]")
+        if requests is not None and requests < 1:
+            raise ValueError("requests must be >= 1")
+        with self._lock:
+            if self.running:
+                raise RuntimeError("A profiling session is already running")
+            self._stop.clear()
+            self._stacks = _Counter()
+            self._requests_left = requests
+            # Request-bounded sessions still stop at the hard cap
+            deadline = time.monotonic() + (seconds if seconds is not None else PROFILER_MAX_SECONDS)
+            self._info = {
+                "state":        "running",
+                "mode":         "seconds" if seconds is not None else "requests",
+                "limit":        seconds if seconds is not None else requests,
+                "interval_ms":  interval_ms,
+                "include_idle": include_idle,
+                "started_at":   datetime.utcnow().isoformat(),
+                "samples":      0,
+            }
+            self._thread = threading.Thread(
+                target=self._run, args=(deadline, max(interval_ms, 1.0) / 1000.0, include_idle),
+                name="sampling-profiler", daemon=True)
+            self._thread.start()
+        return self.status()
+
+    def stop(self):
+        """End the running session early (results are kept)."""
+        self._stop.set()
+        t = self._thread
+        if t is not None and t is not threading.current_thread():
+            t.join(timeout=5)
+
+    def request_finished(self):
+        """Called once per completed request; ends request-bounded sessions."""
+        if self._requests_left is None:
+            return
+        with self._lock:
+            if self._requests_left is None:
+                return
+            self._requests_left -= 1
+            if self._requests_left <= 0:
+                self._requests_left = None
+                self._stop.set()
+
+    def status(self) -> dict:
+        with self._lock:
+            info = dict(self._info)
+            info["distinct_stacks"] = len(self._stacks)
+            if self._requests_left is not None:
+                info["requests_left"] = self._requests_left
+        return info
+
+    def collapsed(self) -> str:
+        """Folded stacks, one `frame;frame;... count` line each, hottest first."""
+        with self._lock:
+            items = self._stacks.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in items)
+
+    # ── sampling thread ──────────────────────────
+
+    def _run(self, deadline: float, interval: float, include_idle: bool):
+        me, samples = threading.get_ident(), 0
+        started = time.perf_counter()
+        while not self._stop.is_set() and time.monotonic() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                stack = self._walk(frame, include_idle)
+                if stack:
+                    with self._lock:
+                        self._stacks[f"{names.get(tid, tid)};{stack}"] += 1
+            samples += 1
+            self._stop.wait(interval)
+        with self._lock:
+            self._requests_left = None
+            self._info.update(state="finished", samples=samples,
+                              finished_at=datetime.utcnow().isoformat(),
+                              seconds=round(time.perf_counter() - started, 3))
+
+    def _walk(self, frame, include_idle: bool) -> Optional[str]:
+        code = frame.f_code
+        if not include_idle and (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+            return None
+        frames = []
+        while frame is not None:
+            frames.append(self._label(frame.f_code))
+            frame = frame.f_back
+        frames.reverse()
+        return ";".join(frames)
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            path = code.co_filename
+            if path.startswith(BASE_DIR):
+                path = os.path.relpath(path, BASE_DIR)
+            else:
+                path = "/".join(path.replace("\\", "/").split("/")[-2:])
+            # ';' separates frames in the collapsed format
+            label = f"{code.co_name} ({path}:{code.co_firstlineno})".replace(";", ":")
+            self._labels[code] = label
+        return label
+
+
+profiler = SamplingProfiler()
+
+
+# ──────────────────────────────────────────────
+# Server-Timing
+# ──────────────────────────────────────────────
+
+class _RequestTimings:
+    __slots__ = ("durations", "active")
+
+    def __init__(self):
+        self.durations: dict[str, float] = {}
+        self.active: set = set()
+
+    def header(self, total: float) -> str:
+        parts = [f"{name};dur={secs * 1000:.1f}" for name, secs in self.durations.items()]
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+
+_current: ContextVar[Optional[_RequestTimings]] = ContextVar("server_timing", default=None)
+
+
+class timing_phase:
+    """Adds the enclosed wall time to the current request's `name` phase."""
+
+    __slots__ = ("name", "_timings", "_start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        timings = _current.get()
+        if timings is None or self.name in timings.active:
+            self._timings = None
+            return self
+        timings.active.add(self.name)
+        self._timings, self._start = timings, time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        timings = self._timings
+        if timings is not None:
+            elapsed = time.perf_counter() - self._start
+            timings.durations[self.name] = timings.durations.get(self.name, 0.0) + elapsed
+            timings.active.discard(self.name)
+        return False
+
+    def __call__(self, fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timing_phase(self.name):
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+class DiagnosticsMiddleware:
+    """Opens the Server-Timing bucket per request and feeds request-bounded profiles."""
+
+    def __init__(self, app, server_timing: bool = SERVER_TIMING_ENABLED):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path", "").startswith(_UNTRACKED_PREFIXES):
+            return await self.app(scope, receive, send)
+
+        timings = _RequestTimings()
+        token   = _current.set(timings)
+        start   = time.perf_counter()
+
+        async def send_wrapper(message):
+            if self.server_timing and message["type"] == "http.response.start":
+                header = timings.header(time.perf_counter() - start).encode("latin-1")
+                message = {**message, "headers": [*message.get("headers", []),
+                                                  (b"server-timing", header)]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            profiler.request_finished()
@@ -0,0 +1,388 @@
+"""
+Structured tracing — OpenTelemetry-compatible spans, exported locally.
+
+A labeled snapshot sets off a chain (post_snapshot → save_snapshot →
+count_labeled → _maybe_retrain → retrain → train_model → joblib.dump → the next
+joblib.load) that crosses the request, a background thread and a later
+request. Each stage is a span; the retrain is its own trace *linked* to the
+ingest span that triggered it, and the next model load links back to the
+train that wrote the file.
+
+No SDK or collector is needed (only opentelemetry-api would be installed
+here, and it exports nothing by itself). Spans use OTel's data model —
+128-bit trace ids, 64-bit span ids, parent ids, links, kinds, status, nano
+timestamps — and the exporters write:
+
+  file    — one OTLP/JSON `resourceSpans` document per line (TRACE_FILE), the
+            format the Collector's otlpjsonfile receiver and Jaeger import read
+  console — one readable line per span on stdout
+  none    — default; span() returns a shared no-op, so instrumented code pays
+            one attribute check
+
+Incoming W3C `traceparent` headers become the parent of the request span.
+
+Usage:
+    from core.tracing import tracer, traced
+    with tracer.span("fit", attributes={"train.samples": len(X)}):
+        pipeline.fit(X, y)
+
+    @traced()
+    def count_labeled(): ...
+
+    python -m core.tracing summarize traces.ndjson   # per-span latency table
+"""
+import atexit
+import functools
+import json
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Iterable, NamedTuple, Optional
+
+from core.config import TRACING_EXPORTER, TRACE_FILE, TRACE_SAMPLE_RATIO
+
+SERVICE_NAME = "commute-buddy-api"
+SCOPE_NAME   = "commute-buddy"
+
+# OTLP enum values
+_KINDS  = {"INTERNAL": 1, "SERVER": 2, "CLIENT": 3}
+_STATUS = {"UNSET": 0, "OK": 1, "ERROR": 2}
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+class SpanContext(NamedTuple):
+    trace_id: str   # 32 hex chars
+    span_id:  str   # 16 hex chars
+
+
+# The active span's context; _UNSAMPLED marks a trace that was sampled out
+_UNSAMPLED = SpanContext("0" * 32, "0" * 16)
+_current: ContextVar[Optional[SpanContext]] = ContextVar("trace_span", default=None)
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[SpanContext]:
+    """W3C traceparent → SpanContext (None if absent or malformed)."""
+    m = _TRACEPARENT.match((header or "").strip().lower())
+    if not m or m.group(1) == "0" * 32 or m.group(2) == "0" * 16:
+        return None
+    return SpanContext(m.group(1), m.group(2))
+
+
+class Span:
+    __slots__ = ("name", "context", "parent_id", "kind", "start_ns", "end_ns",
+                 "attributes", "links", "status", "status_message", "events")
+
+    def __init__(self, name: str, context: SpanContext, parent_id: Optional[str],
+                 kind: str, attributes: Optional[dict], links: Iterable[SpanContext]):
+        self.name       = name
+        self.context    = context
+        self.parent_id  = parent_id
+        self.kind       = kind
+        self.start_ns   = time.time_ns()
+        self.end_ns     = None
+        self.attributes = dict(attributes or {})
+        self.links      = [l for l in links if l is not None and l is not _UNSAMPLED]
+        self.status     = "UNSET"
+        self.status_message = ""
+        self.events: list = []
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def set_status(self, status: str, message: str = ""):
+        self.status, self.status_message = status, message
+
+    def record_exception(self, exc: BaseException):
+        self.events.append({"name": "exception", "time_ns": time.time_ns(), "attributes": {
+            "exception.type": type(exc).__name__, "exception.message": str(exc)}})
+        self.set_status("ERROR", str(exc))
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId":           self.context.trace_id,
+            "spanId":            self.context.span_id,
+            "name":              self.name,
+            "kind":              _KINDS[self.kind],
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano":   str(self.end_ns),
+            "attributes":        _otlp_attributes(self.attributes),
+            "status":            {"code": _STATUS[self.status]},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.links:
+            span["links"] = [{"traceId": l.trace_id, "spanId": l.span_id} for l in self.links]
+        if self.status_message:
+            span["status"]["message"] = self.status_message
+        if self.events:
+            span["events"] = [{"name": e["name"], "timeUnixNano": str(e["time_ns"]),
+                               "attributes": _otlp_attributes(e["attributes"])}
+                              for e in self.events]
+        return span
+
+
+class _NoopSpan:
+    context = None
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_status(self, status, message=""):
+        pass
+
+    def record_exception(self, exc):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+_NOOP_CM   = nullcontext(_NOOP_SPAN)
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: dict) -> list[dict]:
+    return [{"key": k, "value": _otlp_value(v)} for k, v in attributes.items()]
+
+
+# ──────────────────────────────────────────────
+# Exporters
+# ──────────────────────────────────────────────
+
+class FileExporter:
+    """Appends OTLP/JSON lines; buffered and flushed whenever a root span ends."""
+
+    def __init__(self, path: str):
+        self.path    = path
+        self._buffer: list[dict] = []
+        self._lock   = threading.Lock()
+        atexit.register(self.flush)
+
+    def export(self, span: Span):
+        with self._lock:
+            self._buffer.append(span.to_otlp())
+            if span.parent_id is None or len(self._buffer) >= 512:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._buffer:
+            return
+        doc = {"resourceSpans": [{
+            "resource":   {"attributes": _otlp_attributes({"service.name": SERVICE_NAME})},
+            "scopeSpans": [{"scope": {"name": SCOPE_NAME}, "spans": self._buffer}],
+        }]}
+        with open(self.path, "a") as f:
+            f.write(json.dumps(doc, separators=(",", ":")) + "\n")
+        self._buffer = []
+
+
+class ConsoleExporter:
+    def export(self, span: Span):
+        parent = span.parent_id or "root"
+        links  = f" links={[l.span_id for l in span.links]}" if span.links else ""
+        print(f"[Trace] {span.context.trace_id[:8]} {span.name} {span.duration_ms:.2f}ms "
+              f"span={span.context.span_id} parent={parent}{links} {span.attributes}")
+
+    def flush(self):
+        pass
+
+
+class InMemoryExporter:
+    """Keeps finished spans in a list — for tests and ad-hoc scripts."""
+
+    def __init__(self):
+        self.spans: list[Span] = []
+
+    def export(self, span: Span):
+        self.spans.append(span)
+
+    def flush(self):
+        pass
+
+    def by_name(self, name: str) -> list[Span]:
+        return [s for s in self.spans if s.name == name]
+
+
+def build_exporter(kind: str = TRACING_EXPORTER):
+    if kind == "file":
+        return FileExporter(TRACE_FILE)
+    if kind == "console":
+        return ConsoleExporter()
+    return None
+
+
+# ──────────────────────────────────────────────
+# Tracer
+# ──────────────────────────────────────────────
+
+class Tracer:
+    def __init__(self, exporter=None, sample_ratio: float = 1.0):
+        self.exporter     = exporter
+        self.sample_ratio = sample_ratio
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    def current_context(self) -> Optional[SpanContext]:
+        """The active span's context — pass it as a link to work started elsewhere."""
+        ctx = _current.get()
+        return None if ctx is _UNSAMPLED else ctx
+
+    def span(self, name: str, attributes: Optional[dict] = None,
+             links: Iterable[Optional[SpanContext]] = (), kind: str = "INTERNAL",
+             parent: Optional[SpanContext] = None):
+        """Context manager yielding a Span (or a no-op when tracing is off/sampled out)."""
+        if self.exporter is None:
+            return _NOOP_CM
+        return self._span(name, attributes, links, kind, parent)
+
+    @contextmanager
+    def _span(self, name, attributes, links, kind, parent):
+        parent = parent or _current.get()
+        if parent is _UNSAMPLED or (parent is None and random.random() >= self.sample_ratio):
+            token = _current.set(_UNSAMPLED)
+            try:
+                yield _NOOP_SPAN
+            finally:
+                _current.reset(token)
+            return
+
+        trace_id = parent.trace_id if parent else f"{random.getrandbits(128):032x}"
+        span  = Span(name, SpanContext(trace_id, f"{random.getrandbits(64):016x}"),
+                     parent.span_id if parent else None, kind, attributes, links)
+        token = _current.set(span.context)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            _current.reset(token)
+            span.end_ns = time.time_ns()
+            exporter = self.exporter
+            if exporter is not None:
+                exporter.export(span)
+
+
+tracer = Tracer(build_exporter(), TRACE_SAMPLE_RATIO)
+
+
+def traced(name: Optional[str] = None, **attributes):
+    """Decorator: run the function inside a span (named after it by default)."""
+    def decorator(fn):
+        span_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if tracer.exporter is None:
+                return fn(*args, **kwargs)
+            with tracer.span(span_name, attributes):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class TracingMiddleware:
+    """One SERVER span per HTTP request, named `METHOD /route/{template}`."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not tracer.enabled:
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope.get("headers") or [])
+        parent  = parse_traceparent(headers.get(b"traceparent", b"").decode("latin-1"))
+        status  = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        method = scope.get("method", "")
+        with tracer.span(f"{method} {scope.get('path', '')}", kind="SERVER", parent=parent,
+                         attributes={"http.request.method": method,
+                                     "url.path": scope.get("path", "")}) as span:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = getattr(scope.get("route"), "path", None)
+                if isinstance(span, Span):
+                    if route:
+                        span.name = f"{method} {route}"
+                        span.set_attribute("http.route", route)
+                    span.set_attribute("http.response.status_code", status["code"])
+                    if status["code"] >= 500:
+                        span.set_status("ERROR")
+
+
+# ──────────────────────────────────────────────
+# Offline summary of a trace file
+# ──────────────────────────────────────────────
+
+def read_spans(path: str) -> list[dict]:
+    """All spans from an OTLP/JSON lines file."""
+    spans = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            for rs in json.loads(line).get("resourceSpans", []):
+                for ss in rs.get("scopeSpans", []):
+                    spans.extend(ss.get("spans", []))
+    return spans
+
+
+def summarize(spans: list[dict]) -> list[dict]:
+    """Per span name: count, mean / p95 / max duration in ms, slowest first."""
+    by_name: dict[str, list[float]] = {}
+    for s in spans:
+        ms = (int(s["endTimeUnixNano"]) - int(s["startTimeUnixNano"])) / 1e6
+        by_name.setdefault(s["name"], []).append(ms)
+    rows = []
+    for name, durations in by_name.items():
+        durations.sort()
+        rows.append({
+            "name":    name,
+            "count":   len(durations),
+            "mean_ms": round(sum(durations) / len(durations), 3),
+            "p95_ms":  round(durations[min(len(durations) - 1, int(0.95 * len(durations)))], 3),
+            "max_ms":  round(durations[-1], 3),
+        })
+    return sorted(rows, key=lambda r: r["mean_ms"] * r["count"], reverse=True)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarize an OTLP/JSON trace file")
+    parser.add_argument("command", choices=["summarize"])
+    parser.add_argument("path", nargs="?", default=TRACE_FILE)
+    args = parser.parse_args()
+
+    print(f"{'span':<40} {'count':>7} {'mean':>10} {'p95':>10} {'max':>10}  (ms)")
+    for row in summarize(read_spans(args.path)):
+        print(f"{row['name'][:40]:<40} {row['count']:>7} {row['mean_ms']:>10} "
+              f"{row['p95_ms']:>10} {row['max_ms']:>10}")
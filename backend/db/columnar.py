@@ -0,0 +1,241 @@
+"""
+Columnar snapshot export — NDJSON, Arrow IPC stream or Parquet, written in chunks.
+
+Snapshots are nested dicts (spotify is a sub-object); the columnar formats use
+one flat schema instead (SCHEMA_COLUMNS), with the spotify fields prefixed and
+timestamps as UTC microseconds. Rows are converted one chunk at a time and
+every chunk is handed to the client as soon as it's encoded, so an export
+never holds the whole history as Arrow buffers — Parquet gets one row group per
+chunk, the Arrow stream one record batch per chunk.
+
+Only the encoding is bounded by the chunk size. The rows come from
+db.store.iter_snapshots one partition at a time; with the default
+single-table layout that is the whole table as one list (TinyDB parses the
+whole file on every read anyway), which _rechunk then slices.
+
+pyarrow is optional and not in requirements.txt (pip install "pyarrow>=15"):
+NDJSON always works, the other formats raise ColumnarUnavailable without it.
+
+read_columns(path) is the reverse path for training: it loads a Parquet or
+Arrow file as plain numpy columns (see ml.features.feature_matrix_from_columns).
+"""
+import json
+from datetime import timezone
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+
+from db.partitions import snapshot_time
+
+# (column, arrow type name) — spotify.* flattened, timestamp as UTC microseconds
+SCHEMA_COLUMNS = [
+    ("doc_id",                 "int64"),
+    ("user_id",                "string"),
+    ("timestamp",              "timestamp"),
+    ("heart_rate",             "int64"),
+    ("steps_last_minute",      "int64"),
+    ("latitude",               "float64"),
+    ("longitude",              "float64"),
+    ("location_variance",      "float64"),
+    ("spotify_track_name",     "string"),
+    ("spotify_artist_name",    "string"),
+    ("spotify_energy",         "float64"),
+    ("spotify_valence",        "float64"),
+    ("spotify_tempo",          "float64"),
+    ("spotify_danceability",   "float64"),
+    ("label",                  "string"),
+]
+COLUMN_NAMES   = [name for name, _ in SCHEMA_COLUMNS]
+SPOTIFY_FIELDS = ["track_name", "artist_name", "energy", "valence", "tempo", "danceability"]
+
+FORMATS = {
+    "ndjson":  ("application/x-ndjson",                "ndjson"),
+    "arrow":   ("application/vnd.apache.arrow.stream", "arrows"),
+    "parquet": ("application/vnd.apache.parquet",      "parquet"),
+}
+
+
+class ColumnarUnavailable(RuntimeError):
+    """The requested format needs pyarrow, which isn't installed."""
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        return pyarrow
+    except ImportError:
+        raise ColumnarUnavailable("Arrow/Parquet export needs pyarrow (pip install pyarrow)")
+
+
+def arrow_schema():
+    pa = _pyarrow()
+    types = {"int64": pa.int64(), "float64": pa.float64(), "string": pa.string(),
+             "timestamp": pa.timestamp("us", tz="UTC")}
+    return pa.schema([(name, types[kind]) for name, kind in SCHEMA_COLUMNS])
+
+
+# ──────────────────────────────────────────────
+# Rows → columns
+# ──────────────────────────────────────────────
+
+def _epoch_us(record: dict) -> Optional[int]:
+    ts = snapshot_time(record)
+    if ts is None:
+        return None
+    return int(ts.replace(tzinfo=timezone.utc).timestamp() * 1_000_000)
+
+
+def columns_from_rows(rows: list[dict]) -> dict[str, list]:
+    """Flatten a chunk of snapshot dicts into per-column lists (None for missing)."""
+    cols: dict[str, list] = {name: [] for name in COLUMN_NAMES}
+    for r in rows:
+        spotify = r.get("spotify") or {}
+        cols["doc_id"].append(getattr(r, "doc_id", None))
+        cols["user_id"].append(r.get("user_id"))
+        cols["timestamp"].append(_epoch_us(r))
+        for name in ("heart_rate", "steps_last_minute"):
+            value = r.get(name)
+            cols[name].append(None if value is None else int(value))
+        for name in ("latitude", "longitude", "location_variance"):
+            value = r.get(name)
+            cols[name].append(None if value is None else float(value))
+        for field in SPOTIFY_FIELDS:
+            cols[f"spotify_{field}"].append(spotify.get(field))
+        cols["label"].append(r.get("label"))
+    return cols
+
+
+def numpy_columns(cols: dict[str, list]) -> dict[str, np.ndarray]:
+    """Per-column lists → numpy: numbers as float64 (NaN = missing), strings as object."""
+    out = {}
+    for name, kind in SCHEMA_COLUMNS:
+        values = cols[name]
+        if kind == "string":
+            out[name] = np.array(values, dtype=object)
+        else:
+            out[name] = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    return out
+
+
+# ──────────────────────────────────────────────
+# Chunked writers
+# ──────────────────────────────────────────────
+
+class _ChunkSink:
+    """Write-only file object for pyarrow writers; drain() hands over what's been written."""
+
+    closed = False
+
+    def __init__(self):
+        self._parts: list[bytes] = []
+        self._pos = 0
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        out, self._parts = b"".join(self._parts), []
+        return out
+
+
+def _rechunk(chunks: Iterable[list[dict]], chunk_rows: int) -> Iterator[list[dict]]:
+    """Split oversized chunks (e.g. a whole single-table store) to at most chunk_rows."""
+    for chunk in chunks:
+        for start in range(0, len(chunk), chunk_rows):
+            yield chunk[start:start + chunk_rows]
+
+
+def _ndjson(chunks: Iterable[list[dict]]) -> Iterator[bytes]:
+    for chunk in chunks:
+        yield "".join(json.dumps({"doc_id": getattr(r, "doc_id", None), **r}, default=str) + "\n"
+                      for r in chunk).encode()
+
+
+def _arrow_batches(chunks: Iterable[list[dict]], schema):
+    pa = _pyarrow()
+    for chunk in chunks:
+        cols = columns_from_rows(chunk)
+        yield pa.RecordBatch.from_arrays(
+            [pa.array(cols[name], type=schema.field(name).type) for name in COLUMN_NAMES],
+            schema=schema)
+
+
+def _arrow_stream(chunks: Iterable[list[dict]]) -> Iterator[bytes]:
+    pa = _pyarrow()
+    schema = arrow_schema()
+    sink = _ChunkSink()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for batch in _arrow_batches(chunks, schema):
+            writer.write_batch(batch)
+            yield sink.drain()
+    yield sink.drain()
+
+
+def _parquet(chunks: Iterable[list[dict]]) -> Iterator[bytes]:
+    _pyarrow()
+    import pyarrow.parquet as pq
+    schema = arrow_schema()
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, schema, compression="zstd") as writer:
+        for batch in _arrow_batches(chunks, schema):
+            writer.write_batch(batch)     # one row group per chunk
+            yield sink.drain()
+    yield sink.drain()                    # footer
+
+
+def export_stream(fmt: str, chunks: Iterable[list[dict]], chunk_rows: int = 5000) -> Iterator[bytes]:
+    """
+    Encode snapshot chunks as `fmt` ("ndjson" | "arrow" | "parquet"), yielding
+    bytes as each chunk is written. Raises ColumnarUnavailable up front (before
+    any bytes) if the format needs pyarrow and it's missing.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}' ({' | '.join(FORMATS)})")
+    if fmt != "ndjson":
+        _pyarrow()
+    writer = {"ndjson": _ndjson, "arrow": _arrow_stream, "parquet": _parquet}[fmt]
+    return (data for data in writer(_rechunk(chunks, chunk_rows)) if data)
+
+
+# ──────────────────────────────────────────────
+# Reading back (training)
+# ──────────────────────────────────────────────
+
+def read_columns(path: str, columns: Optional[list[str]] = None) -> dict[str, np.ndarray]:
+    """
+    Load a Parquet (.parquet) or Arrow stream (.arrows / .arrow) export as numpy
+    columns in the numpy_columns layout — numbers float64 with NaN for missing,
+    timestamps as float epoch microseconds, strings as object arrays.
+    """
+    pa = _pyarrow()
+    columns = columns or COLUMN_NAMES
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        table = pq.read_table(path, columns=columns)
+    else:
+        with pa.OSFile(path, "rb") as f:
+            table = pa.ipc.open_stream(f).read_all().select(columns)
+
+    kinds = dict(SCHEMA_COLUMNS)
+    out = {}
+    for name in columns:
+        col = table.column(name)
+        if kinds[name] == "string":
+            out[name] = np.asarray(col.to_numpy(zero_copy_only=False), dtype=object)
+        else:
+            if kinds[name] == "timestamp":
+                col = col.cast(pa.int64())
+            out[name] = col.cast(pa.float64()).to_numpy(zero_copy_only=False)
+    return out
@@ -0,0 +1,379 @@
+"""
+Snapshot table layouts — one TinyDB table, or time partitions with retention.
+
+SingleTable (STORE_PARTITION=none, default)
+  Every snapshot in the `health_snapshots` table of DB_PATH, as before.
+
+PartitionedTable (STORE_PARTITION=day | week)
+  One TinyDB file per period under PARTITION_DIR (snapshots-2024-03-01.json,
+  snapshots-2024-W09.json, snapshots-undated.json for readings without a
+  parsable timestamp). An insert rewrites only its own period's file, and
+  time-bounded reads skip partitions outside the range:
+    - recent(user, limit) walks partitions newest → oldest and stops as soon
+      as it has `limit` rows (older partitions can't hold newer readings)
+    - search/all(since=, until=) only open overlapping partitions
+  Doc ids stay global: they are assigned here, not by the per-file tables.
+
+Retention (partitioned layout, apply_retention)
+  - unlabeled readings older than RETENTION_RAW_DAYS are folded into
+    per-user, per-minute aggregates (count, HR mean/min/max, steps mean,
+    location variance mean) in the partition's `minute_aggregates` table,
+    and the raw rows are removed
+  - except the readings in the TEMPORAL_WINDOW_MINUTES before one of the
+    same user's labeled readings: a retrain replays them into that row's
+    rolling features, which must match what the live window saw at ingest
+  - aggregates older than RETENTION_AGGREGATE_DAYS are dropped
+  - labeled readings are never touched; empty partition files are deleted
+
+Both layouts expose the same methods, so db/store.py doesn't care which one
+is active.
+"""
+import bisect
+import os
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from tinydb import TinyDB
+from tinydb.table import Document, Table
+
+TABLE_NAME      = "health_snapshots"
+AGGREGATE_TABLE = "minute_aggregates"
+UNDATED         = "undated"
+FILE_PREFIX     = "snapshots-"
+
+
+def snapshot_time(record: dict) -> Optional[datetime]:
+    """The reading's timestamp (naive UTC), or None if missing/unparsable."""
+    value = record.get("timestamp")
+    if isinstance(value, datetime):
+        ts = value
+    elif isinstance(value, str):
+        try:
+            ts = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    else:
+        return None
+    if ts.tzinfo is not None:
+        ts = (ts - ts.utcoffset()).replace(tzinfo=None)
+    return ts
+
+
+def in_range(record: dict, since: Optional[datetime], until: Optional[datetime]) -> bool:
+    """since <= timestamp < until; an unbounded range matches undated readings too."""
+    if since is None and until is None:
+        return True
+    ts = snapshot_time(record)
+    if ts is None:
+        return False
+    return (since is None or ts >= since) and (until is None or ts < until)
+
+
+def _insert_documents(table: Table, docs: list[Document]):
+    """insert_multiple, skipping ids already present (replaying a log after a crash)."""
+    try:
+        table.insert_multiple(docs)
+    except ValueError:
+        have = {d.doc_id for d in table.all()}
+        table.insert_multiple([d for d in docs if d.doc_id not in have])
+
+
+# ──────────────────────────────────────────────
+# Single table (default)
+# ──────────────────────────────────────────────
+
+class SingleTable:
+    """The original layout — time ranges filter rows but prune nothing."""
+
+    partitioned = False
+
+    def __init__(self, table: Table):
+        self.table = table
+
+    def insert(self, record: dict) -> int:
+        return self.table.insert(record)
+
+    def insert_documents(self, docs: list[Document]):
+        _insert_documents(self.table, docs)
+
+    def search(self, cond, since: Optional[datetime] = None,
+               until: Optional[datetime] = None) -> list[Document]:
+        return [d for d in self.table.search(cond) if in_range(d, since, until)]
+
+    def all(self, since: Optional[datetime] = None, until: Optional[datetime] = None) -> list[Document]:
+        return [d for d in self.table.all() if in_range(d, since, until)]
+
+    def parts(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+              newest_first: bool = False) -> list:
+        return [None]
+
+    def bounds(self, part) -> tuple[Optional[datetime], Optional[datetime]]:
+        return None, None
+
+    def read_part(self, part, since: Optional[datetime] = None,
+                  until: Optional[datetime] = None) -> list[Document]:
+        return self.all(since, until)
+
+    def recent(self, cond, limit: int) -> list[Document]:
+        results = self.table.search(cond)
+        results.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
+        return results[:limit]
+
+    def count(self) -> int:
+        return len(self.table)
+
+    def max_doc_id(self) -> int:
+        return max((d.doc_id for d in self.table.all()), default=0)
+
+
+# ──────────────────────────────────────────────
+# Time partitions
+# ──────────────────────────────────────────────
+
+class PartitionedTable:
+    partitioned = True
+
+    def __init__(self, directory: str, granularity: str = "week"):
+        if granularity not in ("day", "week"):
+            raise ValueError(f"Unknown partition granularity '{granularity}' (day | week)")
+        self.directory   = directory
+        self.granularity = granularity
+        self._dbs: dict[str, TinyDB] = {}
+        os.makedirs(directory, exist_ok=True)
+        self._keys = sorted(
+            name[len(FILE_PREFIX):-len(".json")] for name in os.listdir(directory)
+            if name.startswith(FILE_PREFIX) and name.endswith(".json"))
+        self._next_id = self.max_doc_id() + 1
+
+    # ── partition keys ───────────────────────────
+
+    def key_for(self, record: dict) -> str:
+        ts = snapshot_time(record)
+        if ts is None:
+            return UNDATED
+        if self.granularity == "day":
+            return ts.strftime("%Y-%m-%d")
+        iso = ts.isocalendar()
+        return f"{iso[0]}-W{iso[1]:02d}"
+
+    def bounds(self, key: str) -> tuple[Optional[datetime], Optional[datetime]]:
+        """[start, end) covered by a partition key (None, None for undated)."""
+        if key == UNDATED:
+            return None, None
+        if "-W" in key:
+            start = datetime.strptime(key + "-1", "%G-W%V-%u")
+            return start, start + timedelta(days=7)
+        start = datetime.strptime(key, "%Y-%m-%d")
+        return start, start + timedelta(days=1)
+
+    def keys(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+             newest_first: bool = False) -> list[str]:
+        """Partition keys overlapping [since, until) — the pruning step."""
+        dated = [k for k in self._keys if k != UNDATED]
+        selected = []
+        for key in dated:
+            start, end = self.bounds(key)
+            if (since is not None and end <= since) or (until is not None and start >= until):
+                continue
+            selected.append(key)
+        if newest_first:
+            selected.reverse()
+        if since is None and until is None and UNDATED in self._keys:
+            selected.append(UNDATED)
+        return selected
+
+    def _db(self, key: str) -> TinyDB:
+        db = self._dbs.get(key)
+        if db is None:
+            db = self._dbs[key] = TinyDB(os.path.join(self.directory, f"{FILE_PREFIX}{key}.json"),
+                                         indent=2)
+            if key not in self._keys:
+                self._keys.append(key)
+                self._keys.sort()
+        return db
+
+    def _table(self, key: str) -> Table:
+        return self._db(key).table(TABLE_NAME)
+
+    # ── table interface ──────────────────────────
+
+    def insert(self, record: dict) -> int:
+        doc_id = self._next_id
+        self._next_id += 1
+        self._table(self.key_for(record)).insert(Document(record, doc_id=doc_id))
+        return doc_id
+
+    def insert_documents(self, docs: list[Document]):
+        by_key: dict[str, list[Document]] = {}
+        for doc in docs:
+            by_key.setdefault(self.key_for(doc), []).append(doc)
+        for key, group in by_key.items():
+            _insert_documents(self._table(key), group)
+        if docs:
+            self._next_id = max(self._next_id, max(d.doc_id for d in docs) + 1)
+
+    def search(self, cond, since: Optional[datetime] = None,
+               until: Optional[datetime] = None) -> list[Document]:
+        out = []
+        for key in self.keys(since, until):
+            out.extend(d for d in self._table(key).search(cond) if in_range(d, since, until))
+        return out
+
+    def all(self, since: Optional[datetime] = None, until: Optional[datetime] = None) -> list[Document]:
+        out = []
+        for key in self.keys(since, until):
+            out.extend(d for d in self._table(key).all() if in_range(d, since, until))
+        return out
+
+    def parts(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+              newest_first: bool = False) -> list[str]:
+        """Units for chunked reads (read_part) — the overlapping partitions, oldest first."""
+        return self.keys(since, until, newest_first)
+
+    def read_part(self, key: str, since: Optional[datetime] = None,
+                  until: Optional[datetime] = None) -> list[Document]:
+        if key not in self._keys:
+            return []   # removed by retention since parts() was called
+        return [d for d in self._table(key).all() if in_range(d, since, until)]
+
+    def recent(self, cond, limit: int) -> list[Document]:
+        results: list[Document] = []
+        for key in self.keys(newest_first=True):
+            if len(results) >= limit:
+                break   # every remaining partition is older (undated sorts last anyway)
+            results.extend(self._table(key).search(cond))
+        results.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
+        return results[:limit]
+
+    def count(self) -> int:
+        return sum(len(self._table(key)) for key in self._keys)
+
+    def max_doc_id(self) -> int:
+        return max((d.doc_id for key in list(self._keys) for d in self._table(key).all()),
+                   default=0)
+
+    def partition_stats(self) -> list[dict]:
+        return [{"partition": key,
+                 "snapshots": len(self._table(key)),
+                 "minute_aggregates": len(self._db(key).table(AGGREGATE_TABLE))}
+                for key in self._keys]
+
+    def migrate_from(self, legacy: Table) -> int:
+        """Move every row of the single-table layout into partitions (ids kept)."""
+        docs = legacy.all()
+        if docs:
+            self.insert_documents(docs)
+            legacy.truncate()
+        return len(docs)
+
+    # ── retention ────────────────────────────────
+
+    def minute_aggregates(self, user_id: Optional[str] = None,
+                          since: Optional[datetime] = None,
+                          until: Optional[datetime] = None) -> list[dict]:
+        out = []
+        for key in self.keys(since, until):
+            for row in self._db(key).table(AGGREGATE_TABLE).all():
+                if user_id is not None and row.get("user_id") != user_id:
+                    continue
+                minute = datetime.fromisoformat(row["minute"])
+                if (since is None or minute >= since) and (until is None or minute < until):
+                    out.append(dict(row))
+        return sorted(out, key=lambda r: r["minute"])
+
+    def _label_times(self, until: datetime) -> dict:
+        """user_id → sorted timestamps of that user's labeled readings before `until`."""
+        times: dict = {}
+        for key in self.keys(until=until):
+            for d in self._table(key).all():
+                ts = snapshot_time(d)
+                if d.get("label") is not None and d.get("user_id") is not None and ts is not None \
+                        and ts < until:
+                    times.setdefault(d["user_id"], []).append(ts)
+        for user_times in times.values():
+            user_times.sort()
+        return times
+
+    def apply_retention(self, raw_days: float, aggregate_days: float,
+                        now: Optional[datetime] = None, context_minutes: float = 0.0) -> dict:
+        """
+        Downsample old unlabeled readings, drop old aggregates, delete empty files.
+        Unlabeled readings up to `context_minutes` before one of the same user's
+        labeled readings stay raw (the temporal window a retrain replays).
+        """
+        now = now or datetime.utcnow()
+        # Whole minutes, so one minute is never split across two runs
+        raw_cutoff = (now - timedelta(days=raw_days)).replace(second=0, microsecond=0)
+        agg_cutoff = (now - timedelta(days=aggregate_days)).replace(second=0, microsecond=0)
+        context    = timedelta(minutes=context_minutes)
+        stats = {"downsampled": 0, "aggregates_written": 0, "aggregates_dropped": 0,
+                 "kept_for_labels": 0, "partitions_deleted": 0}
+        # A label just after the cutoff still replays readings from before it
+        labels = self._label_times(raw_cutoff + context) if context_minutes > 0 else {}
+
+        def labeled_context(doc) -> bool:
+            user_times = labels.get(doc.get("user_id"))
+            if not user_times:
+                return False
+            ts = snapshot_time(doc)
+            i  = bisect.bisect_left(user_times, ts)
+            return i < len(user_times) and user_times[i] - ts <= context
+
+        for key in self.keys(until=raw_cutoff):
+            table = self._table(key)
+            old = [d for d in table.all()
+                   if d.get("label") is None and in_range(d, None, raw_cutoff)]
+            kept = [d for d in old if labeled_context(d)]
+            if kept:
+                kept_ids = {d.doc_id for d in kept}
+                old = [d for d in old if d.doc_id not in kept_ids]
+                stats["kept_for_labels"] += len(kept)
+            if old:
+                rows = aggregate_minutes(old)
+                self._db(key).table(AGGREGATE_TABLE).insert_multiple(rows)
+                table.remove(doc_ids=[d.doc_id for d in old])
+                stats["downsampled"] += len(old)
+                stats["aggregates_written"] += len(rows)
+
+        cutoff_iso = agg_cutoff.isoformat(timespec="minutes")
+        for key in self.keys(until=agg_cutoff):
+            aggregates = self._db(key).table(AGGREGATE_TABLE)
+            stale = [r.doc_id for r in aggregates.all() if r["minute"] < cutoff_iso]
+            if stale:
+                aggregates.remove(doc_ids=stale)
+                stats["aggregates_dropped"] += len(stale)
+
+        for key in list(self._keys):
+            db = self._db(key)
+            if key != UNDATED and not len(db.table(TABLE_NAME)) and not len(db.table(AGGREGATE_TABLE)):
+                db.close()
+                os.remove(os.path.join(self.directory, f"{FILE_PREFIX}{key}.json"))
+                del self._dbs[key]
+                self._keys.remove(key)
+                stats["partitions_deleted"] += 1
+        return stats
+
+
+def aggregate_minutes(readings: Iterable[dict]) -> list[dict]:
+    """Per (user, minute) summary rows for a batch of raw readings."""
+    groups: dict[tuple, list[dict]] = {}
+    for r in readings:
+        minute = snapshot_time(r).replace(second=0, microsecond=0)
+        groups.setdefault((r.get("user_id"), minute.isoformat(timespec="minutes")), []).append(r)
+
+    rows = []
+    for (user_id, minute), group in sorted(groups.items(), key=lambda kv: (kv[0][1], str(kv[0][0]))):
+        hr    = [float(g.get("heart_rate") or 0.0) for g in group]
+        steps = [float(g.get("steps_last_minute") or 0.0) for g in group]
+        locv  = [float(g.get("location_variance") or 0.0) for g in group]
+        rows.append({
+            "user_id":                user_id,
+            "minute":                 minute,
+            "count":                  len(group),
+            "heart_rate_mean":        round(sum(hr) / len(hr), 2),
+            "heart_rate_min":         min(hr),
+            "heart_rate_max":         max(hr),
+            "steps_mean":             round(sum(steps) / len(steps), 2),
+            "location_variance_mean": sum(locv) / len(locv),
+        })
+    return rows
@@ -9,66 +9,309 @@ Why TinyDB and not SQLite/Postgres?
 Stored data is used for:
   1. Building a training dataset over time (labeled snapshots)
   2. Serving recent snapshots per user for context
+
+TinyDB rewrites the whole file on every insert. With STORE_WAL=1 inserts go to
+an append-only log instead (db/wal.py) and are folded into the file in
+batches; reads merge in the records that haven't been folded yet.
+With STORE_PARTITION=day|week snapshots live in one file per period
+(db/partitions.py): reads with a time range only open the overlapping files,
+and a background retention pass downsamples old unlabeled readings.
+TinyDB isn't thread-safe, so every table access holds _db_lock.
 """
+import atexit
+import heapq
 import os
+import threading
+import time
 from datetime import datetime
+from typing import Iterator, Optional
 from tinydb import TinyDB, Query
-from core.config import DB_PATH
+from tinydb.table import Document
+from core.config import (
+    DB_PATH, STORE_WAL, WAL_DIR, WAL_GROUP_COMMIT_MS, WAL_FSYNC,
+    WAL_COMPACT_INTERVAL_S, WAL_COMPACT_MAX_PENDING,
+    STORE_PARTITION, PARTITION_DIR, RETENTION_RAW_DAYS, RETENTION_AGGREGATE_DAYS,
+    RETENTION_INTERVAL_HOURS, TEMPORAL_WINDOW_MINUTES,
+)
+from db.partitions import SingleTable, PartitionedTable, in_range, snapshot_time
+from core.metrics import REGISTRY, timed, sample_lines
+from core.profiling import timing_phase
+from core.tracing import traced
+from ml.temporal import temporal_state
 
 # Singleton DB — all tables share this file
 _db = TinyDB(DB_PATH, indent=2)
 _snapshots = _db.table("health_snapshots")
+_db_lock   = threading.RLock()
+
+# Where snapshots actually live — the table above, or per-period partition files
+if STORE_PARTITION in ("day", "week"):
+    _table = PartitionedTable(PARTITION_DIR, STORE_PARTITION)
+    _migrated = _table.migrate_from(_snapshots)
+    if _migrated:
+        print(f"[Store] Moved {_migrated} snapshots into {STORE_PARTITION} partitions")
+elif STORE_PARTITION == "none":
+    _table = SingleTable(_snapshots)
+else:
+    raise ValueError(f"Unknown STORE_PARTITION '{STORE_PARTITION}' (none | day | week)")
+
+STORE_SECONDS = REGISTRY.histogram(
+    "store_operation_duration_seconds", "Snapshot store operation latency", ["op"])
+
+
+def _instrumented(op: str):
+    """Latency histogram (op label), Server-Timing "store" phase and a trace span."""
+    def decorator(fn):
+        return timed(STORE_SECONDS, op=op)(timing_phase("store")(traced()(fn)))
+    return decorator
+
+
+# ──────────────────────────────────────────────
+# Write-ahead log (STORE_WAL=1)
+# ──────────────────────────────────────────────
+
+def _fold(entries: list[tuple[int, dict]]):
+    """Fold WAL entries into TinyDB in one file rewrite; ids already present are skipped."""
+    with _db_lock:
+        _table.insert_documents([Document(record, doc_id=doc_id) for doc_id, record in entries])
+        if _wal is not None:
+            _wal.discard(doc_id for doc_id, _ in entries)
+
+
+def _pending(since: Optional[datetime] = None, until: Optional[datetime] = None) -> list[Document]:
+    if _wal is None:
+        return []
+    return [Document(record, doc_id=doc_id) for doc_id, record in _wal.pending()
+            if in_range(record, since, until)]
+
+
+def _wal_metrics() -> list[str]:
+    stats = _wal.stats()
+    return (
+        sample_lines("store_wal_pending", "Appended snapshots not yet folded into TinyDB",
+                     "gauge", stats["pending"])
+        + sample_lines("store_wal_appends_total", "Snapshots appended to the log", "counter",
+                       stats["appends"])
+        + sample_lines("store_wal_group_commits_total", "write+fsync groups", "counter",
+                       stats["group_commits"])
+        + sample_lines("store_wal_compactions_total", "Compactions that folded records",
+                       "counter", stats["compactions"])
+    )
+
+
+def close_store():
+    """Flush and fold the write-ahead log (registered atexit)."""
+    if _wal is not None:
+        _wal.close()
+
+
+_wal = None
+if STORE_WAL:
+    from db.wal import WriteAheadLog
+    _wal = WriteAheadLog(WAL_DIR, _fold, group_commit_ms=WAL_GROUP_COMMIT_MS, fsync=WAL_FSYNC,
+                         compact_interval=WAL_COMPACT_INTERVAL_S,
+                         compact_max_pending=WAL_COMPACT_MAX_PENDING)
+    _wal.recover()
+    with _db_lock:
+        _wal.start(next_id=_table.max_doc_id() + 1)
+    REGISTRY.register_collector(_wal_metrics)
+    atexit.register(close_store)
+
+
+# ──────────────────────────────────────────────
+# Retention (partitioned store)
+# ──────────────────────────────────────────────
+
+RETENTION_RUNS = REGISTRY.counter(
+    "store_retention_runs_total", "Retention passes over the partitioned store", ["outcome"])
+RETENTION_DOWNSAMPLED = REGISTRY.counter(
+    "store_retention_downsampled_total", "Raw unlabeled readings folded into minute aggregates")
+
+
+def apply_retention(now: Optional[datetime] = None) -> dict:
+    """
+    Downsample / drop old unlabeled data (no-op for the single-table layout).
+    Readings inside a labeled row's temporal window stay raw for retrains.
+    """
+    if not _table.partitioned:
+        return {}
+    try:
+        with _db_lock:
+            stats = _table.apply_retention(RETENTION_RAW_DAYS, RETENTION_AGGREGATE_DAYS, now=now,
+                                           context_minutes=TEMPORAL_WINDOW_MINUTES)
+    except Exception:
+        RETENTION_RUNS.inc(outcome="error")
+        raise
+    RETENTION_RUNS.inc(outcome="ok")
+    RETENTION_DOWNSAMPLED.inc(stats["downsampled"])
+    if stats["downsampled"] or stats["aggregates_dropped"] or stats["partitions_deleted"]:
+        print(f"[Store] Retention: {stats}")
+    return stats
+
+
+def _retention_loop():
+    while True:
+        try:
+            apply_retention()
+        except Exception as e:
+            print(f"[Store] Retention pass failed: {e}")
+        time.sleep(RETENTION_INTERVAL_HOURS * 3600)
+
+
+if _table.partitioned and RETENTION_INTERVAL_HOURS > 0:
+    threading.Thread(target=_retention_loop, name="store-retention", daemon=True).start()
 
 
 # ──────────────────────────────────────────────
 # Writes
 # ──────────────────────────────────────────────
 
+@_instrumented("save_snapshot")
 def save_snapshot(snapshot: dict) -> int:
     """
     Persist a health snapshot.
-    Converts datetime objects to ISO strings for JSON compatibility.
-    Returns the TinyDB document ID.
+    Converts datetime objects to ISO strings for JSON compatibility and feeds
+    the user's temporal window (O(1)) so live features stay current.
+    Returns the TinyDB document ID (assigned by the log in WAL mode, where the
+    call returns once the record's group commit is fsynced).
     """
     record = {**snapshot}
     for key, val in record.items():
         if isinstance(val, datetime):
             record[key] = val.isoformat()
-    return _snapshots.insert(record)
+    # Hydrate a first-time window before the write, so it can't read this
+    # record back from the DB; push only once the write has succeeded.
+    temporal_state.hydrate(record.get("user_id"))
+    if _wal is not None:
+        doc_id = _wal.append(record)
+    else:
+        with _db_lock:
+            doc_id = _table.insert(record)
+    temporal_state.push(record)
+    return doc_id
 
 
 # ──────────────────────────────────────────────
 # Reads
 # ──────────────────────────────────────────────
 
-def get_labeled_snapshots() -> list[dict]:
-    """Return all snapshots that carry a ground-truth label (for ML training)."""
+@_instrumented("search_labeled")
+def get_labeled_snapshots(since: Optional[datetime] = None,
+                          until: Optional[datetime] = None) -> list[dict]:
+    """
+    Return all snapshots that carry a ground-truth label (for ML training).
+    `since` / `until` (naive UTC) restrict the time range; partitioned stores
+    skip the files outside it.
+    """
     Snap = Query()
-    return _snapshots.search(Snap.label.exists())
+    with _db_lock:
+        return (_table.search(Snap.label.exists(), since, until)
+                + [d for d in _pending(since, until) if "label" in d])
 
 
+@_instrumented("search_recent")
 def get_recent_snapshots(user_id: str, limit: int = 10) -> list[dict]:
     """Return the most recent N snapshots for a given user, newest first."""
     Snap = Query()
-    results = _snapshots.search(Snap.user_id == user_id)
+    with _db_lock:
+        results = _table.recent(Snap.user_id == user_id, limit)
+        results += [d for d in _pending() if d.get("user_id") == user_id]
     results.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
     return results[:limit]
 
 
-def get_all_snapshots() -> list[dict]:
-    """Return every snapshot — used for bulk export or full retrains."""
-    return _snapshots.all()
+@_instrumented("all")
+def get_all_snapshots(since: Optional[datetime] = None,
+                      until: Optional[datetime] = None) -> list[dict]:
+    """Return every snapshot (optionally within [since, until)) — bulk export or retrains."""
+    with _db_lock:
+        return _table.all(since, until) + _pending(since, until)
+
+
+def iter_snapshots(since: Optional[datetime] = None, until: Optional[datetime] = None,
+                   labeled_only: bool = False) -> Iterator[list[dict]]:
+    """
+    Snapshots in chunks — one per partition, then the unfolded WAL records — for
+    streaming exports. The lock is only held while a chunk is read, so ingest
+    isn't blocked for the length of an export. Unpartitioned, the one chunk is
+    the whole table: memory then scales with the table, not the chunk size.
+    """
+    with _db_lock:
+        pending = _pending(since, until)
+    pending_ids = {d.doc_id for d in pending}   # may get folded while we iterate
+    for part in _table.parts(since, until):
+        with _db_lock:
+            docs = _table.read_part(part, since, until)
+        docs = [d for d in docs if d.doc_id not in pending_ids
+                and (not labeled_only or d.get("label") is not None)]
+        if docs:
+            yield docs
+    pending = [d for d in pending if not labeled_only or d.get("label") is not None]
+    if pending:
+        yield pending
+
+
+def _newest_first_key(doc) -> tuple[str, int]:
+    """Sort key for newest-first history (timestamp, then doc id) — also the cursor."""
+    return doc.get("timestamp") or "", doc.doc_id
+
+
+def iter_user_snapshots(user_id: str,
+                        before: Optional[tuple[str, int]] = None) -> Iterator[Document]:
+    """
+    A user's snapshots newest first. With a partitioned store they're produced
+    lazily: partitions are read one at a time (newest → oldest, the lock held
+    per read) and merged with the unfolded WAL records, so a caller that stops
+    early never touches older partitions. The default single table is one part,
+    so the whole table is read under the lock on the first next().
+    `before` is a (timestamp, doc_id) keyset cursor — only older rows are returned.
+    """
+    def after_cursor(doc) -> bool:
+        return before is None or _newest_first_key(doc) < before
+
+    with _db_lock:
+        pending = [d for d in _pending() if d.get("user_id") == user_id and after_cursor(d)]
+    pending.sort(key=_newest_first_key, reverse=True)
+    pending_ids = {d.doc_id for d in pending}   # may get folded while we iterate
+    cursor_time = snapshot_time({"timestamp": before[0]}) if before else None
+
+    def stored() -> Iterator[Document]:
+        for part in _table.parts(newest_first=True):
+            start, _ = _table.bounds(part)
+            if cursor_time is not None and start is not None and start > cursor_time:
+                continue
+            with _db_lock:
+                docs = _table.read_part(part)
+            docs = [d for d in docs if d.get("user_id") == user_id
+                    and d.doc_id not in pending_ids and after_cursor(d)]
+            docs.sort(key=_newest_first_key, reverse=True)
+            yield from docs
+
+    return heapq.merge(stored(), pending, key=_newest_first_key, reverse=True)
+
+
+def get_minute_aggregates(user_id: Optional[str] = None,
+                          since: Optional[datetime] = None,
+                          until: Optional[datetime] = None) -> list[dict]:
+    """Per-minute summaries that replaced downsampled raw readings, oldest first."""
+    if not _table.partitioned:
+        return []
+    with _db_lock:
+        return _table.minute_aggregates(user_id, since, until)
 
 
 # ──────────────────────────────────────────────
 # Counts
 # ──────────────────────────────────────────────
 
+@_instrumented("count_labeled")
 def count_labeled() -> int:
     """How many labeled (training-eligible) snapshots are stored."""
     return len(get_labeled_snapshots())
 
 
+@_instrumented("count_total")
 def count_total() -> int:
     """Total snapshots stored (labeled + unlabeled)."""
-    return len(_snapshots)
\ No newline at end of file
+    with _db_lock:
+        return _table.count() + (len(_wal.pending()) if _wal is not None else 0)
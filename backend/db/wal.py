@@ -0,0 +1,306 @@
+"""
+Write-ahead log for snapshot ingest (STORE_WAL=1).
+
+TinyDB rewrites its whole JSON file on every insert, so ingest cost grows with
+the size of the store. In WAL mode save_snapshot instead appends one NDJSON
+line to the current log segment and returns once that line is durable:
+
+  group commit — appenders queue their record and wait; one writer thread
+                 takes everything queued within WAL_GROUP_COMMIT_MS, writes it
+                 with a single write() + fsync(), then wakes the whole group.
+  compaction   — a background thread seals the current segment, folds the
+                 sealed segments into TinyDB with one insert_multiple (one
+                 file rewrite per compaction instead of per snapshot) and
+                 deletes them. It runs every WAL_COMPACT_INTERVAL_S seconds,
+                 or sooner once WAL_COMPACT_MAX_PENDING records are waiting.
+  recovery     — on startup every segment left behind is replayed into the
+                 store before the first append. Doc ids are assigned by the log
+                 and folding skips ids the store already has, so a crash between
+                 "folded" and "segment deleted" can't duplicate a snapshot, and a
+                 torn last line (crash mid-write) is ignored.
+
+A record is published to memory (`pending`) only once its group commit is
+fsynced, and stays there until folded, so reads see exactly the durable
+records. A group commit that fails is cut back off the segment (truncated to
+its start offset), so recovery never replays a snapshot whose append raised.
+
+Segment line format: {"doc_id": 123, "record": {...snapshot...}}
+"""
+import json
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+SEGMENT_PREFIX = "wal-"
+SEGMENT_SUFFIX = ".ndjson"
+
+
+def _segment_seq(name: str) -> Optional[int]:
+    if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+        try:
+            return int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+        except ValueError:
+            return None
+    return None
+
+
+def read_segment(path: str) -> list[tuple[int, dict]]:
+    """(doc_id, record) pairs from one segment; a torn/corrupt line ends the segment."""
+    entries = []
+    with open(path, "rb") as f:
+        for raw in f:
+            try:
+                line = json.loads(raw)
+                entries.append((int(line["doc_id"]), line["record"]))
+            except (ValueError, KeyError, TypeError):
+                print(f"[WAL] Ignoring torn entry at the end of {os.path.basename(path)}")
+                break
+    return entries
+
+
+class WALWriteError(RuntimeError):
+    """The group commit containing this record failed to reach disk."""
+
+
+class WriteAheadLog:
+    """
+    fold(entries) must persist [(doc_id, record), ...] into the main store,
+    skipping doc ids it already holds, and call discard() for them while the
+    store's read lock is held (so readers never see a record twice or not at all).
+    """
+
+    def __init__(self, directory: str, fold: Callable[[list[tuple[int, dict]]], None],
+                 group_commit_ms: float = 5.0, fsync: bool = True,
+                 compact_interval: float = 30.0, compact_max_pending: int = 5000):
+        self.directory           = directory
+        self.fold                = fold
+        self.window              = max(0.0, group_commit_ms) / 1000.0
+        self.fsync               = fsync
+        self.compact_interval    = compact_interval
+        self.compact_max_pending = compact_max_pending
+
+        self._cond      = threading.Condition()
+        self._queue: list[tuple[int, dict]] = []
+        self._pending: dict[int, dict] = {}
+        self._next_id   = 1
+        self._batch_no  = 1        # batch currently collecting appends
+        self._durable   = 0        # last batch written (or failed)
+        self._failed: dict[int, Exception] = {}
+        self._closed    = False
+
+        self._file_lock = threading.Lock()
+        self._seq       = 0
+        self._file      = None
+        self._current_ids: list[int] = []
+        self._sealed: list[tuple[str, list[int]]] = []
+        self._compact_lock  = threading.Lock()
+        self._compact_event = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self.stats_counters = {"appends": 0, "group_commits": 0, "compactions": 0,
+                               "folded": 0, "recovered": 0}
+        os.makedirs(directory, exist_ok=True)
+
+    # ── lifecycle ────────────────────────────────
+
+    def _segments_on_disk(self) -> list[tuple[int, str]]:
+        found = []
+        for name in os.listdir(self.directory):
+            seq = _segment_seq(name)
+            if seq is not None:
+                found.append((seq, os.path.join(self.directory, name)))
+        return sorted(found)
+
+    def recover(self) -> int:
+        """Replay every segment on disk into the store, then delete them. Call before start()."""
+        segments = self._segments_on_disk()
+        recovered = 0
+        for seq, path in segments:
+            entries = read_segment(path)
+            if entries:
+                self.fold(entries)
+                recovered += len(entries)
+            self._seq = max(self._seq, seq)
+        for _, path in segments:
+            os.remove(path)
+        self.stats_counters["recovered"] += recovered
+        if recovered:
+            print(f"[WAL] Recovered {recovered} snapshots from {len(segments)} segment(s)")
+        return recovered
+
+    def start(self, next_id: int):
+        """Begin accepting appends; doc ids continue from `next_id`."""
+        self._next_id = next_id
+        self._open_segment()
+        for target, name in ((self._writer, "wal-writer"), (self._compactor, "wal-compactor")):
+            t = threading.Thread(target=target, name=name, daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def close(self):
+        """Flush queued appends, fold everything, stop the threads."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._compact_event.set()
+        for t in self._threads:
+            t.join(timeout=10)
+        self.compact()
+        with self._file_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            path = self._segment_path(self._seq)
+            if os.path.exists(path) and not self._current_ids:
+                os.remove(path)
+
+    # ── appends (group commit) ───────────────────
+
+    def append(self, record: dict) -> int:
+        """Queue `record`, block until its group commit is on disk, return its doc id."""
+        with self._cond:
+            if self._closed:
+                raise WALWriteError("Write-ahead log is closed")
+            doc_id = self._next_id
+            self._next_id += 1
+            self._queue.append((doc_id, record))
+            batch = self._batch_no
+            self._cond.notify_all()
+            while self._durable < batch:
+                self._cond.wait()
+            error = self._failed.get(batch)
+        if error is not None:
+            raise WALWriteError(f"WAL write failed: {error}") from error
+        return doc_id
+
+    def _writer(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue and self._closed:
+                    return
+            if self.window:
+                time.sleep(self.window)   # let concurrent appends join this group
+            with self._cond:
+                batch, self._queue = self._queue, []
+                batch_no = self._batch_no
+                self._batch_no += 1
+            error = None
+            try:
+                self._write(batch)
+            except Exception as e:
+                error = e
+                print(f"[WAL] Group commit of {len(batch)} records failed: {e}")
+            with self._cond:
+                if error is not None:
+                    self._failed[batch_no] = error
+                self._durable = batch_no
+                self.stats_counters["group_commits"] += 1
+                self.stats_counters["appends"] += len(batch)
+                backlog = len(self._pending)
+                self._cond.notify_all()
+            if backlog >= self.compact_max_pending:
+                self._compact_event.set()
+
+    def _write(self, batch: list[tuple[int, dict]]):
+        data = "".join(json.dumps({"doc_id": doc_id, "record": record}, default=str) + "\n"
+                       for doc_id, record in batch).encode()
+        with self._file_lock:
+            start = self._file.tell()
+            try:
+                view = memoryview(data)
+                while view:
+                    view = view[self._file.write(view):]
+                if self.fsync:
+                    os.fsync(self._file.fileno())
+            except Exception:
+                self._abort(start)
+                raise
+            # Publish while the file lock is held, so compaction can't seal
+            # this segment between the fsync and the records becoming visible
+            with self._cond:
+                self._pending.update(batch)
+            self._current_ids.extend(doc_id for doc_id, _ in batch)
+
+    def _abort(self, start: int):
+        """Cut a failed group commit off the segment (file lock held)."""
+        try:
+            # The next successful group commit's fsync makes the new size durable
+            os.ftruncate(self._file.fileno(), start)
+            self._file.seek(start)
+        except OSError as e:
+            # Can't cut it off: seal the segment so later batches don't land
+            # behind the partial line, where recovery would stop reading
+            print(f"[WAL] Could not truncate {os.path.basename(self._file.name)}: {e}")
+            self._file.close()
+            self._sealed.append((self._segment_path(self._seq), self._current_ids))
+            self._open_segment()
+
+    # ── segments / compaction ────────────────────
+
+    def _segment_path(self, seq: int) -> str:
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{seq:08d}{SEGMENT_SUFFIX}")
+
+    def _open_segment(self):
+        self._seq += 1
+        # Unbuffered: a failed write leaves nothing queued to be flushed later
+        self._file = open(self._segment_path(self._seq), "ab", buffering=0)
+        self._current_ids = []
+
+    def _seal(self):
+        with self._file_lock:
+            if not self._current_ids or self._file is None:
+                return
+            self._file.close()
+            self._sealed.append((self._segment_path(self._seq), self._current_ids))
+            self._open_segment()
+
+    def compact(self) -> int:
+        """Seal the current segment and fold every sealed one into the store."""
+        with self._compact_lock:
+            self._seal()
+            folded = 0
+            while self._sealed:
+                path, ids = self._sealed[0]
+                with self._cond:
+                    entries = [(i, self._pending[i]) for i in ids if i in self._pending]
+                if entries:
+                    self.fold(entries)
+                os.remove(path)
+                self._sealed.pop(0)
+                folded += len(entries)
+            if folded:
+                self.stats_counters["compactions"] += 1
+                self.stats_counters["folded"] += folded
+            return folded
+
+    def _compactor(self):
+        while True:
+            self._compact_event.wait(self.compact_interval)
+            self._compact_event.clear()
+            if self._closed:
+                return
+            try:
+                self.compact()
+            except Exception as e:
+                print(f"[WAL] Compaction failed (segments kept for retry): {e}")
+
+    # ── store-facing reads ───────────────────────
+
+    def discard(self, doc_ids):
+        """Forget folded records (called by fold under the store's read lock)."""
+        with self._cond:
+            for doc_id in doc_ids:
+                self._pending.pop(doc_id, None)
+
+    def pending(self) -> list[tuple[int, dict]]:
+        """Appended-but-not-folded records, oldest first."""
+        with self._cond:
+            return list(self._pending.items())
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {**self.stats_counters, "pending": len(self._pending),
+                    "segment": self._seq, "sealed_segments": len(self._sealed),
+                    "group_commit_ms": round(self.window * 1000.0, 3), "fsync": self.fsync}
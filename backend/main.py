@@ -1,17 +1,44 @@
 """
 Commute Buddy Backend — FastAPI entry point
+
+Startup stays fast: the ML stack (sklearn, joblib, the model file) is never
+imported here. The lifespan hook warms the model up on a background thread;
+GET /live answers as soon as the process is up, GET /ready only once the model
+is loaded. GET /metrics serves Prometheus text (core/metrics.py); responses carry a
+Server-Timing header and /api/admin/profile runs the sampling profiler
+(core/profiling.py). TRACING_EXPORTER=file|console turns on request → store →
+retrain spans (core/tracing.py).
 """
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from datetime import datetime
-from api.routes import transit, health, ml
+from api.routes import transit, health, ml, admin, assets
+from core.config import WARMUP_ON_STARTUP
+from core.metrics import REGISTRY, CONTENT_TYPE, MetricsMiddleware
+from core.profiling import DiagnosticsMiddleware
+from core.tracing import TracingMiddleware
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if WARMUP_ON_STARTUP:
+        from ml.warmup import warm_up
+        warm_up()   # background thread — never blocks startup
+    yield
 
-app = FastAPI(title="Commute Buddy API", version="1.0.0")
+
+app = FastAPI(title="Commute Buddy API", version="1.0.0", lifespan=lifespan)
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+app.add_middleware(DiagnosticsMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(TracingMiddleware)
 app.include_router(transit.router)
 app.include_router(health.router)
 app.include_router(ml.router)
+app.include_router(admin.router)
+app.include_router(assets.router)
 
 
 @app.get("/", tags=["status"])
@@ -20,6 +47,28 @@ def root():
             "timestamp": datetime.utcnow().isoformat()}
 
 
+@app.get("/live", tags=["status"])
+def live():
+    """Liveness — the process is up and serving. Never touches the model."""
+    return {"status": "alive"}
+
+
+@app.get("/ready", tags=["status"])
+def ready():
+    """Readiness — 200 once the model is loaded, 503 while warming up/training."""
+    from ml.warmup import readiness
+    state = readiness()
+    if state["status"] != "ready":
+        return JSONResponse(status_code=503, content=state, headers={"Retry-After": "5"})
+    return state
+
+
+@app.get("/metrics", tags=["status"], include_in_schema=False)
+def metrics():
+    """Prometheus text exposition of every registered metric."""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
 @app.get("/view/health", response_class=HTMLResponse, tags=["debug"])
 def debug_view():
     from db.store import get_labeled_snapshots, count_labeled, count_total
@@ -0,0 +1,95 @@
+"""
+Micro-batching for model inference.
+
+A single-row predict_proba on a 300-tree forest is mostly Python overhead, and
+under concurrent load every /api/ml/predict call paid it separately in its own
+threadpool thread. MicroBatcher collects feature rows on the event loop for up
+to `window_ms` (or until `max_batch` rows are waiting), runs ONE vectorized
+call on the stacked matrix in the threadpool, and resolves each caller's future
+with its own row of the result.
+
+  window_ms  — how long the first request in a batch may wait (bounds p99)
+  max_batch  — flush immediately once this many rows are queued
+
+Configured by PREDICT_BATCH_WINDOW_MS / PREDICT_BATCH_MAX; a window of 0
+disables batching (each call goes straight to the threadpool).
+"""
+import asyncio
+from typing import Callable, Sequence
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+
+
+class MicroBatcher:
+    """Coalesces concurrent `submit(row)` calls into batched `fn(X)` calls."""
+
+    def __init__(self, fn: Callable[[np.ndarray], Sequence], window_ms: float, max_batch: int):
+        self.fn        = fn
+        self.window    = max(0.0, window_ms) / 1000.0
+        self.max_batch = max(1, int(max_batch))
+        self._loop     = None
+        self._pending: list = []
+        self._timer    = None
+        self.batches = self.rows = self.largest_batch = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0 and self.max_batch > 1
+
+    async def submit(self, row: np.ndarray):
+        """Queue one feature row and wait for its result."""
+        if not self.enabled:
+            self._record(1)
+            return (await run_in_threadpool(self.fn, np.atleast_2d(row)))[0]
+
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # New event loop (e.g. a fresh TestClient) — pending state is per loop
+            self._loop, self._pending, self._timer = loop, [], None
+
+        future = loop.create_future()
+        self._pending.append((np.ravel(row), future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            self._loop.create_task(self._run(batch))
+
+    async def _run(self, batch: list):
+        self._record(len(batch))
+        X = np.vstack([row for row, _ in batch])
+        try:
+            results = await run_in_threadpool(self.fn, X)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def _record(self, size: int):
+        self.batches += 1
+        self.rows    += size
+        self.largest_batch = max(self.largest_batch, size)
+
+    def stats(self) -> dict:
+        return {
+            "enabled":        self.enabled,
+            "window_ms":      round(self.window * 1000.0, 3),
+            "max_batch":      self.max_batch,
+            "batches":        self.batches,
+            "rows":           self.rows,
+            "avg_batch_size": round(self.rows / self.batches, 3) if self.batches else 0.0,
+            "largest_batch":  self.largest_batch,
+        }
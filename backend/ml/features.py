@@ -1,7 +1,7 @@
 """
 Features: 6-mood classifier with Spotify audio features.
 
-Feature vector (10 features):
+Feature vector (17 features):
   [0]  heart_rate             — raw BPM
   [1]  hr_normalized          — deviation from resting baseline
   [2]  steps_last_minute      — activity level
@@ -12,6 +12,13 @@ Feature vector (10 features):
   [7]  spotify_valence        — track positivity (0=sad, 1=happy). 0.5 if no Spotify
   [8]  spotify_tempo_norm     — track BPM normalized to 0-1 range (0=60bpm, 1=200bpm)
   [9]  has_spotify            — binary: 1 if Spotify data present
+  [10-16] temporal features   — rolling HR/steps mean, slope, variance and
+                                minutes since last stop (see ml.temporal)
+
+FEATURE_VERSION is bumped whenever the vector layout or a feature's meaning
+changes. The batch pipeline (train.is_current_layout) and the online head both
+record the version they were fitted on, so a model saved against an older
+layout is never fed the new one — it is retrained instead.
 
 Mood → label encoding:
   happy    = 0
@@ -22,9 +29,14 @@ Mood → label encoding:
   sleepy   = 5
 """
 import numpy as np
-from datetime import datetime
+from typing import Optional
+from datetime import datetime, timezone
+from ml.temporal import (
+    RESTING_HR_BASELINE, TEMPORAL_FEATURE_NAMES, TemporalWindow, parse_timestamp,
+    replay_temporal_features, replay_temporal_columns,
+)
 
-RESTING_HR_BASELINE = 70
+FEATURE_VERSION = 2
 
 MOOD_TO_INT = {
     "happy":    0,
@@ -37,7 +49,7 @@ MOOD_TO_INT = {
 
 INT_TO_MOOD = {v: k for k, v in MOOD_TO_INT.items()}
 
-FEATURE_NAMES = [
+BASE_FEATURE_NAMES = [
     "heart_rate",
     "hr_normalized",
     "steps_last_minute",
@@ -50,22 +62,21 @@ FEATURE_NAMES = [
     "has_spotify",
 ]
 
+FEATURE_NAMES = BASE_FEATURE_NAMES + TEMPORAL_FEATURE_NAMES
+
 
-def extract_features(snapshot: dict) -> np.ndarray:
-    """Convert a single snapshot dict into a 10-element feature vector."""
+def extract_features(snapshot: dict, temporal: Optional[dict] = None) -> np.ndarray:
+    """
+    Convert a single snapshot dict into a feature vector (see FEATURE_NAMES).
+    `temporal` holds the user's rolling-window stats; without it the snapshot
+    is treated as the only reading in its window.
+    """
     hr    = float(snapshot.get("heart_rate") or RESTING_HR_BASELINE)
     steps = float(snapshot.get("steps_last_minute") or 0)
     locv  = float(snapshot.get("location_variance") or 0.0)
 
     # Timestamp features
-    ts = snapshot.get("timestamp")
-    if isinstance(ts, str):
-        try:
-            ts = datetime.fromisoformat(ts)
-        except ValueError:
-            ts = datetime.utcnow()
-    elif not isinstance(ts, datetime):
-        ts = datetime.utcnow()
+    ts = parse_timestamp(snapshot.get("timestamp"))
 
     hour     = float(ts.hour)
     is_rush  = 1.0 if (7 <= ts.hour <= 9) or (16 <= ts.hour <= 19) else 0.0
@@ -83,23 +94,102 @@ def extract_features(snapshot: dict) -> np.ndarray:
     # Normalize tempo: 60bpm→0.0, 200bpm→1.0
     spotify_tempo_norm = max(0.0, min(1.0, (raw_tempo - 60.0) / 140.0))
 
+    if temporal is None:
+        temporal = TemporalWindow().push(snapshot)
+
     return np.array([
         hr, hr_norm, steps, locv, hour, is_rush,
         spotify_energy, spotify_valence, spotify_tempo_norm, has_spotify,
+        *(temporal[name] for name in TEMPORAL_FEATURE_NAMES),
     ], dtype=np.float32)
 
 
 def build_feature_matrix(snapshots: list[dict]) -> tuple[np.ndarray, np.ndarray]:
-    """Build X and y from labeled snapshots. Skips unlabeled ones."""
+    """
+    Build X and y from labeled snapshots. Unlabeled ones are skipped as rows
+    but still replayed into the temporal windows, exactly as at ingest.
+    """
+    temporal = replay_temporal_features(snapshots)
     X, y = [], []
-    for snap in snapshots:
+    for snap, window in zip(snapshots, temporal):
         lbl = snap.get("label")
         if lbl not in MOOD_TO_INT:
             continue
-        X.append(extract_features(snap))
+        X.append(extract_features(snap, window))
         y.append(MOOD_TO_INT[lbl])
 
     if not X:
         return np.empty((0, len(FEATURE_NAMES))), np.empty((0,))
 
-    return np.array(X, dtype=np.float32), np.array(y, dtype=np.int32)
\ No newline at end of file
+    return np.array(X, dtype=np.float32), np.array(y, dtype=np.int32)
+
+# ──────────────────────────────────────────────
+# Columnar path (Parquet / Arrow exports)
+# ──────────────────────────────────────────────
+
+def _or_default(col: np.ndarray, default: float) -> np.ndarray:
+    """Vectorized `float(value or default)` — NaN (missing) and 0 both take the default."""
+    col = np.asarray(col, dtype=np.float64)
+    return np.where(np.isnan(col) | (col == 0), default, col)
+
+
+def _truthy(col: np.ndarray) -> np.ndarray:
+    if col.dtype == object:
+        return np.array([bool(v) for v in col], dtype=bool)
+    return ~np.isnan(col) & (col != 0)
+
+
+def feature_matrix_from_columns(cols: dict[str, np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    build_feature_matrix for column arrays (db.columnar layout) — same X and y,
+    computed column-wise instead of through a dict per row. Only the temporal
+    replay walks the rows, since the windows are inherently sequential.
+    Exports store UTC, so hour_of_day only matches the row path for naive
+    (UTC) timestamps — which is what the app writes.
+    """
+    n = len(cols["heart_rate"])
+    if n == 0:
+        return np.empty((0, len(FEATURE_NAMES))), np.empty((0,))
+
+    now_us = datetime.utcnow().replace(tzinfo=timezone.utc).timestamp() * 1e6
+    ts_us  = np.asarray(cols["timestamp"], dtype=np.float64)
+    ts_us  = np.where(np.isnan(ts_us), now_us, ts_us)
+
+    hr        = _or_default(cols["heart_rate"], RESTING_HR_BASELINE)
+    steps     = np.nan_to_num(np.asarray(cols["steps_last_minute"], dtype=np.float64))
+    temporal  = replay_temporal_columns(cols["user_id"], ts_us / 6e7, hr, steps)
+
+    labels = np.array([MOOD_TO_INT.get(lbl, -1) if isinstance(lbl, str) else -1
+                       for lbl in cols["label"]], dtype=np.int32)
+    rows   = labels >= 0
+    if not rows.any():
+        return np.empty((0, len(FEATURE_NAMES))), np.empty((0,))
+
+    hour    = np.floor(ts_us / 3.6e9) % 24
+    is_rush = (((hour >= 7) & (hour <= 9)) | ((hour >= 16) & (hour <= 19))).astype(np.float64)
+
+    spotify     = [cols[f"spotify_{f}"] for f in
+                   ("track_name", "artist_name", "energy", "valence", "tempo", "danceability")]
+    has_spotify = np.logical_or.reduce([_truthy(c) for c in spotify]).astype(np.float64)
+    tempo_norm  = np.clip((_or_default(cols["spotify_tempo"], 120.0) - 60.0) / 140.0, 0.0, 1.0)
+
+    X = np.column_stack([
+        hr,
+        (hr - RESTING_HR_BASELINE) / RESTING_HR_BASELINE,
+        steps,
+        np.nan_to_num(np.asarray(cols["location_variance"], dtype=np.float64)),
+        hour,
+        is_rush,
+        _or_default(cols["spotify_energy"], 0.5),
+        _or_default(cols["spotify_valence"], 0.5),
+        tempo_norm,
+        has_spotify,
+        temporal,
+    ])
+    return X[rows].astype(np.float32), labels[rows]
+
+
+def load_feature_matrix(path: str) -> tuple[np.ndarray, np.ndarray]:
+    """X, y straight from a Parquet / Arrow snapshot export (needs pyarrow)."""
+    from db.columnar import read_columns
+    return feature_matrix_from_columns(read_columns(path))
@@ -1,25 +1,253 @@
 """
 Inference — predicts one of 6 moods from a health + Spotify snapshot.
+
+The app polls /api/ml/predict every 30–60 s and a steady ride produces nearly
+identical feature vectors, so model outputs are memoized in a small LRU/TTL
+cache. The key is the user id plus the feature vector quantized per
+FEATURE_BINS: HR bucket, steps bucket, hour, Spotify energy/valence/tempo
+bins, and coarse bins of the rolling-window features (both models use them,
+so two windows that differ materially never share an answer). GPS jitter is
+left out. The active model version tags the cache, and the whole cache is
+dropped whenever the model is swapped.
+
+Cache misses from the async route go through a MicroBatcher (ml.batching) so
+concurrent requests share one vectorized predict_proba call.
 """
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
-from ml.models.training.train import load_model
-from ml.features import extract_features, INT_TO_MOOD
+from typing import Optional
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from ml.batching import MicroBatcher
+from ml.models.training.train import model_version
+from ml.features import extract_features, FEATURE_NAMES, INT_TO_MOOD
+from ml.online import online_model, blend_proba, CLASSES
+from ml.temporal import temporal_state
+from ml.warmup import get_ready_model, ModelNotReady
+from core.config import (
+    PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL, PREDICT_BATCH_WINDOW_MS, PREDICT_BATCH_MAX,
+)
+from core.metrics import REGISTRY, sample_lines
+from core.profiling import timing_phase
 from core.models import MoodPrediction, MOOD_EMOJI
 
+PREDICT_SECONDS = REGISTRY.histogram(
+    "model_predict_duration_seconds", "Model predict_proba call (one batch), incl. online blend")
+PREDICT_ROWS    = REGISTRY.counter("model_predict_rows_total", "Rows scored by the model")
+
+# Bucket width per feature for the cache key; 0 = not part of the key
+FEATURE_BINS = {
+    "heart_rate":         2.0,
+    "hr_normalized":      0.0,      # derived from heart_rate
+    "steps_last_minute":  5.0,
+    "location_variance":  0.0,      # GPS jitter — different on every reading
+    "hour_of_day":        1.0,
+    "is_rush_hour":       0.0,      # derived from hour_of_day
+    "spotify_energy":     0.05,
+    "spotify_valence":    0.05,
+    "spotify_tempo_norm": 0.05,
+    "has_spotify":        1.0,
+    # Rolling-window features move a little with every reading: coarse bins,
+    # so a steady ride keeps hitting while a real change in trend misses
+    "hr_roll_mean":       5.0,
+    "hr_roll_slope":      2.0,
+    "hr_roll_var":        50.0,
+    "steps_roll_mean":    10.0,
+    "steps_roll_slope":   5.0,
+    "steps_roll_var":     250.0,
+    "mins_since_stop":    5.0,
+}
+
+_BIN_WIDTHS = np.array([FEATURE_BINS[name] for name in FEATURE_NAMES], dtype=np.float64)
+_KEYED      = _BIN_WIDTHS > 0
+
+
+def quantize_features(features: np.ndarray) -> tuple:
+    """Bucket a feature vector into a hashable tuple (the cache key minus the user)."""
+    x = np.asarray(features, dtype=np.float64).ravel()[_KEYED]
+    return tuple(np.floor(x / _BIN_WIDTHS[_KEYED]).astype(np.int64).tolist())
+
+
+class PredictionCache:
+    """
+    LRU cache with a TTL, tagged with the model version it was filled under.
+    A lookup under a different version clears everything (model swap).
+    """
+
+    def __init__(self, maxsize: int = PREDICTION_CACHE_SIZE, ttl: float = PREDICTION_CACHE_TTL):
+        self.maxsize  = maxsize
+        self.ttl      = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._version = None
+        self._lock    = threading.Lock()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def _check_version(self, version):
+        if version != self._version:
+            if self._data:
+                self.invalidations += 1
+            self._data.clear()
+            self._version = version
+
+    def get(self, key: tuple, version) -> Optional[tuple]:
+        if self.maxsize <= 0:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            self._check_version(version)
+            entry = self._data.get((version, key))
+            if entry is None or now - entry[0] >= self.ttl:
+                if entry is not None:
+                    del self._data[(version, key)]
+                self.misses += 1
+                return None
+            self._data.move_to_end((version, key))
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: tuple, version, value: tuple):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._check_version(version)
+            self._data[(version, key)] = (time.monotonic(), value)
+            self._data.move_to_end((version, key))
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._version = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size":          len(self._data),
+                "maxsize":       self.maxsize,
+                "ttl_seconds":   self.ttl,
+                "hits":          self.hits,
+                "misses":        self.misses,
+                "hit_rate":      round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions":     self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+prediction_cache = PredictionCache()
+
+
+def _predict_labels(X: np.ndarray) -> list[tuple[int, float]]:
+    """
+    (label_int, confidence) per row, batch model blended with the online head.
+    Never trains: while the batch model is warming up the online head answers
+    alone if it can, otherwise ModelNotReady propagates.
+    """
+    X = np.atleast_2d(X)
+    with PREDICT_SECONDS.time(), timing_phase("model"):
+        labels, confidence = _predict_proba_rows(X)
+    PREDICT_ROWS.inc(X.shape[0])
+    return [(int(lbl), round(float(p), 3)) for lbl, p in zip(labels, confidence)]
+
+
+def _predict_proba_rows(X: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    online = online_model.predict_proba(X)
+    try:
+        pipeline = get_ready_model()
+    except ModelNotReady:
+        if online is None:
+            raise
+        pipeline = None
+
+    batch = None
+    if pipeline is not None:
+        batch = np.zeros((X.shape[0], len(CLASSES)))
+        batch[:, np.searchsorted(CLASSES, pipeline.classes_)] = pipeline.predict_proba(X)
+    proba = blend_proba(batch, online, online_model.weight())
+    return CLASSES[np.argmax(proba, axis=1)], proba.max(axis=1)
+
+
+batcher = MicroBatcher(_predict_labels, PREDICT_BATCH_WINDOW_MS, PREDICT_BATCH_MAX)
+
+
+def _collect_metrics() -> list[str]:
+    """Cache / batcher counters already live on the objects — read them at scrape time."""
+    cache, batches = prediction_cache.stats(), batcher.stats()
+    return (
+        sample_lines("prediction_cache_hits_total", "Prediction cache hits", "counter", cache["hits"])
+        + sample_lines("prediction_cache_misses_total", "Prediction cache misses", "counter", cache["misses"])
+        + sample_lines("prediction_cache_hit_ratio", "Hits / lookups since start", "gauge", cache["hit_rate"])
+        + sample_lines("prediction_cache_entries", "Entries currently cached", "gauge", cache["size"])
+        + sample_lines("prediction_cache_evictions_total", "LRU evictions", "counter", cache["evictions"])
+        + sample_lines("prediction_cache_invalidations_total", "Full clears on model swap",
+                       "counter", cache["invalidations"])
+        + sample_lines("predict_batches_total", "Micro-batches sent to the model", "counter",
+                       batches["batches"])
+        + sample_lines("predict_batch_rows_total", "Rows sent through micro-batches", "counter",
+                       batches["rows"])
+    )
+
+
+REGISTRY.register_collector(_collect_metrics)
+
+
+@timing_phase("features")
+def _features_and_key(snapshot: dict) -> tuple[np.ndarray, tuple]:
+    temporal = temporal_state.peek(snapshot)
+    features = extract_features(snapshot, temporal).reshape(1, -1)
+    # Per user: the window behind the features is theirs alone
+    return features, (snapshot.get("user_id"), *quantize_features(features))
+
+
+def _current_version() -> tuple:
+    return model_version(), online_model.version()
+
+
+def _lookup(snapshot: dict) -> tuple[np.ndarray, tuple, tuple, Optional[tuple]]:
+    """
+    (features, cache key, model version, cached result or None). Blocking: the
+    first peek for a user hydrates their window from the DB, and the version
+    lookup may load the model from disk.
+    """
+    features, key = _features_and_key(snapshot)
+    version = _current_version()
+    return features, key, version, prediction_cache.get(key, version)
+
 
 def predict_mood(snapshot: dict) -> MoodPrediction:
     """
     Predict mood from a health snapshot dict.
     Returns mood label, emoji, and confidence.
+    When the online head is enabled its probabilities are blended in.
+    """
+    features, key, version, cached = _lookup(snapshot)
+    if cached is None:
+        cached = _predict_labels(features)[0]
+        prediction_cache.put(key, version, cached)
+    return _to_prediction(snapshot, *cached)
+
+
+async def predict_mood_async(snapshot: dict) -> MoodPrediction:
+    """
+    predict_mood for the async route. The lookup runs in the threadpool so a
+    slow DB read or model load never stalls the event loop; only the wait on
+    the micro-batch happens on the loop.
     """
-    pipeline = load_model()
-    features = extract_features(snapshot).reshape(1, -1)
+    features, key, version, cached = await run_in_threadpool(_lookup, snapshot)
+    if cached is None:
+        with timing_phase("model"):   # includes the wait for the batch to fill
+            cached = await batcher.submit(features)
+        prediction_cache.put(key, version, cached)
+    return _to_prediction(snapshot, *cached)
 
-    label_int = int(pipeline.predict(features)[0])
-    proba     = pipeline.predict_proba(features)[0]
 
+def _to_prediction(snapshot: dict, label_int: int, confidence: float) -> MoodPrediction:
     mood       = INT_TO_MOOD[label_int]
-    confidence = round(float(max(proba)), 3)
     emoji      = MOOD_EMOJI[mood]
 
     # Build Spotify context string if available
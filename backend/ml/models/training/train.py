@@ -3,161 +3,42 @@ ML training pipeline — 6-mood classifier with Spotify context.
 """
 import os
 import json
+import threading
+import time
 import numpy as np
 import joblib
-from datetime import datetime
+from datetime import datetime, timedelta
+from typing import Optional
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import StandardScaler
 from sklearn.pipeline import Pipeline
 from sklearn.model_selection import cross_val_score, StratifiedKFold
 
-from ml.features import build_feature_matrix, FEATURE_NAMES, INT_TO_MOOD
-from db.store import get_labeled_snapshots
-from core.config import MODEL_DIR
+from ml.features import build_feature_matrix, load_feature_matrix, FEATURE_NAMES, FEATURE_VERSION, INT_TO_MOOD
+from ml.synthetic import synthetic_feature_matrix, spec_hash
+from db.store import get_all_snapshots
+from core.config import MODEL_DIR, SYNTHETIC_SAMPLES_PER_MOOD, SYNTHETIC_SEED, TRAIN_HISTORY_DAYS
+from core.metrics import REGISTRY, SLOW_BUCKETS
+from core.tracing import tracer
 
 MODEL_FILE    = os.path.join(MODEL_DIR, "mood_classifier.pkl")
 METADATA_FILE = os.path.join(MODEL_DIR, "model_metadata.json")
 
+# In-process copy of the pipeline; reloaded when the file on disk changes
+_loaded: dict = {"version": None, "pipeline": None}
+# Span of the train that wrote MODEL_FILE — the next load links back to it
+_last_train_span = None
+_load_lock = threading.Lock()
 
-def _make_synthetic_data() -> list[dict]:
-    """
-    600 synthetic samples covering all 6 moods with realistic
-    biometric + Spotify audio feature combinations.
-
-    Mood profiles:
-      happy    — moderate HR, active steps, high valence, high energy music
-      neutral  — resting HR, low steps, mid valence, mid energy music
-      stressed — elevated HR, rush hour, low/high steps, intense low-valence music
-      angry    — very high HR, high steps, very low valence, very high energy music
-      sad      — low HR, few steps, low valence, low energy music
-      sleepy   — very low HR, almost no steps, low energy slow music
-    """
-    rng = np.random.default_rng(seed=42)
-    samples = []
-
-    def ts(hour_min, hour_max, day=1):
-        h = int(rng.integers(hour_min, hour_max))
-        m = int(rng.integers(0, 59))
-        return datetime(2026, 3, day, h, m, 0)
-
-    # ── HAPPY (100 samples) ──────────────────────────────────────
-    for i in range(100):
-        samples.append({
-            "heart_rate":        int(rng.integers(72, 95)),
-            "steps_last_minute": int(rng.integers(30, 70)),
-            "location_variance": float(rng.uniform(0.00001, 0.00008)),
-            "timestamp":         ts(9, 18, i % 9 + 1),
-            "spotify": {
-                "energy":       float(rng.uniform(0.65, 0.95)),
-                "valence":      float(rng.uniform(0.70, 1.00)),
-                "tempo":        float(rng.uniform(110, 145)),
-                "danceability": float(rng.uniform(0.60, 0.90)),
-            },
-            "label": "happy",
-        })
-
-    # ── NEUTRAL (100 samples) ────────────────────────────────────
-    for i in range(100):
-        samples.append({
-            "heart_rate":        int(rng.integers(62, 80)),
-            "steps_last_minute": int(rng.integers(5, 30)),
-            "location_variance": float(rng.uniform(0.000001, 0.00003)),
-            "timestamp":         ts(10, 19, i % 9 + 1),
-            "spotify": {
-                "energy":       float(rng.uniform(0.35, 0.60)),
-                "valence":      float(rng.uniform(0.40, 0.65)),
-                "tempo":        float(rng.uniform(90, 125)),
-                "danceability": float(rng.uniform(0.40, 0.65)),
-            },
-            "label": "neutral",
-        })
-
-    # ── STRESSED (100 samples) ───────────────────────────────────
-    for i in range(100):
-        rushing = i % 2 == 0
-        samples.append({
-            "heart_rate":        int(rng.integers(100, 145) if rushing else rng.integers(90, 120)),
-            "steps_last_minute": int(rng.integers(80, 150) if rushing else rng.integers(0, 15)),
-            "location_variance": float(rng.uniform(0.0005, 0.002) if rushing else rng.uniform(0.0002, 0.0009)),
-            "timestamp":         ts(7, 9, i % 9 + 1),
-            "spotify": {
-                "energy":       float(rng.uniform(0.70, 1.00)),
-                "valence":      float(rng.uniform(0.10, 0.40)),
-                "tempo":        float(rng.uniform(140, 200)),
-                "danceability": float(rng.uniform(0.30, 0.60)),
-            },
-            "label": "stressed",
-        })
-
-    # ── ANGRY (100 samples) ──────────────────────────────────────
-    for i in range(100):
-        samples.append({
-            "heart_rate":        int(rng.integers(110, 155)),
-            "steps_last_minute": int(rng.integers(50, 130)),
-            "location_variance": float(rng.uniform(0.0003, 0.0015)),
-            "timestamp":         ts(7, 20, i % 9 + 1),
-            "spotify": {
-                "energy":       float(rng.uniform(0.85, 1.00)),
-                "valence":      float(rng.uniform(0.00, 0.20)),
-                "tempo":        float(rng.uniform(150, 200)),
-                "danceability": float(rng.uniform(0.20, 0.50)),
-            },
-            "label": "angry",
-        })
-
-    # ── SAD (100 samples) ────────────────────────────────────────
-    for i in range(100):
-        samples.append({
-            "heart_rate":        int(rng.integers(55, 75)),
-            "steps_last_minute": int(rng.integers(0, 20)),
-            "location_variance": float(rng.uniform(0.000001, 0.00005)),
-            "timestamp":         ts(8, 22, i % 9 + 1),
-            "spotify": {
-                "energy":       float(rng.uniform(0.10, 0.40)),
-                "valence":      float(rng.uniform(0.00, 0.30)),
-                "tempo":        float(rng.uniform(60, 100)),
-                "danceability": float(rng.uniform(0.10, 0.40)),
-            },
-            "label": "sad",
-        })
-
-    # ── SLEEPY (100 samples) ─────────────────────────────────────
-    for i in range(100):
-        samples.append({
-            "heart_rate":        int(rng.integers(48, 65)),
-            "steps_last_minute": int(rng.integers(0, 8)),
-            "location_variance": float(rng.uniform(0.0, 0.000005)),
-            "timestamp":         ts(6, 10, i % 9 + 1),   # early morning commute
-            "spotify": {
-                "energy":       float(rng.uniform(0.05, 0.30)),
-                "valence":      float(rng.uniform(0.20, 0.50)),
-                "tempo":        float(rng.uniform(60, 90)),
-                "danceability": float(rng.uniform(0.10, 0.35)),
-            },
-            "label": "sleepy",
-        })
-
-    return samples
-
-
-def train_model(min_samples: int = 10) -> dict:
-    """Train the 6-mood classifier and save to disk."""
-    real_data      = get_labeled_snapshots()
-    synthetic_data = _make_synthetic_data()
-    all_data       = synthetic_data + real_data
-
-    X, y = build_feature_matrix(all_data)
-
-    if len(X) < min_samples:
-        raise ValueError(f"Need at least {min_samples} samples, got {len(X)}")
+TRAIN_SECONDS = REGISTRY.histogram(
+    "model_train_duration_seconds", "train_model wall time by outcome", ["outcome"], SLOW_BUCKETS)
+TRAIN_RUNS    = REGISTRY.counter("model_train_total", "train_model runs by outcome", ["outcome"])
+LOAD_SECONDS  = REGISTRY.histogram("model_load_duration_seconds", "joblib.load of the model file")
 
-    # Count per mood
-    mood_counts = {}
-    for label_int in y:
-        mood = INT_TO_MOOD[int(label_int)]
-        mood_counts[mood] = mood_counts.get(mood, 0) + 1
 
-    pipeline = Pipeline([
+def build_pipeline() -> Pipeline:
+    """The production estimator: scaler + class-balanced random forest."""
+    return Pipeline([
         ("scaler", StandardScaler()),
         ("clf", RandomForestClassifier(
             n_estimators=300,
@@ -168,42 +49,151 @@ def train_model(min_samples: int = 10) -> dict:
         )),
     ])
 
-    # Need at least 2 samples per class for stratified CV
-    min_class_count = min(mood_counts.values()) if mood_counts else 1
+
+def cv_splitter(y: np.ndarray) -> StratifiedKFold:
+    """Stratified K-fold with as many folds (2–5) as the rarest class allows."""
+    counts = np.bincount(np.asarray(y, dtype=np.int64)) if len(y) else np.array([1])
+    min_class_count = int(counts[counts > 0].min())
     n_splits = max(2, min(5, min_class_count))
-    cv = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=42)
-    cv_scores = cross_val_score(pipeline, X, y, cv=cv, scoring="f1_weighted")
+    return StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=42)
 
-    pipeline.fit(X, y)
-    joblib.dump(pipeline, MODEL_FILE)
+
+def train_model(min_samples: int = 10, data_file: Optional[str] = None) -> dict:
+    """
+    Train the 6-mood classifier and save to disk (duration/outcome → /metrics).
+    `data_file` trains on a Parquet/Arrow snapshot export instead of the store.
+    """
+    start, outcome = time.perf_counter(), "error"
+    try:
+        with tracer.span("train_model", {"train.min_samples": min_samples}):
+            metadata = _train(min_samples, data_file)
+        outcome  = "ok"
+        return metadata
+    finally:
+        TRAIN_SECONDS.observe(time.perf_counter() - start, outcome=outcome)
+        TRAIN_RUNS.inc(outcome=outcome)
+
+
+def _real_feature_matrix(data_file: Optional[str]) -> tuple[np.ndarray, np.ndarray]:
+    # Unlabeled readings are kept in the mix: they only feed the temporal
+    # windows, build_feature_matrix drops them as training rows.
+    # TRAIN_HISTORY_DAYS bounds the read (older partitions aren't opened).
+    if data_file is not None:
+        with tracer.span("load_feature_matrix", {"train.data_file": data_file}):
+            return load_feature_matrix(data_file)
+    since   = (datetime.utcnow() - timedelta(days=TRAIN_HISTORY_DAYS)
+               if TRAIN_HISTORY_DAYS > 0 else None)
+    history = get_all_snapshots(since=since)
+    with tracer.span("build_feature_matrix", {"history.size": len(history)}):
+        return build_feature_matrix(history)
+
+
+def _train(min_samples: int, data_file: Optional[str] = None) -> dict:
+    global _last_train_span
+    X_real, y_real = _real_feature_matrix(data_file)
+    with tracer.span("synthetic_feature_matrix"):
+        X_syn, y_syn   = synthetic_feature_matrix(SYNTHETIC_SAMPLES_PER_MOOD, SYNTHETIC_SEED)
+
+    X = np.vstack([X_syn, X_real.astype(np.float32)])
+    y = np.concatenate([y_syn, y_real.astype(np.int32)])
+
+    if len(X) < min_samples:
+        raise ValueError(f"Need at least {min_samples} samples, got {len(X)}")
+
+    # Count per mood
+    mood_counts = {}
+    for label_int in y:
+        mood = INT_TO_MOOD[int(label_int)]
+        mood_counts[mood] = mood_counts.get(mood, 0) + 1
+
+    pipeline = build_pipeline()
+
+    size = {"train.samples": int(len(X)), "train.real_samples": int(len(y_real))}
+    # Need at least 2 samples per class for stratified CV
+    with tracer.span("cross_val_score", size):
+        cv_scores = cross_val_score(pipeline, X, y, cv=cv_splitter(y), scoring="f1_weighted")
+
+    with tracer.span("fit", size):
+        pipeline.fit(X, y)
+    pipeline.feature_version_ = FEATURE_VERSION   # checked on load (is_current_layout)
+    with tracer.span("joblib.dump", {"model.path": MODEL_FILE}):
+        tmp = MODEL_FILE + ".tmp"
+        joblib.dump(pipeline, tmp)
+        os.replace(tmp, MODEL_FILE)   # a concurrent load never sees a half-written pickle
+    _last_train_span = tracer.current_context()
 
     metadata = {
         "trained_at":        datetime.utcnow().isoformat(),
         "total_samples":     int(len(X)),
-        "real_samples":      len(real_data),
-        "synthetic_samples": len(synthetic_data),
+        "real_samples":      int(len(y_real)),
+        "synthetic_samples": int(len(X_syn)),
+        "synthetic_spec":    spec_hash(SYNTHETIC_SAMPLES_PER_MOOD, SYNTHETIC_SEED),
         "mood_counts":       mood_counts,
         "cv_f1_weighted_mean": round(float(cv_scores.mean()), 4),
         "cv_f1_weighted_std":  round(float(cv_scores.std()), 4),
         "features":          FEATURE_NAMES,
+        "feature_version":   FEATURE_VERSION,
         "moods_supported":   list(INT_TO_MOOD.values()),
         "model_path":        MODEL_FILE,
     }
 
-    with open(METADATA_FILE, "w") as f:
+    tmp = METADATA_FILE + ".tmp"
+    with open(tmp, "w") as f:
         json.dump(metadata, f, indent=2)
+    os.replace(tmp, METADATA_FILE)
 
     print(f"[ML] Trained 6-mood classifier — {len(X)} samples | F1={metadata['cv_f1_weighted_mean']:.3f}")
     return metadata
 
 
+def model_version() -> str | None:
+    """Identifies the model file on disk — changes whenever a retrain swaps it."""
+    try:
+        st = os.stat(MODEL_FILE)
+    except FileNotFoundError:
+        return None
+    return f"{st.st_mtime_ns}-{st.st_size}"
+
+
+def _read_model():
+    """Return the cached pipeline, reloading it if the file was swapped."""
+    version = model_version()
+    if version is None:
+        return None
+    with _load_lock:
+        if _loaded["version"] != version:
+            with LOAD_SECONDS.time(), tracer.span("joblib.load", {"model.version": version},
+                                                  links=[_last_train_span]):
+                _loaded["pipeline"] = joblib.load(MODEL_FILE)
+            _loaded["version"]  = version
+        return _loaded["pipeline"]
+
+
+def is_current_layout(pipeline) -> bool:
+    """True if the pipeline was fitted on this FEATURE_VERSION and width of the vector."""
+    return (getattr(pipeline, "feature_version_", None) == FEATURE_VERSION
+            and getattr(pipeline, "n_features_in_", len(FEATURE_NAMES)) == len(FEATURE_NAMES))
+
+
 def load_model():
-    if not os.path.exists(MODEL_FILE):
+    """
+    Load the model, training it synchronously if missing or outdated.
+    For scripts/CLI only — request paths use ml.warmup.get_ready_model(),
+    which never trains inline.
+    """
+    pipeline = _read_model()
+    if pipeline is not None:
+        if is_current_layout(pipeline):
+            return pipeline
+        print("[ML] Model was trained on an older feature layout — retraining...")
+    else:
         print("[ML] No model — training on synthetic data...")
-        train_model(min_samples=1)
-    return joblib.load(MODEL_FILE)
+    train_model(min_samples=1)
+    return _read_model()
 
 
 if __name__ == "__main__":
-    result = train_model()
+    import sys
+    # python -m ml.models.training.train [export.parquet|export.arrows]
+    result = train_model(data_file=sys.argv[1] if len(sys.argv) > 1 else None)
     print(json.dumps(result, indent=2))
\ No newline at end of file
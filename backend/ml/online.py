@@ -0,0 +1,189 @@
+"""
+Online mood head — incremental learner that runs alongside the batch forest.
+
+The RandomForest in train.py is only refreshed every RETRAIN_EVERY_N labels and
+re-reads the whole history each time. This head is updated with `partial_fit`
+on every labeled snapshot as it arrives (constant time per update), so it picks
+up recent user behaviour between retrains.
+
+  - SGDClassifier (log loss, constant learning rate) → recent labels keep a
+    steady influence instead of being averaged away.
+  - Features are standardized with running (Welford) mean/variance, since the
+    head can't share the batch pipeline's fitted scaler.
+  - Predictions blend: p = (1 - w) · p_batch + w · p_online, where w ramps from 0
+    up to ONLINE_BLEND_WEIGHT over the first ONLINE_WARMUP_SAMPLES updates.
+    If the batch model is unavailable the online head is used on its own.
+
+Disabled unless ONLINE_MODEL_ENABLED=1. State is saved next to the batch model.
+"""
+import os
+import threading
+from datetime import datetime
+from typing import Optional
+
+import joblib
+import numpy as np
+
+from core.config import (
+    MODEL_DIR, ONLINE_MODEL_ENABLED, ONLINE_BLEND_WEIGHT, ONLINE_WARMUP_SAMPLES,
+)
+from ml.features import FEATURE_NAMES, FEATURE_VERSION, MOOD_TO_INT
+from ml.warmup import ModelNotReady
+
+ONLINE_MODEL_FILE = os.path.join(MODEL_DIR, "mood_online.pkl")
+
+# Persist the online state every N updates (and on explicit save()); the
+# prediction cache sees one new head version per N updates as well
+SAVE_EVERY_N = 10
+
+CLASSES = np.array(sorted(MOOD_TO_INT.values()))
+
+
+class OnlineMoodModel:
+    """Incremental SGD head with its own running feature standardization."""
+
+    def __init__(self, path: str = ONLINE_MODEL_FILE, enabled: bool = ONLINE_MODEL_ENABLED,
+                 max_weight: float = ONLINE_BLEND_WEIGHT,
+                 warmup_samples: int = ONLINE_WARMUP_SAMPLES):
+        self.path           = path
+        self.enabled        = enabled
+        self.max_weight     = float(max_weight)
+        self.warmup_samples = max(1, int(warmup_samples))
+        self._lock          = threading.Lock()
+        self._state: Optional[dict] = None
+
+    # ── state ────────────────────────────────────────────────────
+
+    def _new_state(self) -> dict:
+        from sklearn.linear_model import SGDClassifier
+        n = len(FEATURE_NAMES)
+        return {
+            "clf": SGDClassifier(loss="log_loss", learning_rate="constant",
+                                 eta0=0.01, alpha=1e-4, random_state=42),
+            "feature_version": FEATURE_VERSION,
+            "n":          0,
+            "mean":       np.zeros(n, dtype=np.float64),
+            "m2":         np.zeros(n, dtype=np.float64),
+            "updated_at": None,
+        }
+
+    def _loaded(self) -> dict:
+        if self._state is None:
+            state = None
+            if os.path.exists(self.path):
+                try:
+                    state = joblib.load(self.path)
+                except Exception as e:
+                    print(f"[ML] Could not load online model, starting fresh: {e}")
+            if not state or state.get("feature_version") != FEATURE_VERSION:
+                state = self._new_state()
+            self._state = state
+        return self._state
+
+    def _scale(self, state: dict, x: np.ndarray) -> np.ndarray:
+        if state["n"] < 2:
+            return x - state["mean"]
+        std = np.sqrt(state["m2"] / (state["n"] - 1))
+        std[std < 1e-9] = 1.0
+        return (x - state["mean"]) / std
+
+    def save(self):
+        with self._lock:
+            if self._state is not None:
+                joblib.dump(self._state, self.path)
+
+    def reset(self):
+        with self._lock:
+            self._state = self._new_state()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    # ── learning / prediction ────────────────────────────────────
+
+    def learn(self, features: np.ndarray, label: str) -> bool:
+        """One partial_fit step on a labeled feature vector. No-op when disabled."""
+        if not self.enabled or label not in MOOD_TO_INT:
+            return False
+        x = np.asarray(features, dtype=np.float64).ravel()
+        with self._lock:
+            state = self._loaded()
+            # Welford update of the running mean / variance
+            state["n"] += 1
+            delta = x - state["mean"]
+            state["mean"] += delta / state["n"]
+            state["m2"] += delta * (x - state["mean"])
+
+            xs = self._scale(state, x).reshape(1, -1)
+            state["clf"].partial_fit(xs, [MOOD_TO_INT[label]], classes=CLASSES)
+            state["updated_at"] = datetime.utcnow().isoformat()
+            should_save = state["n"] % SAVE_EVERY_N == 0
+        if should_save:
+            self.save()
+        return True
+
+    def weight(self) -> float:
+        """Current blend weight of the online head (0 until it has seen data)."""
+        if not self.enabled:
+            return 0.0
+        with self._lock:
+            n = self._loaded()["n"]
+        return self.max_weight * min(1.0, n / self.warmup_samples)
+
+    def predict_proba(self, features: np.ndarray) -> Optional[np.ndarray]:
+        """Class probabilities over CLASSES, or None if the head can't predict yet."""
+        if not self.enabled:
+            return None
+        X = np.asarray(features, dtype=np.float64).reshape(-1, len(FEATURE_NAMES))
+        with self._lock:
+            state = self._loaded()
+            if state["n"] == 0:
+                return None
+            clf = state["clf"]
+            proba = clf.predict_proba(self._scale(state, X))
+        full = np.zeros((X.shape[0], len(CLASSES)))
+        full[:, np.searchsorted(CLASSES, clf.classes_)] = proba
+        return full
+
+    def version(self) -> int:
+        """
+        Part of the prediction cache key. Bumps on the first update and then
+        once per SAVE_EVERY_N updates, so a busy labeler doesn't flush the
+        cache on every sample.
+        """
+        if not self.enabled:
+            return 0
+        with self._lock:
+            n = self._loaded()["n"]
+        return -(-n // SAVE_EVERY_N)
+
+    def info(self) -> dict:
+        with self._lock:
+            state = self._loaded() if self.enabled else None
+        return {
+            "enabled":        self.enabled,
+            "model":          "SGDClassifier(log_loss, partial_fit)",
+            "samples_seen":   state["n"] if state else 0,
+            "blend_weight":   round(self.weight(), 4),
+            "max_weight":     self.max_weight,
+            "warmup_samples": self.warmup_samples,
+            "updated_at":     state["updated_at"] if state else None,
+        }
+
+
+def blend_proba(batch: Optional[np.ndarray], online: Optional[np.ndarray],
+                weight: float) -> np.ndarray:
+    """
+    Mix batch and online class probabilities; fall back to whichever exists.
+    Neither usable (no batch model, online head empty or weighted 0) → ModelNotReady.
+    """
+    if online is None or weight <= 0.0:
+        if batch is None:
+            raise ModelNotReady("Model is warming up — retry shortly")
+        return batch
+    if batch is None:
+        return online
+    return (1.0 - weight) * batch + weight * online
+
+
+# Process-wide head, fed by POST /api/health/snapshot
+online_model = OnlineMoodModel()
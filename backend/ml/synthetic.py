@@ -0,0 +1,193 @@
+"""
+Synthetic training data — vectorized, configurable and cached on disk.
+
+Real labeled data is sparse early on, so every retrain mixes in synthetic
+samples drawn from per-mood distribution specs. Rows are generated straight
+into the feature matrix with one NumPy draw per column (no per-sample dicts,
+no ISO timestamp round-trips through extract_features), and the result is
+cached under MODEL_DIR/cache keyed by a hash of everything that affects it —
+so production retrains pay for generation once, and experiments can ask for
+100k+ rows cheaply.
+
+Mood profiles (MOOD_SPECS):
+  happy    — moderate HR, active steps, high valence, high energy music
+  neutral  — resting HR, low steps, mid valence, mid energy music
+  stressed — elevated HR, rush hour, low/high steps, intense low-valence music
+  angry    — very high HR, high steps, very low valence, very high energy music
+  sad      — low HR, few steps, low valence, low energy music
+  sleepy   — very low HR, almost no steps, low energy slow music
+
+Each mood is a list of variants (e.g. stressed = rushing | waiting); samples
+are split evenly between them. Integer ranges are [lo, hi), like rng.integers.
+Synthetic samples carry no history, so their temporal features are those of a
+single-reading window — the same values ml.temporal produces for them.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from core.config import MODEL_DIR, TEMPORAL_WINDOW_MINUTES
+from ml.features import (
+    FEATURE_NAMES, FEATURE_VERSION, MOOD_TO_INT, RESTING_HR_BASELINE,
+)
+from ml.temporal import STILL_STEPS_THRESHOLD
+
+CACHE_DIR = os.path.join(MODEL_DIR, "cache")
+
+# Bump when the generation logic changes (invalidates cached matrices)
+GENERATOR_VERSION = 1
+
+MOOD_SPECS: dict[str, list[dict]] = {
+    "happy": [{
+        "heart_rate": (72, 95), "steps_last_minute": (30, 70),
+        "location_variance": (0.00001, 0.00008), "hour": (9, 18),
+        "energy": (0.65, 0.95), "valence": (0.70, 1.00), "tempo": (110, 145),
+    }],
+    "neutral": [{
+        "heart_rate": (62, 80), "steps_last_minute": (5, 30),
+        "location_variance": (0.000001, 0.00003), "hour": (10, 19),
+        "energy": (0.35, 0.60), "valence": (0.40, 0.65), "tempo": (90, 125),
+    }],
+    "stressed": [
+        {   # rushing for the train
+            "heart_rate": (100, 145), "steps_last_minute": (80, 150),
+            "location_variance": (0.0005, 0.002), "hour": (7, 9),
+            "energy": (0.70, 1.00), "valence": (0.10, 0.40), "tempo": (140, 200),
+        },
+        {   # stuck waiting on the platform
+            "heart_rate": (90, 120), "steps_last_minute": (0, 15),
+            "location_variance": (0.0002, 0.0009), "hour": (7, 9),
+            "energy": (0.70, 1.00), "valence": (0.10, 0.40), "tempo": (140, 200),
+        },
+    ],
+    "angry": [{
+        "heart_rate": (110, 155), "steps_last_minute": (50, 130),
+        "location_variance": (0.0003, 0.0015), "hour": (7, 20),
+        "energy": (0.85, 1.00), "valence": (0.00, 0.20), "tempo": (150, 200),
+    }],
+    "sad": [{
+        "heart_rate": (55, 75), "steps_last_minute": (0, 20),
+        "location_variance": (0.000001, 0.00005), "hour": (8, 22),
+        "energy": (0.10, 0.40), "valence": (0.00, 0.30), "tempo": (60, 100),
+    }],
+    "sleepy": [{   # early morning commute
+        "heart_rate": (48, 65), "steps_last_minute": (0, 8),
+        "location_variance": (0.0, 0.000005), "hour": (6, 10),
+        "energy": (0.05, 0.30), "valence": (0.20, 0.50), "tempo": (60, 90),
+    }],
+}
+
+
+def spec_hash(samples_per_mood: int, seed: int, specs: dict = MOOD_SPECS) -> str:
+    """Stable hash of every input that changes the generated matrix."""
+    payload = json.dumps({
+        "specs":            specs,
+        "samples_per_mood": samples_per_mood,
+        "seed":             seed,
+        "features":         FEATURE_NAMES,
+        "feature_version":  FEATURE_VERSION,
+        "generator":        GENERATOR_VERSION,
+        "window_minutes":   TEMPORAL_WINDOW_MINUTES,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def _variant_block(rng: np.random.Generator, spec: dict, n: int) -> np.ndarray:
+    """Draw n rows for one variant, already laid out as FEATURE_NAMES columns."""
+    hr    = rng.integers(*spec["heart_rate"], size=n).astype(np.float64)
+    steps = rng.integers(*spec["steps_last_minute"], size=n).astype(np.float64)
+    locv  = rng.uniform(*spec["location_variance"], size=n)
+    hour  = rng.integers(*spec["hour"], size=n)
+    energy  = rng.uniform(*spec["energy"], size=n)
+    valence = rng.uniform(*spec["valence"], size=n)
+    tempo   = rng.uniform(*spec["tempo"], size=n)
+
+    # Same defaults as extract_features: a falsy value means "use the neutral one"
+    energy  = np.where(energy == 0.0, 0.5, energy)
+    valence = np.where(valence == 0.0, 0.5, valence)
+
+    still = steps <= STILL_STEPS_THRESHOLD
+    cols = {
+        "heart_rate":         hr,
+        "hr_normalized":      (hr - RESTING_HR_BASELINE) / RESTING_HR_BASELINE,
+        "steps_last_minute":  steps,
+        "location_variance":  locv,
+        "hour_of_day":        hour.astype(np.float64),
+        "is_rush_hour":       (((7 <= hour) & (hour <= 9)) | ((16 <= hour) & (hour <= 19))).astype(np.float64),
+        "spotify_energy":     energy,
+        "spotify_valence":    valence,
+        "spotify_tempo_norm": np.clip((tempo - 60.0) / 140.0, 0.0, 1.0),
+        "has_spotify":        np.ones(n),
+        # Single-reading window (see module docstring)
+        "hr_roll_mean":       hr,
+        "hr_roll_slope":      np.zeros(n),
+        "hr_roll_var":        np.zeros(n),
+        "steps_roll_mean":    steps,
+        "steps_roll_slope":   np.zeros(n),
+        "steps_roll_var":     np.zeros(n),
+        "mins_since_stop":    np.where(still, 0.0, float(TEMPORAL_WINDOW_MINUTES)),
+    }
+    return np.column_stack([cols[name] for name in FEATURE_NAMES])
+
+
+def generate_synthetic(samples_per_mood: int = 100, seed: int = 42,
+                       specs: dict = MOOD_SPECS) -> tuple[np.ndarray, np.ndarray]:
+    """Build (X, y) for every mood in `specs` — no caching."""
+    rng = np.random.default_rng(seed=seed)
+    blocks, labels = [], []
+    for mood, variants in specs.items():
+        # Split samples evenly across variants, remainder to the first ones
+        base, extra = divmod(samples_per_mood, len(variants))
+        for i, spec in enumerate(variants):
+            n = base + (1 if i < extra else 0)
+            if n == 0:
+                continue
+            blocks.append(_variant_block(rng, spec, n))
+            labels.append(np.full(n, MOOD_TO_INT[mood], dtype=np.int32))
+
+    if not blocks:
+        return np.empty((0, len(FEATURE_NAMES)), dtype=np.float32), np.empty((0,), dtype=np.int32)
+    return np.vstack(blocks).astype(np.float32), np.concatenate(labels)
+
+
+def synthetic_feature_matrix(samples_per_mood: int = 100, seed: int = 42,
+                             specs: dict = MOOD_SPECS,
+                             cache_dir: str | None = CACHE_DIR) -> tuple[np.ndarray, np.ndarray]:
+    """
+    (X, y) synthetic training data, read from the on-disk cache when the spec
+    hash matches, generated and cached otherwise. cache_dir=None disables caching.
+    """
+    if cache_dir is None:
+        return generate_synthetic(samples_per_mood, seed, specs)
+
+    path = os.path.join(cache_dir, f"synthetic_{spec_hash(samples_per_mood, seed, specs)}.npz")
+    if os.path.exists(path):
+        try:
+            with np.load(path) as data:
+                return data["X"], data["y"]
+        except Exception as e:
+            print(f"[ML] Ignoring unreadable synthetic cache {path}: {e}")
+
+    X, y = generate_synthetic(samples_per_mood, seed, specs)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = path + ".tmp.npz"
+    np.savez(tmp, X=X, y=y)
+    os.replace(tmp, path)
+    return X, y
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Generate (and cache) synthetic mood data")
+    parser.add_argument("--samples-per-mood", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    X, y = synthetic_feature_matrix(args.samples_per_mood, args.seed)
+    print(f"{X.shape[0]} rows × {X.shape[1]} features in {time.perf_counter() - start:.3f}s "
+          f"(spec {spec_hash(args.samples_per_mood, args.seed)})")
@@ -0,0 +1,321 @@
+"""
+Streaming temporal features — per-user sliding window over recent readings.
+
+A single snapshot says little on its own; the HR trend, step bursts and how
+long the user has been on the move are much stronger stress signals. Each user
+gets a window of their last K minutes of readings (K = TEMPORAL_WINDOW_MINUTES)
+backed by running sums, so adding a reading and reading the rolling stats are
+both O(1) (amortized — every reading is evicted exactly once).
+
+Temporal features (appended after the base features in ml.features):
+  [0]  hr_roll_mean        — mean BPM over the window
+  [1]  hr_roll_slope       — least-squares BPM change per minute
+  [2]  hr_roll_var         — BPM variance
+  [3]  steps_roll_mean     — mean steps/min over the window
+  [4]  steps_roll_slope    — least-squares steps/min change per minute
+  [5]  steps_roll_var      — steps/min variance
+  [6]  mins_since_stop     — minutes since the last still reading (capped at K)
+
+The same TemporalWindow is used online (db.store.save_snapshot pushes every
+reading, inference peeks) and offline (build_feature_matrix replays history in
+timestamp order), so training and serving can't drift apart. A reading that
+arrives late is slotted into the window by timestamp, so the readings after
+it see the same window the replay builds.
+"""
+import bisect
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+import numpy as np
+
+from core.config import TEMPORAL_WINDOW_MINUTES
+
+# A missing heart rate reads as the resting baseline, as in ml.features
+RESTING_HR_BASELINE = 70
+
+# A reading with this many steps/min or fewer counts as "stopped"
+STILL_STEPS_THRESHOLD = 5
+
+# Max snapshots read back from the DB when a user's window is first touched
+HYDRATE_LIMIT = 200
+
+# Re-anchor the time axis once it drifts this far, to keep the sums precise
+_REANCHOR_MINUTES = 24 * 60
+
+TEMPORAL_FEATURE_NAMES = [
+    "hr_roll_mean",
+    "hr_roll_slope",
+    "hr_roll_var",
+    "steps_roll_mean",
+    "steps_roll_slope",
+    "steps_roll_var",
+    "mins_since_stop",
+]
+
+
+def parse_timestamp(value) -> datetime:
+    """Accept a datetime or ISO string; fall back to now if missing/invalid."""
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            pass
+    return datetime.utcnow()
+
+
+def _epoch_minutes(ts: datetime) -> float:
+    # Naive timestamps are UTC throughout the app (datetime.utcnow defaults)
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.timestamp() / 60.0
+
+
+def _reading(snapshot: dict) -> tuple[float, float, float]:
+    """(minutes, heart_rate, steps) for one snapshot."""
+    t     = _epoch_minutes(parse_timestamp(snapshot.get("timestamp")))
+    hr    = float(snapshot.get("heart_rate") or RESTING_HR_BASELINE)
+    steps = float(snapshot.get("steps_last_minute") or 0.0)
+    return t, hr, steps
+
+
+class TemporalWindow:
+    """
+    Rolling mean / slope / variance of HR and steps over the last `minutes`.
+
+    Keeps the readings in a deque plus running sums over (t, hr, steps), where
+    t is minutes relative to an anchor close to the window.
+    """
+
+    def __init__(self, minutes: float = TEMPORAL_WINDOW_MINUTES):
+        self.minutes     = float(minutes)
+        self._items      = deque()   # (t_abs, hr, steps)
+        self._anchor     = None
+        self._last_still = None
+        self._sums       = [0.0] * 9
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    # ── running sums ─────────────────────────────────────────────
+    # [n, Σt, Σt², Σhr, Σhr², Σt·hr, Σsteps, Σsteps², Σt·steps]
+
+    def _accumulate(self, sums: list, t_abs: float, hr: float, steps: float, sign: float):
+        t = t_abs - self._anchor
+        sums[0] += sign
+        sums[1] += sign * t
+        sums[2] += sign * t * t
+        sums[3] += sign * hr
+        sums[4] += sign * hr * hr
+        sums[5] += sign * t * hr
+        sums[6] += sign * steps
+        sums[7] += sign * steps * steps
+        sums[8] += sign * t * steps
+
+    def _reanchor(self, t_abs: float):
+        self._anchor = t_abs
+        self._sums = [0.0] * 9
+        for item in self._items:
+            self._accumulate(self._sums, *item, 1.0)
+
+    # ── updates ──────────────────────────────────────────────────
+
+    def push(self, snapshot: dict) -> dict:
+        """Add a reading, evict anything older than the window, return features."""
+        return self.push_reading(*_reading(snapshot))
+
+    def push_reading(self, t_abs: float, hr: float, steps: float) -> dict:
+        """push() for an already-decoded (minutes, heart_rate, steps) reading."""
+        if self._items and t_abs < self._items[-1][0]:
+            return self._push_late(t_abs, hr, steps)
+        cutoff = t_abs - self.minutes
+        while self._items and self._items[0][0] < cutoff:
+            self._accumulate(self._sums, *self._items.popleft(), -1.0)
+
+        if not self._items or self._anchor is None or t_abs - self._anchor > _REANCHOR_MINUTES:
+            self._reanchor(t_abs)
+        self._items.append((t_abs, hr, steps))
+        self._accumulate(self._sums, t_abs, hr, steps, 1.0)
+
+        if steps <= STILL_STEPS_THRESHOLD:
+            self._last_still = t_abs
+        return self._features(self._sums, t_abs, self._last_still)
+
+    def _push_late(self, t_abs: float, hr: float, steps: float) -> dict:
+        """
+        A reading older than the newest one. It is inserted by timestamp, so
+        eviction stays oldest-first, unless it is already outside the window.
+        Its own features come from the held readings up to its timestamp.
+        """
+        features = self._as_of(t_abs).push_reading(t_abs, hr, steps)
+        if t_abs >= self._items[-1][0] - self.minutes:
+            times = [item[0] for item in self._items]
+            self._items.insert(bisect.bisect_right(times, t_abs), (t_abs, hr, steps))
+            self._accumulate(self._sums, t_abs, hr, steps, 1.0)
+            if steps <= STILL_STEPS_THRESHOLD and (self._last_still is None or t_abs > self._last_still):
+                self._last_still = t_abs
+        return features
+
+    def _as_of(self, t_abs: float) -> "TemporalWindow":
+        """A fresh window holding the readings at or before `t_abs` (O(window))."""
+        window = TemporalWindow(self.minutes)
+        for item in self._items:
+            if item[0] > t_abs:
+                break
+            window.push_reading(*item)
+        return window
+
+    def peek(self, snapshot: dict) -> dict:
+        """Features as if `snapshot` were pushed, without changing the window."""
+        t_abs, hr, steps = _reading(snapshot)
+        if not self._items or self._anchor is None:
+            return TemporalWindow(self.minutes).push(snapshot)
+        if t_abs < self._items[-1][0]:
+            return self._as_of(t_abs).push_reading(t_abs, hr, steps)
+
+        sums   = list(self._sums)
+        cutoff = t_abs - self.minutes
+        for item in self._items:
+            if item[0] >= cutoff:
+                break
+            self._accumulate(sums, *item, -1.0)
+        self._accumulate(sums, t_abs, hr, steps, 1.0)
+
+        last_still = t_abs if steps <= STILL_STEPS_THRESHOLD else self._last_still
+        return self._features(sums, t_abs, last_still)
+
+    # ── stats ────────────────────────────────────────────────────
+
+    def _features(self, sums: list, t_now: float, last_still: Optional[float]) -> dict:
+        n, st, stt, shr, shr2, sthr, sst, sst2, stst = sums
+        denom = n * stt - st * st
+
+        def stats(s, s2, ts):
+            mean  = s / n
+            var   = max(0.0, s2 / n - mean * mean)
+            slope = (n * ts - st * s) / denom if denom > 1e-9 else 0.0
+            return mean, slope, var
+
+        hr_mean, hr_slope, hr_var          = stats(shr, shr2, sthr)
+        steps_mean, steps_slope, steps_var = stats(sst, sst2, stst)
+
+        if last_still is None:
+            since_stop = self.minutes
+        else:
+            since_stop = max(0.0, min(self.minutes, t_now - last_still))
+
+        return {
+            "hr_roll_mean":     hr_mean,
+            "hr_roll_slope":    hr_slope,
+            "hr_roll_var":      hr_var,
+            "steps_roll_mean":  steps_mean,
+            "steps_roll_slope": steps_slope,
+            "steps_roll_var":   steps_var,
+            "mins_since_stop":  since_stop,
+        }
+
+
+class TemporalStateStore:
+    """
+    One TemporalWindow per user, created lazily.
+
+    The first time a user is seen in this process their window is rebuilt from
+    `loader(user_id)` (recent snapshots), so a restart doesn't reset the trend.
+    """
+
+    def __init__(self, minutes: float = TEMPORAL_WINDOW_MINUTES,
+                 loader: Optional[Callable[[str], list[dict]]] = None):
+        self.minutes  = float(minutes)
+        self.loader   = loader
+        self._windows: dict[str, TemporalWindow] = {}
+        self._lock    = threading.Lock()
+
+    def _window(self, user_id) -> TemporalWindow:
+        window = self._windows.get(user_id)
+        if window is None:
+            window = TemporalWindow(self.minutes)
+            if self.loader is not None and user_id is not None:
+                history = self.loader(user_id) or []
+                history = sorted(history, key=lambda s: _reading(s)[0])
+                for past in history:
+                    window.push(past)
+            self._windows[user_id] = window
+        return window
+
+    def hydrate(self, user_id):
+        """Build the user's window from stored history now, if it doesn't exist yet."""
+        if user_id is None:
+            return
+        with self._lock:
+            self._window(user_id)
+
+    def push(self, snapshot: dict) -> dict:
+        """Record a new reading for its user (call once per stored snapshot)."""
+        user_id = snapshot.get("user_id")
+        if user_id is None:
+            return TemporalWindow(self.minutes).push(snapshot)
+        with self._lock:
+            return self._window(user_id).push(snapshot)
+
+    def peek(self, snapshot: dict) -> dict:
+        """Temporal features for a reading that is not being stored (inference)."""
+        user_id = snapshot.get("user_id")
+        if user_id is None:
+            return TemporalWindow(self.minutes).push(snapshot)
+        with self._lock:
+            return self._window(user_id).peek(snapshot)
+
+    def reset(self):
+        with self._lock:
+            self._windows.clear()
+
+
+def replay_temporal_features(snapshots: list[dict],
+                             minutes: float = TEMPORAL_WINDOW_MINUTES) -> list[dict]:
+    """
+    Offline counterpart of the ingest path: push every snapshot through a fresh
+    store in timestamp order and return the features each one saw, aligned
+    with the input list. Snapshots without a user_id (e.g. synthetic samples)
+    each get an isolated window.
+    """
+    store = TemporalStateStore(minutes)
+    order = sorted(range(len(snapshots)), key=lambda i: _reading(snapshots[i])[0])
+    out: list[Optional[dict]] = [None] * len(snapshots)
+    for i in order:
+        out[i] = store.push(snapshots[i])
+    return out
+
+
+def replay_temporal_columns(user_ids: np.ndarray, t_minutes: np.ndarray, hr: np.ndarray,
+                            steps: np.ndarray, minutes: float = TEMPORAL_WINDOW_MINUTES) -> np.ndarray:
+    """
+    replay_temporal_features over columns instead of snapshot dicts — an
+    (n, len(TEMPORAL_FEATURE_NAMES)) array aligned with the inputs. Missing
+    values must already be filled the way _reading does (HR at RESTING_HR_BASELINE,
+steps 0, time now).
+    """
+    out     = np.empty((len(t_minutes), len(TEMPORAL_FEATURE_NAMES)), dtype=np.float64)
+    windows: dict = {}
+    for i in np.argsort(t_minutes, kind="stable"):
+        user_id = user_ids[i]
+        if user_id is None:
+            window = TemporalWindow(minutes)
+        else:
+            window = windows.get(user_id)
+            if window is None:
+                window = windows[user_id] = TemporalWindow(minutes)
+        feats  = window.push_reading(float(t_minutes[i]), float(hr[i]), float(steps[i]))
+        out[i] = [feats[name] for name in TEMPORAL_FEATURE_NAMES]
+    return out
+
+
+def _load_history(user_id: str) -> list[dict]:
+    from db.store import get_recent_snapshots
+    return get_recent_snapshots(user_id, limit=HYDRATE_LIMIT)
+
+
+# Process-wide live state, fed by db.store.save_snapshot
+temporal_state = TemporalStateStore(loader=_load_history)
@@ -0,0 +1,180 @@
+"""
+Model lifecycle — background warm-up, readiness, and single-flight training.
+
+Cold start used to be paid by the first /api/ml/predict after a deploy: it
+imported sklearn/joblib, loaded the model and, if there was none yet, trained
+one synchronously inside that request. Now:
+
+  - warm_up() runs at app startup in a daemon thread: it imports the ML stack
+    and loads the model, or trains one if the file is missing.
+  - get_ready_model() is what request paths use. It NEVER trains; if no usable
+    model is loaded it schedules a background retrain and raises ModelNotReady
+    (routes answer 503 + Retry-After).
+  - schedule_retrain() runs training on one background thread at a time, so
+    auto-retrains and warm-up never pile up or block a request.
+
+This module must stay cheap to import — main.py imports it at startup, and the
+import-time budget test checks that `import main` doesn't pull in sklearn.
+"""
+import threading
+import time
+import traceback
+from datetime import datetime
+from typing import Callable, Optional
+
+from core.metrics import REGISTRY
+from core.tracing import tracer, SpanContext
+
+
+class ModelNotReady(RuntimeError):
+    """No trained model is loaded yet — a background load/train is in progress."""
+
+
+_lock  = threading.Lock()
+_state = {
+    "status":     "cold",      # cold → loading → training → ready | failed
+    "error":      None,
+    "started_at": None,
+    "ready_at":   None,
+    "warmup_seconds": None,
+    "last_retrain": None,      # {reason, outcome, error, finished_at} of the latest retrain
+}
+_training: Optional[threading.Thread] = None
+
+RETRAINS = REGISTRY.counter(
+    "model_background_retrain_total", "Background retrains by trigger and outcome",
+    ["reason", "outcome"])
+
+
+def _set(**fields):
+    with _lock:
+        _state.update(fields)
+
+
+def readiness() -> dict:
+    """Snapshot of the lifecycle state (served by GET /ready)."""
+    with _lock:
+        state = dict(_state)
+    state["training_in_progress"] = is_training()
+    return state
+
+
+def is_ready() -> bool:
+    with _lock:
+        return _state["status"] == "ready"
+
+
+def is_training() -> bool:
+    t = _training
+    return t is not None and t.is_alive()
+
+
+def _usable_model():
+    """The in-memory pipeline if one exists on disk with the current layout."""
+    from ml.models.training.train import _read_model, is_current_layout
+    pipeline = _read_model()
+    if pipeline is None or not is_current_layout(pipeline):
+        return None
+    return pipeline
+
+
+def get_ready_model():
+    """
+    Return the loaded pipeline for a request path. Never trains inline: if no
+    usable model exists, a background retrain is scheduled and ModelNotReady
+    is raised.
+    """
+    pipeline = _usable_model()
+    if pipeline is not None:
+        if not is_ready():
+            _set(status="ready", error=None, ready_at=datetime.utcnow().isoformat())
+        return pipeline
+    schedule_retrain(reason="model missing")
+    raise ModelNotReady("Model is warming up — retry shortly")
+
+
+def schedule_retrain(reason: str = "manual",
+                     on_done: Optional[Callable[[Optional[dict], Optional[Exception]], None]] = None,
+                     trace_link: Optional[SpanContext] = None,
+                     min_samples: int = 1) -> bool:
+    """
+    Start train_model(min_samples) on a background thread unless one is already running.
+    `on_done(result, error)` is called from that thread. Returns True if scheduled.
+    The retrain is traced as a new root span linked to `trace_link` (the caller).
+    """
+    global _training
+    with _lock:
+        if _training is not None and _training.is_alive():
+            return False
+        if _state["status"] != "ready":
+            _state["status"] = "training"
+
+        def run():
+            result, error = None, None
+            with tracer.span("retrain", {"retrain.reason": reason}, links=[trace_link]) as span:
+                try:
+                    from ml.models.training.train import train_model
+                    result = train_model(min_samples=min_samples)
+                    _usable_model()   # load the fresh file into memory
+                    _set(status="ready", error=None, ready_at=datetime.utcnow().isoformat())
+                    RETRAINS.inc(reason=reason, outcome="ok")
+                except Exception as e:
+                    error = e
+                    span.record_exception(e)
+                    RETRAINS.inc(reason=reason, outcome="error")
+                    print(f"[ML] Background retrain ({reason}) failed: {e}")
+                    if not is_ready():
+                        _set(status="failed", error=str(e))
+            _set(last_retrain={"reason": reason, "outcome": "error" if error else "ok",
+                               "error": None if error is None else str(error),
+                               "finished_at": datetime.utcnow().isoformat()})
+            if on_done is not None:
+                try:
+                    on_done(result, error)
+                except Exception:
+                    traceback.print_exc()
+
+        _training = threading.Thread(target=run, name=f"retrain:{reason}", daemon=True)
+        _training.start()
+    return True
+
+
+def _begin_loading() -> bool:
+    """cold | failed → loading. Any other state means a load/train already got further."""
+    with _lock:
+        if _state["status"] not in ("cold", "failed"):
+            return False
+        _state.update(status="loading", started_at=datetime.utcnow().isoformat(), error=None)
+        return True
+
+
+def warm_up(background: bool = True) -> Optional[threading.Thread]:
+    """Preload the model (training it if missing) without blocking the caller."""
+    def run():
+        started = time.perf_counter()
+        if not _begin_loading():
+            print(f"[ML] Warm-up skipped — model is already {_state['status']}")
+            return
+        try:
+            pipeline = _usable_model()
+        except Exception as e:
+            print(f"[ML] Warm-up could not load the model: {e}")
+            pipeline = None
+        if pipeline is None:
+            print("[ML] Warm-up: no usable model — training in the background...")
+            schedule_retrain(reason="warm-up")
+            return
+        # One throwaway prediction so the first real request hits warm code paths
+        from ml.features import FEATURE_NAMES
+        import numpy as np
+        pipeline.predict_proba(np.zeros((1, len(FEATURE_NAMES)), dtype=np.float32))
+        _set(status="ready", ready_at=datetime.utcnow().isoformat(),
+             warmup_seconds=round(time.perf_counter() - started, 3))
+        print(f"[ML] Warm-up done in {_state['warmup_seconds']}s")
+
+    if not background:
+        run()
+        return None
+    t = threading.Thread(target=run, name="model-warmup", daemon=True)
+    t.start()
+    return t
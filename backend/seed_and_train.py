@@ -15,6 +15,7 @@ Mood profiles:
 Run with server running:
     python seed_and_train_v2.py
 """
+import time
 import requests
 
 BASE = "http://localhost:8000"
@@ -203,8 +204,15 @@ def seed():
 def train():
     print("\n🤖 Training model...")
     r = requests.post(f"{BASE}/api/ml/train", json={"min_samples": 1}, timeout=30)
-    r.raise_for_status()
-    res = r.json()
+    r.raise_for_status()   # 202 — training runs in the background
+    while True:
+        state = requests.get(f"{BASE}/ready", timeout=5).json()
+        if not state["training_in_progress"]:
+            break
+        time.sleep(1)
+    if (state.get("last_retrain") or {}).get("outcome") != "ok":
+        raise SystemExit(f"❌ Training failed: {state.get('last_retrain') or state.get('error')}")
+    res = requests.get(f"{BASE}/api/ml/model/info", timeout=5).json()
     f1  = res.get("cv_f1_weighted_mean", res.get("cv_f1_mean", "?"))
     std = res.get("cv_f1_weighted_std",  res.get("cv_f1_std",  "?"))
     print(f"\n✅ Done! {res['total_samples']} samples  ({res['real_samples']} real + {res['synthetic_samples']} synthetic)")
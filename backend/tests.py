@@ -2,7 +2,7 @@
 Backend test suite — run with: pytest tests.py -v
 
 Tests cover:
-  - API endpoints (status, transit mock, health ingestion, ML predict/train)
+  - API endpoints (status, transit mock, health ingestion, ML predict/train, mood asset packs)
   - ML feature extraction
   - DB store operations
   - Stress prediction logic
@@ -17,10 +17,19 @@ from unittest.mock import patch, MagicMock
 # Setup
 # ──────────────────────────────────────────────
 
+# Cold-start budget for `import main` (seconds, fresh interpreter)
+IMPORT_BUDGET_SECONDS = 3.0
+
 @pytest.fixture(scope="module")
 def client():
+    import time
     from main import app
-    return TestClient(app)
+    # Entering the context runs the lifespan hook → background model warm-up
+    with TestClient(app) as c:
+        deadline = time.monotonic() + 120
+        while c.get("/ready").status_code != 200 and time.monotonic() < deadline:
+            time.sleep(0.2)
+        yield c
 
 
 # ──────────────────────────────────────────────
@@ -35,6 +44,90 @@ def test_root(client):
     assert "timestamp" in data
 
 
+def test_live_and_ready(client):
+    assert client.get("/live").json() == {"status": "alive"}
+    r = client.get("/ready")
+    assert r.status_code == 200
+    assert r.json()["status"] == "ready"
+
+
+def test_warm_up_never_moves_ready_back_to_loading(client, monkeypatch):
+    from ml import warmup
+    assert warmup.is_ready()
+    monkeypatch.setattr(warmup, "_usable_model", lambda: pytest.fail("warm-up reloaded a ready model"))
+    warmup.warm_up(background=False)
+    assert warmup.readiness()["status"] == "ready"
+    assert client.get("/ready").status_code == 200
+
+
+def test_import_main_is_fast_and_lazy():
+    """`import main` must stay under budget and never pull in the ML stack."""
+    import subprocess, sys, os
+    code = ("import sys, time; t = time.perf_counter(); import main; "
+            "print(time.perf_counter() - t); "
+            "print(any(m.split('.')[0] in ('sklearn', 'joblib') for m in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                         cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+    seconds, ml_loaded = out.stdout.strip().splitlines()[-2:]
+    assert ml_loaded == "False"
+    assert float(seconds) < IMPORT_BUDGET_SECONDS
+
+
+def test_predict_never_trains_inline(client, monkeypatch):
+    from ml import warmup
+    from ml.inference import prediction_cache
+    monkeypatch.setattr(warmup, "_usable_model", lambda: None)
+    monkeypatch.setattr(warmup, "schedule_retrain", lambda **kw: True)
+    prediction_cache.clear()
+    r = client.post("/api/ml/predict", json={**SAMPLE_SNAPSHOT, "heart_rate": 201})
+    assert r.status_code == 503
+    assert r.headers["retry-after"] == "5"
+
+
+def test_predict_falls_back_to_online_head(client, monkeypatch, tmp_path):
+    """No batch model yet: an online head that has seen labels answers on its own."""
+    from ml import inference, warmup
+    from ml.features import extract_features
+    from ml.online import OnlineMoodModel
+    head = OnlineMoodModel(path=str(tmp_path / "online.pkl"), enabled=True, warmup_samples=1)
+    for _ in range(10):
+        head.learn(extract_features({"heart_rate": 55, "steps_last_minute": 0}), "sleepy")
+        head.learn(extract_features({"heart_rate": 150, "steps_last_minute": 120}), "angry")
+    monkeypatch.setattr(inference, "online_model", head)
+    monkeypatch.setattr(warmup, "_usable_model", lambda: None)
+    monkeypatch.setattr(warmup, "schedule_retrain", lambda **kw: True)
+    inference.prediction_cache.clear()
+    r = client.post("/api/ml/predict", json={"user_id": "online_only_user", "heart_rate": 150,
+                                             "steps_last_minute": 120})
+    assert r.status_code == 200
+    assert r.json()["mood"] == "angry"
+
+    # A head weighted 0 can't answer either: same 503 as any other not-ready path
+    monkeypatch.setattr(head, "max_weight", 0.0)
+    inference.prediction_cache.clear()
+    r = client.post("/api/ml/predict", json={"user_id": "online_only_user", "heart_rate": 149,
+                                             "steps_last_minute": 120})
+    assert r.status_code == 503 and r.headers["retry-after"] == "5"
+
+
+def test_failed_save_does_not_teach_the_online_head(client, monkeypatch, tmp_path):
+    from api.routes import health
+    from ml import online
+    head = online.OnlineMoodModel(path=str(tmp_path / "online.pkl"), enabled=True)
+    monkeypatch.setattr(online, "online_model", head)
+
+    def fail(record):
+        raise OSError("disk full")
+    monkeypatch.setattr(health, "save_snapshot", fail)
+    with pytest.raises(OSError):
+        client.post("/api/health/snapshot", json={**LABELED_SNAPSHOT, "user_id": "unsaved_user"})
+    assert head.info()["samples_seen"] == 0
+    monkeypatch.undo()
+    monkeypatch.setattr(online, "online_model", head)
+    client.post("/api/health/snapshot", json={**LABELED_SNAPSHOT, "user_id": "unsaved_user"})
+    assert head.info()["samples_seen"] == 1
+
+
 # ──────────────────────────────────────────────
 # Transit
 # ──────────────────────────────────────────────
@@ -113,6 +206,31 @@ def test_get_recent_snapshots_unknown_user(client):
     assert r.status_code == 404
 
 
+def test_get_recent_ndjson_stream_and_cursor(client, monkeypatch):
+    import json, uuid
+    user = f"stream_{uuid.uuid4().hex[:8]}"   # fresh history on every run of the shared DB
+    for hr in (71, 72, 73):
+        client.post("/api/health/snapshot", json={**SAMPLE_SNAPSHOT, "user_id": user,
+                                                  "heart_rate": hr})
+    ndjson = {"Accept": "application/x-ndjson"}
+    r = client.get(f"/api/health/{user}/recent", headers=ndjson)
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line)["heart_rate"] for line in r.text.splitlines()] == [73, 72, 71]
+
+    page = client.get(f"/api/health/{user}/recent?limit=2", headers=ndjson).text.splitlines()
+    cursor = json.loads(page[-1])["next_cursor"]
+    rest = client.get(f"/api/health/{user}/recent", params={"cursor": cursor}).json()
+    assert [s["heart_rate"] for s in rest["snapshots"]] == [71] and rest["next_cursor"] is None
+
+    from api.routes import health
+    monkeypatch.setattr(health, "MAX_RECENT_LIMIT", 2)     # over the cap: clamped, with a next link
+    clamped = client.get(f"/api/health/{user}/recent?limit=100000")
+    assert clamped.status_code == 200 and clamped.json()["count"] == 2
+    assert "limit=100000&cursor=" in clamped.links["next"]["url"]
+    assert [s["heart_rate"] for s in client.get(clamped.links["next"]["url"]).json()["snapshots"]] == [71]
+    assert client.get(f"/api/health/{user}/recent?cursor=bogus").status_code == 422
+
+
 # ──────────────────────────────────────────────
 # ML — Feature extraction
 # ──────────────────────────────────────────────
@@ -151,6 +269,221 @@ def test_build_feature_matrix_filters_unlabeled():
     assert list(y) == [1, 0]
 
 
+# ──────────────────────────────────────────────
+# ML — Temporal (sliding window) features
+# ──────────────────────────────────────────────
+
+def _reading(minute, hr, steps, user="window_user", **extra):
+    return {"user_id": user, "heart_rate": hr, "steps_last_minute": steps,
+            "timestamp": datetime(2024, 3, 1, 8, minute).isoformat(), **extra}
+
+
+def test_temporal_window_rolling_stats():
+    from ml.temporal import TemporalWindow
+    w = TemporalWindow(minutes=10)
+    for minute, hr in enumerate([80, 90, 100, 110]):
+        feats = w.push(_reading(minute, hr, 40))
+    assert feats["hr_roll_mean"] == pytest.approx(95.0)
+    assert feats["hr_roll_slope"] == pytest.approx(10.0)
+    assert feats["hr_roll_var"] == pytest.approx(125.0)
+    assert feats["steps_roll_slope"] == pytest.approx(0.0)
+    assert feats["mins_since_stop"] == 10.0          # never still → capped at K
+
+
+def test_temporal_window_evicts_old_readings():
+    from ml.temporal import TemporalWindow
+    w = TemporalWindow(minutes=5)
+    w.push(_reading(0, 150, 0))
+    feats = w.push(_reading(20, 70, 30))
+    assert len(w) == 1
+    assert feats["hr_roll_mean"] == pytest.approx(70.0)
+    assert feats["mins_since_stop"] == 5.0
+
+
+def test_temporal_peek_does_not_mutate():
+    from ml.temporal import TemporalStateStore
+    store = TemporalStateStore(minutes=10)
+    store.push(_reading(0, 80, 0))
+    peeked = store.peek(_reading(2, 120, 30))
+    assert peeked["hr_roll_mean"] == pytest.approx(100.0)
+    assert peeked["mins_since_stop"] == pytest.approx(2.0)
+    assert store.push(_reading(2, 60, 30))["hr_roll_mean"] == pytest.approx(70.0)
+
+
+def test_temporal_missing_hr_reads_as_resting_baseline():
+    from ml.features import RESTING_HR_BASELINE
+    from ml.temporal import TemporalWindow
+    w = TemporalWindow(minutes=10)
+    w.push(_reading(0, RESTING_HR_BASELINE, 40))
+    feats = w.push(_reading(1, None, 40))
+    assert feats["hr_roll_mean"] == pytest.approx(RESTING_HR_BASELINE)
+    assert feats["hr_roll_slope"] == pytest.approx(0.0)
+
+
+def test_temporal_late_reading_matches_replay():
+    from ml.temporal import TemporalWindow, replay_temporal_features
+    readings = [_reading(m, hr, steps) for m, hr, steps in
+                [(0, 80, 40), (1, 90, 0), (2, 100, 40), (3, 110, 40), (4, 120, 40)]]
+    arrival  = [readings[i] for i in (0, 2, 3, 1, 4)]     # minute 1 arrives late
+    w = TemporalWindow(minutes=10)
+    online = {r["timestamp"]: w.push(r) for r in arrival}
+    replayed = replay_temporal_features(readings, minutes=10)
+    for i in (1, 4):                                      # the late reading and everything after it
+        assert online[readings[i]["timestamp"]] == pytest.approx(replayed[i])
+    # Too old to be in the window any more: its own features only, later ones unaffected
+    stale = _reading(0, 200, 40, timestamp=datetime(2024, 3, 1, 7, 0).isoformat())
+    assert w.push(stale)["hr_roll_mean"] == pytest.approx(200.0)
+    assert w.peek(_reading(5, 130, 40))["hr_roll_mean"] == pytest.approx(105.0)
+
+
+def test_save_snapshot_feeds_the_window_only_after_the_write(monkeypatch):
+    from db import store
+    from ml.temporal import temporal_state
+    user = "window_write_user"
+    store.save_snapshot(_reading(0, 80, 40, user=user))
+    temporal_state.reset()                              # next save hydrates from the DB
+    store.save_snapshot(_reading(1, 120, 40, user=user))
+    assert temporal_state.peek(_reading(2, 100, 40, user=user))["hr_roll_mean"] == pytest.approx(100.0)
+
+    def fail(record):
+        raise OSError("disk full")
+    monkeypatch.setattr(store._table, "insert", fail)
+    with pytest.raises(OSError):
+        store.save_snapshot(_reading(2, 200, 40, user=user))
+    assert temporal_state.peek(_reading(3, 100, 40, user=user))["hr_roll_mean"] == pytest.approx(100.0)
+
+
+def test_build_feature_matrix_replays_unlabeled_history():
+    from ml.features import build_feature_matrix, FEATURE_NAMES
+    snaps = [
+        _reading(3, 120, 10, label="stressed"),
+        _reading(0, 90, 10),
+        _reading(1, 100, 10),
+        _reading(2, 110, 10),
+    ]
+    X, y = build_feature_matrix(snaps)
+    assert X.shape == (1, len(FEATURE_NAMES))
+    slope = X[0, FEATURE_NAMES.index("hr_roll_slope")]
+    assert slope == pytest.approx(10.0)
+
+
+def test_model_from_another_feature_version_is_not_used(monkeypatch):
+    """Same width but a different FEATURE_VERSION (reorder / new meaning) → retrain, never serve."""
+    import numpy as np
+    from ml import warmup
+    from ml.features import FEATURE_NAMES, FEATURE_VERSION
+    from ml.models.training import train
+    pipeline = train.build_pipeline().fit(np.random.RandomState(0).rand(12, len(FEATURE_NAMES)),
+                                          np.arange(12) % 2)
+    assert not train.is_current_layout(pipeline)           # saved before versions were recorded
+    pipeline.feature_version_ = FEATURE_VERSION - 1
+    assert not train.is_current_layout(pipeline)
+    monkeypatch.setattr(train, "_read_model", lambda: pipeline)
+    assert warmup._usable_model() is None
+    pipeline.feature_version_ = FEATURE_VERSION
+    assert warmup._usable_model() is pipeline
+
+
+def test_interrupted_dump_keeps_the_previous_model(monkeypatch, tmp_path):
+    """The model file is replaced atomically — a crash mid-dump leaves the old one whole."""
+    import numpy as np
+    import pytest
+    from ml.models.training import train
+    model_file, meta_file = tmp_path / "model.pkl", tmp_path / "meta.json"
+    model_file.write_bytes(b"previous model")
+    meta_file.write_text('{"trained_at": "previous"}')
+    monkeypatch.setattr(train, "MODEL_FILE", str(model_file))
+    monkeypatch.setattr(train, "METADATA_FILE", str(meta_file))
+    monkeypatch.setattr(train, "cross_val_score", lambda *a, **k: np.ones(3))
+
+    def crash(pipeline, path):
+        with open(path, "wb") as f:
+            f.write(b"half a pick")
+        raise OSError("disk full")
+    monkeypatch.setattr(train.joblib, "dump", crash)
+    with pytest.raises(OSError):
+        train._train(min_samples=1)
+    assert model_file.read_bytes() == b"previous model"
+    assert meta_file.read_text() == '{"trained_at": "previous"}'
+
+
+# ──────────────────────────────────────────────
+# ML — Synthetic data
+# ──────────────────────────────────────────────
+
+def test_synthetic_matrix_matches_extract_features():
+    """Vectorized rows must equal what extract_features yields for the same reading."""
+    import numpy as np
+    from ml.features import extract_features, FEATURE_NAMES, INT_TO_MOOD
+    from ml.synthetic import generate_synthetic
+    X, y = generate_synthetic(samples_per_mood=7, seed=1)
+    assert X.shape == (42, len(FEATURE_NAMES))
+    assert sorted(set(INT_TO_MOOD[int(v)] for v in y)) == sorted(INT_TO_MOOD.values())
+    col = {name: i for i, name in enumerate(FEATURE_NAMES)}
+    for row in X[::5]:
+        tempo = 60.0 + float(row[col["spotify_tempo_norm"]]) * 140.0
+        snap = {
+            "heart_rate":        int(row[col["heart_rate"]]),
+            "steps_last_minute": int(row[col["steps_last_minute"]]),
+            "location_variance": float(row[col["location_variance"]]),
+            "timestamp":         datetime(2026, 3, 1, int(row[col["hour_of_day"]]), 15),
+            "spotify": {"energy": float(row[col["spotify_energy"]]),
+                        "valence": float(row[col["spotify_valence"]]), "tempo": tempo},
+        }
+        assert np.allclose(extract_features(snap), row, atol=1e-5)
+
+
+def test_synthetic_matrix_is_cached_by_spec(tmp_path):
+    import numpy as np
+    from ml.synthetic import synthetic_feature_matrix, spec_hash
+    X1, y1 = synthetic_feature_matrix(50, seed=3, cache_dir=str(tmp_path))
+    cached = list(tmp_path.iterdir())
+    assert [p.name for p in cached] == [f"synthetic_{spec_hash(50, 3)}.npz"]
+    X2, y2 = synthetic_feature_matrix(50, seed=3, cache_dir=str(tmp_path))
+    assert np.array_equal(X1, X2) and np.array_equal(y1, y2)
+    assert spec_hash(50, 3) != spec_hash(50, 4) != spec_hash(60, 3)
+
+
+# ──────────────────────────────────────────────
+# ML — Online head
+# ──────────────────────────────────────────────
+
+def test_online_model_learns_and_blends(tmp_path):
+    import numpy as np
+    from ml.features import extract_features
+    from ml.online import OnlineMoodModel, blend_proba
+    head = OnlineMoodModel(path=str(tmp_path / "online.pkl"), enabled=True,
+                           max_weight=0.5, warmup_samples=4)
+    calm  = extract_features({"heart_rate": 55, "steps_last_minute": 0})
+    angry = extract_features({"heart_rate": 150, "steps_last_minute": 120})
+    assert head.predict_proba(calm) is None
+    for _ in range(10):
+        head.learn(calm, "sleepy")
+        head.learn(angry, "angry")
+    assert head.weight() == 0.5
+    assert head.version() == 2              # one cache version per SAVE_EVERY_N updates
+    head.learn(calm, "sleepy")
+    assert head.version() == 3
+    p = head.predict_proba(np.vstack([calm, angry]))
+    assert p.shape == (2, 6)
+    assert p[0].argmax() == 5 and p[1].argmax() == 3
+    assert (tmp_path / "online.pkl").exists()
+
+    batch, online = np.full(6, 1 / 6), p[0]
+    assert blend_proba(batch, online, 0.5).sum() == pytest.approx(1.0)
+    assert blend_proba(None, online, 0.5) is online
+    assert blend_proba(batch, None, 0.0) is batch
+
+
+def test_online_model_disabled_is_noop(tmp_path):
+    from ml.features import extract_features
+    from ml.online import OnlineMoodModel
+    head = OnlineMoodModel(path=str(tmp_path / "online.pkl"), enabled=False)
+    assert head.learn(extract_features({"heart_rate": 80}), "happy") is False
+    assert head.weight() == 0.0
+    assert head.info()["enabled"] is False
+
+
 # ──────────────────────────────────────────────
 # ML — Prediction endpoint
 # ──────────────────────────────────────────────
@@ -182,6 +515,138 @@ def test_predict_not_stressed(client):
     assert r.json()["mood"] in ("stressed", "not_stressed")
 
 
+# ──────────────────────────────────────────────
+# ML — Prediction cache
+# ──────────────────────────────────────────────
+
+def test_quantize_features_groups_close_readings():
+    from ml.features import extract_features
+    from ml.inference import quantize_features
+    a = extract_features({"heart_rate": 100, "steps_last_minute": 11,
+                          "timestamp": "2024-03-01T08:10:00"})
+    b = extract_features({"heart_rate": 101, "steps_last_minute": 12,
+                          "timestamp": "2024-03-01T08:40:00"})
+    c = extract_features({"heart_rate": 120, "steps_last_minute": 12,
+                          "timestamp": "2024-03-01T08:40:00"})
+    assert quantize_features(a) == quantize_features(b)
+    assert quantize_features(a) != quantize_features(c)
+    # GPS jitter isn't part of the key; the rolling window is, in coarse bins
+    d = extract_features({"heart_rate": 100, "steps_last_minute": 11, "location_variance": 0.0009,
+                          "timestamp": "2024-03-01T08:10:00"})
+    assert quantize_features(a) == quantize_features(d)
+    trend = {"hr_roll_mean": 130.0, "hr_roll_slope": 4.0, "hr_roll_var": 80.0, "steps_roll_mean": 0.0,
+             "steps_roll_slope": -3.0, "steps_roll_var": 10.0, "mins_since_stop": 2.0}
+    e = extract_features({"heart_rate": 100, "steps_last_minute": 11,
+                          "timestamp": "2024-03-01T08:10:00"}, trend)
+    assert quantize_features(a) != quantize_features(e)
+
+
+def test_prediction_cache_lru_ttl_and_version():
+    from ml.inference import PredictionCache
+    cache = PredictionCache(maxsize=2, ttl=60)
+    cache.put((1,), "v1", (0, 0.9))
+    cache.put((2,), "v1", (1, 0.8))
+    assert cache.get((1,), "v1") == (0, 0.9)
+    cache.put((3,), "v1", (2, 0.7))           # evicts (2,) — least recently used
+    assert cache.get((2,), "v1") is None
+    assert cache.get((1,), "v2") is None      # model swapped → cache dropped
+    assert cache.get((3,), "v2") is None
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 3
+    assert stats["evictions"] == 1 and stats["invalidations"] == 1
+
+    expired = PredictionCache(maxsize=2, ttl=0)
+    expired.put((1,), "v1", (0, 0.9))
+    assert expired.get((1,), "v1") is None
+
+
+def test_cache_never_shares_answers_across_windows(monkeypatch):
+    """Same instant reading, different users / rolling windows → separate predictions."""
+    from ml import inference
+    from ml.features import FEATURE_NAMES
+    from ml.temporal import TemporalStateStore
+    col = FEATURE_NAMES.index("hr_roll_mean")
+    # Stand-in model: stressed when the window's mean HR is high, happy otherwise
+    monkeypatch.setattr(inference, "_predict_labels",
+                        lambda X: [(2 if row[col] > 100 else 0, 0.9) for row in X])
+    windows = TemporalStateStore()
+    monkeypatch.setattr(inference, "temporal_state", windows)
+    monkeypatch.setattr(inference, "prediction_cache", inference.PredictionCache(maxsize=16, ttl=300))
+    for minute in range(5):
+        windows.push(_reading(minute, 60, 40, user="calm_rider"))
+        windows.push(_reading(minute, 150, 40, user="tense_rider"))
+    now = {"heart_rate": 95, "steps_last_minute": 10, "timestamp": datetime(2024, 3, 1, 8, 5).isoformat()}
+    assert inference.predict_mood({**now, "user_id": "calm_rider"}).mood == "happy"
+    assert inference.predict_mood({**now, "user_id": "tense_rider"}).mood == "stressed"
+
+
+def test_predict_uses_cache(client):
+    from ml.inference import prediction_cache
+    client.post("/api/ml/predict", json=SAMPLE_SNAPSHOT)
+    hits = prediction_cache.hits
+    r = client.post("/api/ml/predict", json=SAMPLE_SNAPSHOT)
+    assert r.status_code == 200
+    assert prediction_cache.hits == hits + 1
+
+
+def test_predict_async_looks_up_off_the_event_loop(monkeypatch):
+    """Feature extraction (DB hydration) and the model version lookup run in the threadpool."""
+    import asyncio, threading
+    from ml import inference
+    threads = []
+
+    def lookup(snapshot):
+        threads.append(threading.current_thread())
+        return None, (), (), (0, 0.9)
+
+    monkeypatch.setattr(inference, "_lookup", lookup)
+    prediction = asyncio.run(inference.predict_mood_async(dict(SAMPLE_SNAPSHOT)))
+    assert prediction.confidence == 0.9
+    assert threads and threads[0] is not threading.main_thread()
+
+
+# ──────────────────────────────────────────────
+# ML — Micro-batching
+# ──────────────────────────────────────────────
+
+def _batch_calls(window_ms, max_batch, n):
+    import asyncio
+    import numpy as np
+    from ml.batching import MicroBatcher
+    calls = []
+
+    def fn(X):
+        calls.append(len(X))
+        return [float(row[0]) * 2 for row in X]
+
+    batcher = MicroBatcher(fn, window_ms=window_ms, max_batch=max_batch)
+
+    async def run():
+        return await asyncio.gather(*(batcher.submit(np.array([i])) for i in range(n)))
+
+    return asyncio.run(run()), calls, batcher
+
+
+def test_micro_batcher_coalesces_concurrent_calls():
+    results, calls, batcher = _batch_calls(window_ms=20, max_batch=64, n=5)
+    assert results == [0.0, 2.0, 4.0, 6.0, 8.0]
+    assert calls == [5]
+    assert batcher.stats()["avg_batch_size"] == 5.0
+
+
+def test_micro_batcher_respects_max_batch():
+    results, calls, _ = _batch_calls(window_ms=50, max_batch=3, n=7)
+    assert results == [float(i * 2) for i in range(7)]
+    assert sorted(calls) == [1, 3, 3]
+
+
+def test_micro_batcher_disabled_calls_directly():
+    results, calls, batcher = _batch_calls(window_ms=0, max_batch=32, n=3)
+    assert results == [0.0, 2.0, 4.0]
+    assert calls == [1, 1, 1]
+    assert batcher.enabled is False
+
+
 # ──────────────────────────────────────────────
 # ML — Model info
 # ──────────────────────────────────────────────
@@ -196,17 +661,631 @@ def test_model_info(client):
     assert "labeled_samples_in_db" in body
 
 
+def test_model_info_reports_blend(client):
+    client.post("/api/ml/predict", json=SAMPLE_SNAPSHOT)
+    body = client.get("/api/ml/model/info").json()
+    assert body["blend"]["batch"] + body["blend"]["online"] == pytest.approx(1.0)
+    assert "samples_seen" in body["online"]
+
+
 # ──────────────────────────────────────────────
 # ML — Retrain
 # ──────────────────────────────────────────────
 
 def test_retrain(client):
+    import time
+    from ml.warmup import is_training
     r = client.post("/api/ml/train", json={"min_samples": 1})
-    assert r.status_code == 200
+    assert r.status_code == 202
     body = r.json()
-    assert body["status"] == "trained"
-    assert "cv_f1_mean" in body
-    assert body["total_samples"] > 0
+    assert "scheduled" in body and "status" in body
+    deadline = time.monotonic() + 120
+    while is_training() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    state = client.get("/ready").json()
+    assert state["last_retrain"]["outcome"] == "ok"
+    info = client.get("/api/ml/model/info").json()
+    assert "cv_f1_weighted_mean" in info
+    assert info["total_samples"] > 0
+
+
+def test_manual_train_is_single_flight(client, monkeypatch):
+    import threading, time
+    import ml.models.training.train as train
+    from ml.warmup import is_training
+    while is_training():
+        time.sleep(0.05)
+    release, calls = threading.Event(), []
+
+    def slow_train(min_samples=1):
+        calls.append(min_samples)
+        release.wait(5)
+        raise ValueError(f"Need at least {min_samples} samples")
+    monkeypatch.setattr(train, "train_model", slow_train)
+
+    first  = client.post("/api/ml/train", json={"min_samples": 10**9})
+    second = client.post("/api/ml/train", json={"min_samples": 10**9})
+    release.set()
+    while is_training():
+        time.sleep(0.05)
+    assert (first.status_code, second.status_code) == (202, 202)
+    assert first.json()["scheduled"] and not second.json()["scheduled"]
+    assert calls == [10**9]
+    last = client.get("/ready").json()["last_retrain"]
+    assert last["reason"] == "manual" and last["outcome"] == "error"
+
+
+# ──────────────────────────────────────────────
+# Benchmarks harness (smoke test — tiny size)
+# ──────────────────────────────────────────────
+
+def test_benchmark_harness_smoke():
+    from benchmarks.bench_training import run_size, compare
+    result = run_size(120, fit_limit=120)
+    stages = result["stages"]
+    for name in ("featurize", "cv", "fit", "save", "load", "predict_batch"):
+        assert stages[name]["seconds"] >= 0
+        assert stages[name]["peak_rss_mb"] > 0
+    assert stages["save"]["artifact_mb"] > 0
+    assert stages["predict_single"]["p99_ms"] >= stages["predict_single"]["p50_ms"]
+
+    skipped = run_size(50, fit_limit=10)["stages"]
+    assert "skipped" in skipped["fit"]
+    lines = compare({"results": [result]}, {"results": [result]})
+    assert any("fit" in line and "×1.00" in line for line in lines)
+
+
+# ──────────────────────────────────────────────
+# Load-test harness pieces
+# ──────────────────────────────────────────────
+
+def test_fake_metrolinx_feeds_go_provider(monkeypatch):
+    from benchmarks.fake_metrolinx import FakeMetrolinx
+    from transit_api.providers import go
+    with FakeMetrolinx(latency_ms=5, trips=12) as upstream:
+        monkeypatch.setattr(go, "BASE_URL", upstream.departures_url)
+        monkeypatch.setattr(go, "KEY", "loadtest")
+        deps = go.get_departures(limit=5)
+        assert len(deps) == 5
+        assert deps[0]["line"] == "Lakeshore West"
+        assert deps[0]["destination"] == "Aldershot"
+        assert upstream.requests == 1
+
+    with FakeMetrolinx(failure_rate=1.0) as flaky:
+        monkeypatch.setattr(go, "BASE_URL", flaky.departures_url)
+        assert go.get_departures() == []
+        assert flaky.failures == 1
+
+
+def test_loadtest_summary_and_mix():
+    from benchmarks.loadtest import parse_mix, summarize
+    assert parse_mix("snapshot=3,predict=1") == {"snapshot": 0.75, "predict": 0.25}
+    with pytest.raises(ValueError):
+        parse_mix("bogus=1")
+    records = [("predict", i / 1000, 200) for i in range(1, 101)] + [("transit", 0.5, 502)]
+    report = summarize(records, elapsed=10.0)
+    assert report["predict"]["requests"] == 100
+    assert report["predict"]["p50_ms"] == pytest.approx(50.5)
+    assert report["predict"]["p99_ms"] == pytest.approx(99.01)
+    assert report["transit"]["errors"] == 1
+    assert report["_all"]["throughput_rps"] == 10.1
+
+
+# ──────────────────────────────────────────────
+# Metrics
+# ──────────────────────────────────────────────
+
+def test_histogram_exposition_is_cumulative():
+    from core.metrics import Registry
+    reg  = Registry()
+    hist = reg.histogram("demo_seconds", "demo", ["op"], buckets=(0.1, 1.0))
+    for v in (0.05, 0.5, 5.0):
+        hist.observe(v, op='a"b')
+    reg.counter("demo_total", "demo").inc(2)
+    text = reg.render()
+    assert '# TYPE demo_seconds histogram' in text
+    assert 'demo_seconds_bucket{op="a\\"b",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{op="a\\"b",le="1"} 2' in text
+    assert 'demo_seconds_bucket{op="a\\"b",le="+Inf"} 3' in text
+    assert 'demo_seconds_count{op="a\\"b"} 3' in text
+    assert "demo_total 2" in text
+
+
+def test_metrics_endpoint(client):
+    client.post("/api/health/snapshot", json=SAMPLE_SNAPSHOT)
+    client.post("/api/ml/predict", json=SAMPLE_SNAPSHOT)
+    r = client.get("/metrics")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain")
+    text = r.text
+    # Routes are labeled by template, not raw path
+    assert 'route="/api/health/snapshot",status="200"' in text
+    assert 'store_operation_duration_seconds_count{op="save_snapshot"}' in text
+    assert "model_predict_duration_seconds_count" in text
+    assert "prediction_cache_hit_ratio" in text
+
+
+def test_transit_upstream_errors_counted(monkeypatch):
+    from benchmarks.fake_metrolinx import FakeMetrolinx
+    import transit_api.providers.go as go
+    monkeypatch.setattr(go, "KEY", "test")
+    before = go.UPSTREAM_ERRORS.value(provider="go", kind="http_5xx")
+    with FakeMetrolinx(failure_rate=1.0) as flaky:
+        monkeypatch.setattr(go, "BASE_URL", flaky.departures_url)
+        go.get_departures()
+    assert go.UPSTREAM_ERRORS.value(provider="go", kind="http_5xx") == before + 1
+
+
+# ──────────────────────────────────────────────
+# Diagnostics — Server-Timing + sampling profiler
+# ──────────────────────────────────────────────
+
+def test_server_timing_header(client):
+    r = client.post("/api/health/snapshot", json=SAMPLE_SNAPSHOT)
+    phases = dict(p.split(";dur=") for p in r.headers["server-timing"].split(", "))
+    assert {"store", "total"} <= set(phases)
+    assert float(phases["total"]) >= float(phases["store"])
+
+
+def test_sampling_profiler_collapsed_stacks():
+    import threading, time
+    from core.profiling import SamplingProfiler
+
+    def busy_loop_for_profiler(stop):
+        while not stop.is_set():
+            sum(range(1000))
+
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop_for_profiler, args=(stop,), name="busy")
+    worker.start()
+    prof = SamplingProfiler()
+    try:
+        prof.start(seconds=0.3, interval_ms=5)
+        with pytest.raises(RuntimeError):
+            prof.start(seconds=1)
+        time.sleep(0.5)
+    finally:
+        stop.set()
+        worker.join()
+    assert prof.status()["state"] == "finished"
+    lines = prof.collapsed().splitlines()
+    assert any(l.startswith("busy;") and "busy_loop_for_profiler" in l for l in lines)
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) >= 1
+
+
+def test_admin_profile_requires_token(client, monkeypatch):
+    import api.routes.admin as admin
+    assert client.get("/api/admin/profile").status_code == 404   # no token configured
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", "s3cret")
+    assert client.get("/api/admin/profile").status_code == 403
+    headers = {"X-Admin-Token": "s3cret"}
+    assert client.post("/api/admin/profile", headers=headers).status_code == 422
+
+    r = client.post("/api/admin/profile?requests=2", headers=headers)
+    assert r.status_code == 200 and r.json()["mode"] == "requests"
+    client.get("/live")
+    client.get("/live")
+    client.delete("/api/admin/profile", headers=headers)   # joins the sampler thread
+    assert client.get("/api/admin/profile", headers=headers).json()["state"] == "finished"
+    r = client.get("/api/admin/profile/collapsed", headers=headers)
+    assert r.status_code == 200
+    assert r.headers["content-disposition"].endswith('.collapsed"')
+
+
+# ──────────────────────────────────────────────
+# Store — write-ahead log
+# ──────────────────────────────────────────────
+
+def test_wal_group_commit_and_compaction(tmp_path):
+    import threading
+    from db.wal import WriteAheadLog
+    store: dict = {}
+
+    def fold(entries):
+        store.update(entries)
+        wal.discard(i for i, _ in entries)
+
+    wal = WriteAheadLog(str(tmp_path), fold, group_commit_ms=20, compact_interval=3600)
+    wal.recover()
+    wal.start(next_id=1)
+    ids, lock = [], threading.Lock()
+
+    def writer(n):
+        doc_id = wal.append({"user_id": f"u{n}", "heart_rate": 70 + n})
+        with lock:
+            ids.append(doc_id)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(ids) == list(range(1, 17))
+    assert len(wal.pending()) == 16 and not store
+    assert wal.stats()["group_commits"] < 16          # appends shared fsyncs
+
+    assert wal.compact() == 16
+    assert sorted(store) == sorted(ids) and wal.pending() == []
+    wal.close()
+    assert not any(p.name.endswith(".ndjson") for p in tmp_path.iterdir())
+
+
+def test_wal_recovery_skips_folded_ids_and_torn_tail(tmp_path):
+    import json
+    from db.wal import WriteAheadLog
+    seg = tmp_path / "wal-00000003.ndjson"
+    seg.write_text(json.dumps({"doc_id": 7, "record": {"heart_rate": 80}}) + "\n"
+                   + json.dumps({"doc_id": 8, "record": {"heart_rate": 81}}) + "\n"
+                   + '{"doc_id": 9, "rec')                       # crash mid-write
+    folded = []
+    wal = WriteAheadLog(str(tmp_path), folded.extend)
+    assert wal.recover() == 2
+    assert [i for i, _ in folded] == [7, 8]
+    assert not seg.exists()
+    wal.start(next_id=9)
+    assert wal.stats()["segment"] == 4                  # new segment after the old ones
+    wal.close()
+
+
+def test_wal_publishes_after_fsync_and_cuts_failed_batches(tmp_path, monkeypatch):
+    import threading
+    import pytest
+    from db import wal as wal_module
+    from db.wal import WriteAheadLog, WALWriteError, read_segment
+    folded = []
+
+    def fold(entries):
+        folded.extend(i for i, _ in entries)
+        wal.discard(i for i, _ in entries)
+
+    wal = WriteAheadLog(str(tmp_path), fold, group_commit_ms=0, compact_interval=3600)
+    wal.recover()
+    wal.start(next_id=1)
+    assert wal.append({"heart_rate": 70}) == 1
+    segment = tmp_path / "wal-00000001.ndjson"
+    good_size = segment.stat().st_size
+
+    in_fsync, release = threading.Event(), threading.Event()
+    real_fsync = wal_module.os.fsync
+
+    def failing_fsync(fd):
+        in_fsync.set()
+        release.wait(5)
+        raise OSError("I/O error")
+    monkeypatch.setattr(wal_module.os, "fsync", failing_fsync)
+    errors = []
+
+    def append():
+        try:
+            wal.append({"heart_rate": 71})
+        except WALWriteError as e:
+            errors.append(e)
+    t = threading.Thread(target=append)
+    t.start()
+    assert in_fsync.wait(5)
+    assert [i for i, _ in wal.pending()] == [1]          # written but not yet durable: not visible
+    release.set()
+    t.join()
+    assert errors and [i for i, _ in wal.pending()] == [1]
+    assert segment.stat().st_size == good_size           # failed batch cut off the segment
+
+    monkeypatch.setattr(wal_module.os, "fsync", real_fsync)
+    assert wal.append({"heart_rate": 72}) == 3
+    assert [r["heart_rate"] for _, r in read_segment(str(segment))] == [70, 72]
+
+    def no_truncate(fd, size):
+        raise OSError("read-only file system")
+    monkeypatch.setattr(wal_module.os, "fsync", failing_fsync)
+    monkeypatch.setattr(wal_module.os, "ftruncate", no_truncate)
+    with pytest.raises(WALWriteError):
+        wal.append({"heart_rate": 73})
+    assert wal.stats()["segment"] == 2                   # couldn't cut it: moved to a new segment
+    monkeypatch.setattr(wal_module.os, "fsync", real_fsync)
+    assert wal.append({"heart_rate": 74}) == 5
+    assert wal.compact() == 3 and folded == [1, 3, 5]
+    wal.close()
+    assert not any(p.name.endswith(".ndjson") for p in tmp_path.iterdir())
+
+
+def test_store_wal_mode_survives_crash(tmp_path):
+    """Kill the process without closing the log; the next start replays it."""
+    import subprocess, sys, os
+    env = {**os.environ, "STORE_WAL": "1", "WAL_COMPACT_INTERVAL_S": "3600",
+           "COMMUTE_DB_PATH": str(tmp_path / "db.json"), "WAL_DIR": str(tmp_path / "wal")}
+    backend = os.path.dirname(os.path.abspath(__file__))
+    write = ("import os; from db.store import save_snapshot, count_total, get_recent_snapshots\n"
+             "for i in range(25):\n"
+             "    save_snapshot({'user_id': 'wal_user', 'heart_rate': 60 + i, 'label': None,\n"
+             "                   'timestamp': f'2024-03-01T08:{i:02d}:00'})\n"
+             "assert count_total() == 25\n"
+             "assert get_recent_snapshots('wal_user', 1)[0]['heart_rate'] == 84\n"
+             "os._exit(0)\n")
+    subprocess.run([sys.executable, "-c", write], cwd=backend, env=env, check=True)
+    assert list((tmp_path / "wal").iterdir())           # still only in the log
+
+    read = ("from db.store import count_total, get_all_snapshots\n"
+            "docs = get_all_snapshots()\n"
+            "print(count_total(), sorted(d.doc_id for d in docs) == list(range(1, 26)))\n")
+    out = subprocess.run([sys.executable, "-c", read], cwd=backend, env=env, check=True,
+                         capture_output=True, text=True)
+    assert out.stdout.strip().splitlines()[-1] == "25 True"
+
+
+def test_partitioned_table_prunes_by_time(tmp_path):
+    from datetime import datetime
+    from tinydb import Query
+    from db.partitions import PartitionedTable
+    table = PartitionedTable(str(tmp_path), "day")
+    for day in (1, 2, 3):
+        for minute in range(3):
+            table.insert({"user_id": "u", "heart_rate": 70 + day, "label": None,
+                          "timestamp": f"2024-03-0{day}T08:0{minute}:00"})
+    table.insert({"user_id": "u", "heart_rate": 99, "label": None})     # no timestamp
+    assert table.keys() == ["2024-03-01", "2024-03-02", "2024-03-03", "undated"]
+    assert table.count() == 10 and table.max_doc_id() == 10
+
+    since = datetime(2024, 3, 2, 8, 1)
+    assert table.keys(since=since) == ["2024-03-02", "2024-03-03"]
+    assert len(table.all(since=since)) == 5
+    assert len(table.search(Query().heart_rate == 73, until=datetime(2024, 3, 3))) == 0
+
+    opened = []
+    original = table._table
+    table._table = lambda key: opened.append(key) or original(key)
+    recent = table.recent(Query().user_id == "u", 2)
+    assert [r["timestamp"] for r in recent] == ["2024-03-03T08:02:00", "2024-03-03T08:01:00"]
+    assert opened == ["2024-03-03"]                     # older partitions never touched
+
+    reopened = PartitionedTable(str(tmp_path), "day")   # ids continue across restarts
+    assert reopened.insert({"user_id": "u", "timestamp": "2024-03-03T09:00:00"}) == 11
+
+
+def test_retention_downsamples_unlabeled_and_keeps_labeled(tmp_path):
+    from datetime import datetime
+    from db.partitions import PartitionedTable
+    table = PartitionedTable(str(tmp_path), "week")
+    for sec, hr in ((0, 70), (20, 80), (40, 90)):
+        table.insert({"user_id": "u", "heart_rate": hr, "steps_last_minute": 10, "label": None,
+                      "location_variance": 0.0, "timestamp": f"2024-01-02T08:00:{sec:02d}"})
+    table.insert({"user_id": "u", "heart_rate": 75, "label": "calm",
+                  "timestamp": "2024-01-02T08:00:30"})
+    table.insert({"user_id": "u", "heart_rate": 60, "label": None,
+                  "timestamp": "2024-03-01T08:00:00"})               # still fresh
+    table.insert({"user_id": "u", "heart_rate": 65, "label": None,
+                  "timestamp": "2023-06-01T08:00:00"})               # past both cutoffs
+
+    stats = table.apply_retention(raw_days=14, aggregate_days=90, now=datetime(2024, 3, 5))
+    assert stats == {"downsampled": 4, "aggregates_written": 2, "aggregates_dropped": 1,
+                     "kept_for_labels": 0, "partitions_deleted": 1}
+    assert [s["label"] for s in table.all()] == ["calm", None]
+    [agg] = table.minute_aggregates("u")
+    assert agg["minute"] == "2024-01-02T08:00" and agg["count"] == 3
+    assert (agg["heart_rate_mean"], agg["heart_rate_min"], agg["heart_rate_max"]) == (80.0, 70.0, 90.0)
+    assert "2023-W22" not in table.keys()
+
+
+def test_retention_keeps_the_window_retrains_replay(tmp_path):
+    """Replayed rolling features of old labeled rows are the same after retention."""
+    import numpy as np
+    from datetime import datetime, timedelta
+    from db.partitions import PartitionedTable
+    from ml.features import build_feature_matrix
+    table = PartitionedTable(str(tmp_path), "day")
+    start = datetime(2024, 1, 1, 23, 30)                  # the window crosses midnight
+    for i in range(60):
+        ts = start + timedelta(minutes=i)
+        table.insert({"user_id": "u", "heart_rate": 70 + (i * 7) % 40, "steps_last_minute": (i * 13) % 50,
+                      "label": "stressed" if i in (25, 45) else None, "timestamp": ts.isoformat()})
+    table.insert({"user_id": "other", "heart_rate": 90, "label": None,
+                  "timestamp": (start + timedelta(minutes=24)).isoformat()})
+    before = build_feature_matrix(table.all())
+
+    stats = table.apply_retention(raw_days=14, aggregate_days=90, now=datetime(2024, 3, 5),
+                                  context_minutes=10)
+    assert stats["kept_for_labels"] == 20 and stats["downsampled"] == 58 - 20 + 1
+    after = build_feature_matrix(table.all())
+    assert np.array_equal(before[0], after[0]) and np.array_equal(before[1], after[1])
+
+
+def test_store_partitioned_mode_migrates_and_reads(tmp_path):
+    import subprocess, sys, os
+    from tinydb import TinyDB
+    legacy = TinyDB(str(tmp_path / "db.json"))
+    legacy.table("health_snapshots").insert_multiple(
+        [{"user_id": "p", "heart_rate": 60 + i, "label": None,
+          "timestamp": f"2024-03-0{1 + i % 3}T08:00:00"} for i in range(6)])
+    legacy.close()
+    env = {**os.environ, "STORE_PARTITION": "day", "RETENTION_INTERVAL_HOURS": "0",
+           "COMMUTE_DB_PATH": str(tmp_path / "db.json"),
+           "PARTITION_DIR": str(tmp_path / "parts")}
+    backend = os.path.dirname(os.path.abspath(__file__))
+    script = ("from datetime import datetime\n"
+              "from db.store import save_snapshot, count_total, get_recent_snapshots, get_all_snapshots\n"
+              "doc_id = save_snapshot({'user_id': 'p', 'heart_rate': 99, 'label': None,\n"
+              "                        'timestamp': '2024-03-04T08:00:00'})\n"
+              "from db.store import iter_user_snapshots\n"
+              "newest = [d['heart_rate'] for d in iter_user_snapshots('p')][:3]\n"
+              "print(doc_id, count_total(), get_recent_snapshots('p', 1)[0]['heart_rate'],\n"
+              "      len(get_all_snapshots(since=datetime(2024, 3, 3))), newest)\n")
+    out = subprocess.run([sys.executable, "-c", script], cwd=backend, env=env, check=True,
+                         capture_output=True, text=True)
+    assert out.stdout.strip().splitlines()[-1] == "7 7 99 3 [99, 65, 62]"
+    assert len(list((tmp_path / "parts").iterdir())) == 4
+
+
+def test_columnar_feature_matrix_matches_row_path():
+    import numpy as np
+    from ml.features import build_feature_matrix, feature_matrix_from_columns
+    from db.columnar import columns_from_rows, numpy_columns
+    spotify = {"track_name": "x", "energy": 0.9, "valence": 0.0, "tempo": 250.0}
+    rows = [
+        {"user_id": "a", "heart_rate": 90, "steps_last_minute": 2, "label": None,
+         "timestamp": "2024-03-01T08:00:00"},
+        {"user_id": "a", "heart_rate": 120, "steps_last_minute": 40, "label": "stressed",
+         "location_variance": 0.002, "spotify": spotify, "timestamp": "2024-03-01T08:03:00"},
+        {"user_id": "b", "heart_rate": 65, "steps_last_minute": 0, "label": "sleepy",
+         "spotify": {"track_name": None}, "timestamp": "2024-03-01T23:10:00"},
+        {"user_id": None, "heart_rate": 80, "label": "happy", "latitude": 43.6,
+         "timestamp": "2024-03-01T17:30:00"},
+    ]
+    X_rows, y_rows = build_feature_matrix(rows)
+    X_cols, y_cols = feature_matrix_from_columns(numpy_columns(columns_from_rows(rows)))
+    assert list(y_cols) == list(y_rows)
+    np.testing.assert_allclose(X_cols, X_rows, rtol=1e-5, atol=1e-5)
+
+
+def test_export_ndjson_streams_labeled_snapshots(client):
+    import json
+    client.post("/api/health/snapshot", json=LABELED_SNAPSHOT)
+    r = client.get("/api/health/export", params={"format": "ndjson", "labeled": "true"})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in r.text.splitlines()]
+    assert rows and all(row["label"] is not None and row["doc_id"] for row in rows)
+    assert client.get("/api/health/export", params={"format": "csv"}).status_code == 422
+
+
+def test_export_parquet_round_trips_into_training(client, tmp_path):
+    pytest.importorskip("pyarrow")
+    import numpy as np
+    from ml.features import build_feature_matrix, load_feature_matrix
+    from db.store import get_all_snapshots
+    client.post("/api/health/snapshot", json=LABELED_SNAPSHOT)
+    for fmt, name in (("parquet", "s.parquet"), ("arrow", "s.arrows")):
+        r = client.get("/api/health/export", params={"format": fmt})
+        assert r.status_code == 200
+        (tmp_path / name).write_bytes(r.content)
+        X, y = load_feature_matrix(str(tmp_path / name))
+        X_rows, y_rows = build_feature_matrix(get_all_snapshots())
+        assert list(y) == list(y_rows)
+        np.testing.assert_allclose(X, X_rows, rtol=1e-5, atol=1e-4)
+
+
+def test_export_columnar_without_pyarrow_is_501(client):
+    try:
+        import pyarrow  # noqa: F401
+        pytest.skip("pyarrow installed")
+    except ImportError:
+        pass
+    r = client.get("/api/health/export", params={"format": "parquet"})
+    assert r.status_code == 501 and "pyarrow" in r.json()["detail"]
+
+
+# ──────────────────────────────────────────────
+# Tracing
+# ──────────────────────────────────────────────
+
+def test_tracer_parenting_and_otlp_export(tmp_path):
+    from core.tracing import Tracer, FileExporter, read_spans, parse_traceparent, summarize
+    exporter = FileExporter(str(tmp_path / "t.ndjson"))
+    t = Tracer(exporter)
+    remote = parse_traceparent("00-" + "a" * 32 + "-" + "b" * 16 + "-01")
+    with t.span("outer", parent=remote) as outer:
+        with t.span("inner", {"rows": 3}):
+            pass
+    with pytest.raises(ValueError):
+        with t.span("boom"):
+            raise ValueError("x")
+    exporter.flush()
+
+    spans = {s["name"]: s for s in read_spans(str(tmp_path / "t.ndjson"))}
+    assert spans["outer"]["traceId"] == "a" * 32 and spans["outer"]["parentSpanId"] == "b" * 16
+    assert spans["inner"]["parentSpanId"] == outer.context.span_id
+    assert spans["inner"]["attributes"] == [{"key": "rows", "value": {"intValue": "3"}}]
+    assert spans["boom"]["status"]["code"] == 2 and "parentSpanId" not in spans["boom"]
+    assert {r["name"] for r in summarize(list(spans.values()))} == {"outer", "inner", "boom"}
+    assert parse_traceparent("garbage") is None
+
+
+def test_retrain_trace_links_to_ingest(client, monkeypatch):
+    import time
+    import api.routes.health as health
+    import ml.models.training.train as train
+    from core.tracing import tracer, InMemoryExporter
+    exporter = InMemoryExporter()
+    monkeypatch.setattr(tracer, "exporter", exporter)
+    monkeypatch.setattr(train, "train_model", lambda min_samples=1: {
+        "total_samples": 1, "cv_f1_weighted_mean": 1.0})
+    monkeypatch.setattr(health, "_labeled_at_last_train", -health.RETRAIN_EVERY_N)
+    from ml.warmup import is_training
+    while is_training():   # single-flight: wait out any warm-up retrain
+        time.sleep(0.05)
+
+    r = client.post("/api/health/snapshot", json=LABELED_SNAPSHOT)
+    assert r.status_code == 200
+    deadline = time.monotonic() + 10
+    while not exporter.by_name("retrain") and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    names = {s.name for s in exporter.spans}
+    assert {"POST /api/health/snapshot", "post_snapshot", "save_snapshot",
+            "count_labeled", "_maybe_retrain"} <= names
+    trigger = exporter.by_name("_maybe_retrain")[0]
+    retrain = exporter.by_name("retrain")[0]
+    assert retrain.parent_id is None
+    assert retrain.links == [trigger.context]
+    request = exporter.by_name("POST /api/health/snapshot")[0]
+    assert exporter.by_name("save_snapshot")[0].context.trace_id == request.context.trace_id
+
+
+# ──────────────────────────────────────────────
+# Assets — mood animation packs
+# ──────────────────────────────────────────────
+
+@pytest.fixture
+def emotion_dir(tmp_path, monkeypatch):
+    import os, shutil
+    import api.routes.assets as assets
+    smile = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "AnjeBubu", "emotions", "test", "smile.json")
+    shutil.copyfile(smile, tmp_path / "happy.json")
+    monkeypatch.setattr(assets, "EMOTION_PROJECT_DIR", str(tmp_path))
+    monkeypatch.setattr(assets, "_packs", {})
+    return tmp_path
+
+
+def test_emotion_pack_is_content_addressed(client, emotion_dir):
+    index = client.get("/api/assets/emotions").json()
+    assert index["moods"]["sad"]["pack"] is None
+    entry = index["moods"]["happy"]["pack"]
+
+    r = client.get("/api/assets/emotions/happy")
+    assert r.status_code == 200 and len(r.content) == entry["size"]
+    assert r.content[:8] == b"BUBUPACK"
+    assert r.headers["etag"] == f'"{entry["hash"]}"' and r.headers["cache-control"] == "no-cache"
+    assert r.headers["content-location"] == entry["url"]
+    assert client.get("/api/assets/emotions/happy",
+                      headers={"If-None-Match": r.headers["etag"]}).status_code == 304
+
+    immutable = client.get(entry["url"])
+    assert immutable.content == r.content and "immutable" in immutable.headers["cache-control"]
+    assert client.get("/api/assets/emotions/happy/" + "0" * 64).status_code == 404
+    assert client.get("/api/assets/emotions/sad").status_code == 404
+    assert client.get("/api/assets/emotions/grumpy").status_code == 400
+
+    # Editing the project rebuilds the pack under a new hash
+    import json
+    project = json.loads((emotion_dir / "happy.json").read_text())
+    (emotion_dir / "happy.json").write_text(json.dumps({**project, "speed": 90}))
+    assert client.get("/api/assets/emotions").json()["moods"]["happy"]["pack"]["hash"] != entry["hash"]
+    assert client.get(entry["url"]).status_code == 404
+
+
+def test_emotion_pack_ranges(client, emotion_dir):
+    full = client.get("/api/assets/emotions/happy").content
+    size = len(full)
+    r = client.get("/api/assets/emotions/happy", headers={"Range": "bytes=8-15"})
+    assert r.status_code == 206 and r.content == full[8:16]
+    assert r.headers["content-range"] == f"bytes 8-15/{size}"
+    assert client.get("/api/assets/emotions/happy", headers={"Range": "bytes=-10"}).content == full[-10:]
+    assert client.get("/api/assets/emotions/happy", headers={"Range": "bytes=100-"}).content == full[100:]
+    r = client.get("/api/assets/emotions/happy", headers={"Range": f"bytes={size}-"})
+    assert r.status_code == 416 and r.headers["content-range"] == f"bytes */{size}"
+    # A stale If-Range validator gets the whole (new) body instead of a mismatched slice
+    r = client.get("/api/assets/emotions/happy", headers={"Range": "bytes=0-9", "If-Range": '"old"'})
+    assert r.status_code == 200 and r.content == full
+    head = client.head("/api/assets/emotions/happy")
+    assert head.status_code == 200 and head.headers["content-length"] == str(size)
 
 
 # ──────────────────────────────────────────────
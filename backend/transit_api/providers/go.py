@@ -8,16 +8,40 @@ import requests
 import urllib3
 from dotenv import load_dotenv
 import os
+import time
 from datetime import datetime
 
+from core.metrics import REGISTRY
+from core.profiling import timing_phase
+
 # Suppress SSL warnings (Metrolinx API sometimes has certificate issues)
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 load_dotenv()
 
-BASE_URL = "https://api.openmetrolinx.com/OpenDataAPI/api/V1/ServiceUpdate/UnionDepartures/All"
+# Overridable so load tests can point at a local stand-in (benchmarks/fake_metrolinx.py)
+BASE_URL = os.getenv(
+    "METROLINX_DEPARTURES_URL",
+    "https://api.openmetrolinx.com/OpenDataAPI/api/V1/ServiceUpdate/UnionDepartures/All",
+)
 KEY = os.getenv("METROLINX_API_KEY")
 
+UPSTREAM_SECONDS = REGISTRY.histogram(
+    "transit_upstream_duration_seconds", "Metrolinx API call latency by outcome",
+    ["provider", "outcome"])
+UPSTREAM_ERRORS  = REGISTRY.counter(
+    "transit_upstream_errors_total", "Failed Metrolinx API calls by kind", ["provider", "kind"])
+
+
+def _error_kind(e: requests.RequestException) -> str:
+    if isinstance(e, requests.Timeout):
+        return "timeout"
+    if isinstance(e, requests.ConnectionError):
+        return "connection"
+    if isinstance(e, requests.HTTPError) and e.response is not None:
+        return f"http_{e.response.status_code // 100}xx"
+    return "other"
+
 
 def _parse_time(t: str) -> datetime:
     """Convert API time string into datetime."""
@@ -59,22 +83,31 @@ def get_departures(limit: int = 10) -> list[dict]:
         "Connection": "keep-alive"
     }
 
+    start = time.perf_counter()
     try:
-        resp = requests.get(
-            BASE_URL,
-            params={"key": KEY},
-            headers=headers,
-            timeout=10,
-            verify=False
-        )
+        with timing_phase("upstream"):
+            resp = requests.get(
+                BASE_URL,
+                params={"key": KEY},
+                headers=headers,
+                timeout=10,
+                verify=False
+            )
 
         resp.raise_for_status()
 
     except requests.RequestException as e:
+        UPSTREAM_SECONDS.observe(time.perf_counter() - start, provider="go", outcome="error")
+        UPSTREAM_ERRORS.inc(provider="go", kind=_error_kind(e))
         print("Metrolinx API request failed:", e)
         return []
+    UPSTREAM_SECONDS.observe(time.perf_counter() - start, provider="go", outcome="ok")
 
-    data = resp.json()
+    try:
+        data = resp.json()
+    except ValueError:
+        UPSTREAM_ERRORS.inc(provider="go", kind="parse")
+        raise
 
     raw = data.get("AllDepartures")
     if not raw:
@@ -0,0 +1,24 @@
+"""
+bubu_assets: asset code shared by the pixel editors
+(AnjeBubu/emotions/pixel_editor_animation.py, ESP32/display_gen.py) and the
+headless `emotions compile` tool. Everything except `render` is GUI-independent.
+
+  color     "#RRGGBB" / RGB / RGB565 conversions (scalar or numpy)
+  frames    FrameStore: uint16 colour-index frames with diff-based undo
+  raster    shape masks and scanline flood fill for the editor tools
+  encoders  raw / pal4 / pal8 / rle / delta animation headers (+ bubu_frames.h)
+  face      face-region crop and the face_bitmap header for the ESP32 sketch
+  project   versioned project files (reads v1 and v2, writes v2)
+  pack      .bpk binary asset packs streamed from SD (+ bubu_pack.h)
+  images    PNG/GIF import: downscale, quantize, dither (decoding needs Pillow)
+  tiles     one deduplicated tile bank shared by a set of animations (+ bubu_tiles.h)
+  render    Tk canvas helpers for the editors: dirty-cell CellGrid, cached PreviewImage
+
+The editors run as plain scripts, so they put the repository root on sys.path
+before importing this package. Tests: pytest bubu_assets/tests.py
+"""
+from .color import hex_to_565, rgb565_to_rgb, rgb_to_565
+from .frames import FrameStore
+from .project import FORMAT_VERSION, Project
+
+__all__ = ["FrameStore", "Project", "FORMAT_VERSION", "hex_to_565", "rgb_to_565", "rgb565_to_rgb"]
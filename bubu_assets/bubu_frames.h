@@ -0,0 +1,112 @@
+// bubu_frames.h — decoders for packed emotion animations (bubu_assets/encoders.py)
+//
+// Works with any display object that has fillRect(x, y, w, h, color):
+// TFT_eSPI, Adafruit_GFX / Adafruit_ST7789, ...  Every run of equal cells is
+// one fillRect of (run * scale) x scale pixels, so frames are never expanded
+// into a bitmap in RAM.
+//
+//   bubuDrawFrame(tft, smile_packed, i, 0, 0, FACE_SCALE);   // any encoding
+//
+// For BUBU_ENC_DELTA, bubuDrawFrame(i) only repaints what changed since frame
+// i-1 (frame 0: since the last frame), so call bubuDrawKeyframe() once before
+// the first frame and after anything else has drawn over the face region.
+#pragma once
+#include <Arduino.h>
+#include <pgmspace.h>
+
+enum : uint8_t {
+  BUBU_ENC_PAL4  = 1,   // 4-bit indices, rows byte-aligned, high nibble first
+  BUBU_ENC_PAL8  = 2,   // 8-bit indices
+  BUBU_ENC_RLE   = 3,   // (run, index) pairs; runs never cross rows
+  BUBU_ENC_DELTA = 4,   // (row, col, run, index) quads vs the previous frame
+};
+
+struct BubuAnim {
+  uint8_t         encoding;
+  uint8_t         width, height;
+  uint16_t        frame_count;
+  uint16_t        delay_ms;
+  const uint16_t* palette;   // PROGMEM RGB565
+  const uint8_t*  data;      // PROGMEM, all frames back to back
+  const uint32_t* offsets;   // PROGMEM, frame_count + 1 entries into data
+  const uint8_t*  keyframe;  // PROGMEM RLE of frame 0 (delta only), else nullptr
+};
+
+static inline uint16_t bubuColor(const BubuAnim& a, uint8_t idx) {
+  return pgm_read_word(&a.palette[idx]);
+}
+
+template <class Display>
+void bubuDrawRle(Display& tft, const BubuAnim& a, const uint8_t* p, const uint8_t* end,
+                 int16_t x0, int16_t y0, uint8_t scale) {
+  uint16_t x = 0, y = 0;
+  while (p < end) {
+    uint8_t run = pgm_read_byte(p++);
+    uint8_t idx = pgm_read_byte(p++);
+    tft.fillRect(x0 + x * scale, y0 + y * scale, run * scale, scale, bubuColor(a, idx));
+    x += run;
+    if (x >= a.width) { x = 0; y++; }
+  }
+}
+
+template <class Display>
+void bubuDrawIndexed(Display& tft, const BubuAnim& a, const uint8_t* p,
+                     int16_t x0, int16_t y0, uint8_t scale) {
+  const bool four = a.encoding == BUBU_ENC_PAL4;
+  const uint16_t stride = four ? (a.width + 1) / 2 : a.width;
+  for (uint16_t y = 0; y < a.height; y++, p += stride) {
+    uint16_t start = 0;
+    uint8_t runIdx = 0;
+    for (uint16_t x = 0; x <= a.width; x++) {
+      uint8_t idx = 0;
+      if (x < a.width) {
+        uint8_t b = pgm_read_byte(&p[four ? x / 2 : x]);
+        idx = four ? ((x & 1) ? (b & 0x0F) : (b >> 4)) : b;
+      }
+      if (x == 0) { runIdx = idx; continue; }
+      if (x == a.width || idx != runIdx) {   // merge equal neighbours into one fillRect
+        tft.fillRect(x0 + start * scale, y0 + y * scale, (x - start) * scale, scale,
+                     bubuColor(a, runIdx));
+        start = x;
+        runIdx = idx;
+      }
+    }
+  }
+}
+
+template <class Display>
+void bubuDrawDelta(Display& tft, const BubuAnim& a, const uint8_t* p, const uint8_t* end,
+                   int16_t x0, int16_t y0, uint8_t scale) {
+  while (p < end) {
+    uint8_t row = pgm_read_byte(p++);
+    uint8_t col = pgm_read_byte(p++);
+    uint8_t run = pgm_read_byte(p++);
+    uint8_t idx = pgm_read_byte(p++);
+    tft.fillRect(x0 + col * scale, y0 + row * scale, run * scale, scale, bubuColor(a, idx));
+  }
+}
+
+// Full frame 0 of a delta animation (no-op for the other encodings)
+template <class Display>
+void bubuDrawKeyframe(Display& tft, const BubuAnim& a, int16_t x0, int16_t y0, uint8_t scale) {
+  if (a.encoding != BUBU_ENC_DELTA || a.keyframe == nullptr) return;
+  // The keyframe's length isn't stored: walk runs until they cover width*height cells
+  const uint8_t* p = a.keyframe;
+  uint16_t cells = 0, total = (uint16_t)a.width * a.height;
+  const uint8_t* end = p;
+  while (cells < total) { cells += pgm_read_byte(end); end += 2; }
+  bubuDrawRle(tft, a, p, end, x0, y0, scale);
+}
+
+template <class Display>
+void bubuDrawFrame(Display& tft, const BubuAnim& a, uint16_t frame,
+                   int16_t x0, int16_t y0, uint8_t scale) {
+  const uint8_t* p   = a.data + pgm_read_dword(&a.offsets[frame]);
+  const uint8_t* end = a.data + pgm_read_dword(&a.offsets[frame + 1]);
+  switch (a.encoding) {
+    case BUBU_ENC_PAL4:
+    case BUBU_ENC_PAL8:  bubuDrawIndexed(tft, a, p, x0, y0, scale); break;
+    case BUBU_ENC_RLE:   bubuDrawRle(tft, a, p, end, x0, y0, scale); break;
+    case BUBU_ENC_DELTA: bubuDrawDelta(tft, a, p, end, x0, y0, scale); break;
+  }
+}
@@ -0,0 +1,185 @@
+// bubu_pack.h — streams animations out of a .bpk asset pack (bubu_assets/pack.py)
+//
+// A pack is one file on SD (or SPIFFS/LittleFS): a small index, then every
+// frame as its own encoded blob on an `align`-byte boundary. The reader keeps
+// only the index entries it needs and reads one blob at a time into a buffer
+// the caller owns, so RAM use is max_blob bytes no matter how many moods the
+// pack holds. Allocate that buffer with heap_caps_malloc(MALLOC_CAP_DMA) and
+// SD reads land in it without a bounce copy.
+//
+// Works with any File-like class that has seek(uint32_t) and read(uint8_t*, size_t)
+// (SD/FS File on the ESP32):
+//
+//   File f = SD.open("/faces.bpk");
+//   BubuPackReader<File> pack(f);
+//   if (!pack.begin()) { ... }                    // checks magic, version, index CRC
+//   uint8_t* buf = (uint8_t*)heap_caps_malloc(pack.maxBlob(), MALLOC_CAP_DMA);
+//   BubuPackAnim smile;
+//   pack.find("smile", smile);
+//   pack.drawFrame(tft, smile, i, buf, 0, 0, FACE_SCALE);
+//
+// Drawing reuses the bubu_frames.h decoders on the RAM buffer. They read
+// through pgm_read_*, which on the ESP32 is a plain load from any address.
+#pragma once
+#include <Arduino.h>
+#include <string.h>
+#include "bubu_frames.h"
+
+enum : uint8_t { BUBU_ENC_RAW = 0 };   // pack only: width * height RGB565 words
+
+struct __attribute__((packed)) BubuPackHeader {
+  char     magic[8];       // "BUBUPACK"
+  uint16_t version;
+  uint16_t align;
+  uint16_t anim_count;
+  uint16_t flags;
+  uint32_t anim_table;
+  uint32_t frame_table;
+  uint32_t data_offset;
+  uint32_t file_size;
+  uint32_t max_blob;       // largest frame/keyframe blob: size the read buffer once
+  uint32_t index_crc;      // CRC-32 of anim_table .. data_offset
+};
+
+struct __attribute__((packed)) BubuPackAnimEntry {
+  char     name[16];
+  uint8_t  encoding;       // BUBU_ENC_*
+  uint8_t  width, height;
+  uint8_t  flags;
+  uint16_t frame_count;
+  uint16_t delay_ms;
+  uint32_t first_frame;    // index into the frame table
+  uint32_t palette_offset;
+  uint16_t palette_count;
+  uint16_t reserved;
+  uint32_t keyframe_offset;
+  uint32_t keyframe_size;
+  uint32_t meta_crc;
+};
+
+struct __attribute__((packed)) BubuPackFrameEntry {
+  uint32_t offset;
+  uint32_t size;
+  uint32_t crc;
+};
+
+static_assert(sizeof(BubuPackHeader) == 40, "pack header layout");
+static_assert(sizeof(BubuPackAnimEntry) == 48, "pack animation entry layout");
+static_assert(sizeof(BubuPackFrameEntry) == 12, "pack frame entry layout");
+
+struct BubuPackAnim {
+  BubuPackAnimEntry entry;
+  uint16_t          palette[256];   // loaded by find(); 512 bytes per open animation
+};
+
+static inline uint32_t bubuCrc32(uint32_t crc, const uint8_t* p, size_t n) {
+  crc = ~crc;
+  while (n--) {
+    crc ^= *p++;
+    for (uint8_t k = 0; k < 8; k++) crc = (crc >> 1) ^ (0xEDB88320u & (0u - (crc & 1)));
+  }
+  return ~crc;
+}
+
+template <class File>
+class BubuPackReader {
+ public:
+  explicit BubuPackReader(File& file) : f_(file) {}
+
+  // Reads the header and verifies the index CRC (one pass over the tables, no
+  // frame data). Returns false for anything that isn't a readable v1 pack.
+  bool begin() {
+    if (!readAt(0, &h_, sizeof(h_))) return false;
+    if (memcmp(h_.magic, "BUBUPACK", 8) != 0 || h_.version != 1) return false;
+    if (h_.anim_table > h_.frame_table || h_.frame_table > h_.data_offset) return false;
+    uint8_t chunk[64];
+    uint32_t crc = 0;
+    for (uint32_t pos = h_.anim_table; pos < h_.data_offset;) {
+      size_t n = h_.data_offset - pos < sizeof(chunk) ? h_.data_offset - pos : sizeof(chunk);
+      if (!readAt(pos, chunk, n)) return false;
+      crc = bubuCrc32(crc, chunk, n);
+      pos += n;
+    }
+    return crc == h_.index_crc;
+  }
+
+  uint16_t count() const   { return h_.anim_count; }
+  uint32_t maxBlob() const { return h_.max_blob; }
+
+  bool entry(uint16_t i, BubuPackAnim& out) {
+    if (i >= h_.anim_count) return false;
+    if (!readAt(h_.anim_table + (uint32_t)i * sizeof(BubuPackAnimEntry), &out.entry, sizeof(out.entry)))
+      return false;
+    const BubuPackAnimEntry& e = out.entry;
+    if (e.palette_count > 256) return false;
+    return e.palette_count == 0 || readAt(e.palette_offset, out.palette, e.palette_count * 2u);
+  }
+
+  bool find(const char* name, BubuPackAnim& out) {
+    for (uint16_t i = 0; i < h_.anim_count; i++) {
+      if (entry(i, out) && strncmp(out.entry.name, name, sizeof(out.entry.name)) == 0) return true;
+    }
+    return false;
+  }
+
+  // Reads frame i's encoded blob into buf (maxBlob() bytes). Returns its size, or -1.
+  int32_t readFrame(const BubuPackAnim& a, uint16_t i, uint8_t* buf) {
+    if (i >= a.entry.frame_count) return -1;
+    BubuPackFrameEntry fe;
+    uint32_t at = h_.frame_table + (a.entry.first_frame + i) * (uint32_t)sizeof(fe);
+    if (!readAt(at, &fe, sizeof(fe)) || fe.size > h_.max_blob) return -1;
+    return readAt(fe.offset, buf, fe.size) ? (int32_t)fe.size : -1;
+  }
+
+  template <class Display>
+  bool drawFrame(Display& tft, const BubuPackAnim& a, uint16_t i, uint8_t* buf,
+                 int16_t x0, int16_t y0, uint8_t scale) {
+    int32_t size = readFrame(a, i, buf);
+    if (size < 0) return false;
+    draw(tft, a, buf, (uint32_t)size, x0, y0, scale);
+    return true;
+  }
+
+  // Full frame 0 of a delta animation; see bubuDrawKeyframe().
+  template <class Display>
+  bool drawKeyframe(Display& tft, const BubuPackAnim& a, uint8_t* buf,
+                    int16_t x0, int16_t y0, uint8_t scale) {
+    const BubuPackAnimEntry& e = a.entry;
+    if (e.encoding != BUBU_ENC_DELTA) return true;
+    if (e.keyframe_size > h_.max_blob || !readAt(e.keyframe_offset, buf, e.keyframe_size)) return false;
+    BubuAnim view = makeView(a, buf, nullptr);
+    bubuDrawRle(tft, view, buf, buf + e.keyframe_size, x0, y0, scale);
+    return true;
+  }
+
+ private:
+  bool readAt(uint32_t pos, void* dst, size_t n) {
+    return f_.seek(pos) && f_.read((uint8_t*)dst, n) == n;
+  }
+
+  static BubuAnim makeView(const BubuPackAnim& a, const uint8_t* data, const uint32_t* offsets) {
+    const BubuPackAnimEntry& e = a.entry;
+    return BubuAnim{e.encoding, e.width, e.height, 1, e.delay_ms, a.palette, data, offsets, nullptr};
+  }
+
+  template <class Display>
+  void draw(Display& tft, const BubuPackAnim& a, const uint8_t* buf, uint32_t size,
+            int16_t x0, int16_t y0, uint8_t scale) {
+    const BubuPackAnimEntry& e = a.entry;
+    if (e.encoding == BUBU_ENC_RAW) {
+      const uint8_t* p = buf;
+      for (uint16_t y = 0; y < e.height; y++) {
+        for (uint16_t x = 0; x < e.width; x++, p += 2) {
+          tft.fillRect(x0 + x * scale, y0 + y * scale, scale, scale, (uint16_t)(p[0] | (p[1] << 8)));
+        }
+      }
+      return;
+    }
+    const uint32_t offsets[2] = {0, size};   // a one-frame BubuAnim over the buffer
+    BubuAnim view = makeView(a, buf, offsets);
+    bubuDrawFrame(tft, view, 0, x0, y0, scale);
+  }
+
+  File&          f_;
+  BubuPackHeader h_{};
+};
@@ -0,0 +1,102 @@
+// bubu_tiles.h — decoder for shared-tile animation sets (bubu_assets/tiles.py)
+//
+// One BubuTileSet (palette + bank of unique tiles) serves every animation in
+// the generated header; each BubuTileAnim is just a map of bank indices per
+// frame. Works with any display that has fillRect(x, y, w, h, color).
+//
+//   bubuDrawTiledFrame(tft, happy_tiled, i, 0, 0, FACE_SCALE);         // whole frame
+//   bubuDrawTiledFrame(tft, happy_tiled, i, 0, 0, FACE_SCALE, i - 1);  // only tiles that changed
+//
+// Passing the previously drawn frame skips every tile whose bank index is the
+// same in both frames, which for blinking eyes is nearly all of them.
+#pragma once
+#include <Arduino.h>
+#include <pgmspace.h>
+
+struct BubuTileSet {
+  uint8_t         tile;        // tile width = height in cells
+  uint8_t         bpp;         // 4 (high nibble first) or 8
+  uint8_t         map_bytes;   // 1, or 2 (little-endian) when the bank has > 256 tiles
+  uint16_t        count;       // tiles in the bank
+  const uint16_t* palette;     // PROGMEM RGB565
+  const uint8_t*  bank;        // PROGMEM: packed, count * tile * tile * bpp / 8 bytes,
+                               //   or (run, index) pairs per tile row when offsets is set
+  const uint32_t* offsets;     // PROGMEM, count + 1 entries into bank (RLE layout), else nullptr
+};
+
+struct BubuTileAnim {
+  const BubuTileSet* set;
+  uint8_t            width, height;      // in cells
+  uint8_t            across, down;       // in tiles
+  uint16_t           frame_count;
+  uint16_t           delay_ms;
+  const uint8_t*     map;                // PROGMEM, frame_count * down * across entries
+};
+
+static inline uint16_t bubuTileIndex(const BubuTileAnim& a, uint16_t frame, uint16_t slot) {
+  uint32_t i = ((uint32_t)frame * a.down * a.across + slot) * a.set->map_bytes;
+  uint16_t v = pgm_read_byte(&a.map[i]);
+  if (a.set->map_bytes == 2) v |= (uint16_t)pgm_read_byte(&a.map[i + 1]) << 8;
+  return v;
+}
+
+static inline uint8_t bubuTilePixel(const BubuTileSet& s, const uint8_t* tile, uint16_t i) {
+  if (s.bpp == 8) return pgm_read_byte(&tile[i]);
+  uint8_t b = pgm_read_byte(&tile[i / 2]);
+  return (i & 1) ? (b & 0x0F) : (b >> 4);
+}
+
+// Draw one tile, clipped to the animation's width x height; equal neighbours share a fillRect
+template <class Display>
+void bubuDrawTile(Display& tft, const BubuTileAnim& a, uint16_t index, uint8_t tx, uint8_t ty,
+                  int16_t x0, int16_t y0, uint8_t scale) {
+  const BubuTileSet& s = *a.set;
+  uint16_t cx = tx * s.tile, cy = ty * s.tile;
+  uint8_t w = a.width - cx < s.tile ? a.width - cx : s.tile;
+  uint8_t h = a.height - cy < s.tile ? a.height - cy : s.tile;
+  if (s.offsets != nullptr) {
+    const uint8_t* p   = s.bank + pgm_read_dword(&s.offsets[index]);
+    const uint8_t* end = s.bank + pgm_read_dword(&s.offsets[index + 1]);
+    uint8_t x = 0, y = 0;
+    while (p < end && y < h) {
+      uint8_t run = pgm_read_byte(p++);
+      uint8_t idx = pgm_read_byte(p++);
+      if (x < w) {
+        uint8_t len = x + run > w ? w - x : run;
+        tft.fillRect(x0 + (cx + x) * scale, y0 + (cy + y) * scale, len * scale, scale,
+                     pgm_read_word(&s.palette[idx]));
+      }
+      x += run;
+      if (x >= s.tile) { x = 0; y++; }
+    }
+    return;
+  }
+  const uint8_t* tile = s.bank + (uint32_t)index * s.tile * s.tile * s.bpp / 8;
+  for (uint8_t y = 0; y < h; y++) {
+    uint8_t start = 0, run = bubuTilePixel(s, tile, y * s.tile);
+    for (uint8_t x = 1; x <= w; x++) {
+      uint8_t idx = x < w ? bubuTilePixel(s, tile, y * s.tile + x) : 0;
+      if (x == w || idx != run) {
+        tft.fillRect(x0 + (cx + start) * scale, y0 + (cy + y) * scale, (x - start) * scale, scale,
+                     pgm_read_word(&s.palette[run]));
+        start = x;
+        run = idx;
+      }
+    }
+  }
+}
+
+// prev < 0: draw every tile. Otherwise skip the tiles frame `prev` already drew.
+template <class Display>
+void bubuDrawTiledFrame(Display& tft, const BubuTileAnim& a, uint16_t frame,
+                        int16_t x0, int16_t y0, uint8_t scale, int32_t prev = -1) {
+  if (prev >= a.frame_count) prev = -1;
+  for (uint8_t ty = 0; ty < a.down; ty++) {
+    for (uint8_t tx = 0; tx < a.across; tx++) {
+      uint16_t slot = ty * a.across + tx;
+      uint16_t index = bubuTileIndex(a, frame, slot);
+      if (prev >= 0 && bubuTileIndex(a, (uint16_t)prev, slot) == index) continue;
+      bubuDrawTile(tft, a, index, tx, ty, x0, y0, scale);
+    }
+  }
+}
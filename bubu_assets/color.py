@@ -0,0 +1,46 @@
+"""
+Colour conversion between the editors' "#RRGGBB" strings, 8-bit RGB and RGB565.
+
+RGB565 is what the TFT takes. It keeps the top 5/6/5 bits of red, green and
+blue. Going back to 8 bits repeats the high bits into the low ones
+(0b11111 → 0xFF, not 0xF8), so white stays white and a colour survives a
+565 → RGB → 565 round trip unchanged.
+
+The rgb_* functions work on plain ints or on numpy arrays of any shape.
+"""
+import numpy as np
+
+
+def hex_to_rgb(hex_color):
+    h = hex_color.lstrip('#')
+    return tuple(int(h[i:i+2], 16) for i in (0, 2, 4))
+
+
+def rgb_to_hex(r, g, b):
+    return f"#{int(r):02X}{int(g):02X}{int(b):02X}"
+
+
+def rgb_to_565(r, g, b):
+    return ((r & 0xF8) << 8) | ((g & 0xFC) << 3) | (b >> 3)
+
+
+def hex_to_565(hex_color):
+    return rgb_to_565(*hex_to_rgb(hex_color))
+
+
+def rgb565_to_rgb(value):
+    """RGB565 → (r, g, b) at 8 bits per channel."""
+    r = (value >> 11) & 0x1F
+    g = (value >> 5) & 0x3F
+    b = value & 0x1F
+    return (r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2)
+
+
+def rgb565_to_hex(value):
+    return rgb_to_hex(*rgb565_to_rgb(int(value)))
+
+
+def pixels_to_565(rgb):
+    """(..., 3) uint8 RGB array → (...) uint16 RGB565 array."""
+    rgb = np.asarray(rgb, dtype=np.uint16)
+    return rgb_to_565(rgb[..., 0], rgb[..., 1], rgb[..., 2]).astype(np.uint16)
@@ -0,0 +1,254 @@
+"""
+Frame encoders for the .h export — raw RGB565, palette-indexed, RLE and delta.
+
+A raw frame is ROWS x COLS uint16_t (60x34 at SCALE=4 → ~4 KB per frame in
+PROGMEM). Mood faces only use a handful of colours and mostly flat areas, so:
+
+  raw    the original format: one RGB565 word per cell
+  pal4   shared RGB565 palette + 4-bit indices (≤16 colours), rows byte-aligned
+  pal8   shared RGB565 palette + 8-bit indices (≤256 colours)
+  rle    per row: (run length, palette index) byte pairs; runs never cross rows
+  delta  frame 0 as an RLE keyframe, then for every frame only the cells that
+         changed since the previous one: (row, col, run length, index) quads.
+         delta[0] is last frame → frame 0, so looping never needs the keyframe
+
+Every encoded animation is one PROGMEM blob plus frame offsets; bubu_frames.h
+(copied next to the exported header) decodes them with fillRect per run, so
+the sketch never expands a frame into a full bitmap.
+
+The decode_* functions mirror the C decoders and are used to verify exports.
+"""
+import os
+import shutil
+
+import numpy as np
+
+from .frames import FrameStore
+
+ENCODINGS = ["raw", "pal4", "pal8", "rle", "delta"]
+DECODER_HEADER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bubu_frames.h")
+MAX_RUN = 255
+
+
+def frames_to_565(frames):
+    """
+    Editor frames → (frames, rows, cols) uint16 RGB565 array. Takes a
+    FrameStore (one table lookup for the whole animation) or "#RRGGBB" grids
+    from a project file (each distinct colour parsed once).
+    """
+    if not isinstance(frames, FrameStore):
+        frames = FrameStore.from_hex(frames)
+    return frames.to_565()
+
+
+def build_palette(frames565):
+    """
+    Shared palette across all frames, in first-seen order, and every cell's
+    index into it (same shape as frames565).
+    """
+    flat = np.asarray(frames565, dtype=np.uint16).ravel()
+    values, first, inverse = np.unique(flat, return_index=True, return_inverse=True)
+    order = np.argsort(first)                  # np.unique sorts; re-rank by first appearance
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return values[order].tolist(), rank[inverse].reshape(np.shape(frames565))
+
+
+def _frame_runs(grid):
+    """
+    Runs of equal values in a 2-D grid, row by row: (rows, starts, lengths,
+    values) arrays. Runs never cross rows and are capped at MAX_RUN.
+    """
+    grid = np.asarray(grid)
+    cols = grid.shape[1]
+    flat = grid.ravel()
+    starts = np.union1d(np.flatnonzero(np.diff(flat)) + 1, np.arange(0, flat.size, cols))
+    lengths = np.diff(np.append(starts, flat.size))
+    # Split runs longer than MAX_RUN into MAX_RUN-sized pieces
+    pieces = -(-lengths // MAX_RUN)
+    which = np.repeat(np.arange(len(starts)), pieces)
+    step = (np.arange(len(which)) - np.repeat(np.cumsum(pieces) - pieces, pieces)) * MAX_RUN
+    starts, lengths = starts[which] + step, np.minimum(lengths[which] - step, MAX_RUN)
+    return starts // cols, starts % cols, lengths, flat[starts]
+
+
+def _runs(row):
+    """[(start, length, value)] for one row, runs capped at MAX_RUN."""
+    _, starts, lengths, values = _frame_runs(np.asarray(row).reshape(1, -1))
+    return list(zip(starts.tolist(), lengths.tolist(), values.tolist()))
+
+
+# ──────────────────────────────────────────────
+# Encoders — each returns {"palette", "blobs", "keyframe", "bpp"}
+# ──────────────────────────────────────────────
+
+def _require_palette(palette, limit, encoding):
+    if len(palette) > limit:
+        raise ValueError(f"{encoding} supports at most {limit} colours, animation uses {len(palette)}")
+
+
+def encode_palette(frames565, bpp):
+    palette, index = build_palette(frames565)
+    _require_palette(palette, 1 << bpp, f"pal{bpp}")
+    index = index.astype(np.uint8)
+    if bpp == 4:
+        if index.shape[2] % 2:                # rows stay byte-aligned: pad odd widths with index 0
+            index = np.pad(index, ((0, 0), (0, 0), (0, 1)))
+        index = (index[:, :, 0::2] << 4) | index[:, :, 1::2]
+    return {"palette": palette, "blobs": [fr.tobytes() for fr in index], "keyframe": b"", "bpp": bpp}
+
+
+def _rle_frame(index):
+    _, _, lengths, values = _frame_runs(index)
+    return np.stack([lengths, values], axis=1).astype(np.uint8).tobytes()
+
+
+def encode_rle(frames565):
+    palette, index = build_palette(frames565)
+    _require_palette(palette, 256, "rle")
+    return {"palette": palette, "blobs": [_rle_frame(fr) for fr in index],
+            "keyframe": b"", "bpp": 8}
+
+
+def _delta_frame(prev, index):
+    # Unchanged cells become -1, so runs of one new index stop at them
+    changed = np.where(prev != index, index.astype(np.int16), -1)
+    rows, starts, lengths, values = _frame_runs(changed)
+    keep = values >= 0
+    return np.stack([rows[keep], starts[keep], lengths[keep], values[keep]],
+                    axis=1).astype(np.uint8).tobytes()
+
+
+def encode_delta(frames565):
+    palette, index = build_palette(frames565)
+    _require_palette(palette, 256, "delta")
+    blobs = [_delta_frame(index[i - 1], fr) for i, fr in enumerate(index)]
+    return {"palette": palette, "blobs": blobs,
+            "keyframe": _rle_frame(index[0]) if len(index) else b"", "bpp": 8}
+
+
+def encode(frames565, encoding):
+    frames565 = np.asarray(frames565, dtype=np.uint16)
+    if len(frames565) and (frames565.shape[1] > 255 or frames565.shape[2] > 255):
+        raise ValueError(f"{encoding} stores sizes/positions as bytes — frames must be at most 255x255")
+    if encoding in ("pal4", "pal8"):
+        return encode_palette(frames565, 4 if encoding == "pal4" else 8)
+    if encoding == "rle":
+        return encode_rle(frames565)
+    if encoding == "delta":
+        return encode_delta(frames565)
+    raise ValueError(f"Unknown encoding '{encoding}' ({', '.join(ENCODINGS)})")
+
+
+def encoded_size(frames565, encoding):
+    """PROGMEM bytes the animation's pixel data takes in `encoding`."""
+    rows, cols = len(frames565[0]), len(frames565[0][0])
+    if encoding == "raw":
+        return len(frames565) * rows * cols * 2
+    enc = encode(frames565, encoding)
+    return (len(enc["palette"]) * 2 + sum(map(len, enc["blobs"])) + len(enc["keyframe"])
+            + (len(enc["blobs"]) + 1) * 4)
+
+
+# ──────────────────────────────────────────────
+# Reference decoders (mirror bubu_frames.h)
+# ──────────────────────────────────────────────
+
+def decode_palette(blob, palette, bpp, rows, cols):
+    if bpp == 8:
+        return [[palette[blob[r * cols + c]] for c in range(cols)] for r in range(rows)]
+    stride = (cols + 1) // 2
+    return [[palette[(blob[r * stride + c // 2] >> (4 if c % 2 == 0 else 0)) & 0x0F]
+             for c in range(cols)] for r in range(rows)]
+
+
+def decode_rle(blob, palette, rows, cols):
+    out, row = [], []
+    for i in range(0, len(blob), 2):
+        row.extend([palette[blob[i + 1]]] * blob[i])
+        if len(row) == cols:
+            out.append(row)
+            row = []
+    return out
+
+
+def apply_delta(prev, blob, palette):
+    fr = [row[:] for row in prev]
+    for i in range(0, len(blob), 4):
+        r, c, length, idx = blob[i:i + 4]
+        fr[r][c:c + length] = [palette[idx]] * length
+    return fr
+
+
+def decode_all(enc, encoding, rows, cols):
+    """Every frame of an encoded animation, back as RGB565 grids."""
+    palette, blobs = enc["palette"], enc["blobs"]
+    if encoding in ("pal4", "pal8"):
+        return [decode_palette(b, palette, enc["bpp"], rows, cols) for b in blobs]
+    if encoding == "rle":
+        return [decode_rle(b, palette, rows, cols) for b in blobs]
+    frames = [decode_rle(enc["keyframe"], palette, rows, cols)]
+    for blob in blobs[1:]:
+        frames.append(apply_delta(frames[-1], blob, palette))
+    return frames
+
+
+# ──────────────────────────────────────────────
+# Header writer
+# ──────────────────────────────────────────────
+
+def _c_array(f, decl, values, fmt, per_line=16):
+    f.write(f"{decl} PROGMEM = {{\n")
+    for i in range(0, len(values), per_line):
+        f.write("  " + ", ".join(fmt.format(v) for v in values[i:i + per_line]) + ",\n")
+    f.write("};\n\n")
+
+
+def write_header(f, name, frames, delay, encoding="raw"):
+    """Write the animation as a C header in `encoding` (raw keeps the original layout)."""
+    frames565 = frames_to_565(frames)
+    rows, cols = len(frames565[0]), len(frames565[0][0])
+    if encoding == "raw":
+        f.write(f"#include <pgmspace.h>\nconst int {name}_delay = {delay};\n")
+        for i, fr in enumerate(frames565):
+            f.write(f"const uint16_t {name}{i+1}[] PROGMEM = {{\n")
+            for row in fr.tolist():
+                f.write("  " + ", ".join(f"0x{v:04X}" for v in row) + ",\n")
+            f.write("};\n\n")
+        f.write(f"const uint16_t* const {name}_anim[] PROGMEM = {{"+", ".join([f"{name}{i+1}" for i in range(len(frames565))])+"};\n")
+        f.write(f"const int {name}_frame_count = {len(frames565)};\n")
+        return
+
+    enc = encode(frames565, encoding)
+    data = b"".join(enc["blobs"])
+    offsets = [0]
+    for blob in enc["blobs"]:
+        offsets.append(offsets[-1] + len(blob))
+
+    f.write(f"// {name}: {len(frames565)} frames, {cols}x{rows}, {encoding} "
+            f"({encoded_size(frames565, encoding)} bytes, raw {encoded_size(frames565, 'raw')})\n")
+    f.write('#include <pgmspace.h>\n#include "bubu_frames.h"\n')
+    f.write(f"const int {name}_delay = {delay};\n")
+    f.write(f"const int {name}_frame_count = {len(frames565)};\n\n")
+    _c_array(f, f"const uint16_t {name}_palette[]", enc["palette"], "0x{:04X}", 12)
+    _c_array(f, f"const uint8_t {name}_data[]", list(data) or [0], "0x{:02X}")
+    _c_array(f, f"const uint32_t {name}_offsets[]", offsets, "{}", 12)
+    keyframe = "nullptr"
+    if enc["keyframe"]:
+        _c_array(f, f"const uint8_t {name}_keyframe[]", list(enc["keyframe"]), "0x{:02X}")
+        keyframe = f"{name}_keyframe"
+    f.write(f"const BubuAnim {name}_packed = {{ BUBU_ENC_{encoding.upper()}, {cols}, {rows}, "
+            f"{len(frames565)}, {delay}, {name}_palette, {name}_data, {name}_offsets, {keyframe} }};\n")
+
+
+def export_header(path, frames, delay, encoding="raw"):
+    """Write `path` (name taken from the file name) and, for packed encodings,
+    copy bubu_frames.h next to it so the sketch folder compiles as-is."""
+    name = os.path.basename(path).replace(".h", "").replace(" ", "_")
+    with open(path, "w") as f:
+        write_header(f, name, frames, delay, encoding)
+    if encoding != "raw":
+        target = os.path.join(os.path.dirname(os.path.abspath(path)), "bubu_frames.h")
+        if os.path.abspath(target) != DECODER_HEADER:
+            shutil.copyfile(DECODER_HEADER, target)
+    return name
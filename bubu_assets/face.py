@@ -0,0 +1,45 @@
+"""
+Face-region export, the layout the ESP32 custom-face sketch includes.
+
+The ESP32 editor draws on a coarse grid (48x64 cells at BLOCK=5). Only the top
+of the grid, above the editor's white boundary line, is the face. On the TFT
+that region is FACE_W x FACE_H pixels (240x135), and the sketch expects it as
+a single `face_bitmap[FACE_W * FACE_H]` of RGB565 words.
+
+face_pixels() builds that bitmap in two steps. It upscales the frame by
+`block` (every cell becomes block x block pixels), then crops to width x
+height in pixels. Crop boundaries therefore don't have to fall on cell edges.
+"""
+import numpy as np
+
+
+def face_pixels(store, f, block, width, height):
+    """Frame f → (height, width) uint16 RGB565 bitmap of the face region."""
+    rows = -(-height // block)      # cells needed to cover the region
+    cols = -(-width // block)
+    if rows > store.rows or cols > store.cols:
+        raise ValueError(f"a {width}x{height} face needs {cols}x{rows} cells at BLOCK={block}, "
+                         f"the grid is {store.cols}x{store.rows}")
+    return store.upscale(f, block, rows, cols)[:height, :width]
+
+
+def write_face_header(f, pixels, per_line=12):
+    """Write `pixels` (from face_pixels) with the exact names the custom-face sketch uses."""
+    height, width = pixels.shape
+    flat = np.ascontiguousarray(pixels).ravel().tolist()
+    f.write("// Auto-generated custom face header\n")
+    f.write("#pragma once\n")
+    f.write("#include <Arduino.h>\n\n")
+    f.write(f"#define FACE_W {width}\n")
+    f.write(f"#define FACE_H {height}\n\n")
+    f.write("static const uint16_t face_bitmap[FACE_W * FACE_H] PROGMEM = {\n")
+    for i in range(0, len(flat), per_line):
+        f.write("  " + "".join(f"0x{v:04X}, " for v in flat[i:i + per_line]) + "\n")
+    f.write("};\n")
+
+
+def export_face(path, store, f, block, width, height):
+    pixels = face_pixels(store, f, block, width, height)
+    with open(path, "w") as out:
+        write_face_header(out, pixels)
+    return pixels
@@ -0,0 +1,212 @@
+"""
+NumPy frame store shared by the pixel editors, the compiler and the encoders.
+
+All frames live in one uint16 array, data[frame, row, col]. Each entry is an
+index into a colour table (the "#RRGGBB" strings plus their RGB565 values), so
+the editor still works with exact hex colours:
+
+  export      one table lookup for the whole animation: rgb565[data]
+  upscale     np.repeat along both axes instead of nested loops per cell
+  flood fill  scanline fill over the target colour's boolean mask (raster.py)
+  move/paste  slice assignments on the frame
+
+The table only ever grows, so an index stays valid for as long as the store
+exists. Copied regions and undo diffs can hold plain indices.
+
+Undo keeps diffs, not whole frames. begin_edit() takes one working copy of the
+frame being edited. end_edit() stores just the cells that changed, as
+(flat positions, old indices). That copy is the only full frame held, however
+long the history is. History is keyed by a frame id that stays attached to the
+frame when frames are inserted or deleted, so an undo never lands on the wrong
+frame.
+"""
+from collections import deque
+
+import numpy as np
+
+from .color import hex_to_565
+from .raster import scanline_fill
+
+BACKGROUND = "#000000"
+
+
+def _normalize(hex_color):
+    return hex_color.upper()
+
+
+class FrameStore:
+    def __init__(self, rows, cols, frames=1, background=BACKGROUND, max_history=50):
+        self.rows, self.cols = rows, cols
+        self.colors = []                                  # index → "#RRGGBB"
+        self._lookup = {}                                 # "#RRGGBB" → index
+        self._rgb565 = np.zeros(16, dtype=np.uint16)      # index → RGB565, grown on demand
+        self.background = self.color_index(background)
+        self.data = np.full((frames, rows, cols), self.background, dtype=np.uint16)
+
+        self.max_history = max_history
+        self._ids = list(range(frames))      # stable id per frame, for history
+        self._next_id = frames
+        self._history = {}                   # frame id → deque of (positions, old indices)
+        self._edit = None                    # (frame id, working copy) while an edit is open
+
+    @classmethod
+    def from_indices(cls, colors, index, **kwargs):
+        """Build from index grids (frames x rows x cols) into the list of "#RRGGBB" `colors`."""
+        index = np.asarray(index)
+        store = cls(index.shape[1], index.shape[2], frames=0, **kwargs)
+        table = np.array([store.color_index(c) for c in colors], dtype=np.uint16)
+        store.data = table[index]
+        store._ids = list(range(len(index)))
+        store._next_id = len(index)
+        return store
+
+    @classmethod
+    def from_hex(cls, frames, **kwargs):
+        """Build from "#RRGGBB" grids (the project file layout); each distinct colour is parsed once."""
+        grid = np.char.upper(np.array(frames, dtype=str))
+        if grid.ndim != 3:
+            raise ValueError("frames must be a list of equally sized grids")
+        unique, inverse = np.unique(grid, return_inverse=True)
+        return cls.from_indices(unique, inverse.reshape(grid.shape), **kwargs)
+
+    # ── colours ────────────────────────────────
+    def color_index(self, hex_color):
+        hex_color = _normalize(hex_color)
+        idx = self._lookup.get(hex_color)
+        if idx is None:
+            idx = len(self.colors)
+            if idx > np.iinfo(np.uint16).max:
+                raise ValueError("too many distinct colours for a uint16 frame store")
+            if idx == len(self._rgb565):
+                self._rgb565 = np.concatenate([self._rgb565, np.zeros_like(self._rgb565)])
+            self._rgb565[idx] = hex_to_565(hex_color)
+            self.colors.append(hex_color)
+            self._lookup[hex_color] = idx
+        return idx
+
+    def to_hex(self):
+        """Every frame as "#RRGGBB" grids (for saving)."""
+        return np.array(self.colors, dtype=object)[self.data].tolist()
+
+    def hex_grid(self, f):
+        """Frame f as a 2-D object array of "#RRGGBB" strings."""
+        return np.array(self.colors, dtype=object)[self.data[f]]
+
+    def hex_frame(self, f):
+        return self.hex_grid(f).tolist()
+
+    def get(self, f, r, c):
+        return self.colors[self.data[f, r, c]]
+
+    def to_565(self, frames=None):
+        """RGB565 array for all frames (or an index/slice of them), one lookup."""
+        data = self.data if frames is None else self.data[frames]
+        return self._rgb565[data]
+
+    def upscale(self, f, block, rows=None, cols=None):
+        """Frame f cropped to rows x cols, as RGB565 with each cell repeated block x block times."""
+        frame = self._rgb565[self.data[f, :rows, :cols]]
+        return np.repeat(np.repeat(frame, block, axis=0), block, axis=1)
+
+    # ── frames ─────────────────────────────────
+    def __len__(self):
+        return len(self.data)
+
+    def insert(self, at, source=None):
+        """Insert a blank frame (or a copy of frame `source`) at position `at`."""
+        if source is None:
+            frame = np.full((1, self.rows, self.cols), self.background, dtype=np.uint16)
+        else:
+            frame = self.data[source:source + 1].copy()
+        self.data = np.concatenate([self.data[:at], frame, self.data[at:]])
+        self._ids.insert(at, self._next_id)
+        self._next_id += 1
+
+    def delete(self, f):
+        self.data = np.delete(self.data, f, axis=0)
+        self._history.pop(self._ids.pop(f), None)
+
+    # ── editing (each returns the mask of cells it wrote) ──
+    def set_cells(self, f, rows, cols, hex_color):
+        idx = self.color_index(hex_color)
+        rows, cols = np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)
+        keep = (rows >= 0) & (rows < self.rows) & (cols >= 0) & (cols < self.cols)
+        mask = np.zeros((self.rows, self.cols), dtype=bool)
+        mask[rows[keep], cols[keep]] = True
+        self.data[f][mask] = idx
+        return mask
+
+    def flood_mask(self, f, r, c):
+        """4-connected region of frame f that shares (r, c)'s colour."""
+        frame = self.data[f]
+        return scanline_fill(frame == frame[r, c], r, c)
+
+    def fill(self, f, mask, hex_color):
+        self.data[f][mask] = self.color_index(hex_color)
+        return mask
+
+    def put_frame(self, f, colors, index, r=0, c=0):
+        """paste() an index grid into another colour table (e.g. an imported image) at (r, c)."""
+        table = np.array([self.color_index(color) for color in colors], dtype=np.uint16)
+        return self.paste(f, table[np.asarray(index)], r, c)
+
+    def region(self, f, box):
+        """Copy of the cells inside box = (r0, c0, r1, c1), inclusive."""
+        r0, c0, r1, c1 = box
+        return self.data[f, r0:r1 + 1, c0:c1 + 1].copy()
+
+    def paste(self, f, block, r, c):
+        """Write a region() copy with its top-left at (r, c), clipped to the frame."""
+        h = min(block.shape[0], self.rows - r)
+        w = min(block.shape[1], self.cols - c)
+        mask = np.zeros((self.rows, self.cols), dtype=bool)
+        if h > 0 and w > 0:
+            self.data[f, r:r + h, c:c + w] = block[:h, :w]
+            mask[r:r + h, c:c + w] = True
+        return mask
+
+    def clear(self, f, box):
+        r0, c0, r1, c1 = box
+        self.data[f, r0:r1 + 1, c0:c1 + 1] = self.background
+        mask = np.zeros((self.rows, self.cols), dtype=bool)
+        mask[r0:r1 + 1, c0:c1 + 1] = True
+        return mask
+
+    def move(self, f, box, dr, dc):
+        """Move the cells in box by (dr, dc), leaving background behind."""
+        block = self.region(f, box)
+        mask = self.clear(f, box)
+        return mask | self.paste(f, block, box[0] + dr, box[1] + dc)
+
+    # ── undo ───────────────────────────────────
+    def begin_edit(self, f):
+        """Start recording an undo step for frame f (closing any open one)."""
+        self.end_edit()
+        self._edit = (self._ids[f], self.data[f].copy())
+
+    def end_edit(self):
+        if self._edit is None:
+            return
+        fid, before = self._edit
+        self._edit = None
+        if fid not in self._ids:
+            return
+        after = self.data[self._ids.index(fid)]
+        changed = np.flatnonzero(before != after)
+        if changed.size:
+            stack = self._history.setdefault(fid, deque(maxlen=self.max_history))
+            pos_type = np.uint16 if before.size <= 1 << 16 else np.uint32
+            stack.append((changed.astype(pos_type), before.ravel()[changed]))
+
+    def undo(self, f):
+        """Revert frame f's last edit. Returns the mask of restored cells, or None."""
+        self.end_edit()
+        stack = self._history.get(self._ids[f])
+        if not stack:
+            return None
+        positions, old = stack.pop()
+        frame = self.data[f].ravel()    # view: data is C-contiguous
+        frame[positions] = old
+        mask = np.zeros(self.rows * self.cols, dtype=bool)
+        mask[positions] = True
+        return mask.reshape(self.rows, self.cols)
@@ -0,0 +1,230 @@
+"""
+PNG / GIF import: map a picture (or every frame of a GIF) onto an editor grid and palette.
+
+  downscale   area average over the source pixels each cell covers (np.add.reduceat
+              per axis), nearest neighbour when the grid is larger than the image
+  quantize    median cut, optionally refined by k-means, all on numpy arrays. Or
+              the caller's own palette (the editor's swatches)
+  dither      none, ordered (8x8 Bayer) or Floyd-Steinberg. Floyd-Steinberg
+              walks anti-diagonal wavefronts (2 * row + col = t): a cell only
+              pushes error to cells on later wavefronts, so each wavefront is
+              one vectorized step for every frame at once
+
+Palette colours are snapped to RGB565 before any pixel is mapped, so the
+dither error is measured against what the TFT will actually show.
+
+convert() is the numpy core (frames in, colour table + index grids out).
+import_image() decodes the file with Pillow, the only optional dependency,
+imported when an image is loaded, and returns a Project the editors and
+`emotions import` can use directly.
+"""
+import numpy as np
+
+from .color import hex_to_rgb, rgb565_to_rgb, rgb_to_565, rgb_to_hex
+from .frames import FrameStore
+from .project import DEFAULT_SPEED, Project
+
+METHODS = ["median-cut", "kmeans"]
+DITHERS = ["none", "ordered", "floyd-steinberg"]
+
+
+# ──────────────────────────────────────────────
+# Geometry
+# ──────────────────────────────────────────────
+
+def fit_size(height, width, rows, cols):
+    """Largest rows x cols box with the image's aspect ratio (cells are square)."""
+    scale = min(rows / height, cols / width)
+    return max(1, min(rows, round(height * scale))), max(1, min(cols, round(width * scale)))
+
+
+def _resample(pixels, size, axis):
+    n = pixels.shape[axis]
+    if size == n:
+        return pixels
+    if size > n:
+        return np.take(pixels, (np.arange(size) * n) // size, axis=axis)
+    edges = (np.arange(size) * n) // size
+    counts = np.diff(np.append(edges, n)).reshape([-1] + [1] * (pixels.ndim - axis % pixels.ndim - 1))
+    return np.add.reduceat(pixels, edges, axis=axis) / counts
+
+
+def downscale(pixels, rows, cols):
+    """(..., H, W, C) float pixels → (..., rows, cols, C), each cell the mean of the pixels it covers."""
+    return _resample(_resample(np.asarray(pixels, dtype=np.float64), rows, -3), cols, -2)
+
+
+def place(pixels, rows, cols, background):
+    """Centre (..., h, w, 3) pixels on a rows x cols grid filled with the background RGB."""
+    h, w = pixels.shape[-3:-1]
+    out = np.empty(pixels.shape[:-3] + (rows, cols, 3))
+    out[...] = background
+    top, left = (rows - h) // 2, (cols - w) // 2
+    out[..., top:top + h, left:left + w, :] = pixels
+    return out
+
+
+# ──────────────────────────────────────────────
+# Palettes
+# ──────────────────────────────────────────────
+
+def snap_565(rgb):
+    """The colours the TFT shows for these RGB values (any shape, last axis RGB)."""
+    rgb = np.clip(np.rint(rgb), 0, 255).astype(np.int64)
+    return np.stack(rgb565_to_rgb(rgb_to_565(rgb[..., 0], rgb[..., 1], rgb[..., 2])), axis=-1)
+
+
+def median_cut(pixels, n_colors):
+    """Up to n_colors box means: repeatedly split the box with the widest channel at its median."""
+    boxes = [np.asarray(pixels, dtype=np.float64).reshape(-1, 3)]
+    while len(boxes) < n_colors:
+        spans = [(b.max(axis=0) - b.min(axis=0)) if len(b) > 1 else np.zeros(3) for b in boxes]
+        widest = int(np.argmax([s.max() for s in spans]))
+        if spans[widest].max() == 0:
+            break                         # every box is a single colour
+        box, channel = boxes.pop(widest), int(np.argmax(spans[widest]))
+        box = box[np.argsort(box[:, channel], kind="stable")]
+        half = len(box) // 2
+        boxes += [box[:half], box[half:]]
+    return np.array([b.mean(axis=0) for b in boxes])
+
+
+def nearest(pixels, palette):
+    """Index of the closest palette colour (squared RGB distance) for every pixel."""
+    pixels = np.asarray(pixels, dtype=np.float64)
+    d = ((pixels[..., None, :] - palette) ** 2).sum(axis=-1)
+    return d.argmin(axis=-1)
+
+
+def kmeans(pixels, n_colors, iterations=16):
+    """Lloyd's k-means seeded with the median-cut palette (deterministic)."""
+    pixels = np.asarray(pixels, dtype=np.float64).reshape(-1, 3)
+    centers = median_cut(pixels, n_colors)
+    labels = None
+    for _ in range(iterations):
+        new = nearest(pixels, centers)
+        if labels is not None and np.array_equal(new, labels):
+            break
+        labels = new
+        counts = np.bincount(labels, minlength=len(centers))
+        sums = np.stack([np.bincount(labels, weights=pixels[:, ch], minlength=len(centers)) for ch in range(3)], axis=1)
+        used = counts > 0                 # an emptied cluster keeps its old centre
+        centers[used] = sums[used] / counts[used, None]
+    return centers
+
+
+def build_palette(pixels, n_colors, method="median-cut"):
+    """n_colors (or fewer) distinct RGB565-exact colours for these pixels."""
+    if method not in METHODS:
+        raise ValueError(f"Unknown quantization method '{method}' ({', '.join(METHODS)})")
+    centers = median_cut(pixels, n_colors) if method == "median-cut" else kmeans(pixels, n_colors)
+    return np.unique(snap_565(centers), axis=0)
+
+
+# ──────────────────────────────────────────────
+# Dithering
+# ──────────────────────────────────────────────
+
+def bayer(n=8):
+    """n x n ordered-dither thresholds in (-0.5, 0.5)."""
+    m = np.zeros((1, 1), dtype=np.int64)
+    while len(m) < n:
+        m = np.block([[4 * m, 4 * m + 2], [4 * m + 3, 4 * m + 1]])
+    return (m + 0.5) / m.size - 0.5
+
+
+def _spread(palette):
+    """Per-channel dither amplitude: typical distance to the nearest other palette colour."""
+    if len(palette) < 2:
+        return 0.0
+    d = np.sqrt(((palette[:, None, :] - palette[None, :, :]) ** 2).sum(axis=-1))
+    np.fill_diagonal(d, np.inf)
+    return float(np.median(d.min(axis=1))) / np.sqrt(3)
+
+
+def map_ordered(pixels, palette):
+    rows, cols = pixels.shape[-3:-1]
+    threshold = np.tile(bayer(), (-(-rows // 8), -(-cols // 8)))[:rows, :cols, None]
+    return nearest(pixels + threshold * _spread(palette), palette)
+
+
+def map_floyd_steinberg(pixels, palette):
+    """Floyd-Steinberg error diffusion over (..., rows, cols, 3) frames, one wavefront per step."""
+    work = np.array(pixels, dtype=np.float64).reshape((-1,) + pixels.shape[-3:])
+    n, rows, cols = work.shape[:3]
+    out = np.zeros((n, rows, cols), dtype=np.int64)
+    every = slice(None)
+    for t in range(cols + 2 * (rows - 1)):
+        r = np.arange(max(0, (t - cols + 2) // 2), min(rows - 1, t // 2) + 1)
+        c = t - 2 * r
+        values = np.clip(work[:, r, c], 0, 255)
+        idx = nearest(values, palette)
+        out[:, r, c] = idx
+        err = values - palette[idx]
+        for dr, dc, weight in ((0, 1, 7 / 16), (1, -1, 3 / 16), (1, 0, 5 / 16), (1, 1, 1 / 16)):
+            keep = (r + dr < rows) & (c + dc >= 0) & (c + dc < cols)
+            # (r, c+1) and (r+1, c-1) can be the same cell for neighbours on a wavefront: add.at sums both
+            np.add.at(work, (every, r[keep] + dr, c[keep] + dc), err[:, keep] * weight)
+    return out.reshape(pixels.shape[:-1])
+
+
+# ──────────────────────────────────────────────
+# Pipeline
+# ──────────────────────────────────────────────
+
+def convert(frames, rows, cols, colors=None, n_colors=16, method="median-cut", dither="none",
+            background="#000000"):
+    """
+    frames: (n, H, W, 3) RGB in 0..255. Returns ("#RRGGBB" colour table, (n, rows, cols) indices).
+    `colors` forces a palette (e.g. the editor's swatches); otherwise one palette of
+    up to n_colors is built over all frames, so colours stay put across an animation.
+    """
+    if dither not in DITHERS:
+        raise ValueError(f"Unknown dither '{dither}' ({', '.join(DITHERS)})")
+    frames = np.asarray(frames, dtype=np.float64)
+    h, w = fit_size(frames.shape[1], frames.shape[2], rows, cols)
+    pixels = place(downscale(frames, h, w), rows, cols, hex_to_rgb(background))
+
+    if colors:
+        palette = snap_565(np.array([hex_to_rgb(c) for c in colors], dtype=np.float64))
+    else:
+        palette = build_palette(pixels, n_colors, method)
+    palette = palette.astype(np.float64)
+    if dither == "ordered":
+        index = map_ordered(pixels, palette)
+    elif dither == "floyd-steinberg":
+        index = map_floyd_steinberg(pixels, palette)
+    else:
+        index = nearest(pixels, palette)
+    return [rgb_to_hex(*rgb) for rgb in palette.astype(np.int64)], index
+
+
+def load_frames(path, background="#000000"):
+    """
+    Decode a PNG/GIF (anything Pillow reads) → ((n, H, W, 3) RGB array, [frame ms]).
+    Transparent pixels are composited onto the background colour.
+    """
+    try:
+        from PIL import Image, ImageSequence
+    except ImportError:
+        raise ImportError("image import needs Pillow: pip install Pillow") from None
+    bg = np.array(hex_to_rgb(background), dtype=np.float64)
+    frames, durations = [], []
+    with Image.open(path) as im:
+        for frame in ImageSequence.Iterator(im):
+            rgba = np.asarray(frame.convert("RGBA"), dtype=np.float64)
+            alpha = rgba[..., 3:] / 255
+            frames.append(rgba[..., :3] * alpha + bg * (1 - alpha))
+            durations.append(frame.info.get("duration") or 0)
+    return np.stack(frames), durations
+
+
+def import_image(path, rows, cols, colors=None, n_colors=16, method="median-cut", dither="none",
+                 background="#000000"):
+    """Image file → Project (frames on a rows x cols grid, palette, GIF frame delay as speed)."""
+    frames, durations = load_frames(path, background)
+    table, index = convert(frames, rows, cols, colors, n_colors, method, dither, background)
+    store = FrameStore.from_indices(table, index, background=background)
+    timed = [d for d in durations if d > 0]
+    speed = round(sum(timed) / len(timed)) if timed else DEFAULT_SPEED
+    return Project(store, table, speed)
@@ -0,0 +1,278 @@
+"""
+Binary asset packs (.bpk): many animations in one file the firmware streams from SD or flash.
+
+Headers compiled into the firmware mean every face change needs a reflash.
+A pack is a plain file instead. The sketch reads the small index once, then
+reads one frame blob at a time into a DMA-capable buffer (see bubu_pack.h),
+so the emotion set can be swapped by copying a file.
+
+All integers are little-endian. Every offset is from the start of the file.
+
+  header   40 bytes   magic "BUBUPACK", version, blob alignment, animation
+                      count, table offsets, data offset, file size, largest
+                      blob (so the sketch can size its buffer once) and a
+                      CRC-32 of both tables
+  anims    48 bytes   per animation: name (15 chars + NUL), encoding, width,
+                      height, frame count, delay, first frame-table entry,
+                      palette offset/count, delta keyframe offset/size, and
+                      a CRC-32 of palette + keyframe
+  frames   12 bytes   per frame: blob offset, size, CRC-32
+  data                palettes, keyframes and frame blobs. Each starts on an
+                      `align` boundary (default 32, 512 = SD sector) and
+                      the gaps are zero-filled
+
+Frame blobs use the encoders' formats (BUBU_ENC_* in bubu_frames.h), plus raw
+(encoding 0): width x height RGB565 words. Palettes are RGB565 words.
+
+build_pack() writes a pack, Pack parses one (raising PackError on
+structural damage) and validate() lists every problem it finds, including
+CRC mismatches and blobs that don't decode to whole frames.
+"""
+import struct
+import zlib
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from . import encoders
+
+MAGIC = b"BUBUPACK"
+VERSION = 1
+DEFAULT_ALIGN = 32
+NAME_LEN = 16
+
+ENCODING_IDS = {"raw": 0, "pal4": 1, "pal8": 2, "rle": 3, "delta": 4}   # = BUBU_ENC_* in bubu_frames.h
+ENCODING_NAMES = {v: k for k, v in ENCODING_IDS.items()}
+
+HEADER = struct.Struct("<8sHHHHIIIIII")        # 40 bytes
+ANIM = struct.Struct("<16sBBBBHHIIHHIII")      # 48 bytes
+FRAME = struct.Struct("<III")                  # 12 bytes
+
+
+class PackError(ValueError):
+    """The file isn't a readable pack."""
+
+
+@dataclass
+class PackAnimation:
+    name: str
+    encoding: str
+    width: int
+    height: int
+    delay_ms: int
+    palette: list = field(default_factory=list)
+    keyframe: bytes = b""
+    frames: list = field(default_factory=list)     # [(offset, size, crc32)]
+    meta_crc: int = 0
+
+
+# ──────────────────────────────────────────────
+# Writing
+# ──────────────────────────────────────────────
+
+def _pad(n, align):
+    return -n % align
+
+
+def _encode_animation(store, encoding):
+    """(palette, keyframe, [frame blobs]) for one animation."""
+    frames565 = encoders.frames_to_565(store)
+    if encoding == "raw":
+        return [], b"", [np.asarray(fr, dtype="<u2").tobytes() for fr in frames565]
+    enc = encoders.encode(frames565, encoding)
+    return enc["palette"], enc["keyframe"], enc["blobs"]
+
+
+def build_pack(animations, encoding="rle", align=DEFAULT_ALIGN):
+    """
+    animations: [(name, FrameStore, delay_ms)] → pack bytes.
+    Raises ValueError for names that don't fit, bad alignment or frames the encoding can't hold.
+    """
+    if align < 4 or align & (align - 1) or align > 0xFFFF:
+        raise ValueError(f"alignment must be a power of two between 4 and 32768, got {align}")
+    if encoding not in ENCODING_IDS:
+        raise ValueError(f"Unknown encoding '{encoding}' ({', '.join(ENCODING_IDS)})")
+    names = [name for name, _, _ in animations]
+    if len(set(names)) != len(names):
+        raise ValueError("animation names in a pack must be unique")
+
+    encoded = []
+    for name, store, delay in animations:
+        raw_name = name.encode("ascii", "replace")
+        if len(raw_name) >= NAME_LEN:
+            raise ValueError(f"animation name '{name}' is longer than {NAME_LEN - 1} characters")
+        if store.rows > 255 or store.cols > 255:
+            raise ValueError(f"'{name}' is {store.cols}x{store.rows}; packs hold frames up to 255x255")
+        encoded.append((raw_name, store, int(delay)) + _encode_animation(store, encoding))
+
+    frame_total = sum(len(e[5]) for e in encoded)
+    anim_table = HEADER.size
+    frame_table = anim_table + ANIM.size * len(encoded)
+    data_offset = frame_table + FRAME.size * frame_total
+    data_offset += _pad(data_offset, align)
+
+    data = bytearray()
+
+    def place(blob):
+        """Append blob at the next aligned offset; returns its file offset."""
+        data.extend(b"\0" * _pad(data_offset + len(data), align))
+        offset = data_offset + len(data)
+        data.extend(blob)
+        return offset
+
+    anim_rows, frame_rows, first, max_blob = [], [], 0, 0
+    for raw_name, store, delay, palette, keyframe, blobs in encoded:
+        palette_bytes = np.asarray(palette, dtype="<u2").tobytes()
+        palette_offset = place(palette_bytes) if palette else 0
+        keyframe_offset = place(keyframe) if keyframe else 0
+        anim_rows.append(ANIM.pack(
+            raw_name, ENCODING_IDS[encoding], store.cols, store.rows, 0, len(blobs), delay,
+            first, palette_offset, len(palette), 0, keyframe_offset, len(keyframe),
+            zlib.crc32(palette_bytes + keyframe)))
+        for blob in blobs:
+            frame_rows.append(FRAME.pack(place(blob), len(blob), zlib.crc32(blob)))
+        first += len(blobs)
+        max_blob = max([max_blob, len(keyframe)] + [len(b) for b in blobs])
+    data.extend(b"\0" * _pad(data_offset + len(data), align))
+
+    tables = b"".join(anim_rows) + b"".join(frame_rows)
+    tables += b"\0" * (data_offset - frame_table - FRAME.size * frame_total)
+    file_size = data_offset + len(data)
+    header = HEADER.pack(MAGIC, VERSION, align, len(encoded), 0, anim_table, frame_table,
+                         data_offset, file_size, max_blob, zlib.crc32(tables))
+    return header + tables + bytes(data)
+
+
+def write_pack(path, animations, encoding="rle", align=DEFAULT_ALIGN):
+    data = build_pack(animations, encoding, align)
+    with open(path, "wb") as f:
+        f.write(data)
+    return len(data)
+
+
+# ──────────────────────────────────────────────
+# Reading
+# ──────────────────────────────────────────────
+
+class Pack:
+    def __init__(self, data):
+        self.data = bytes(data)
+        if len(self.data) < HEADER.size:
+            raise PackError("file is shorter than a pack header")
+        (magic, self.version, self.align, count, _, anim_table, frame_table,
+         self.data_offset, self.file_size, self.max_blob, self.index_crc) = HEADER.unpack_from(self.data)
+        if magic != MAGIC:
+            raise PackError("not a Bubu asset pack (bad magic)")
+        if self.version > VERSION:
+            raise PackError(f"pack version {self.version} is newer than this reader ({VERSION})")
+        if self.file_size != len(self.data):
+            raise PackError(f"header says {self.file_size} bytes, file has {len(self.data)}")
+        if not anim_table <= frame_table <= self.data_offset <= len(self.data):
+            raise PackError("table offsets are out of order or past the end of the file")
+        if anim_table + ANIM.size * count > frame_table:
+            raise PackError("animation table overlaps the frame table")
+
+        self.animations = {}
+        for i in range(count):
+            (raw_name, enc_id, width, height, _, frame_count, delay, first, pal_off, pal_count, _,
+             key_off, key_size, meta_crc) = ANIM.unpack_from(self.data, anim_table + i * ANIM.size)
+            if enc_id not in ENCODING_NAMES:
+                raise PackError(f"animation {i} has unknown encoding {enc_id}")
+            if frame_table + FRAME.size * (first + frame_count) > self.data_offset:
+                raise PackError(f"animation {i} frame entries run past the frame table")
+            if pal_off + 2 * pal_count > len(self.data) or key_off + key_size > len(self.data):
+                raise PackError(f"animation {i} palette or keyframe runs past the end of the file")
+            name = raw_name.split(b"\0", 1)[0].decode("ascii", "replace")
+            palette = np.frombuffer(self.data, dtype="<u2", count=pal_count, offset=pal_off).tolist() if pal_count else []
+            frames = [FRAME.unpack_from(self.data, frame_table + (first + j) * FRAME.size)
+                      for j in range(frame_count)]
+            self.animations[name] = PackAnimation(
+                name, ENCODING_NAMES[enc_id], width, height, delay, palette,
+                self.data[key_off:key_off + key_size], frames, meta_crc)
+        self._tables = self.data[anim_table:self.data_offset]
+
+    @classmethod
+    def open(cls, path):
+        with open(path, "rb") as f:
+            return cls(f.read())
+
+    def blob(self, anim, i):
+        offset, size, _ = anim.frames[i]
+        if offset + size > len(self.data):
+            raise PackError(f"{anim.name} frame {i} runs past the end of the file")
+        return self.data[offset:offset + size]
+
+    def decode(self, name):
+        """Every frame of animation `name` as RGB565 grids (what the device would draw)."""
+        anim = self.animations[name]
+        rows, cols = anim.height, anim.width
+        blobs = [self.blob(anim, i) for i in range(len(anim.frames))]
+        if anim.encoding == "raw":
+            return [np.frombuffer(b, dtype="<u2").reshape(rows, cols).tolist() for b in blobs]
+        enc = {"palette": anim.palette, "blobs": blobs, "keyframe": anim.keyframe,
+               "bpp": 4 if anim.encoding == "pal4" else 8}
+        return encoders.decode_all(enc, anim.encoding, rows, cols)
+
+
+def _blob_problem(anim, blob, encoding):
+    """Why `blob` can't be a whole `encoding` frame of anim, or None."""
+    cells = anim.width * anim.height
+    n_colors = len(anim.palette)
+    if encoding == "raw":
+        return None if len(blob) == 2 * cells else f"is {len(blob)} bytes, raw frames are {2 * cells}"
+    if encoding in ("pal4", "pal8"):
+        stride = (anim.width + 1) // 2 if encoding == "pal4" else anim.width
+        if len(blob) != stride * anim.height:
+            return f"is {len(blob)} bytes, expected {stride * anim.height}"
+        idx = np.frombuffer(blob, dtype=np.uint8)
+        if encoding == "pal4":
+            idx = np.concatenate([idx >> 4, idx & 0x0F])
+        return None if idx.size == 0 or idx.max() < n_colors else "indexes past the palette"
+    if encoding == "rle":
+        if len(blob) % 2:
+            return "has an odd number of RLE bytes"
+        runs = np.frombuffer(blob, dtype=np.uint8).reshape(-1, 2)
+        if runs[:, 0].sum() != cells:
+            return f"covers {int(runs[:, 0].sum())} cells, frames have {cells}"
+        return None if runs.size == 0 or runs[:, 1].max() < n_colors else "indexes past the palette"
+    if len(blob) % 4:
+        return "is not made of whole (row, col, run, index) quads"
+    quads = np.frombuffer(blob, dtype=np.uint8).reshape(-1, 4).astype(np.int64)
+    if quads.size and ((quads[:, 0] >= anim.height).any() or (quads[:, 1] + quads[:, 2] > anim.width).any()):
+        return "writes outside the frame"
+    return None if quads.size == 0 or quads[:, 3].max() < n_colors else "indexes past the palette"
+
+
+def validate(data):
+    """Every problem found in pack `data` (bytes) as strings; an empty list means it's sound."""
+    try:
+        pack = Pack(data)
+    except PackError as e:
+        return [str(e)]
+    problems = []
+    if zlib.crc32(pack._tables) != pack.index_crc:
+        problems.append("index CRC mismatch (animation or frame table damaged)")
+    for anim in pack.animations.values():
+        palette_bytes = np.asarray(anim.palette, dtype="<u2").tobytes()
+        if zlib.crc32(palette_bytes + anim.keyframe) != anim.meta_crc:
+            problems.append(f"{anim.name}: palette/keyframe CRC mismatch")
+        if anim.encoding == "delta":
+            why = _blob_problem(anim, anim.keyframe, "rle")
+            if why:
+                problems.append(f"{anim.name}: keyframe {why}")
+        for i, (offset, size, crc) in enumerate(anim.frames):
+            if offset % pack.align:
+                problems.append(f"{anim.name} frame {i}: offset {offset} is not {pack.align}-byte aligned")
+            if offset < pack.data_offset or offset + size > len(pack.data):
+                problems.append(f"{anim.name} frame {i}: blob lies outside the data section")
+                continue
+            blob = pack.blob(anim, i)
+            if zlib.crc32(blob) != crc:
+                problems.append(f"{anim.name} frame {i}: CRC mismatch")
+            elif size > pack.max_blob:
+                problems.append(f"{anim.name} frame {i}: {size} bytes exceeds the header's max_blob")
+            else:
+                why = _blob_problem(anim, blob, anim.encoding)
+                if why:
+                    problems.append(f"{anim.name} frame {i} {why}")
+    return problems
@@ -0,0 +1,95 @@
+"""
+Project files (.json) for the pixel editors and the compiler.
+
+Version 1 is what both editors have always written, with no version key:
+
+  {"frames": [[["#RRGGBB", ...], ...], ...], "palette": [...], "speed": 150}
+
+Version 2 stores each colour once. The frames are index grids into a colour
+table, and the grid size is recorded so an editor can reject a project that
+was drawn for a different grid:
+
+  {"format": "bubu-project", "version": 2, "width": 60, "height": 34,
+   "speed": 150, "palette": [...], "colors": ["#000000", ...],
+   "frames": [[[0, 0, 1, ...], ...], ...]}
+
+load() reads both versions and save() always writes the current one. A file
+from a newer version raises ValueError instead of being silently misread.
+"""
+import json
+import os
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from .frames import FrameStore
+
+FORMAT = "bubu-project"
+FORMAT_VERSION = 2
+DEFAULT_SPEED = 150
+
+
+@dataclass
+class Project:
+    store: FrameStore
+    palette: list = field(default_factory=list)   # the editor's colour swatches
+    speed: int = DEFAULT_SPEED                      # ms per frame
+
+
+def _check_grids(frames):
+    if not frames or not frames[0] or not frames[0][0]:
+        raise ValueError("project has no frames")
+    rows, cols = len(frames[0]), len(frames[0][0])
+    for i, fr in enumerate(frames):
+        if len(fr) != rows or any(len(row) != cols for row in fr):
+            raise ValueError(f"frame {i + 1} is not {cols}x{rows} like frame 1")
+
+
+def from_dict(data):
+    if data.get("format", FORMAT) != FORMAT:
+        raise ValueError(f"not a {FORMAT} file (format {data.get('format')!r})")
+    version = data.get("version", 1)
+    if not isinstance(version, int) or version > FORMAT_VERSION:
+        raise ValueError(f"project format version {version!r} is newer than this tool reads "
+                         f"(up to {FORMAT_VERSION})")
+    frames = data.get("frames")
+    _check_grids(frames)
+    if version == 1:
+        store = FrameStore.from_hex(frames)
+    else:
+        colors = data.get("colors") or []
+        index = np.array(frames, dtype=np.int64)
+        if index.min() < 0 or index.max() >= len(colors):
+            raise ValueError("frame refers to a colour missing from the colour table")
+        if index.shape[1:] != (data.get("height"), data.get("width")):
+            raise ValueError(f"frames are {index.shape[2]}x{index.shape[1]}, "
+                             f"header says {data.get('width')}x{data.get('height')}")
+        store = FrameStore.from_indices(colors, index)
+    return Project(store, list(data.get("palette") or []), int(data.get("speed", DEFAULT_SPEED)))
+
+
+def to_dict(project):
+    store = project.store
+    return {
+        "format": FORMAT,
+        "version": FORMAT_VERSION,
+        "width": store.cols,
+        "height": store.rows,
+        "speed": int(project.speed),
+        "palette": list(project.palette),
+        "colors": list(store.colors),
+        "frames": store.data.tolist(),
+    }
+
+
+def load(path):
+    """Read a project file (any version). Raises ValueError on malformed files."""
+    with open(path, "r") as f:
+        return from_dict(json.load(f))
+
+
+def save(path, project):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(to_dict(project), f, separators=(",", ":"))
+    os.replace(tmp, path)   # never leave a half-written project behind
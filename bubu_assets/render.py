@@ -0,0 +1,125 @@
+"""
+Canvas rendering for the pixel editors (and the pack player's preview) that only
+touches Tk items which actually change. The one Tk-dependent module here — the
+headless tools never import it.
+
+Every itemconfig / create_* call is a round trip into Tcl, and the editor grid
+is ROWS x COLS rectangles (2,040 at SCALE=4). Repainting all of them on every
+frame switch, or rebuilding the preview from rectangles on every tick, is what
+made long animations stutter.
+
+  CellGrid      remembers the colour each cell rectangle currently shows. Given
+                a frame, it reconfigures only the cells that differ (the dirty
+                cells), so switching between similar frames costs a few
+                itemconfigs instead of one per cell. The dirty cells are sent
+                as one batch(): a single Tcl script, so a fill or shape costs
+                one round trip however many cells it covers. show_frame() diffs
+                a FrameStore's uint16 index arrays instead of colour strings.
+  PreviewImage  the live preview is a single PhotoImage. The put() row data of
+                each frame is built once and cached by frame position, and it
+                is rebuilt only when that frame's content changes (prerender()
+                fills the cache ahead of time). A tick is then at most one put()
+                and nothing at all when the frame is already shown.
+
+Frames are 2-D grids of "#RRGGBB" strings: nested lists or numpy object arrays.
+"""
+import tkinter as tk
+
+import numpy as np
+
+
+def batch(canvas, commands):
+    """Run canvas subcommands ("itemconfigure 12 -fill #FF0000", ...) in one Tcl round trip."""
+    if commands:
+        path = str(canvas)
+        canvas.tk.eval("\n".join(f"{path} {cmd}" for cmd in commands))
+
+
+class CellGrid:
+    def __init__(self, canvas, items, fill):
+        self.canvas = canvas
+        self.items = items                      # [r][c] → canvas rectangle id
+        self.shown = np.full((len(items), len(items[0])), fill, dtype=object)
+        # Colour indices on screen, valid for _store only (its colour list is
+        # append-only, so equal indices there mean equal colours)
+        self._store = None
+        self._index = None
+
+    def _paint(self, rows, cols, colors):
+        batch(self.canvas, [f"itemconfigure {self.items[r][c]} -fill {color}"
+                            for r, c, color in zip(rows.tolist(), cols.tolist(), colors)])
+        self.shown[rows, cols] = colors
+        return len(rows)
+
+    def show(self, frame, mask=None):
+        """Bring the canvas in line with frame (only within mask, if given); returns cells touched."""
+        frame = np.asarray(frame, dtype=object)
+        dirty = self.shown != frame
+        if mask is not None:
+            dirty &= mask
+        self._index = None                      # strings don't say which indices are shown
+        rows, cols = np.nonzero(dirty)
+        return self._paint(rows, cols, frame[rows, cols].tolist())
+
+    def show_frame(self, store, f, mask=None):
+        """show() for frame f of a FrameStore, diffing its index array against what's on screen."""
+        new = store.data[f]
+        if store is not self._store or self._index is None:
+            touched = self.show(store.hex_grid(f), mask)
+            if mask is None:
+                self._store, self._index = store, new.copy()
+            return touched
+        dirty = new != self._index
+        if mask is not None:
+            dirty &= mask
+        rows, cols = np.nonzero(dirty)
+        self._index[rows, cols] = new[rows, cols]
+        return self._paint(rows, cols, [store.colors[i] for i in new[rows, cols].tolist()])
+
+    def set(self, r, c, color, index=None):
+        """Paint one cell; pass its colour index to keep show_frame()'s diff valid."""
+        if self.shown[r, c] != color:
+            self.canvas.itemconfig(self.items[r][c], fill=color)
+            self.shown[r, c] = color
+        if self._index is not None:
+            if index is None:
+                self._index = None
+            else:
+                self._index[r, c] = index
+
+
+class PreviewImage:
+    def __init__(self, canvas, width, height, zoom=1):
+        self.zoom = zoom
+        self.image = tk.PhotoImage(master=canvas, width=width * zoom, height=height * zoom)
+        canvas.create_image(0, 0, image=self.image, anchor="nw")
+        self._cache = {}        # frame position → (frame grid, put data)
+        self._current = None    # put data on screen right now
+
+    def _put_data(self, frame):
+        if self.zoom > 1:
+            frame = np.repeat(np.repeat(frame, self.zoom, axis=0), self.zoom, axis=1)
+        return " ".join("{" + " ".join(row) + "}" for row in frame.tolist())
+
+    def render(self, key, frame):
+        """put() data for the frame at position key, reused while its content is unchanged."""
+        frame = np.asarray(frame, dtype=object)
+        cached = self._cache.get(key)
+        if cached is not None and np.array_equal(cached[0], frame):
+            return cached[1]
+        data = self._put_data(frame)
+        self._cache[key] = (frame.copy(), data)
+        return data
+
+    def prerender(self, frames):
+        """Build (or refresh) the cache for every frame and forget positions that no longer exist."""
+        for key, frame in enumerate(frames):
+            self.render(key, frame)
+        for key in [k for k in self._cache if k >= len(frames)]:
+            del self._cache[key]
+
+    def show(self, key, frame):
+        data = self.render(key, frame)
+        if data is not self._current:
+            self.image.put(data, to=(0, 0))
+            self._current = data
@@ -0,0 +1,434 @@
+"""
+bubu_assets test suite — run from the repository root with: pytest bubu_assets/tests.py -v
+
+Tests cover:
+  - colour conversion (scalar and numpy)
+  - FrameStore: hex round trip, editing, diff undo across frame inserts
+  - raster masks and the scanline fill against cell-by-cell references
+  - every encoding decoding back to the original frames
+  - project files (v1 and v2) and the face-region export
+  - asset packs: round trip, blob alignment and validation of damaged files
+  - image import: area downscale, quantization, both dithers, GIF frames
+  - shared tiles: decode round trip in both bank layouts, dedupe across animations
+  - editor rendering: CellGrid repaints only the cells whose colour index changed
+"""
+import io
+import json
+import os
+import random
+
+import numpy as np
+import pytest
+
+from bubu_assets import FrameStore, encoders, face, images, pack, project, raster, tiles
+from bubu_assets.color import hex_to_565, pixels_to_565, rgb565_to_hex, rgb565_to_rgb
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EMOTION_TESTS = os.path.join(REPO, "AnjeBubu", "emotions", "test")
+
+
+def random_hex_frames(seed, frames=3, rows=6, cols=9, colors=("#000000", "#FFFFFF", "#FF8040", "#123456")):
+    rng = random.Random(seed)
+    return [[[rng.choice(colors) for _ in range(cols)] for _ in range(rows)] for _ in range(frames)]
+
+
+# ──────────────────────────────────────────────
+# Colour
+# ──────────────────────────────────────────────
+
+def test_hex_to_565_known_values():
+    assert hex_to_565("#000000") == 0x0000
+    assert hex_to_565("#FFFFFF") == 0xFFFF
+    assert hex_to_565("#FF0000") == 0xF800
+    assert hex_to_565("#00ff00") == 0x07E0
+    assert hex_to_565("#0000FF") == 0x001F
+
+
+def test_565_round_trip_and_vectorized_conversion():
+    values = np.arange(0, 0x10000, 97, dtype=np.uint16)
+    rgb = np.stack(rgb565_to_rgb(values.astype(np.int64)), axis=-1)
+    assert np.array_equal(pixels_to_565(rgb), values)
+    assert rgb565_to_hex(0xFFFF) == "#FFFFFF"
+
+
+# ──────────────────────────────────────────────
+# FrameStore
+# ──────────────────────────────────────────────
+
+def test_frame_store_hex_round_trip_and_565():
+    frames = random_hex_frames(1)
+    store = FrameStore.from_hex(frames)
+    assert store.to_hex() == frames
+    assert store.to_565().tolist() == [[[hex_to_565(c) for c in row] for row in fr] for fr in frames]
+
+
+def test_frame_store_undo_follows_frame_through_insert():
+    store = FrameStore(4, 5)
+    store.begin_edit(0)
+    store.fill(0, store.flood_mask(0, 0, 0), "#FF0000")
+    store.begin_edit(0)
+    store.set_cells(0, [1, 9], [1, 1], "#00FF00")     # (9, 1) is off the grid and ignored
+
+    store.insert(0)                                    # the edited frame is now frame 1
+    assert store.undo(0) is None
+    restored = store.undo(1)
+    assert restored.sum() == 1 and store.get(1, 1, 1) == "#FF0000"
+    store.undo(1)
+    assert (store.data[1] == store.background).all()
+    assert store.undo(1) is None
+
+
+def test_frame_store_move_and_upscale():
+    store = FrameStore(4, 4)
+    store.set_cells(0, [0, 0, 1], [0, 1, 0], "#FFFFFF")
+    touched = store.move(0, (0, 0, 1, 1), 2, 2)
+    assert touched.sum() == 8
+    assert store.hex_frame(0)[2][2] == "#FFFFFF" and store.hex_frame(0)[0][0] == "#000000"
+    big = store.upscale(0, 3, rows=3, cols=3)
+    assert big.shape == (9, 9) and (big[6:, 6:] == 0xFFFF).all()
+
+
+# ──────────────────────────────────────────────
+# Raster
+# ──────────────────────────────────────────────
+
+def _reference_line(r0, c0, r1, c1):
+    cells = set()
+    dr, dc = abs(r1 - r0), abs(c1 - c0)
+    sr = 1 if r1 > r0 else -1; sc = 1 if c1 > c0 else -1
+    err, r, c = dr - dc, r0, c0
+    while True:
+        cells.add((r, c))
+        if r == r1 and c == c1:
+            break
+        e2 = 2 * err
+        if e2 > -dc: err -= dc; r += sr
+        if e2 < dr: err += dr; c += sc
+    return cells
+
+
+def _cells(mask):
+    return set(map(tuple, np.argwhere(mask).tolist()))
+
+
+def test_line_mask_matches_bresenham():
+    rng = random.Random(2)
+    for _ in range(500):
+        r0, c0, r1, c1 = (rng.randrange(20) for _ in range(4))
+        assert _cells(raster.line_mask((20, 20), r0, c0, r1, c1)) == _reference_line(r0, c0, r1, c1)
+
+
+def test_shape_masks():
+    shape = (10, 12)
+    outline = raster.rect_mask(shape, 1, 2, 5, 8, filled=False)
+    assert outline.sum() == 2 * 7 + 2 * 3 and not outline[3, 5]
+    tri = raster.triangle_mask(shape, 0, 0, 6, 10, filled=True)
+    assert tri[6].sum() == 11 and tri[0].sum() == 1
+    assert raster.ellipse_mask(shape, 2, 2, 2, 9, filled=True).sum() == 1   # degenerate → one cell
+
+
+def test_scanline_fill_matches_four_neighbour_flood():
+    rng = np.random.default_rng(3)
+    for _ in range(300):
+        region = rng.random((rng.integers(1, 15), rng.integers(1, 15))) < 0.6
+        r, c = int(rng.integers(region.shape[0])), int(rng.integers(region.shape[1]))
+        expected, stack = set(), [(r, c)]
+        while stack:
+            a, b = stack.pop()
+            if (a, b) in expected or not (0 <= a < region.shape[0] and 0 <= b < region.shape[1]) or not region[a, b]:
+                continue
+            expected.add((a, b))
+            stack += [(a + 1, b), (a - 1, b), (a, b + 1), (a, b - 1)]
+        assert _cells(raster.scanline_fill(region, r, c)) == expected
+
+
+# ──────────────────────────────────────────────
+# Encoders
+# ──────────────────────────────────────────────
+
+@pytest.mark.parametrize("encoding", ["pal4", "pal8", "rle", "delta"])
+def test_encodings_decode_to_original_frames(encoding):
+    store = FrameStore.from_hex(random_hex_frames(4, frames=5, rows=7, cols=11))
+    frames565 = encoders.frames_to_565(store)
+    enc = encoders.encode(frames565, encoding)
+    assert encoders.decode_all(enc, encoding, 7, 11) == frames565.tolist()
+    if encoding.startswith("pal"):       # random noise has no runs; only indexing is guaranteed smaller
+        assert encoders.encoded_size(frames565, encoding) < encoders.encoded_size(frames565, "raw")
+
+
+def test_palette_is_first_seen_and_runs_split_at_max_run():
+    frames = np.array([[[7, 7, 3], [3, 9, 9]], [[9, 1, 1], [7, 7, 7]]], dtype=np.uint16)
+    palette, index = encoders.build_palette(frames)
+    assert palette == [7, 3, 9, 1]
+    assert np.array_equal(np.asarray(palette)[index], frames)
+    row = [5] * 600 + [6]
+    assert encoders._runs(row) == [(0, 255, 5), (255, 255, 5), (510, 90, 5), (600, 1, 6)]
+
+
+def test_palette_encoding_rejects_too_many_colours():
+    colors = [f"#{i:02X}0000" for i in range(0, 255, 8)]   # 32 colours
+    store = FrameStore.from_hex(random_hex_frames(5, frames=1, rows=8, cols=8, colors=colors))
+    with pytest.raises(ValueError, match="at most 16"):
+        encoders.encode(encoders.frames_to_565(store), "pal4")
+
+
+def test_raw_header_matches_committed_export():
+    with open(os.path.join(EMOTION_TESTS, "smile.json")) as f:
+        data = json.load(f)
+    out = io.StringIO()
+    encoders.write_header(out, "smile", project.from_dict(data).store, data["speed"], "raw")
+    with open(os.path.join(EMOTION_TESTS, "smile.h")) as f:
+        assert out.getvalue() == f.read()
+
+
+# ──────────────────────────────────────────────
+# Project files and face export
+# ──────────────────────────────────────────────
+
+def test_project_v1_loads_and_saves_as_v2(tmp_path):
+    frames = random_hex_frames(6)
+    v1 = tmp_path / "old.json"
+    v1.write_text(json.dumps({"frames": frames, "palette": ["#000000"], "speed": 90}))
+    loaded = project.load(str(v1))
+    assert loaded.store.to_hex() == frames and loaded.speed == 90
+
+    v2 = tmp_path / "new.json"
+    project.save(str(v2), loaded)
+    data = json.loads(v2.read_text())
+    assert data["version"] == project.FORMAT_VERSION and (data["width"], data["height"]) == (9, 6)
+    again = project.load(str(v2))
+    assert again.store.to_hex() == frames and again.palette == ["#000000"]
+
+
+@pytest.mark.parametrize("data, message", [
+    ({"version": 99, "frames": [[["#000000"]]]}, "newer"),
+    ({"frames": [[["#000000", "#000000"]], [["#000000"]]]}, "frame 2"),
+    ({"frames": []}, "no frames"),
+    ({"version": 2, "width": 1, "height": 1, "colors": ["#000000"], "frames": [[[1]]]}, "colour table"),
+])
+def test_project_rejects_malformed_files(data, message):
+    with pytest.raises(ValueError, match=message):
+        project.from_dict(data)
+
+
+def test_face_pixels_crop_in_pixels_not_cells():
+    store = FrameStore(64, 48)
+    store.set_cells(0, [26, 27], [0, 0], "#FFFFFF")
+    pixels = face.face_pixels(store, 0, 5, 240, 136)     # 136 = 27 cells + 1 pixel row
+    assert pixels.shape == (136, 240)
+    assert (pixels[130:135, :5] == 0xFFFF).all() and (pixels[135, :5] == 0xFFFF).all()
+    with pytest.raises(ValueError):
+        face.face_pixels(store, 0, 5, 245, 135)          # wider than the grid
+
+    out = io.StringIO()
+    face.write_face_header(out, face.face_pixels(store, 0, 5, 240, 135))
+    text = out.getvalue()
+    assert "#define FACE_H 135" in text and text.count("0x") == 240 * 135
+
+
+# ──────────────────────────────────────────────
+# Asset packs
+# ──────────────────────────────────────────────
+
+def _pack_animations():
+    return [("smile", FrameStore.from_hex(random_hex_frames(7, frames=4, rows=7, cols=11)), 120),
+            ("sad", FrameStore.from_hex(random_hex_frames(8, frames=2, rows=5, cols=9)), 200)]
+
+
+@pytest.mark.parametrize("encoding", list(pack.ENCODING_IDS))
+def test_pack_round_trip_and_alignment(encoding):
+    animations = _pack_animations()
+    data = pack.build_pack(animations, encoding, align=64)
+    bpk = pack.Pack(data)
+    assert list(bpk.animations) == ["smile", "sad"] and len(data) % 64 == 0
+    for name, store, delay in animations:
+        anim = bpk.animations[name]
+        assert (anim.width, anim.height, anim.delay_ms) == (store.cols, store.rows, delay)
+        assert all(offset % 64 == 0 for offset, _, _ in anim.frames)
+        assert bpk.decode(name) == encoders.frames_to_565(store).tolist()
+    assert pack.validate(data) == []
+
+
+def test_pack_validate_reports_damage():
+    data = pack.build_pack(_pack_animations(), "rle")
+    assert pack.validate(data[:20]) == ["file is shorter than a pack header"]
+    assert "bad magic" in pack.validate(b"X" + data[1:])[0]
+
+    frame_offset = pack.Pack(data).animations["sad"].frames[1][0]
+    flipped = bytearray(data)
+    flipped[frame_offset] ^= 0x01
+    assert pack.validate(bytes(flipped)) == ["sad frame 1: CRC mismatch"]
+
+    flipped = bytearray(data)
+    flipped[pack.HEADER.size + 20] ^= 0x01              # smile's delay_ms
+    assert pack.validate(bytes(flipped))[0].startswith("index CRC mismatch")
+
+
+def test_pack_rejects_bad_arguments():
+    animations = _pack_animations()
+    with pytest.raises(ValueError, match="power of two"):
+        pack.build_pack(animations, align=24)
+    with pytest.raises(ValueError, match="longer than"):
+        pack.build_pack([("a_very_long_name_", animations[0][1], 100)])
+    with pytest.raises(ValueError, match="unique"):
+        pack.build_pack(animations + animations)
+
+
+# ──────────────────────────────────────────────
+# Image import
+# ──────────────────────────────────────────────
+
+def test_downscale_averages_the_covered_pixels():
+    pixels = np.random.default_rng(9).random((2, 64, 48, 3)) * 255
+    small = images.downscale(pixels, 16, 12)
+    assert small.shape == (2, 16, 12, 3)
+    assert np.allclose(small[1, 3, 5], pixels[1, 12:16, 20:24].mean(axis=(0, 1)))
+    assert images.downscale(pixels[:, :4, :4], 8, 8).shape == (2, 8, 8, 3)   # enlarging repeats pixels
+    assert images.fit_size(240, 320, 34, 60) == (34, 45)
+
+
+def test_quantized_palette_is_565_exact_and_bounded():
+    pixels = np.random.default_rng(10).random((500, 3)) * 255
+    for method in images.METHODS:
+        palette = images.build_palette(pixels, 8, method)
+        assert 1 < len(palette) <= 8
+        assert np.array_equal(images.snap_565(palette), palette)
+    solid = np.full((10, 3), 77.0)
+    assert len(images.build_palette(solid, 8)) == 1
+
+
+def _reference_floyd_steinberg(pixels, palette):
+    work, (rows, cols) = pixels.astype(float).copy(), pixels.shape[:2]
+    out = np.zeros((rows, cols), dtype=int)
+    for r in range(rows):
+        for c in range(cols):
+            value = np.clip(work[r, c], 0, 255)
+            out[r, c] = i = int(((value - palette) ** 2).sum(axis=1).argmin())
+            for dr, dc, weight in ((0, 1, 7 / 16), (1, -1, 3 / 16), (1, 0, 5 / 16), (1, 1, 1 / 16)):
+                if r + dr < rows and 0 <= c + dc < cols:
+                    work[r + dr, c + dc] += (value - palette[i]) * weight
+    return out
+
+
+def test_wavefront_floyd_steinberg_matches_scan_order():
+    rng = np.random.default_rng(11)
+    for _ in range(20):
+        pixels = rng.random((2, rng.integers(1, 10), rng.integers(1, 10), 3)) * 255
+        palette = rng.random((4, 3)) * 255
+        got = images.map_floyd_steinberg(pixels, palette)
+        for f in range(2):
+            assert np.array_equal(got[f], _reference_floyd_steinberg(pixels[f], palette))
+
+
+@pytest.mark.parametrize("dither", ["ordered", "floyd-steinberg"])
+def test_dithering_keeps_mid_grey_tone(dither):
+    grey = np.full((1, 32, 32, 3), 128.0)
+    table, index = images.convert(grey, 32, 32, colors=["#000000", "#FFFFFF"], dither=dither)
+    assert table == ["#000000", "#FFFFFF"]
+    assert abs(index.mean() - 0.5) < 0.05
+    assert images.convert(grey, 32, 32, colors=["#000000", "#FFFFFF"])[1].mean() == 1
+
+
+def test_import_gif_frames_and_transparency(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    frames = []
+    for color in [(255, 0, 0), (0, 0, 255)]:
+        im = Image.new("RGBA", (40, 20), (0, 0, 0, 0))
+        im.paste(color + (255,), (0, 0, 20, 20))
+        frames.append(im)
+    path = str(tmp_path / "blink.gif")
+    frames[0].save(path, save_all=True, append_images=frames[1:], duration=80, loop=0, disposal=2)
+
+    proj = images.import_image(path, 10, 20, background="#00FF00")
+    assert len(proj.store) == 2 and proj.speed == 80
+    assert proj.store.get(0, 5, 2) == "#FF0000" and proj.store.get(1, 5, 2) == "#0000FF"
+    assert proj.store.get(0, 5, 15) == "#00FF00"      # transparent half → background
+
+
+# ──────────────────────────────────────────────
+# Shared tiles
+# ──────────────────────────────────────────────
+
+@pytest.mark.parametrize("density", [1.0, 0.02])
+def test_tileset_decodes_to_original_frames(density):
+    rng = random.Random(7)
+    colors = [f"#{i * 6:02X}{255 - i * 6:02X}40" for i in range(24)]
+
+    def sparse(rows, cols):
+        return [[[rng.choice(colors) if rng.random() < density else colors[0] for _ in range(cols)]
+                 for _ in range(rows)] for _ in range(3)]
+
+    animations = [("a", FrameStore.from_hex(sparse(13, 21)), 100), ("b", FrameStore.from_hex(sparse(9, 9)), 50)]
+    tileset = tiles.build_tileset(animations, tile=8)
+    assert tileset.bank_layout()[0] == ("packed" if density == 1.0 else "rle")
+    for name, store, _ in animations:
+        assert tiles.decode(tileset, name) == encoders.frames_to_565(store).tolist()
+    out = io.StringIO()
+    tiles.write_header(out, tileset, "faces")
+    assert "BubuTileAnim b_tiled = { &faces_tiles, 9, 9, 2, 2, 3, 50, b_tilemap };" in out.getvalue()
+
+
+def test_tiles_are_shared_across_animations():
+    frames = random_hex_frames(3, frames=2, rows=8, cols=16)
+    blinking = [frames[0], frames[1], frames[0]]
+    animations = [("open", FrameStore.from_hex(frames), 100), ("blink", FrameStore.from_hex(blinking), 100)]
+    tileset = tiles.build_tileset(animations, tile=8)
+    assert len(tileset.bank) <= 4                       # 2 frames x 2 tiles, whichever animation uses them
+    open_maps, blink_maps = (a.maps for a in tileset.anims)
+    assert np.array_equal(blink_maps[2], open_maps[0])
+    rep = tiles.report(tileset, animations)
+    assert rep["total_tiles"] == 10 and rep["unique_tiles"] == len(tileset.bank)
+    assert rep["tiles"] == tileset.flash_size() < rep["raw"]
+
+
+def test_tileset_rejects_bad_arguments():
+    store = FrameStore.from_hex(random_hex_frames(1))
+    with pytest.raises(ValueError, match="tile size"):
+        tiles.build_tileset([("a", store, 100)], tile=5)
+    many = [[[f"#{r * 16:02X}{c * 12:02X}00" for c in range(20)] for r in range(15)]]
+    with pytest.raises(ValueError, match="256 colours"):
+        tiles.build_tileset([("a", FrameStore.from_hex(many), 100)])
+
+
+# ──────────────────────────────────────────────
+# Editor rendering (no display needed: a stand-in canvas records the Tcl)
+# ──────────────────────────────────────────────
+
+class RecordingCanvas:
+    def __init__(self):
+        self.scripts, self.configs = [], []
+        self.tk = self
+
+    def __str__(self):
+        return ".canvas"
+
+    def eval(self, script):
+        self.scripts.append(script)
+
+    def itemconfig(self, item, fill):
+        self.configs.append((item, fill))
+
+
+def test_cell_grid_repaints_only_changed_indices():
+    from bubu_assets.render import CellGrid
+    store = FrameStore.from_hex(random_hex_frames(7, frames=2, rows=5, cols=6))
+    store.insert(2, source=0)
+    store.set_cells(2, [1, 3], [2, 4], "#00FF00")
+    canvas = RecordingCanvas()
+    items = [[r * 6 + c for c in range(6)] for r in range(5)]
+    cells = CellGrid(canvas, items, "#000000")
+
+    cells.show_frame(store, 0)
+    assert cells.show_frame(store, 2) == 2              # clone of frame 0 with two cells changed
+    assert canvas.scripts[-1].splitlines() == [".canvas itemconfigure 8 -fill #00FF00",
+                                               ".canvas itemconfigure 22 -fill #00FF00"]
+    assert cells.show_frame(store, 2) == 0
+    expected = (store.data[1] != store.data[2]).sum()
+    assert cells.show_frame(store, 1) == expected
+    assert np.array_equal(cells.shown, store.hex_grid(1))
+
+    red = store.color_index("#FF0000")
+    store.data[1, 0, 0] = red
+    cells.set(0, 0, "#FF0000", red)
+    assert canvas.configs == [(0, "#FF0000")]
+    assert cells.show_frame(store, 1) == 0
@@ -0,0 +1,221 @@
+"""
+Shared-tile encoding: one bank of unique tiles for a whole set of animations.
+
+The per-animation encoders (encoders.py) only find repetition inside one
+animation. Mood faces repeat across moods too: the face outline, closed eyes
+and the blank background appear in every one of them. Here every frame of
+every animation is cut into tile x tile blocks (8x8 by default, the grid is
+padded with the background colour up to a whole number of tiles). Identical
+blocks are stored once in a shared bank, and each frame becomes a map of
+bank indices:
+
+  palette   one RGB565 palette for the whole set (≤256 colours)
+  bank      unique tiles in one of two layouts, whichever is smaller:
+              packed  palette indices at 4 bpp (≤16 colours, high nibble
+                      first) or 8 bpp, tile*tile pixels per tile
+              rle     per tile row, (run, index) byte pairs, plus a uint32
+                      offset per tile. Flat and sparse tiles (most of a
+                      face) shrink to a few bytes
+  maps      per animation, frames x tiles_down x tiles_across indices, one
+            byte each if the bank has ≤256 tiles, else two (little-endian)
+
+np.unique over the flattened tiles does the deduplication in one call.
+bubu_tiles.h draws a frame tile by tile with fillRect per run, and can skip
+every tile whose index didn't change since the previous frame.
+
+report() compares the set against writing every frame in full (raw) and
+against the best per-animation encoding, i.e. the flash the tile bank saves.
+"""
+import os
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from . import encoders
+from .color import hex_to_565
+from .encoders import _c_array
+
+TILE = 8
+DECODER_HEADER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bubu_tiles.h")
+
+# The moods the backend predicts (backend/core/models.py MOOD_EMOJI); a complete set has all of them
+MOODS = ["happy", "neutral", "stressed", "angry", "sad", "sleepy"]
+
+
+@dataclass
+class TileAnim:
+    name: str
+    width: int
+    height: int
+    delay: int
+    maps: np.ndarray          # (frames, tiles_down, tiles_across) bank indices
+
+
+@dataclass
+class TileSet:
+    tile: int
+    palette: list             # RGB565 values
+    bank: np.ndarray          # (tiles, tile, tile) palette indices
+    anims: list = field(default_factory=list)
+
+    @property
+    def bpp(self):
+        return 4 if len(self.palette) <= 16 else 8
+
+    @property
+    def map_bytes(self):
+        return 1 if len(self.bank) <= 256 else 2
+
+    def packed_bank(self):
+        flat = self.bank.reshape(len(self.bank), -1).astype(np.uint8)
+        if self.bpp == 8:
+            return flat.tobytes()
+        return ((flat[:, 0::2] << 4) | flat[:, 1::2]).tobytes()
+
+    def rle_bank(self):
+        """(run bytes, offsets[count + 1]); runs never cross a tile row."""
+        out, offsets = bytearray(), [0]
+        for tile in self.bank.tolist():
+            for row in tile:
+                out += b"".join(bytes((length, value)) for _, length, value in encoders._runs(row))
+            offsets.append(len(out))
+        return bytes(out), offsets
+
+    def bank_layout(self):
+        """("packed", bytes, None) or ("rle", bytes, offsets), whichever takes less flash."""
+        packed = self.packed_bank()
+        runs, offsets = self.rle_bank()
+        if len(runs) + 4 * len(offsets) < len(packed):
+            return "rle", runs, offsets
+        return "packed", packed, None
+
+    def flash_size(self):
+        """Bytes of palette + bank (+ offsets) + maps: the PROGMEM the set takes, structs aside."""
+        _, bank, offsets = self.bank_layout()
+        maps = sum(a.maps.size for a in self.anims) * self.map_bytes
+        return 2 * len(self.palette) + len(bank) + 4 * len(offsets or []) + maps
+
+
+def _tiles(index, tile, fill):
+    """(frames, rows, cols) indices → (frames, down, across, tile, tile), padded with `fill`."""
+    n, rows, cols = index.shape
+    down, across = -(-rows // tile), -(-cols // tile)
+    padded = np.full((n, down * tile, across * tile), fill, dtype=index.dtype)
+    padded[:, :rows, :cols] = index
+    return padded.reshape(n, down, tile, across, tile).swapaxes(2, 3)
+
+
+def build_tileset(animations, tile=TILE):
+    """animations: [(name, FrameStore, delay)] → TileSet with one bank for all of them."""
+    if tile < 2 or tile > 32 or tile % 2:
+        raise ValueError(f"tile size must be an even number from 2 to 32, got {tile}")
+    frames565 = [store.to_565() for _, store, _ in animations]
+    # Padding uses each animation's background colour, which may not appear in any frame
+    backgrounds = np.array([hex_to_565(store.colors[store.background]) for _, store, _ in animations],
+                           dtype=np.uint16)
+    palette, inverse = np.unique(np.concatenate([f.ravel() for f in frames565] + [backgrounds]),
+                                 return_inverse=True)
+    if len(palette) > 256:
+        raise ValueError(f"tiles support at most 256 colours across the set, it uses {len(palette)}")
+    bg_index = inverse[-len(animations):]
+
+    blocks, shapes, start = [], [], 0
+    for f565, bg in zip(frames565, bg_index):
+        t = _tiles(inverse[start:start + f565.size].reshape(f565.shape), tile, bg)
+        start += f565.size
+        shapes.append(t.shape[:3])
+        blocks.append(t.reshape(-1, tile * tile))
+    bank, which = np.unique(np.concatenate(blocks), axis=0, return_inverse=True)
+    which = which.ravel()
+
+    tileset = TileSet(tile, palette.tolist(), bank.reshape(-1, tile, tile).astype(np.uint8))
+    start = 0
+    for (name, store, delay), shape in zip(animations, shapes):
+        count = int(np.prod(shape))
+        tileset.anims.append(TileAnim(name, store.cols, store.rows, int(delay),
+                                      which[start:start + count].reshape(shape)))
+        start += count
+    return tileset
+
+
+def _unpack_bank(tileset):
+    """The bank back from its flash layout (mirrors bubu_tiles.h)."""
+    layout, data, offsets = tileset.bank_layout()
+    t, count = tileset.tile, len(tileset.bank)
+    if layout == "rle":
+        tiles = []
+        for i in range(count):
+            runs = np.frombuffer(data[offsets[i]:offsets[i + 1]], dtype=np.uint8).reshape(-1, 2)
+            tiles.append(np.repeat(runs[:, 1], runs[:, 0]))
+        return np.array(tiles, dtype=np.uint8).reshape(count, t, t)
+    packed = np.frombuffer(data, dtype=np.uint8)
+    if tileset.bpp == 4:
+        packed = np.stack([packed >> 4, packed & 0x0F], axis=1).ravel()
+    return packed.reshape(count, t, t)
+
+
+def decode(tileset, name):
+    """Every frame of animation `name` as RGB565 grids (what bubu_tiles.h draws)."""
+    anim = next(a for a in tileset.anims if a.name == name)
+    n, down, across = anim.maps.shape
+    t = tileset.tile
+    pixels = _unpack_bank(tileset)[anim.maps].swapaxes(2, 3).reshape(n, down * t, across * t)
+    return np.asarray(tileset.palette, dtype=np.uint16)[pixels[:, :anim.height, :anim.width]].tolist()
+
+
+def report(tileset, animations):
+    """
+    Flash use of the set three ways. Returns {"raw", "best", "tiles", "unique_tiles",
+    "total_tiles", "per_anim": [(name, raw, best, best encoding)]}.
+    """
+    per_anim, raw_total, best_total = [], 0, 0
+    for name, store, _ in animations:
+        frames565 = encoders.frames_to_565(store)
+        raw = encoders.encoded_size(frames565, "raw")
+        sizes = {"raw": raw}
+        for enc in encoders.ENCODINGS[1:]:
+            try:
+                sizes[enc] = encoders.encoded_size(frames565, enc)
+            except ValueError:      # too many colours for that encoding
+                pass
+        best = min(sizes, key=sizes.get)
+        per_anim.append((name, raw, sizes[best], best))
+        raw_total += raw
+        best_total += sizes[best]
+    return {"raw": raw_total, "best": best_total, "tiles": tileset.flash_size(),
+            "unique_tiles": len(tileset.bank),
+            "total_tiles": sum(a.maps.size for a in tileset.anims), "per_anim": per_anim}
+
+
+# ──────────────────────────────────────────────
+# Header writer
+# ──────────────────────────────────────────────
+
+def _map_values(tileset, anim):
+    values = anim.maps.ravel()
+    if tileset.map_bytes == 1:
+        return values.tolist()
+    return np.stack([values & 0xFF, values >> 8], axis=1).ravel().tolist()
+
+
+def write_header(f, tileset, set_name="bubu"):
+    """One header for the whole set: palette, tile bank, then a BubuTileAnim per animation."""
+    t = tileset.tile
+    layout, bank, offsets = tileset.bank_layout()
+    f.write(f"// {set_name}: {len(tileset.anims)} animations, {len(tileset.bank)} unique {t}x{t} tiles "
+            f"({layout}), {tileset.flash_size()} bytes\n")
+    f.write('#include <pgmspace.h>\n#include "bubu_tiles.h"\n\n')
+    _c_array(f, f"const uint16_t {set_name}_tile_palette[]", tileset.palette, "0x{:04X}", 12)
+    _c_array(f, f"const uint8_t {set_name}_tile_bank[]", list(bank) or [0], "0x{:02X}")
+    offsets_name = "nullptr"
+    if offsets is not None:
+        _c_array(f, f"const uint32_t {set_name}_tile_offsets[]", offsets, "{}", 12)
+        offsets_name = f"{set_name}_tile_offsets"
+    f.write(f"const BubuTileSet {set_name}_tiles = {{ {t}, {tileset.bpp}, {tileset.map_bytes}, "
+            f"{len(tileset.bank)}, {set_name}_tile_palette, {set_name}_tile_bank, {offsets_name} }};\n\n")
+    for anim in tileset.anims:
+        n, down, across = anim.maps.shape
+        _c_array(f, f"const uint8_t {anim.name}_tilemap[]", _map_values(tileset, anim), "{}", 24)
+        f.write(f"const BubuTileAnim {anim.name}_tiled = {{ &{set_name}_tiles, {anim.width}, {anim.height}, "
+                f"{across}, {down}, {n}, {anim.delay}, {anim.name}_tilemap }};\n\n")
+